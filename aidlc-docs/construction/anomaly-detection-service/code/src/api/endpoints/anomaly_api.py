@@ -3,13 +3,25 @@ REST API Endpoints for Anomaly Queries
 FastAPI endpoints for anomaly detection service
 """
 
+import asyncio
+import json
+import os
 from datetime import datetime, timedelta
 from typing import Dict, List, Optional, Any
-from fastapi import FastAPI, HTTPException, Depends, Query, Path
-from fastapi.responses import JSONResponse
+from fastapi import FastAPI, HTTPException, Depends, Query, Path, Request, WebSocket, WebSocketDisconnect
+from fastapi.responses import JSONResponse, Response, StreamingResponse
 from pydantic import BaseModel, Field
+from starlette.requests import ClientDisconnect
 import logging
 
+from ..services.admission_control import AdmissionRejected
+from ..services.anomaly_feed import CHANNEL, AnomalyFeed, FeedClient
+from ..services.detection_service import DETECTION_TYPES, DetectionService
+from ..services.detection_stats import DetectionStatsAggregator
+from ..services.request_coalescer import RequestCoalescer
+from ...infrastructure.storage.anomaly_repository import AnomalyRepository
+from ...utils.serialization.fast_json import dumps, dumps_text, loads
+
 logger = logging.getLogger(__name__)
 
 # Request/Response Models
@@ -45,6 +57,9 @@ class AnomalyResult(BaseModel):
     detection_method: str
     validation_results: Dict[str, Any]
     correlation_context: Optional[Dict[str, Any]] = None
+    source_ip: Optional[str] = None
+    destination_ip: Optional[str] = None
+    entities: Optional[List[str]] = None
     processing_time_ms: int
 
 class AnomalyQueryRequest(BaseModel):
@@ -56,6 +71,7 @@ class AnomalyQueryRequest(BaseModel):
     threat_types: Optional[List[str]] = Field(default=None, description="Filter by threat types")
     min_confidence: Optional[float] = Field(default=0.0, description="Minimum confidence score")
     limit: Optional[int] = Field(default=100, description="Maximum results to return")
+    cursor: Optional[str] = Field(default=None, description="next_cursor from the previous page")
 
 class AnomalyQueryResponse(BaseModel):
     """Response for anomaly queries"""
@@ -63,10 +79,11 @@ class AnomalyQueryResponse(BaseModel):
     total_count: int
     query_time_ms: int
     has_more: bool
+    next_cursor: Optional[str] = None
 
 class BatchDetectionRequest(BaseModel):
     """Batch anomaly detection request"""
-    flow_logs: List[FlowLogData] = Field(..., max_items=100, description="Batch of flow logs (max 100)")
+    flow_logs: List[FlowLogData] = Field(..., description="Batch of flow logs (max DETECT_MAX_BATCH_ITEMS)")
     detection_types: Optional[List[str]] = Field(default=["all"])
     priority: Optional[str] = Field(default="normal")
 
@@ -77,56 +94,162 @@ class BatchDetectionResponse(BaseModel):
     processing_time_ms: int
     success_count: int
     error_count: int
+    tier_timings_ms: Dict[str, float] = Field(default_factory=dict, description="Per-tier processing time")
+    tier_counts: Dict[str, int] = Field(default_factory=dict, description="Records or anomalies leaving each tier")
 
 # API Router
+class FastJSONResponse(JSONResponse):
+    """JSON response rendered with orjson (stdlib json when it is not installed)"""
+    
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
+
+class UploadStreamingResponse(StreamingResponse):
+    """StreamingResponse for bodies that consume the request upload while they are being sent"""
+    
+    async def __call__(self, scope, receive, send):
+        # Below ASGI 2.4, StreamingResponse listens for disconnects by calling receive(), which would take the
+        # upload's messages away from request.stream() and stall it; the body iterator owns receive() instead
+        # and a client that goes away surfaces there as ClientDisconnect
+        try:
+            await self.stream_response(send)
+        except OSError:
+            raise ClientDisconnect()
+        if self.background is not None:
+            await self.background()
+
+# AnomalyResult fields, for large responses that skip building a model per anomaly
+_RESULT_FIELDS = tuple(AnomalyResult.__fields__)
+
+def _result_fields(anomaly: Dict[str, Any]) -> Dict[str, Any]:
+    """Anomaly dict trimmed to the AnomalyResult schema"""
+    return {field: anomaly.get(field) for field in _RESULT_FIELDS}
+
 app = FastAPI(
     title="Anomaly Detection Service API",
     description="Real-time and ML-based anomaly detection for VPC Flow Logs",
-    version="1.0.0"
+    version="1.0.0",
+    default_response_class=FastJSONResponse
+)
+
+def _load_detection_config() -> Dict[str, Any]:
+    """Detection service settings from the environment"""
+    config = {
+        'max_batch_items': int(os.environ.get('DETECT_MAX_BATCH_ITEMS', 10000)),
+        'workers': int(os.environ.get('DETECT_WORKERS', 0)) or None,
+        'use_process_pool': os.environ.get('DETECT_USE_PROCESSES', 'true').lower() != 'false'
+    }
+    # Unset runs the statistical tiers only (DEFAULT_PROCESSOR_CONFIG); ML tiers need SageMaker endpoint names
+    processor_config_path = os.environ.get('DETECT_PROCESSOR_CONFIG')
+    if processor_config_path:
+        with open(processor_config_path) as f:
+            config['processor'] = json.load(f)
+    return config
+
+# Embedded day-partitioned store; ANOMALY_STORE_DIR unset keeps it in memory
+anomaly_repository = AnomalyRepository({
+    'directory': os.environ.get('ANOMALY_STORE_DIR', ':memory:'),
+    'retention_days': int(os.environ.get('ANOMALY_RETENTION_DAYS', 90))
+})
+
+# Per-minute rollups of every pipeline pass, compacted to hours and days
+detection_stats = DetectionStatsAggregator()
+
+# Live threat_alerts channel for WebSocket subscribers
+anomaly_feed = AnomalyFeed({
+    'buffer_size': int(os.environ.get('FEED_BUFFER_SIZE', 1000)),
+    'max_clients': int(os.environ.get('FEED_MAX_CLIENTS', 500))
+})
+
+detection_service = DetectionService(
+    _load_detection_config(), repository=anomaly_repository, stats_recorder=detection_stats,
+    anomaly_feed=anomaly_feed
 )
 
-# Dependency injection placeholders
-async def get_anomaly_detector():
+# Single-flow /detect calls share tiered passes
+request_coalescer = RequestCoalescer(detection_service, {
+    'enabled': os.environ.get('DETECT_COALESCE', 'true').lower() != 'false',
+    'max_records': int(os.environ.get('DETECT_COALESCE_MAX_RECORDS', 1000))
+})
+
+# ANOMALY_RETENTION_DAYS is enforced at startup and then once per purge interval
+ANOMALY_PURGE_INTERVAL = float(os.environ.get('ANOMALY_PURGE_INTERVAL_SECONDS', 86400))
+_purge_task: Optional[asyncio.Task] = None
+
+async def _purge_expired_anomalies():
+    while True:
+        try:
+            await asyncio.get_running_loop().run_in_executor(None, anomaly_repository.purge_expired)
+        except Exception as e:
+            logger.error(f"Anomaly retention purge failed: {e}")
+        await asyncio.sleep(ANOMALY_PURGE_INTERVAL)
+
+@app.on_event("startup")
+async def start_detection_service():
+    global _purge_task
+    detection_service.start()
+    _purge_task = asyncio.create_task(_purge_expired_anomalies())
+
+@app.on_event("shutdown")
+async def stop_detection_service():
+    if _purge_task is not None:
+        _purge_task.cancel()
+    detection_service.shutdown()
+    anomaly_repository.close()
+
+# Dependency injection
+async def get_anomaly_detector() -> DetectionService:
     """Get anomaly detector instance"""
-    # This would be injected with the actual detector
-    pass
+    return detection_service
 
-async def get_anomaly_repository():
+async def get_request_coalescer() -> RequestCoalescer:
+    """Get single-flow request coalescer"""
+    return request_coalescer
+
+async def get_anomaly_repository() -> AnomalyRepository:
     """Get anomaly repository instance"""
-    # This would be injected with the actual repository
-    pass
+    return anomaly_repository
 
 @app.post("/api/v1/detect", response_model=AnomalyResult)
 async def detect_anomaly(
     request: AnomalyDetectionRequest,
-    detector=Depends(get_anomaly_detector)
+    coalescer=Depends(get_request_coalescer)
 ) -> AnomalyResult:
     """
     Detect anomalies in a single VPC flow log entry
     
     - **flow_data**: VPC flow log data to analyze
     - **detection_types**: Specific detection algorithms to run
-    - **priority**: Processing priority level
+    - **priority**: Processing priority level (high requests flush the shared buffer sooner)
     """
     try:
         start_time = datetime.utcnow()
         
-        # Process detection request
-        # This would integrate with the actual detection engine
-        result = {
-            "anomaly_id": f"anom_{int(start_time.timestamp())}",
-            "anomaly_detected": False,
-            "threat_type": "normal",
-            "severity": "info",
-            "confidence_score": 0.1,
-            "detection_method": "tiered_processing",
-            "validation_results": {"validated": True},
-            "processing_time_ms": int((datetime.utcnow() - start_time).total_seconds() * 1000)
-        }
+        # Coalesced with concurrent single-flow requests into one tiered pass
+        flow_log = dict(request.flow_data.dict(), timestamp=request.flow_data.start_time)
+        anomalies = await coalescer.detect(flow_log, request.priority or "normal", request.detection_types)
+        processing_time = int((datetime.utcnow() - start_time).total_seconds() * 1000)
+        
+        if anomalies:
+            result = dict(max(anomalies, key=lambda anomaly: anomaly["confidence_score"]),
+                          processing_time_ms=processing_time)
+        else:
+            result = {
+                "anomaly_id": f"anom_{int(start_time.timestamp() * 1000)}",
+                "anomaly_detected": False,
+                "threat_type": "normal",
+                "severity": "info",
+                "confidence_score": 0.0,
+                "detection_method": "tiered_processing",
+                "validation_results": {"validated": True},
+                "processing_time_ms": processing_time
+            }
         
         logger.info(f"Processed anomaly detection request for {request.flow_data.source_ip}")
         return AnomalyResult(**result)
         
+    except AdmissionRejected:
+        raise
     except Exception as e:
         logger.error(f"Error in anomaly detection: {e}")
         raise HTTPException(status_code=500, detail=f"Detection failed: {str(e)}")
@@ -139,55 +262,78 @@ async def detect_batch_anomalies(
     """
     Detect anomalies in a batch of VPC flow log entries
     
-    - **flow_logs**: Batch of flow log data (max 100 entries)
+    - **flow_logs**: Batch of flow log data (max DETECT_MAX_BATCH_ITEMS entries)
     - **detection_types**: Specific detection algorithms to run
     - **priority**: Processing priority level
     """
+    if len(request.flow_logs) > detector.max_batch_items:
+        raise HTTPException(
+            status_code=413,
+            detail=f"Batch of {len(request.flow_logs)} flow logs exceeds the limit of {detector.max_batch_items}"
+        )
+    
     try:
         start_time = datetime.utcnow()
-        batch_id = f"batch_{int(start_time.timestamp())}"
+        batch_id = f"batch_{int(start_time.timestamp() * 1000)}"
         
-        results = []
-        success_count = 0
-        error_count = 0
+        # The whole batch goes through the tiered pipeline in one call on the worker pool
+        flow_logs = [dict(flow.dict(), timestamp=flow.start_time) for flow in request.flow_logs]
+        summary = await detector.detect(flow_logs, request.detection_types, request.priority or "normal")
         
-        # Process each flow log in the batch
-        for i, flow_data in enumerate(request.flow_logs):
-            try:
-                # This would integrate with the actual detection engine
-                result = {
-                    "anomaly_id": f"{batch_id}_item_{i}",
-                    "anomaly_detected": False,
-                    "threat_type": "normal",
-                    "severity": "info",
-                    "confidence_score": 0.1,
-                    "detection_method": "batch_processing",
-                    "validation_results": {"validated": True},
-                    "processing_time_ms": 50
-                }
-                results.append(AnomalyResult(**result))
-                success_count += 1
-                
-            except Exception as e:
-                logger.error(f"Error processing batch item {i}: {e}")
-                error_count += 1
+        results = [_result_fields(anomaly) for anomaly in summary['anomalies']]
+        error_count = len(flow_logs) if summary['error'] else 0
+        success_count = len(flow_logs) - error_count
         
         processing_time = int((datetime.utcnow() - start_time).total_seconds() * 1000)
         
-        logger.info(f"Processed batch {batch_id}: {success_count} success, {error_count} errors")
+        logger.info(f"Processed batch {batch_id}: {len(flow_logs)} flow logs, {len(results)} anomalies "
+                    f"in {processing_time}ms")
         
-        return BatchDetectionResponse(
-            results=results,
-            batch_id=batch_id,
-            processing_time_ms=processing_time,
-            success_count=success_count,
-            error_count=error_count
-        )
+        # Anomaly dicts are already in AnomalyResult shape; encode them directly instead of through models
+        return FastJSONResponse({
+            "results": results,
+            "batch_id": batch_id,
+            "processing_time_ms": processing_time,
+            "success_count": success_count,
+            "error_count": error_count,
+            "tier_timings_ms": summary['tier_timings_ms'],
+            "tier_counts": summary['tier_counts']
+        })
         
+    except AdmissionRejected:
+        raise
     except Exception as e:
         logger.error(f"Error in batch anomaly detection: {e}")
         raise HTTPException(status_code=500, detail=f"Batch detection failed: {str(e)}")
 
+@app.post("/api/v1/detect/stream")
+async def detect_stream_anomalies(
+    request: Request,
+    detection_types: Optional[str] = Query(None, description="Comma-separated detection types (default all)"),
+    priority: str = Query("normal", description="Processing priority: low, normal, high"),
+    detector=Depends(get_anomaly_detector)
+) -> UploadStreamingResponse:
+    """
+    Detect anomalies in a chunked NDJSON body of any size
+    
+    - **body**: One flow log object per line (FlowLogData or flow log field names), optionally gzip
+    - **detection_types**: Specific detection algorithms to run (comma-separated)
+    - **priority**: Processing priority level
+    
+    Anomalies stream back as NDJSON lines while the upload is still being read, followed by a summary line.
+    """
+    type_list = [t.strip() for t in detection_types.split(",")] if detection_types else None
+    gzipped = True if 'gzip' in request.headers.get('content-encoding', '') else None
+    
+    # Refuse up front while the response status can still be set; later batches queue normally
+    detector.admission.check(priority)
+    
+    logger.info(f"Streaming detection request from {request.client.host if request.client else 'unknown'}")
+    return UploadStreamingResponse(
+        detector.detect_stream(request.stream(), type_list, gzipped, priority),
+        media_type="application/x-ndjson"
+    )
+
 @app.get("/api/v1/anomalies", response_model=AnomalyQueryResponse)
 async def query_anomalies(
     start_time: Optional[datetime] = Query(None, description="Query start time"),
@@ -197,6 +343,8 @@ async def query_anomalies(
     threat_types: Optional[str] = Query(None, description="Comma-separated threat types"),
     min_confidence: Optional[float] = Query(0.0, description="Minimum confidence score"),
     limit: Optional[int] = Query(100, description="Maximum results"),
+    cursor: Optional[str] = Query(None, description="next_cursor from the previous page"),
+    count_total: bool = Query(False, description="Count every match instead of just this page"),
     repository=Depends(get_anomaly_repository)
 ) -> AnomalyQueryResponse:
     """
@@ -209,6 +357,8 @@ async def query_anomalies(
     - **threat_types**: Filter by threat types (comma-separated)
     - **min_confidence**: Minimum confidence score threshold
     - **limit**: Maximum number of results to return
+    - **cursor**: Continue after the last anomaly of a previous page (newest first)
+    - **count_total**: Return the total number of matches (scans every partition in range)
     """
     try:
         query_start = datetime.utcnow()
@@ -216,7 +366,8 @@ async def query_anomalies(
         # Parse threat types
         threat_type_list = None
         if threat_types:
-            threat_type_list = [t.strip() for t in threat_types.split(",")]
+            # API names (port_scan) map to the stored detector names (PORT_SCANNING), as in FeedFilter
+            threat_type_list = [DETECTION_TYPES.get(t.strip(), t.strip().upper()) for t in threat_types.split(",") if t.strip()]
         
         # Set default time range if not provided
         if not end_time:
@@ -224,22 +375,34 @@ async def query_anomalies(
         if not start_time:
             start_time = end_time - timedelta(hours=24)
         
-        # This would integrate with the actual repository
-        # For now, return empty results
-        anomalies = []
-        total_count = 0
+        page = await asyncio.get_running_loop().run_in_executor(None, lambda: repository.query(
+            start_time=start_time,
+            end_time=end_time,
+            source_ip=source_ip,
+            destination_ip=destination_ip,
+            threat_types=threat_type_list,
+            min_confidence=min_confidence or 0.0,
+            limit=limit or 100,
+            cursor=cursor,
+            count_total=count_total
+        ))
+        anomalies = [_result_fields(anomaly) for anomaly in page['anomalies']]
+        total_count = page['total_count'] if page['total_count'] is not None else len(anomalies)
         
         query_time = int((datetime.utcnow() - query_start).total_seconds() * 1000)
         
-        logger.info(f"Queried anomalies: {total_count} results in {query_time}ms")
+        logger.info(f"Queried anomalies: {len(anomalies)} results in {query_time}ms")
         
-        return AnomalyQueryResponse(
-            anomalies=anomalies,
-            total_count=total_count,
-            query_time_ms=query_time,
-            has_more=total_count > limit
-        )
+        return FastJSONResponse({
+            "anomalies": anomalies,
+            "total_count": total_count,
+            "query_time_ms": query_time,
+            "has_more": page['has_more'],
+            "next_cursor": page['next_cursor']
+        })
         
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         logger.error(f"Error querying anomalies: {e}")
         raise HTTPException(status_code=500, detail=f"Query failed: {str(e)}")
@@ -255,66 +418,142 @@ async def get_anomaly_by_id(
     - **anomaly_id**: Unique anomaly identifier
     """
     try:
-        # This would integrate with the actual repository
-        # For now, return a placeholder result
-        result = {
-            "anomaly_id": anomaly_id,
-            "anomaly_detected": True,
-            "threat_type": "port_scan",
-            "severity": "medium",
-            "confidence_score": 0.8,
-            "detection_method": "statistical_analysis",
-            "validation_results": {"validated": True},
-            "processing_time_ms": 150
-        }
+        result = await asyncio.get_running_loop().run_in_executor(None, repository.get, anomaly_id)
+        if result is None:
+            raise HTTPException(status_code=404, detail=f"Anomaly {anomaly_id} not found")
         
         logger.info(f"Retrieved anomaly {anomaly_id}")
         return AnomalyResult(**result)
         
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Error retrieving anomaly {anomaly_id}: {e}")
         raise HTTPException(status_code=404, detail=f"Anomaly {anomaly_id} not found")
 
 @app.get("/api/v1/stats/detection")
 async def get_detection_stats(
-    hours: int = Query(24, description="Hours to look back for statistics")
-) -> Dict[str, Any]:
+    request: Request,
+    hours: int = Query(24, ge=1, le=24 * 90, description="Hours to look back for statistics")
+) -> Response:
     """
     Get anomaly detection statistics
     
     - **hours**: Number of hours to look back for statistics
+    
+    Served from precomputed rollups; send the returned ETag as If-None-Match to get 304 when unchanged.
     """
     try:
-        # This would integrate with actual metrics collection
-        stats = {
-            "time_range_hours": hours,
-            "total_detections": 0,
-            "anomalies_detected": 0,
-            "false_positive_rate": 0.02,
-            "detection_methods": {
-                "statistical": 0,
-                "ml_model": 0,
-                "correlation": 0,
-                "validation": 0
-            },
-            "threat_types": {
-                "port_scan": 0,
-                "ddos": 0,
-                "c2_beacon": 0,
-                "crypto_mining": 0,
-                "tor_usage": 0
-            },
-            "average_processing_time_ms": 85,
-            "sla_compliance": 0.999
-        }
+        etag = detection_stats.etag(hours)
+        headers = {"ETag": etag, "Cache-Control": "no-cache"}
+        if request.headers.get("if-none-match") == etag:
+            return Response(status_code=304, headers=headers)
         
-        logger.info(f"Retrieved detection statistics for {hours} hours")
-        return stats
+        stats = detection_stats.query(hours)
+        
+        logger.debug(f"Retrieved detection statistics for {hours} hours from {stats['buckets_scanned']} buckets")
+        return FastJSONResponse(content=stats, headers=headers)
         
     except Exception as e:
         logger.error(f"Error retrieving detection stats: {e}")
         raise HTTPException(status_code=500, detail=f"Stats retrieval failed: {str(e)}")
 
+@app.get("/api/v1/stats/admission")
+async def get_admission_stats(
+    detector=Depends(get_anomaly_detector),
+    coalescer=Depends(get_request_coalescer)
+) -> Dict[str, Any]:
+    """
+    Get admission control and pipeline load metrics
+    
+    Queue depth, admitted and shed counts per priority, plus detection pool and coalescer counters.
+    """
+    stats = detector.get_statistics()
+    return {
+        "admission": stats.pop("admission"),
+        "detection": stats,
+        "coalescer": coalescer.get_statistics()
+    }
+
+@app.get("/api/v1/stats/feed")
+async def get_feed_stats() -> Dict[str, Any]:
+    """
+    Get live feed metrics
+    
+    Connected clients, subscriptions, buffered and dropped messages, and how often anomalies were serialized.
+    """
+    return anomaly_feed.get_statistics()
+
+@app.websocket("/api/v1/ws")
+async def anomaly_feed_socket(websocket: WebSocket):
+    """
+    Live feed of validated anomalies on the threat_alerts channel
+    
+    - **subscribe**: {"type": "subscribe", "channel": "threat_alerts", "filters": {"threat_types": [...], "severity": [...], "cidrs": [...]}}
+    - **unsubscribe**: {"type": "unsubscribe", "subscription_id": "sub-1"}
+    
+    Each client has a bounded buffer; a slow client loses its oldest alerts and is told how many with a feed_overflow message.
+    """
+    await websocket.accept()
+    try:
+        client = anomaly_feed.connect()
+    except ValueError as e:
+        await websocket.send_json({"type": "error", "code": "TOO_MANY_CLIENTS", "message": str(e), "retry_after": 5000})
+        await websocket.close(code=1013)
+        return
+    
+    # A single writer task owns the socket; control replies go through the client's buffer
+    sender = asyncio.create_task(_send_feed(websocket, client))
+    try:
+        while True:
+            text = await websocket.receive_text()
+            client.push(dumps_text(_handle_feed_message(client, text)))
+    except WebSocketDisconnect:
+        pass
+    finally:
+        sender.cancel()
+        anomaly_feed.disconnect(client)
+
+def _handle_feed_message(client: FeedClient, text: str) -> Dict[str, Any]:
+    """Reply to one client control message"""
+    try:
+        message = loads(text)
+        if not isinstance(message, dict):
+            raise ValueError("Message must be a JSON object")
+        if message.get("type") == "subscribe":
+            if message.get("channel", CHANNEL) != CHANNEL:
+                raise ValueError(f"Unknown channel: {message.get('channel')}")
+            subscription_id = anomaly_feed.subscribe(client, message.get("filters"))
+            return {"type": "subscription_confirmed", "channel": CHANNEL, "subscription_id": subscription_id}
+        if message.get("type") == "unsubscribe":
+            subscription_id = message.get("subscription_id")
+            if not anomaly_feed.unsubscribe(client, subscription_id):
+                raise ValueError(f"Unknown subscription: {subscription_id}")
+            return {"type": "unsubscribed", "subscription_id": subscription_id}
+        raise ValueError(f"Unsupported message type: {message.get('type')}")
+    except ValueError as e:
+        return {"type": "error", "code": "INVALID_MESSAGE", "message": str(e)}
+
+async def _send_feed(websocket: WebSocket, client: FeedClient):
+    """Drain the client's buffer to the socket, with heartbeats while idle"""
+    reported = 0
+    try:
+        while True:
+            messages = await client.next_messages(anomaly_feed.heartbeat_seconds)
+            if client.dropped > reported:
+                await websocket.send_text(dumps_text(
+                    {"type": "feed_overflow", "channel": CHANNEL, "dropped": client.dropped - reported}
+                ))
+                reported = client.dropped
+            if not messages:
+                await websocket.send_text(dumps_text({"type": "heartbeat"}))
+            for message in messages:
+                await websocket.send_text(message)
+    except asyncio.CancelledError:
+        raise
+    except Exception as e:
+        logger.info(f"Feed client {client.client_id} send failed: {e}")
+
 @app.post("/api/v1/models/retrain")
 async def trigger_model_retrain(
     model_type: str = Query(..., description="Model type to retrain"),
@@ -346,6 +585,14 @@ async def trigger_model_retrain(
         raise HTTPException(status_code=500, detail=f"Retrain failed: {str(e)}")
 
 # Error handlers
+@app.exception_handler(AdmissionRejected)
+async def admission_rejected_handler(request, exc):
+    return JSONResponse(
+        status_code=exc.status_code,
+        content={"detail": str(exc), "priority": exc.priority, "retry_after": exc.retry_after},
+        headers={"Retry-After": str(exc.retry_after)}
+    )
+
 @app.exception_handler(ValueError)
 async def value_error_handler(request, exc):
     return JSONResponse(
@@ -0,0 +1,195 @@
+"""
+Admission Control
+Priority scheduler with bounded per-priority queues and deadline-aware dequeuing in front of the detection pipeline.
+"""
+
+import asyncio
+import heapq
+import itertools
+import math
+import time
+from contextlib import asynccontextmanager
+from typing import Any, Dict, List, Optional
+import logging
+
+PRIORITIES = ('high', 'normal', 'low')
+
+
+class AdmissionRejected(Exception):
+    """Request shed by admission control; status_code is 429 (queue full) or 503 (deadline passed while queued)"""
+
+    def __init__(self, priority: str, reason: str, retry_after: int, status_code: int = 429):
+        super().__init__(f"{priority} priority request rejected: {reason}")
+        self.priority = priority
+        self.reason = reason
+        self.retry_after = retry_after
+        self.status_code = status_code
+
+
+class AdmissionController:
+    """Grants `capacity` pipeline slots; waiting requests are served by priority unless a lower one is near its deadline"""
+
+    def __init__(self, config: Dict[str, Any], capacity: int = 1):
+        self.logger = logging.getLogger(__name__)
+        self.enabled = config.get('enabled', True)
+        self.capacity = config.get('capacity') or capacity
+
+        # Bounded queue and queueing deadline per priority
+        self.max_queued = dict({'high': 1000, 'normal': 200, 'low': 50}, **config.get('max_queued', {}))
+        self.deadlines = dict({'high': 30.0, 'normal': 60.0, 'low': 120.0}, **config.get('deadline_seconds', {}))
+        # A waiter this close to its deadline is served ahead of higher priorities
+        self.urgency_window = config.get('urgency_window_seconds', 2.0)
+
+        self._queues: Dict[str, List] = {priority: [] for priority in PRIORITIES}
+        self._sequence = itertools.count()
+        self._in_use = 0
+        self._service_time = config.get('initial_service_seconds', 1.0)  # EWMA of slot hold time
+        self._shed_timer: Optional[asyncio.TimerHandle] = None
+
+        self.stats = {
+            'admitted': {priority: 0 for priority in PRIORITIES},
+            'shed_queue_full': {priority: 0 for priority in PRIORITIES},
+            'shed_deadline': {priority: 0 for priority in PRIORITIES},
+            'wait_seconds': {priority: 0.0 for priority in PRIORITIES}
+        }
+
+    def check(self, priority: str):
+        """Raise AdmissionRejected now if a request at this priority could not even queue"""
+        priority = self._priority(priority)
+        if self.enabled and self._in_use >= self.capacity and len(self._queues[priority]) >= self.max_queued[priority]:
+            self.stats['shed_queue_full'][priority] += 1
+            raise AdmissionRejected(priority, 'queue full', self.retry_after(priority))
+
+    async def acquire(self, priority: str = 'normal', deadline_seconds: Optional[float] = None):
+        """Wait for a pipeline slot; raises AdmissionRejected when shed"""
+        priority = self._priority(priority)
+        if not self.enabled:
+            self._in_use += 1
+            return
+        if self._in_use < self.capacity and not any(self._queues.values()):
+            self._grant(priority, 0.0)
+            return
+
+        self.check(priority)
+        loop = asyncio.get_running_loop()
+        now = loop.time()
+        deadline = now + (deadline_seconds if deadline_seconds is not None else self.deadlines[priority])
+        waiter = loop.create_future()
+        entry = [deadline, next(self._sequence), waiter, now]
+        heapq.heappush(self._queues[priority], entry)
+        self._arm_shed_timer(loop)
+        try:
+            await waiter
+        except asyncio.CancelledError:
+            # Caller went away: give back a slot that was handed over in the meantime
+            if waiter.done() and not waiter.cancelled() and waiter.exception() is None:
+                self.release()
+            else:
+                self._remove(priority, entry)
+            raise
+
+    def release(self, service_seconds: Optional[float] = None):
+        """Return a slot and hand it to the next waiter"""
+        self._in_use -= 1
+        if service_seconds is not None:
+            self._service_time = 0.8 * self._service_time + 0.2 * service_seconds
+        self._dispatch()
+
+    @asynccontextmanager
+    async def slot(self, priority: str = 'normal', deadline_seconds: Optional[float] = None):
+        """async with controller.slot(priority): ... holds one pipeline slot"""
+        await self.acquire(priority, deadline_seconds)
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.release(time.perf_counter() - started)
+
+    def retry_after(self, priority: str) -> int:
+        """Seconds until a slot is likely free for this priority, from queue depth and service time"""
+        ahead = sum(len(self._queues[p]) for p in PRIORITIES[:PRIORITIES.index(self._priority(priority)) + 1])
+        return max(1, math.ceil((ahead + 1) * self._service_time / max(self.capacity, 1)))
+
+    def _priority(self, priority: Optional[str]) -> str:
+        return priority if priority in self._queues else 'normal'
+
+    def _grant(self, priority: str, waited: float):
+        self._in_use += 1
+        self.stats['admitted'][priority] += 1
+        self.stats['wait_seconds'][priority] += waited
+
+    def _dispatch(self):
+        loop = asyncio.get_event_loop()
+        now = loop.time()
+        self._shed_expired(now)
+        while self._in_use < self.capacity:
+            picked = self._pick(now)
+            if picked is None:
+                break
+            priority = picked
+            deadline, _, waiter, enqueued = heapq.heappop(self._queues[priority])
+            if waiter.done():
+                continue
+            self._grant(priority, now - enqueued)
+            waiter.set_result(None)
+
+    def _pick(self, now: float) -> Optional[str]:
+        """Priority order, except that the most urgent head within urgency_window goes first"""
+        heads = [(queue[0][0], priority) for priority, queue in self._queues.items() if queue]
+        if not heads:
+            return None
+        urgent = [head for head in heads if head[0] - now <= self.urgency_window]
+        if urgent:
+            return min(urgent)[1]
+        return min(heads, key=lambda head: PRIORITIES.index(head[1]))[1]
+
+    def _shed_expired(self, now: float):
+        for priority, queue in self._queues.items():
+            while queue and queue[0][0] <= now:
+                _, _, waiter, _ = heapq.heappop(queue)
+                if not waiter.done():
+                    self.stats['shed_deadline'][priority] += 1
+                    waiter.set_exception(
+                        AdmissionRejected(priority, 'queueing deadline passed', self.retry_after(priority), 503)
+                    )
+
+    def _arm_shed_timer(self, loop: asyncio.AbstractEventLoop):
+        """Wake at the earliest queued deadline so expired waiters are shed even when no slot frees up"""
+        earliest = min((queue[0][0] for queue in self._queues.values() if queue), default=None)
+        if earliest is None:
+            return
+        if self._shed_timer is not None:
+            if self._shed_timer.when() <= earliest:
+                return
+            self._shed_timer.cancel()
+        self._shed_timer = loop.call_at(earliest, self._on_shed_timer, loop)
+
+    def _on_shed_timer(self, loop: asyncio.AbstractEventLoop):
+        self._shed_timer = None
+        self._dispatch()
+        self._arm_shed_timer(loop)
+
+    def _remove(self, priority: str, entry: list):
+        queue = self._queues[priority]
+        if entry in queue:
+            queue.remove(entry)
+            heapq.heapify(queue)
+
+    def get_statistics(self) -> Dict[str, Any]:
+        """Queue depth, slot usage and shed counts per priority"""
+        return {
+            'enabled': self.enabled,
+            'capacity': self.capacity,
+            'in_use': self._in_use,
+            'queue_depth': {priority: len(queue) for priority, queue in self._queues.items()},
+            'max_queued': dict(self.max_queued),
+            'admitted': dict(self.stats['admitted']),
+            'shed_queue_full': dict(self.stats['shed_queue_full']),
+            'shed_deadline': dict(self.stats['shed_deadline']),
+            'average_wait_seconds': {
+                priority: self.stats['wait_seconds'][priority] / self.stats['admitted'][priority]
+                if self.stats['admitted'][priority] else 0.0
+                for priority in PRIORITIES
+            },
+            'service_seconds_ewma': round(self._service_time, 4)
+        }
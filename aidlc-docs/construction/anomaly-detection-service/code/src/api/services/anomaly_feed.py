@@ -0,0 +1,166 @@
+"""
+Anomaly Feed
+Fans validated anomalies out to live WebSocket subscribers with server-side filters and bounded per-client buffers.
+"""
+
+import asyncio
+import ipaddress
+import itertools
+from collections import deque
+from datetime import datetime
+from typing import Any, Deque, Dict, List, Optional
+import logging
+
+from .detection_service import DETECTION_TYPES
+from ...utils.serialization.fast_json import dumps_text
+
+CHANNEL = 'threat_alerts'
+
+
+class FeedFilter:
+    """Server-side subscription filter; an empty field matches everything"""
+
+    def __init__(self, filters: Optional[Dict[str, Any]] = None):
+        filters = filters or {}
+        # API names (port_scan) and detector names (PORT_SCANNING) are both accepted
+        self.threat_types = {DETECTION_TYPES.get(name, str(name).upper()) for name in filters.get('threat_types') or []}
+        self.severities = {str(severity).lower() for severity in filters.get('severity') or []}
+        try:
+            self.networks = [ipaddress.ip_network(cidr, strict=False) for cidr in filters.get('cidrs') or []]
+        except (TypeError, ValueError) as e:
+            raise ValueError(f"Invalid CIDR filter: {e}") from e
+
+    def matches(self, anomaly: Dict[str, Any], addresses: List[Any]) -> bool:
+        if self.threat_types and anomaly['threat_type'] not in self.threat_types:
+            return False
+        if self.severities and anomaly['severity'] not in self.severities:
+            return False
+        if self.networks:
+            return any(address in network for address in addresses for network in self.networks
+                       if address.version == network.version)
+        return True
+
+
+class FeedClient:
+    """One connection: its subscriptions and a drop-oldest buffer of serialized messages"""
+
+    def __init__(self, client_id: str, buffer_size: int):
+        self.client_id = client_id
+        self.subscriptions: Dict[str, FeedFilter] = {}
+        self.buffer: Deque[str] = deque(maxlen=buffer_size)
+        self.dropped = 0
+        self.delivered = 0
+        self._ready = asyncio.Event()
+
+    def matches(self, anomaly: Dict[str, Any], addresses: List[Any]) -> bool:
+        return any(feed_filter.matches(anomaly, addresses) for feed_filter in self.subscriptions.values())
+
+    def push(self, message: str):
+        if len(self.buffer) == self.buffer.maxlen:
+            self.dropped += 1
+        self.buffer.append(message)
+        self._ready.set()
+
+    async def next_messages(self, timeout: Optional[float] = None) -> List[str]:
+        """Everything buffered, waiting up to timeout for the first message; [] on timeout"""
+        if not self.buffer:
+            self._ready.clear()
+            try:
+                await asyncio.wait_for(self._ready.wait(), timeout)
+            except asyncio.TimeoutError:
+                return []
+        messages = list(self.buffer)
+        self.buffer.clear()
+        self.delivered += len(messages)
+        return messages
+
+
+class AnomalyFeed:
+    """Publishes each anomaly once as serialized text and appends it to every matching client's buffer"""
+
+    def __init__(self, config: Optional[Dict[str, Any]] = None):
+        config = config or {}
+        self.logger = logging.getLogger(__name__)
+        self.buffer_size = config.get('buffer_size', 1000)
+        self.max_clients = config.get('max_clients', 500)
+        self.max_subscriptions = config.get('max_subscriptions_per_client', 16)
+        self.heartbeat_seconds = config.get('heartbeat_seconds', 30.0)
+
+        self._clients: Dict[str, FeedClient] = {}
+        self._client_ids = itertools.count(1)
+        self._subscription_ids = itertools.count(1)
+        self.stats = {'published': 0, 'serialized': 0, 'enqueued': 0}
+
+    # Clients and subscriptions
+
+    def connect(self) -> FeedClient:
+        if len(self._clients) >= self.max_clients:
+            raise ValueError(f"Feed is at its limit of {self.max_clients} clients")
+        client = FeedClient(f"ws-{next(self._client_ids)}", self.buffer_size)
+        self._clients[client.client_id] = client
+        return client
+
+    def disconnect(self, client: FeedClient):
+        self._clients.pop(client.client_id, None)
+        if client.dropped:
+            self.logger.info(f"Feed client {client.client_id} disconnected after dropping {client.dropped} messages")
+
+    def subscribe(self, client: FeedClient, filters: Optional[Dict[str, Any]] = None) -> str:
+        """Add a filtered subscription; ValueError for bad filters or too many subscriptions"""
+        if len(client.subscriptions) >= self.max_subscriptions:
+            raise ValueError(f"At most {self.max_subscriptions} subscriptions per connection")
+        feed_filter = FeedFilter(filters)
+        subscription_id = f"sub-{next(self._subscription_ids)}"
+        client.subscriptions[subscription_id] = feed_filter
+        return subscription_id
+
+    def unsubscribe(self, client: FeedClient, subscription_id: str) -> bool:
+        return client.subscriptions.pop(subscription_id, None) is not None
+
+    # Publishing
+
+    def publish(self, anomalies: List[Dict[str, Any]]):
+        """Called on the event loop with each pipeline pass's anomaly results"""
+        if not self._clients or not anomalies:
+            return
+        any_cidr = any(feed_filter.networks for client in self._clients.values()
+                       for feed_filter in client.subscriptions.values())
+        timestamp = datetime.utcnow().isoformat() + 'Z'
+        for anomaly in anomalies:
+            self.stats['published'] += 1
+            addresses = self._addresses(anomaly) if any_cidr else []
+            message = None
+            for client in self._clients.values():
+                if not client.matches(anomaly, addresses):
+                    continue
+                # Serialized at most once, then shared by every matching client
+                if message is None:
+                    message = self.serialize(anomaly, timestamp)
+                    self.stats['serialized'] += 1
+                client.push(message)
+                self.stats['enqueued'] += 1
+
+    @staticmethod
+    def serialize(anomaly: Dict[str, Any], timestamp: str) -> str:
+        return dumps_text({'type': 'threat_alert', 'channel': CHANNEL, 'timestamp': timestamp, 'data': anomaly})
+
+    @staticmethod
+    def _addresses(anomaly: Dict[str, Any]) -> List[Any]:
+        addresses = []
+        for ip in [anomaly.get('source_ip'), anomaly.get('destination_ip')] + list(anomaly.get('entities') or []):
+            try:
+                address = ipaddress.ip_address(ip)
+            except (TypeError, ValueError):
+                continue
+            if address not in addresses:
+                addresses.append(address)
+        return addresses
+
+    def get_statistics(self) -> Dict[str, Any]:
+        return dict(
+            self.stats,
+            clients=len(self._clients),
+            subscriptions=sum(len(client.subscriptions) for client in self._clients.values()),
+            buffered=sum(len(client.buffer) for client in self._clients.values()),
+            dropped=sum(client.dropped for client in self._clients.values())
+        )
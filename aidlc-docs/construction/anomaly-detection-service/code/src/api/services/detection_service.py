@@ -0,0 +1,416 @@
+"""
+Detection Service
+Runs TieredAnomalyProcessor in a worker process pool so API handlers only await results.
+"""
+
+import asyncio
+import itertools
+import multiprocessing
+import os
+import time
+import uuid
+from collections import defaultdict, deque
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, AsyncIterator, Dict, List, Optional, Set, Tuple
+import logging
+
+import numpy as np
+
+from .admission_control import AdmissionController, AdmissionRejected
+from .ndjson_stream import NdjsonFlowParser, StreamParseError
+from ...utils.serialization.fast_json import dumps
+
+# API detection_types -> detector threat types
+DETECTION_TYPES = {
+    'port_scan': 'PORT_SCANNING',
+    'ddos': 'DDOS',
+    'c2_beacon': 'C2_BEACONING',
+    'crypto_mining': 'CRYPTO_MINING',
+    'tor_usage': 'TOR_USAGE'
+}
+
+# Processor settings used when none are configured: statistical tiers only, since the
+# SageMaker-backed ML tier needs endpoint names that only a deployment can supply
+DEFAULT_PROCESSOR_CONFIG: Dict[str, Any] = {
+    'ml_config': {
+        'isolation_forest': {'enabled': False},
+        'lstm': {'enabled': False}
+    }
+}
+
+# One processor per worker process, built by the pool initializer
+_processor = None
+
+
+def _init_worker(processor_config: Dict[str, Any]):
+    global _processor
+    from ...detection.tiered_processor import TieredAnomalyProcessor
+    _processor = TieredAnomalyProcessor(processor_config)
+
+
+def _worker_ready() -> bool:
+    return _processor is not None
+
+
+def check_processor_config(processor_config: Dict[str, Any]):
+    """Raise ValueError for settings TieredAnomalyProcessor cannot be built from"""
+    ml_config = processor_config.get('ml_config', {})
+    for model in ('isolation_forest', 'lstm'):
+        settings = ml_config.get(model, {})
+        if settings.get('enabled', True) and not settings.get('endpoint_name'):
+            raise ValueError(
+                f"Processor config enables ml_config.{model} without an endpoint_name; "
+                f"set the SageMaker endpoint or '{model}': {{'enabled': false}}"
+            )
+
+
+def _run_detection(flow_logs: List[Dict], detection_types: Optional[List[str]] = None) -> Dict[str, Any]:
+    """Worker entry point: process one request and return a picklable summary"""
+    result = _processor.process_flow_logs(flow_logs)
+    return summarize_result(result, detection_types)
+
+
+def _run_detection_members(flow_logs: List[Dict], detection_types: Optional[List[str]] = None) -> Dict[str, Any]:
+    """Worker entry point that also reports which of the submitted flows each anomaly was built from"""
+    result = _processor.process_flow_logs(flow_logs)
+    return summarize_result(result, detection_types, flow_logs)
+
+
+def _run_detection_records(records: np.ndarray, detection_types: Optional[List[str]] = None) -> Dict[str, Any]:
+    """Worker entry point for columnar batches; the compact records array is what crosses the process boundary"""
+    from ...ingestion.flow_segment import to_flow_logs
+    return _run_detection(to_flow_logs(records), detection_types)
+
+
+def anomaly_entities(validated: Any) -> List[str]:
+    """Addresses involved in a validated anomaly's correlation group"""
+    group = validated.correlation_group
+    entities = []
+    for anomaly in [group.primary_anomaly] + [related['anomaly'] for related in group.related_anomalies]:
+        flow_log = getattr(anomaly, 'flow_log', None) or {}
+        for ip in (getattr(anomaly, 'source_ip', None), getattr(anomaly, 'destination_ip', None),
+                   getattr(anomaly, 'target_ip', None), flow_log.get('source_ip'), flow_log.get('destination_ip')):
+            if ip and ip not in entities:
+                entities.append(ip)
+    return entities
+
+
+def _anomaly_endpoints(anomaly: Any) -> Tuple[Set[str], Set[str]]:
+    """Source and destination addresses of the flows a detector anomaly was built from"""
+    flow_log = getattr(anomaly, 'flow_log', None) or {}
+    sources = {ip for ip in (getattr(anomaly, 'source_ip', None), flow_log.get('source_ip')) if ip}
+    destinations = {getattr(anomaly, 'destination_ip', None), getattr(anomaly, 'target_ip', None),
+                    flow_log.get('destination_ip')}
+    destinations.update(getattr(anomaly, 'tor_nodes', None) or [])
+    destinations.update(connection.get('dest_ip') for connection in getattr(anomaly, 'connections', None) or [])
+    # Mining pools are recorded as "address:port"
+    destinations.update(pool.rsplit(':', 1)[0] for pool in getattr(anomaly, 'mining_pools', None) or [])
+    destinations.discard(None)
+    return sources, destinations
+
+
+class FlowMembership:
+    """One pass's flow logs indexed by endpoint, to map correlation groups back to their member flows"""
+
+    def __init__(self, flow_logs: List[Dict[str, Any]]):
+        self.by_pair: Dict[Tuple[str, str], List[int]] = defaultdict(list)
+        self.by_source: Dict[str, List[int]] = defaultdict(list)
+        self.by_destination: Dict[str, List[int]] = defaultdict(list)
+        for index, flow_log in enumerate(flow_logs):
+            source, destination = flow_log.get('source_ip'), flow_log.get('destination_ip')
+            self.by_pair[(source, destination)].append(index)
+            self.by_source[source].append(index)
+            self.by_destination[destination].append(index)
+
+    def members(self, validated: Any) -> List[int]:
+        """Flow indexes matching any anomaly in the group by source-destination pair, else by its only side"""
+        group = validated.correlation_group
+        members = set()
+        for anomaly in [group.primary_anomaly] + [related['anomaly'] for related in group.related_anomalies]:
+            sources, destinations = _anomaly_endpoints(anomaly)
+            if sources and destinations:
+                for source in sources:
+                    for destination in destinations:
+                        members.update(self.by_pair.get((source, destination), ()))
+            elif sources:
+                for source in sources:
+                    members.update(self.by_source.get(source, ()))
+            else:
+                for destination in destinations:
+                    members.update(self.by_destination.get(destination, ()))
+        return sorted(members)
+
+
+def filter_detection_types(anomalies: List[Dict[str, Any]], detection_types: Optional[List[str]]) -> List[Dict[str, Any]]:
+    """Anomaly results restricted to the requested detection types ('all' or None keeps everything)"""
+    if not detection_types or 'all' in detection_types:
+        return anomalies
+    wanted = {DETECTION_TYPES.get(name, name.upper()) for name in detection_types}
+    return [anomaly for anomaly in anomalies if anomaly['threat_type'] in wanted]
+
+
+def anomaly_to_result(validated: Any, processing_time_ms: int) -> Dict[str, Any]:
+    """AnomalyResult fields for a ValidatedAnomaly"""
+    group = validated.correlation_group
+    primary = group.primary_anomaly
+    assessment = validated.final_threat_assessment or {}
+    validation = validated.validation_result
+    flow_log = getattr(primary, 'flow_log', None) or {}
+    return {
+        'anomaly_id': getattr(primary, 'anomaly_id', group.group_id),
+        'anomaly_detected': True,
+        'threat_type': assessment.get('threat_type') or getattr(primary, 'threat_type', 'UNKNOWN'),
+        'severity': str(assessment.get('severity', 'MEDIUM')).lower(),
+        'confidence_score': validated.confidence_score,
+        'detection_method': 'tiered_processing',
+        'validation_results': {
+            'validated': validation.is_valid,
+            'stages': validation.validation_stages,
+            'failure_reasons': validation.failure_reasons
+        },
+        'correlation_context': {
+            'group_id': group.group_id,
+            'related_anomalies': len(group.related_anomalies),
+            'group_confidence': group.group_confidence
+        },
+        'source_ip': getattr(primary, 'source_ip', None) or flow_log.get('source_ip'),
+        'destination_ip': getattr(primary, 'destination_ip', None) or getattr(primary, 'target_ip', None)
+        or flow_log.get('destination_ip'),
+        'entities': anomaly_entities(validated),
+        'processing_time_ms': processing_time_ms
+    }
+
+
+def summarize_result(result: Any, detection_types: Optional[List[str]] = None,
+                     flow_logs: Optional[List[Dict[str, Any]]] = None) -> Dict[str, Any]:
+    """Anomalies, per-tier timings and counts from a ProcessingResult.
+
+    With flow_logs, member_flows lists for each anomaly the indexes of the flows it was built from.
+    """
+    processing_time_ms = int(result.total_processing_time * 1000)
+    results = [anomaly_to_result(validated, processing_time_ms) for validated in result.anomalies]
+    anomalies = filter_detection_types(results, detection_types)
+
+    summary = {
+        'anomalies': anomalies,
+        'tier_timings_ms': {tier: round(seconds * 1000, 3) for tier, seconds in result.tier_timings.items()},
+        'tier_counts': {
+            'prefilter_dropped': result.prefilter_dropped,
+            'tier1': result.tier1_count,
+            'tier2': result.tier2_count,
+            'correlation_groups': result.correlation_groups,
+            'validated': result.validated_count
+        },
+        'processing_time_ms': processing_time_ms,
+        'error': result.processing_metadata.get('error') or result.processing_metadata.get('errors')
+    }
+    if flow_logs is not None:
+        membership = FlowMembership(flow_logs)
+        kept = {id(anomaly) for anomaly in anomalies}
+        summary['member_flows'] = [
+            membership.members(validated)
+            for validated, anomaly in zip(result.anomalies, results) if id(anomaly) in kept
+        ]
+    return summary
+
+
+class DetectionService:
+    """Owns the detection worker pool; requests are dispatched with run_in_executor"""
+
+    def __init__(self, config: Dict[str, Any], repository: Any = None, stats_recorder: Any = None,
+                 anomaly_feed: Any = None):
+        self.config = config
+        self.logger = logging.getLogger(__name__)
+        # Detected anomalies are stored here for the query endpoints, and every pass is rolled up for stats
+        self.repository = repository
+        self.stats_recorder = stats_recorder
+        # Live subscribers get each pass's anomalies as soon as it completes
+        self.anomaly_feed = anomaly_feed
+        self.processor_config = config.get('processor') or DEFAULT_PROCESSOR_CONFIG
+        check_processor_config(self.processor_config)
+        self.max_batch_items = config.get('max_batch_items', 10000)
+
+        # Processes keep the GIL-bound tiers off the event loop; threads are for local debugging
+        self.use_processes = config.get('use_process_pool', True)
+        self.workers = config.get('workers') or os.cpu_count() or 1
+        self.start_method = config.get('start_method', 'spawn')
+
+        # Streaming ingest: rows per pipeline call and batches in flight per stream
+        self.stream_batch_rows = config.get('stream_batch_rows', 50000)
+        self.stream_max_in_flight = config.get('stream_max_in_flight', 2)
+        self.max_line_bytes = config.get('max_line_bytes', 65536)
+        self.stream_inflate_bytes = config.get('stream_inflate_bytes', 1024 * 1024)
+
+        # Pipeline slots are granted by priority; defaults to one slot per worker
+        self.admission = AdmissionController(config.get('admission', {}), capacity=self.workers)
+
+        self._executor: Optional[Executor] = None
+        self._in_flight = 0
+        # Detector ids repeat across passes; stored ids are the group id plus this instance's pass sequence
+        self._instance_id = uuid.uuid4().hex[:8]
+        self._pass_ids = itertools.count(1)
+        self.stats = {'requests': 0, 'flow_logs': 0, 'anomalies': 0, 'errors': 0, 'busy_seconds': 0.0}
+
+    def start(self):
+        """Create the pool; each worker builds its processor once at startup"""
+        if self._executor is not None:
+            return
+        if self.use_processes:
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.workers,
+                mp_context=multiprocessing.get_context(self.start_method),
+                initializer=_init_worker,
+                initargs=(self.processor_config,)
+            )
+            # A failing initializer only breaks the pool on first use; surface it at startup instead
+            try:
+                self._executor.submit(_worker_ready).result()
+            except BrokenProcessPool as e:
+                self._executor.shutdown(wait=False)
+                self._executor = None
+                raise RuntimeError(
+                    "Detection workers could not build TieredAnomalyProcessor; check DETECT_PROCESSOR_CONFIG"
+                ) from e
+        else:
+            _init_worker(self.processor_config)
+            self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="detection")
+        self.logger.info(f"Detection service started with {self.workers} "
+                         f"{'processes' if self.use_processes else 'threads'}")
+
+    async def detect(self, flow_logs: List[Dict], detection_types: Optional[List[str]] = None,
+                     priority: str = 'normal') -> Dict[str, Any]:
+        """Run the tiered pipeline on one request's flow logs without blocking the event loop"""
+        return await self._dispatch(_run_detection, flow_logs, detection_types, priority)
+
+    async def detect_members(self, flow_logs: List[Dict], detection_types: Optional[List[str]] = None,
+                             priority: str = 'normal') -> Dict[str, Any]:
+        """detect() plus member_flows: per anomaly, the indexes into flow_logs of the flows it was built from"""
+        return await self._dispatch(_run_detection_members, flow_logs, detection_types, priority)
+
+    async def detect_records(self, records: np.ndarray, detection_types: Optional[List[str]] = None,
+                             priority: str = 'normal') -> Dict[str, Any]:
+        """Run the tiered pipeline on a columnar flow segment batch"""
+        return await self._dispatch(_run_detection_records, records, detection_types, priority)
+
+    async def _dispatch(self, function, flow_logs, detection_types, priority: str) -> Dict[str, Any]:
+        if self._executor is None:
+            self.start()
+        loop = asyncio.get_running_loop()
+        async with self.admission.slot(priority):
+            return await self._execute(loop, function, flow_logs, detection_types)
+
+    async def _execute(self, loop, function, flow_logs, detection_types) -> Dict[str, Any]:
+        started = time.perf_counter()
+        self._in_flight += 1
+        try:
+            summary = await loop.run_in_executor(self._executor, function, flow_logs, detection_types)
+        except Exception:
+            self.stats['errors'] += 1
+            raise
+        finally:
+            self._in_flight -= 1
+            self.stats['busy_seconds'] += time.perf_counter() - started
+
+        self.assign_anomaly_ids(summary['anomalies'])
+        self.stats['requests'] += 1
+        self.stats['flow_logs'] += len(flow_logs)
+        self.stats['anomalies'] += len(summary['anomalies'])
+        if summary['error']:
+            self.stats['errors'] += 1
+        if self.stats_recorder is not None:
+            self.stats_recorder.record(summary, len(flow_logs))
+        if self.anomaly_feed is not None and summary['anomalies']:
+            self.anomaly_feed.publish(summary['anomalies'])
+        if self.repository is not None and summary['anomalies']:
+            try:
+                await loop.run_in_executor(None, self.repository.save_many, summary['anomalies'])
+            except Exception as e:
+                self.logger.error(f"Failed to store {len(summary['anomalies'])} anomalies: {e}")
+        return summary
+
+    def assign_anomaly_ids(self, anomalies: List[Dict[str, Any]]):
+        """Give each anomaly of one pass an id unique across passes, keeping the detector's as detector_anomaly_id"""
+        pass_id = f"{self._instance_id}-{next(self._pass_ids)}"
+        for index, anomaly in enumerate(anomalies):
+            anomaly['detector_anomaly_id'] = anomaly['anomaly_id']
+            anomaly['anomaly_id'] = f"{anomaly['correlation_context']['group_id']}.{pass_id}.{index}"
+
+    async def detect_stream(self, chunks: AsyncIterator[bytes], detection_types: Optional[List[str]] = None,
+                            gzipped: Optional[bool] = None, priority: str = 'normal') -> AsyncIterator[bytes]:
+        """NDJSON anomaly lines for a chunked NDJSON body, emitted as each batch finishes.
+
+        No batch is scheduled while stream_max_in_flight are being processed, and gzip bodies are
+        inflated in bounded pieces, so server memory stays around (in-flight + 1) batches whatever
+        the upload size or compression ratio.
+        """
+        parser = NdjsonFlowParser(self.stream_batch_rows, self.max_line_bytes, gzipped, self.stream_inflate_bytes)
+        pending = deque()
+        totals = {'batches': 0, 'anomalies': 0, 'errors': 0, 'tier_timings_ms': {}}
+        started = time.perf_counter()
+        try:
+            async for chunk in chunks:
+                for records in parser.feed(chunk):
+                    # Backpressure per batch: parsing and inflation pause until a slot frees up
+                    while pending and (len(pending) >= self.stream_max_in_flight or pending[0].done()):
+                        for line in self._stream_lines(await pending.popleft(), totals):
+                            yield line
+                    pending.append(asyncio.ensure_future(self.detect_records(records, detection_types, priority)))
+                while pending and pending[0].done():
+                    for line in self._stream_lines(await pending.popleft(), totals):
+                        yield line
+            for records in parser.close():
+                while len(pending) >= self.stream_max_in_flight:
+                    for line in self._stream_lines(await pending.popleft(), totals):
+                        yield line
+                pending.append(asyncio.ensure_future(self.detect_records(records, detection_types, priority)))
+            while pending:
+                for line in self._stream_lines(await pending.popleft(), totals):
+                    yield line
+        except StreamParseError as e:
+            for task in pending:
+                task.cancel()
+            yield self._ndjson({'type': 'error', 'detail': str(e)})
+        except AdmissionRejected as e:
+            for task in pending:
+                task.cancel()
+            yield self._ndjson({'type': 'error', 'status': e.status_code, 'detail': str(e),
+                                'retry_after': e.retry_after})
+        except Exception as e:
+            self.logger.error(f"Stream detection failed: {e}")
+            for task in pending:
+                task.cancel()
+            yield self._ndjson({'type': 'error', 'detail': f"Stream detection failed: {e}"})
+
+        yield self._ndjson(dict(
+            totals,
+            type='summary',
+            lines=parser.stats['lines'],
+            flow_logs=parser.stats['flow_logs'],
+            parse_errors=parser.stats['parse_errors'],
+            bytes_in=parser.stats['bytes_in'],
+            processing_time_ms=int((time.perf_counter() - started) * 1000)
+        ))
+
+    def _stream_lines(self, summary: Dict[str, Any], totals: Dict[str, Any]) -> List[bytes]:
+        totals['batches'] += 1
+        totals['anomalies'] += len(summary['anomalies'])
+        if summary['error']:
+            totals['errors'] += 1
+        for tier, ms in summary['tier_timings_ms'].items():
+            totals['tier_timings_ms'][tier] = round(totals['tier_timings_ms'].get(tier, 0.0) + ms, 3)
+        return [self._ndjson(dict(anomaly, type='anomaly')) for anomaly in summary['anomalies']]
+
+    @staticmethod
+    def _ndjson(payload: Dict[str, Any]) -> bytes:
+        return dumps(payload) + b'\n'
+
+    def shutdown(self, wait: bool = True):
+        if self._executor is not None:
+            self._executor.shutdown(wait=wait)
+            self._executor = None
+
+    def get_statistics(self) -> Dict[str, Any]:
+        return dict(self.stats, in_flight=self._in_flight, workers=self.workers,
+                    use_processes=self.use_processes, max_batch_items=self.max_batch_items,
+                    admission=self.admission.get_statistics())
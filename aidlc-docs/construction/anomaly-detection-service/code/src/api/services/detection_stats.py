@@ -0,0 +1,205 @@
+"""
+Detection Statistics Rollups
+Per-minute detection aggregates maintained as results arrive, compacted into hour and day buckets.
+"""
+
+import bisect
+import math
+import threading
+import time
+from typing import Any, Dict, List, Optional, Tuple
+import logging
+
+from .detection_service import DETECTION_TYPES
+
+# Latency histogram: geometric bins from 0.1 ms to ~1.5 h, mergeable across buckets
+_BIN_FACTOR = 1.25
+_BIN_EDGES_MS = [0.1 * _BIN_FACTOR ** i for i in range(80)]
+
+_API_THREAT_NAMES = {threat_type: name for name, threat_type in DETECTION_TYPES.items()}
+
+# (name, bucket seconds, default retention in buckets)
+GRANULARITIES = (('minute', 60, 180), ('hour', 3600, 168), ('day', 86400, 90))
+
+SLA_SECONDS = 300
+
+
+def _percentile(histogram: List[int], fraction: float) -> Optional[float]:
+    """Upper edge of the bin holding the percentile"""
+    total = sum(histogram)
+    if not total:
+        return None
+    rank = math.ceil(fraction * total)
+    seen = 0
+    for index, count in enumerate(histogram):
+        seen += count
+        if seen >= rank:
+            return round(_BIN_EDGES_MS[min(index, len(_BIN_EDGES_MS) - 1)], 3)
+    return round(_BIN_EDGES_MS[-1], 3)
+
+
+class _Bucket:
+    """Counters for one time bucket; merge() folds a finer bucket in"""
+
+    __slots__ = ('start', 'passes', 'flow_logs', 'anomalies', 'threat_types', 'severities', 'tier_counts',
+                 'processing_ms', 'sla_met', 'errors', 'latency')
+
+    def __init__(self, start: int):
+        self.start = start
+        self.passes = 0
+        self.flow_logs = 0
+        self.anomalies = 0
+        self.threat_types: Dict[str, int] = {}
+        self.severities: Dict[str, int] = {}
+        self.tier_counts: Dict[str, int] = {}
+        self.processing_ms = 0.0
+        self.sla_met = 0
+        self.errors = 0
+        self.latency: Dict[str, List[int]] = {}
+
+    def merge(self, other: '_Bucket'):
+        self.passes += other.passes
+        self.flow_logs += other.flow_logs
+        self.anomalies += other.anomalies
+        self.processing_ms += other.processing_ms
+        self.sla_met += other.sla_met
+        self.errors += other.errors
+        for target, source in ((self.threat_types, other.threat_types), (self.severities, other.severities),
+                               (self.tier_counts, other.tier_counts)):
+            for key, value in source.items():
+                target[key] = target.get(key, 0) + value
+        for tier, histogram in other.latency.items():
+            mine = self.latency.setdefault(tier, [0] * len(_BIN_EDGES_MS))
+            for index, count in enumerate(histogram):
+                mine[index] += count
+
+
+class DetectionStatsAggregator:
+    """Incremental rollups: record() is O(anomalies) per pass, query() is O(buckets in range)"""
+
+    def __init__(self, config: Optional[Dict[str, Any]] = None):
+        config = config or {}
+        self.logger = logging.getLogger(__name__)
+        retention = config.get('retention', {})
+        self.granularities: List[Tuple[str, int, int]] = [
+            (name, seconds, retention.get(name, default)) for name, seconds, default in GRANULARITIES
+        ]
+        self._buckets: Dict[str, Dict[int, _Bucket]] = {name: {} for name, _, _ in self.granularities}
+        self._lock = threading.Lock()
+        self._version = 0
+        self._cache: Dict[Tuple[int, str], Dict[str, Any]] = {}
+
+    def record(self, summary: Dict[str, Any], flow_logs: int, now: Optional[float] = None):
+        """Fold one pipeline pass (a DetectionService summary of a ProcessingResult) into the current minute"""
+        now = time.time() if now is None else now
+        minute = int(now // 60) * 60
+        with self._lock:
+            buckets = self._buckets['minute']
+            bucket = buckets.get(minute)
+            if bucket is None:
+                bucket = buckets[minute] = _Bucket(minute)
+                self._compact(now)
+
+            bucket.passes += 1
+            bucket.flow_logs += flow_logs
+            bucket.anomalies += len(summary['anomalies'])
+            bucket.processing_ms += summary['processing_time_ms']
+            bucket.sla_met += summary['processing_time_ms'] <= SLA_SECONDS * 1000
+            bucket.errors += bool(summary.get('error'))
+            for anomaly in summary['anomalies']:
+                threat_type = _API_THREAT_NAMES.get(anomaly['threat_type'], anomaly['threat_type'].lower())
+                bucket.threat_types[threat_type] = bucket.threat_types.get(threat_type, 0) + 1
+                bucket.severities[anomaly['severity']] = bucket.severities.get(anomaly['severity'], 0) + 1
+            for tier, count in summary['tier_counts'].items():
+                bucket.tier_counts[tier] = bucket.tier_counts.get(tier, 0) + count
+            for tier, ms in summary['tier_timings_ms'].items():
+                histogram = bucket.latency.setdefault(tier, [0] * len(_BIN_EDGES_MS))
+                histogram[min(bisect.bisect_left(_BIN_EDGES_MS, ms), len(_BIN_EDGES_MS) - 1)] += 1
+            self._version += 1
+
+    def _compact(self, now: float):
+        """Fold buckets past their retention into the next coarser granularity; caller holds the lock"""
+        for (name, seconds, retention), coarser in zip(self.granularities, self.granularities[1:] + [None]):
+            cutoff = int(now // seconds) * seconds - retention * seconds
+            expired = [start for start in self._buckets[name] if start < cutoff]
+            for start in expired:
+                bucket = self._buckets[name].pop(start)
+                if coarser is None:
+                    continue
+                coarse_start = start // coarser[1] * coarser[1]
+                target = self._buckets[coarser[0]].get(coarse_start)
+                if target is None:
+                    target = self._buckets[coarser[0]][coarse_start] = _Bucket(coarse_start)
+                target.merge(bucket)
+        self._cache.clear()
+
+    def etag(self, hours: int, now: Optional[float] = None) -> str:
+        """Changes when a pass is recorded or the window moves to a new minute"""
+        now = time.time() if now is None else now
+        return f'"{self._version}-{hours}-{int(now // 60)}"'
+
+    def query(self, hours: int, now: Optional[float] = None) -> Dict[str, Any]:
+        """Stats for the last `hours`, using the finest buckets kept for each part of the window"""
+        now = time.time() if now is None else now
+        key = (hours, self.etag(hours, now))
+        with self._lock:
+            cached = self._cache.get(key)
+            if cached is not None:
+                return cached
+
+            window_start = now - hours * 3600
+            total = _Bucket(int(window_start))
+            buckets = 0
+            for name, seconds, _ in self.granularities:
+                for start, bucket in self._buckets[name].items():
+                    # A bucket straddling the window edge counts when most of it is inside
+                    if start + seconds / 2 >= window_start:
+                        total.merge(bucket)
+                        buckets += 1
+
+            stats = self._render(total, hours, buckets)
+            if len(self._cache) >= 16:
+                self._cache.clear()
+            self._cache[key] = stats
+            return stats
+
+    @staticmethod
+    def _render(total: _Bucket, hours: int, buckets: int) -> Dict[str, Any]:
+        tiers = total.tier_counts
+        groups = tiers.get('correlation_groups', 0)
+        threat_types = {name: 0 for name in DETECTION_TYPES}
+        threat_types.update(total.threat_types)
+        return {
+            "time_range_hours": hours,
+            "total_detections": total.anomalies,
+            "pipeline_passes": total.passes,
+            "flow_logs_processed": total.flow_logs,
+            "anomalies_detected": total.anomalies,
+            # Share of correlation groups rejected by tier 4 validation
+            "false_positive_rate": round(1 - tiers.get('validated', 0) / groups, 4) if groups else 0.0,
+            "detection_methods": {
+                "statistical": tiers.get('tier1', 0),
+                "ml_model": tiers.get('tier2', 0),
+                "correlation": groups,
+                "validation": tiers.get('validated', 0)
+            },
+            "prefilter_dropped": tiers.get('prefilter_dropped', 0),
+            "threat_types": threat_types,
+            "severities": dict(total.severities),
+            "tier_latency_ms": {
+                tier: {
+                    "p50": _percentile(histogram, 0.50),
+                    "p95": _percentile(histogram, 0.95),
+                    "p99": _percentile(histogram, 0.99)
+                }
+                for tier, histogram in total.latency.items()
+            },
+            "average_processing_time_ms": round(total.processing_ms / total.passes, 1) if total.passes else 0,
+            "sla_compliance": round(total.sla_met / total.passes, 4) if total.passes else 1.0,
+            "errors": total.errors,
+            "buckets_scanned": buckets
+        }
+
+    def get_statistics(self) -> Dict[str, Any]:
+        with self._lock:
+            return {name: len(buckets) for name, buckets in self._buckets.items()}
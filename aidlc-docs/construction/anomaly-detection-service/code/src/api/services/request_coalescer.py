@@ -0,0 +1,135 @@
+"""
+Request Coalescer
+Buffers single-flow detection requests briefly and runs them through the tiered pipeline as one batch.
+"""
+
+import asyncio
+import itertools
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional
+import logging
+
+from .detection_service import DetectionService, filter_detection_types
+
+# Lower rank flushes first when the buffer holds more than one pass
+PRIORITY_RANK = {'high': 0, 'normal': 1, 'low': 2}
+
+
+class DetectionFailed(Exception):
+    """The tiered pass a request landed in reported an error instead of results"""
+
+
+@dataclass(order=True)
+class _PendingFlow:
+    rank: int
+    sequence: int
+    flow_log: Dict[str, Any] = field(compare=False)
+    detection_types: Optional[List[str]] = field(compare=False)
+    future: asyncio.Future = field(compare=False)
+
+
+class RequestCoalescer:
+    """Collects /detect calls for at most a priority-dependent wait or max_records flows, then fans results out"""
+
+    def __init__(self, service: DetectionService, config: Dict[str, Any]):
+        self.service = service
+        self.logger = logging.getLogger(__name__)
+        self.enabled = config.get('enabled', True)
+
+        # Longest a request may wait for company, by priority
+        self.max_wait_ms = dict({'high': 2.0, 'normal': 10.0, 'low': 50.0}, **config.get('max_wait_ms', {}))
+        self.max_records = config.get('max_records', 1000)
+
+        self._pending: List[_PendingFlow] = []
+        self._sequence = itertools.count()
+        self._deadline: Optional[float] = None
+        self._timer: Optional[asyncio.TimerHandle] = None
+        self.stats = {'requests': 0, 'flushes': 0, 'flushed_records': 0, 'size_flushes': 0, 'errors': 0}
+
+    async def detect(self, flow_log: Dict[str, Any], priority: str = 'normal',
+                     detection_types: Optional[List[str]] = None) -> List[Dict[str, Any]]:
+        """Anomalies built from this flow, from the coalesced pass it lands in"""
+        if not self.enabled:
+            summary = await self.service.detect([flow_log], detection_types, priority)
+            if summary['error']:
+                self.stats['errors'] += 1
+                raise DetectionFailed(f"Detection pass failed: {summary['error']}")
+            return summary['anomalies']
+
+        loop = asyncio.get_running_loop()
+        priority = priority if priority in PRIORITY_RANK else 'normal'
+        pending = _PendingFlow(
+            PRIORITY_RANK[priority], next(self._sequence), flow_log, detection_types, loop.create_future()
+        )
+        self._pending.append(pending)
+        self.stats['requests'] += 1
+
+        if len(self._pending) >= self.max_records:
+            self.stats['size_flushes'] += 1
+            self._flush_now(loop)
+        else:
+            # A more urgent arrival pulls the whole buffer's flush forward
+            deadline = loop.time() + self.max_wait_ms[priority] / 1000.0
+            if self._deadline is None or deadline < self._deadline:
+                self._schedule(loop, deadline)
+        return await pending.future
+
+    def _schedule(self, loop: asyncio.AbstractEventLoop, deadline: float):
+        if self._timer is not None:
+            self._timer.cancel()
+        self._deadline = deadline
+        self._timer = loop.call_at(deadline, self._flush_now, loop)
+
+    def _flush_now(self, loop: asyncio.AbstractEventLoop):
+        if self._timer is not None:
+            self._timer.cancel()
+        self._timer = None
+        self._deadline = None
+        if not self._pending:
+            return
+
+        # Highest priority first, arrival order within a priority; the rest waits for the next pass
+        self._pending.sort()
+        batch, self._pending = self._pending[:self.max_records], self._pending[self.max_records:]
+        if self._pending:
+            rank = self._pending[0].rank
+            priority = next(name for name, value in PRIORITY_RANK.items() if value == rank)
+            self._schedule(loop, loop.time() + self.max_wait_ms[priority] / 1000.0)
+        loop.create_task(self._run(batch))
+
+    async def _run(self, batch: List[_PendingFlow]):
+        self.stats['flushes'] += 1
+        self.stats['flushed_records'] += len(batch)
+        # The batch is sorted, so its first entry carries the most urgent priority for admission
+        priority = next(name for name, value in PRIORITY_RANK.items() if value == batch[0].rank)
+        try:
+            summary = await self.service.detect_members([pending.flow_log for pending in batch], priority=priority)
+            # The pipeline reports its own failures in the summary; an empty result would read as "no anomaly"
+            if summary['error']:
+                raise DetectionFailed(f"Coalesced detection pass failed: {summary['error']}")
+        except Exception as e:
+            self.stats['errors'] += 1
+            self.logger.error(f"Coalesced detection of {len(batch)} flows failed: {e}")
+            for pending in batch:
+                if not pending.future.done():
+                    pending.future.set_exception(e)
+            return
+
+        # Each caller gets the anomalies whose correlation group was built from its own flow
+        by_flow: List[List[Dict[str, Any]]] = [[] for _ in batch]
+        for anomaly, members in zip(summary['anomalies'], summary['member_flows']):
+            anomaly['correlation_context'] = dict(anomaly.get('correlation_context') or {}, coalesced_flows=len(batch))
+            for index in members:
+                by_flow[index].append(anomaly)
+
+        for pending, anomalies in zip(batch, by_flow):
+            if not pending.future.done():
+                pending.future.set_result(filter_detection_types(anomalies, pending.detection_types))
+
+    def get_statistics(self) -> Dict[str, Any]:
+        flushes = self.stats['flushes']
+        return dict(
+            self.stats,
+            buffered=len(self._pending),
+            average_flush_size=self.stats['flushed_records'] / flushes if flushes else 0.0
+        )
@@ -0,0 +1,133 @@
+"""
+Adaptive Batch Controller
+Sizes TieredAnomalyProcessor sub-batches from observed tier timings and backlog to hold a target p95 latency.
+"""
+
+import math
+import threading
+import time
+from collections import deque
+from typing import Any, Dict, List
+import logging
+
+
+def _percentile(values: List[float], fraction: float) -> float:
+    """Nearest-rank percentile of a non-empty list"""
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, max(0, math.ceil(fraction * len(ordered)) - 1))]
+
+
+class AdaptiveBatchController:
+    """Latency-targeting batch size controller: multiplicative decrease on overrun, bounded growth under backlog"""
+
+    def __init__(self, config: Dict[str, Any]):
+        self.logger = logging.getLogger(__name__)
+        self.enabled = config.get('enabled', True)
+
+        # Target and bounds
+        self.target_p95 = config.get('target_p95_seconds', 60.0)
+        self.min_batch_size = config.get('min_batch_size', 1000)
+        self.max_batch_size = config.get('max_batch_size', 500000)
+        self.batch_size = min(max(config.get('initial_batch_size', 50000), self.min_batch_size), self.max_batch_size)
+
+        # Control behaviour: grow only when p95 sits below low_watermark * target and the
+        # backlog could fill a larger batch; tiers near their timeout force a cut
+        self.window = config.get('window', 50)
+        self.min_samples = config.get('min_samples', 3)
+        self.low_watermark = config.get('low_watermark', 0.7)
+        self.max_growth = config.get('max_growth', 1.5)
+        self.max_shrink = config.get('max_shrink', 0.5)
+        self.timeout_pressure = config.get('timeout_pressure', 0.9)
+        self.tier_timeouts: Dict[str, float] = dict(config.get('tier_timeouts', {}))
+
+        self._lock = threading.Lock()
+        self._latencies = deque(maxlen=self.window)
+        self._per_record = deque(maxlen=self.window)
+        self._tier_timings: Dict[str, deque] = {}
+        self._decisions = deque(maxlen=config.get('decision_history', 20))
+        self.stats = {'batches': 0, 'records': 0, 'increase': 0, 'decrease': 0, 'hold': 0}
+
+    def next_batch_size(self, remaining: int) -> int:
+        """Records to take for the next sub-batch; everything when the controller is disabled"""
+        return min(self.batch_size, remaining) if self.enabled else remaining
+
+    def record(self, batch_records: int, latency: float, tier_timings: Dict[str, float], backlog: int = 0) -> int:
+        """Observe one processed sub-batch and return the batch size to use next"""
+        if not self.enabled or batch_records <= 0:
+            return self.batch_size
+
+        with self._lock:
+            self._latencies.append(latency)
+            self._per_record.append(latency / batch_records)
+            for tier, seconds in tier_timings.items():
+                self._tier_timings.setdefault(tier, deque(maxlen=self.window)).append(seconds)
+            self.stats['batches'] += 1
+            self.stats['records'] += batch_records
+
+            decision, reason, new_size = self._decide(tier_timings, backlog)
+            self.stats[decision] += 1
+            if new_size != self.batch_size:
+                self._decisions.append({
+                    'timestamp': time.time(),
+                    'decision': decision,
+                    'reason': reason,
+                    'from': self.batch_size,
+                    'to': new_size,
+                    'backlog': backlog
+                })
+                self.logger.info(f"Batch size {self.batch_size} -> {new_size} ({reason})")
+                self.batch_size = new_size
+                # Latencies at the old size no longer describe the new one; per-record costs still do
+                self._latencies.clear()
+            return self.batch_size
+
+    def _decide(self, tier_timings: Dict[str, float], backlog: int):
+        """Pick (decision, reason, size); caller holds the lock"""
+        size = self.batch_size
+
+        # A tier close to its timeout is about to lose results: cut immediately
+        for tier, seconds in tier_timings.items():
+            timeout = self.tier_timeouts.get(tier)
+            if timeout and seconds >= timeout * self.timeout_pressure:
+                return 'decrease', f"{tier} at {seconds:.1f}s of {timeout}s timeout", self._clamp(size * self.max_shrink)
+
+        if len(self._latencies) < self.min_samples:
+            return 'hold', 'warming up', size
+
+        p95 = _percentile(list(self._latencies), 0.95)
+        per_record_p95 = _percentile(list(self._per_record), 0.95)
+        # Size that would land the p95 per-record cost exactly on target
+        ideal = self.target_p95 / per_record_p95 if per_record_p95 > 0 else self.max_batch_size
+
+        if p95 > self.target_p95:
+            return 'decrease', f"p95 {p95:.1f}s over {self.target_p95}s target", \
+                self._clamp(min(size, max(ideal, size * self.max_shrink)))
+
+        # Growing only pays off when the backlog can fill the larger batch
+        if p95 < self.target_p95 * self.low_watermark and backlog > size:
+            target = min(ideal * self.low_watermark, size * self.max_growth, backlog)
+            if target > size:
+                return 'increase', f"p95 {p95:.1f}s with backlog {backlog}", self._clamp(target)
+
+        return 'hold', 'within target', size
+
+    def _clamp(self, size: float) -> int:
+        return int(min(max(size, self.min_batch_size), self.max_batch_size))
+
+    def get_statistics(self) -> Dict[str, Any]:
+        """Controller state and recent decisions for metrics"""
+        with self._lock:
+            latencies = list(self._latencies)
+            return {
+                'enabled': self.enabled,
+                'batch_size': self.batch_size,
+                'target_p95_seconds': self.target_p95,
+                'observed_p95_seconds': _percentile(latencies, 0.95) if latencies else None,
+                'tier_p95_seconds': {
+                    tier: _percentile(list(values), 0.95) for tier, values in self._tier_timings.items() if values
+                },
+                'decisions': dict((key, self.stats[key]) for key in ('increase', 'decrease', 'hold')),
+                'batches': self.stats['batches'],
+                'records': self.stats['records'],
+                'recent_adjustments': list(self._decisions)
+            }
@@ -6,11 +6,13 @@ Correlates anomalies across time, entity, and threat type dimensions.
 import time
 import json
 from datetime import datetime, timedelta
-from typing import List, Dict, Set, Optional, Any
+from typing import List, Dict, Set, Optional, Any, Tuple
 from dataclasses import dataclass, asdict
 from collections import defaultdict
 import logging
 
+from ...utils.network.ip_codec import IpCodec, same_subnet
+
 @dataclass
 class CorrelationGroup:
     group_id: str
@@ -41,6 +43,7 @@ class MultiDimensionalCorrelationEngine:
         self.entity_correlation_threshold = config.get('entity_threshold', 0.7)
         self.temporal_correlation_threshold = config.get('temporal_threshold', 0.6)
         self.threat_correlation_threshold = config.get('threat_threshold', 0.5)
+        self.ip_codec = IpCodec.shared()
         
         # Threat type correlation weights
         self.threat_correlation_weights = {
@@ -67,6 +70,9 @@ class MultiDimensionalCorrelationEngine:
         # Sort anomalies by timestamp for temporal analysis
         sorted_anomalies = sorted(anomalies, key=lambda x: getattr(x, 'detection_timestamp', datetime.utcnow()))
         
+        # Encode entity addresses once per anomaly rather than once per pair
+        entities = [self._entity_codes(anomaly) for anomaly in sorted_anomalies]
+        
         for i, anomaly in enumerate(sorted_anomalies):
             if i in processed_anomalies:
                 continue
@@ -90,7 +96,9 @@ class MultiDimensionalCorrelationEngine:
                 if j in processed_anomalies:
                     continue
                 
-                correlation_score = self._calculate_correlation_score(anomaly, other_anomaly)
+                correlation_score = self._calculate_correlation_score(
+                    anomaly, other_anomaly, entities[i], entities[j]
+                )
                 
                 if correlation_score > self.entity_correlation_threshold:
                     correlation_group.add_related_anomaly(other_anomaly, correlation_score)
@@ -102,7 +110,8 @@ class MultiDimensionalCorrelationEngine:
         
         return correlation_groups
     
-    def _calculate_correlation_score(self, anomaly1: Any, anomaly2: Any) -> float:
+    def _calculate_correlation_score(self, anomaly1: Any, anomaly2: Any,
+                                     entity1: Optional[Tuple] = None, entity2: Optional[Tuple] = None) -> float:
         """Calculate multi-dimensional correlation score between two anomalies"""
         total_score = 0.0
         
@@ -111,7 +120,7 @@ class MultiDimensionalCorrelationEngine:
         total_score += temporal_score * 0.4
         
         # Entity correlation (40% weight)
-        entity_score = self._calculate_entity_correlation(anomaly1, anomaly2)
+        entity_score = self._calculate_entity_correlation(anomaly1, anomaly2, entity1, entity2)
         total_score += entity_score * 0.4
         
         # Threat type correlation (20% weight)
@@ -134,30 +143,38 @@ class MultiDimensionalCorrelationEngine:
         
         return 0.0
     
-    def _calculate_entity_correlation(self, anomaly1: Any, anomaly2: Any) -> float:
+    def _entity_codes(self, anomaly: Any) -> Tuple[Optional[int], Optional[int], Optional[int]]:
+        """Integer source and destination address codes plus destination port for entity correlation"""
+        source = getattr(anomaly, 'source_ip', None)
+        dest = getattr(anomaly, 'destination_ip', getattr(anomaly, 'target_ip', None))
+        port = getattr(anomaly, 'destination_port', getattr(anomaly, 'target_port', None))
+        return (
+            self.ip_codec.encode(source) if source else None,
+            self.ip_codec.encode(dest) if dest else None,
+            port
+        )
+    
+    def _calculate_entity_correlation(self, anomaly1: Any, anomaly2: Any,
+                                      entity1: Optional[Tuple] = None, entity2: Optional[Tuple] = None) -> float:
         """Calculate entity-based correlation between anomalies"""
         similarity = 0.0
+        source1, dest1, port1 = entity1 or self._entity_codes(anomaly1)
+        source2, dest2, port2 = entity2 or self._entity_codes(anomaly2)
         
         # Source IP similarity
-        source1 = getattr(anomaly1, 'source_ip', None)
-        source2 = getattr(anomaly2, 'source_ip', None)
-        if source1 and source2 and source1 == source2:
+        if source1 is not None and source1 == source2:
             similarity += 0.5
         
         # Destination IP similarity
-        dest1 = getattr(anomaly1, 'destination_ip', getattr(anomaly1, 'target_ip', None))
-        dest2 = getattr(anomaly2, 'destination_ip', getattr(anomaly2, 'target_ip', None))
-        if dest1 and dest2 and dest1 == dest2:
+        if dest1 is not None and dest1 == dest2:
             similarity += 0.3
         
         # Port similarity
-        port1 = getattr(anomaly1, 'destination_port', getattr(anomaly1, 'target_port', None))
-        port2 = getattr(anomaly2, 'destination_port', getattr(anomaly2, 'target_port', None))
         if port1 and port2 and port1 == port2:
             similarity += 0.2
         
         # Subnet correlation (same /24 network)
-        if source1 and source2 and self._same_subnet(source1, source2):
+        if source1 is not None and source2 is not None and self._same_subnet(source1, source2):
             similarity += 0.1
         
         return min(similarity, 1.0)
@@ -177,20 +194,9 @@ class MultiDimensionalCorrelationEngine:
         
         return 0.0
     
-    def _same_subnet(self, ip1: str, ip2: str, subnet_mask: int = 24) -> bool:
-        """Check if two IPs are in the same subnet"""
-        try:
-            # Simple /24 subnet check
-            parts1 = ip1.split('.')
-            parts2 = ip2.split('.')
-            
-            if len(parts1) == 4 and len(parts2) == 4:
-                # Compare first 3 octets for /24
-                return parts1[:3] == parts2[:3]
-        except Exception:
-            pass
-        
-        return False
+    def _same_subnet(self, ip1: int, ip2: int, subnet_mask: int = 24) -> bool:
+        """Check if two encoded IPv4 addresses are in the same subnet (one mask and compare)"""
+        return same_subnet(ip1, ip2, subnet_mask)
     
     def _calculate_group_confidence(self, group: CorrelationGroup) -> float:
         """Calculate overall confidence for correlation group"""
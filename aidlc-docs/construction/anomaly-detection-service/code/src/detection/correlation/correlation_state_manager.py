@@ -4,13 +4,22 @@ Manages correlation state across detection instances using ElastiCache.
 """
 
 import json
-import redis
+import redis.asyncio as aioredis
 import time
-from datetime import datetime, timedelta
-from typing import Dict, List, Optional, Any, Set
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List, Optional, Any, Set, AsyncIterator, Tuple
 from dataclasses import dataclass, asdict
 import logging
 
+from ...infrastructure.cache.state_codec import (
+    get_codec, decode_value, to_epoch_us, datetime_to_epoch_us, epoch_us_to_datetime
+)
+from ...infrastructure.cache.sharding import RedisShardSet, shard_configs_from
+from ...utils.concurrency.event_loop_thread import EventLoopThread
+
+# Timestamps are aware UTC datetimes, as epoch_us_to_datetime returns them
+_MIN_TIME = datetime.min.replace(tzinfo=timezone.utc)
+
 @dataclass
 class CorrelationState:
     entity_key: str
@@ -29,51 +38,98 @@ class CorrelationState:
             'expiry_time': self.expiry_time.isoformat()
         }
     
+    def to_record(self) -> Dict:
+        """Convert to compact codec record with epoch microsecond timestamps"""
+        return {
+            'entity_key': self.entity_key,
+            'anomaly_history': self.anomaly_history,
+            'correlation_context': self.correlation_context,
+            'last_updated': datetime_to_epoch_us(self.last_updated),
+            'expiry_time': datetime_to_epoch_us(self.expiry_time)
+        }
+    
     @classmethod
     def from_dict(cls, data: Dict) -> 'CorrelationState':
-        """Create from dictionary"""
+        """Create from dictionary (codec record or legacy ISO format); timestamps normalize to epoch us"""
         return cls(
             entity_key=data['entity_key'],
-            anomaly_history=data['anomaly_history'],
+            anomaly_history=[
+                dict(anomaly, timestamp=to_epoch_us(anomaly['timestamp'])) if isinstance(anomaly.get('timestamp'), str)
+                else anomaly
+                for anomaly in data['anomaly_history']
+            ],
             correlation_context=data['correlation_context'],
-            last_updated=datetime.fromisoformat(data['last_updated']),
-            expiry_time=datetime.fromisoformat(data['expiry_time'])
+            last_updated=epoch_us_to_datetime(to_epoch_us(data['last_updated'])),
+            expiry_time=epoch_us_to_datetime(to_epoch_us(data['expiry_time']))
         )
 
-class CorrelationStateManager:
+class AsyncCorrelationStateManager:
+    """asyncio-native correlation state manager on redis.asyncio"""
+    
     def __init__(self, config: Dict[str, Any]):
         self.config = config
         self.logger = logging.getLogger(__name__)
         
-        # Redis connection
-        self.redis_client = redis.Redis(
-            host=config.get('redis_host', 'localhost'),
-            port=config.get('redis_port', 6379),
-            db=config.get('redis_db', 0),
-            decode_responses=True,
-            socket_timeout=config.get('socket_timeout', 5),
-            socket_connect_timeout=config.get('connect_timeout', 5),
-            retry_on_timeout=True
+        # Pooled Redis connections, entity state sharded by consistent hash on
+        # entity key (config['shards'] lists nodes; default is a single node)
+        self.shards = RedisShardSet(
+            shard_configs_from(config, {
+                'host': config.get('redis_host', 'localhost'),
+                'port': config.get('redis_port', 6379),
+                'db': config.get('redis_db', 0)
+            }),
+            vnodes=config.get('shard_vnodes', 160),
+            connection_kwargs=dict(
+                decode_responses=False,
+                max_connections=config.get('max_connections', 50),
+                socket_timeout=config.get('socket_timeout', 5),
+                socket_connect_timeout=config.get('connect_timeout', 5),
+                retry_on_timeout=True
+            )
         )
+        # Global metrics live on the primary shard
+        self.redis_client = self.shards.primary_client
+        
+        # State codec (legacy JSON states remain readable)
+        self.codec = get_codec(config.get('state_codec', 'msgpack'))
         
         # State management parameters
         self.state_ttl = config.get('state_ttl', 1800)  # 30 minutes
         self.max_history_size = config.get('max_history_size', 100)
         self.cleanup_interval = config.get('cleanup_interval', 300)  # 5 minutes
-        self.last_cleanup = datetime.utcnow()
+        self.last_cleanup = datetime.now(timezone.utc)
+        self.scan_count = config.get('scan_count', 1000)  # SCAN page size (never KEYS)
         
         # Key prefixes
         self.entity_prefix = "correlation:entity:"
         self.global_prefix = "correlation:global:"
+    
+    async def _iter_entity_states(self, client: aioredis.Redis) -> AsyncIterator[Tuple[bytes, bytes]]:
+        """Yield (key, payload) for every entity state on one shard, one SCAN page and MGET per round trip"""
+        pattern = f"{self.entity_prefix}*"
+        cursor = 0
+        while True:
+            cursor, keys = await client.scan(cursor=cursor, match=pattern, count=self.scan_count)
+            if keys:
+                payloads = await client.mget(keys)
+                for key, payload in zip(keys, payloads):
+                    if payload:
+                        yield key, payload
+            if cursor == 0:
+                break
+    
+    async def _fan_out_states(self, handler) -> Dict[str, Any]:
+        """Run handler(client) over every shard's entity states concurrently"""
+        return await self.shards.fan_out(lambda name, client: handler(client))
         
-    def get_entity_correlation_state(self, entity_key: str) -> Optional[CorrelationState]:
+    async def get_entity_correlation_state(self, entity_key: str) -> Optional[CorrelationState]:
         """Get correlation state for specific entity"""
         try:
             state_key = f"{self.entity_prefix}{entity_key}"
-            state_data = self.redis_client.get(state_key)
+            state_data = await self.shards.client_for(entity_key).get(state_key)
             
             if state_data:
-                data = json.loads(state_data)
+                data = decode_value(state_data)
                 return CorrelationState.from_dict(data)
             
             return None
@@ -82,21 +138,21 @@ class CorrelationStateManager:
             self.logger.error(f"Failed to get correlation state for {entity_key}: {e}")
             return None
     
-    def update_entity_correlation_state(self, entity_key: str, 
-                                      anomaly_data: Dict, 
-                                      correlation_context: Optional[Dict] = None) -> bool:
+    async def update_entity_correlation_state(self, entity_key: str, 
+                                            anomaly_data: Dict, 
+                                            correlation_context: Optional[Dict] = None) -> bool:
         """Update correlation state for entity"""
         try:
             # Get existing state or create new
-            state = self.get_entity_correlation_state(entity_key)
+            state = await self.get_entity_correlation_state(entity_key)
             
             if state is None:
                 state = CorrelationState(
                     entity_key=entity_key,
                     anomaly_history=[],
                     correlation_context=correlation_context or {},
-                    last_updated=datetime.utcnow(),
-                    expiry_time=datetime.utcnow() + timedelta(seconds=self.state_ttl)
+                    last_updated=datetime.now(timezone.utc),
+                    expiry_time=datetime.now(timezone.utc) + timedelta(seconds=self.state_ttl)
                 )
             
             # Add anomaly to history
@@ -104,7 +160,7 @@ class CorrelationStateManager:
                 'anomaly_id': anomaly_data.get('anomaly_id'),
                 'threat_type': anomaly_data.get('threat_type'),
                 'confidence_score': anomaly_data.get('confidence_score'),
-                'timestamp': datetime.utcnow().isoformat(),
+                'timestamp': datetime_to_epoch_us(datetime.now(timezone.utc)),
                 'source_ip': anomaly_data.get('source_ip'),
                 'destination_ip': anomaly_data.get('destination_ip'),
                 'destination_port': anomaly_data.get('destination_port')
@@ -121,15 +177,15 @@ class CorrelationStateManager:
                 state.correlation_context.update(correlation_context)
             
             # Update timestamps
-            state.last_updated = datetime.utcnow()
-            state.expiry_time = datetime.utcnow() + timedelta(seconds=self.state_ttl)
+            state.last_updated = datetime.now(timezone.utc)
+            state.expiry_time = datetime.now(timezone.utc) + timedelta(seconds=self.state_ttl)
             
             # Save to Redis
             state_key = f"{self.entity_prefix}{entity_key}"
-            self.redis_client.setex(
+            await self.shards.client_for(entity_key).setex(
                 state_key,
                 self.state_ttl,
-                json.dumps(state.to_dict())
+                self.codec.encode(state.to_record())
             )
             
             return True
@@ -138,50 +194,48 @@ class CorrelationStateManager:
             self.logger.error(f"Failed to update correlation state for {entity_key}: {e}")
             return False
     
-    def get_related_entities(self, entity_key: str, 
-                           time_window: int = 300,
-                           threat_types: Optional[Set[str]] = None) -> List[Dict]:
-        """Get entities with related anomalies within time window"""
+    async def get_related_entities(self, entity_key: str, 
+                                 time_window: int = 300,
+                                 threat_types: Optional[Set[str]] = None) -> List[Dict]:
+        """Get entities with related anomalies within time window (fanned out across shards)"""
         try:
-            related_entities = []
-            current_time = datetime.utcnow()
-            
-            # Get all entity keys
-            pattern = f"{self.entity_prefix}*"
-            entity_keys = self.redis_client.keys(pattern)
-            
-            for key in entity_keys:
-                if key == f"{self.entity_prefix}{entity_key}":
-                    continue  # Skip self
-                
-                try:
-                    state_data = self.redis_client.get(key)
-                    if not state_data:
-                        continue
-                    
-                    data = json.loads(state_data)
-                    state = CorrelationState.from_dict(data)
+            cutoff_us = datetime_to_epoch_us(datetime.now(timezone.utc)) - time_window * 1_000_000
+            self_key = f"{self.entity_prefix}{entity_key}".encode('utf-8')
+            
+            async def scan_shard(client: aioredis.Redis) -> List[Dict]:
+                shard_related = []
+                async for key, state_data in self._iter_entity_states(client):
+                    if key == self_key:
+                        continue  # Skip self
                     
-                    # Check for recent anomalies
-                    recent_anomalies = []
-                    for anomaly in state.anomaly_history:
-                        anomaly_time = datetime.fromisoformat(anomaly['timestamp'])
-                        time_diff = (current_time - anomaly_time).total_seconds()
+                    try:
+                        data = decode_value(state_data)
+                        state = CorrelationState.from_dict(data)
                         
-                        if time_diff <= time_window:
-                            if threat_types is None or anomaly['threat_type'] in threat_types:
-                                recent_anomalies.append(anomaly)
+                        # Check for recent anomalies (epoch comparison, no per-entry datetime parsing)
+                        recent_anomalies = []
+                        for anomaly in state.anomaly_history:
+                            if to_epoch_us(anomaly['timestamp']) >= cutoff_us:
+                                if threat_types is None or anomaly['threat_type'] in threat_types:
+                                    recent_anomalies.append(self._history_entry_output(anomaly))
+                        
+                        if recent_anomalies:
+                            shard_related.append({
+                                'entity_key': state.entity_key,
+                                'recent_anomalies': recent_anomalies,
+                                'correlation_context': state.correlation_context
+                            })
                     
-                    if recent_anomalies:
-                        related_entities.append({
-                            'entity_key': state.entity_key,
-                            'recent_anomalies': recent_anomalies,
-                            'correlation_context': state.correlation_context
-                        })
-                
-                except Exception as e:
-                    self.logger.warning(f"Failed to process entity {key}: {e}")
-                    continue
+                    except Exception as e:
+                        self.logger.warning(f"Failed to process entity {key}: {e}")
+                        continue
+                return shard_related
+            
+            # Unreachable shards contribute nothing rather than failing the query
+            related_entities = []
+            for shard_related in (await self._fan_out_states(scan_shard)).values():
+                if not isinstance(shard_related, Exception):
+                    related_entities.extend(shard_related)
             
             return related_entities
             
@@ -189,14 +243,14 @@ class CorrelationStateManager:
             self.logger.error(f"Failed to get related entities for {entity_key}: {e}")
             return []
     
-    def get_global_correlation_metrics(self) -> Dict[str, Any]:
+    async def get_global_correlation_metrics(self) -> Dict[str, Any]:
         """Get global correlation metrics"""
         try:
             metrics_key = f"{self.global_prefix}metrics"
-            metrics_data = self.redis_client.get(metrics_key)
+            metrics_data = await self.redis_client.get(metrics_key)
             
             if metrics_data:
-                return json.loads(metrics_data)
+                return decode_value(metrics_data)
             
             return {}
             
@@ -204,20 +258,20 @@ class CorrelationStateManager:
             self.logger.error(f"Failed to get global correlation metrics: {e}")
             return {}
     
-    def update_global_correlation_metrics(self, metrics: Dict[str, Any]) -> bool:
+    async def update_global_correlation_metrics(self, metrics: Dict[str, Any]) -> bool:
         """Update global correlation metrics"""
         try:
             metrics_key = f"{self.global_prefix}metrics"
             
             # Get existing metrics
-            existing_metrics = self.get_global_correlation_metrics()
+            existing_metrics = await self.get_global_correlation_metrics()
             
             # Update with new metrics
             existing_metrics.update(metrics)
-            existing_metrics['last_updated'] = datetime.utcnow().isoformat()
+            existing_metrics['last_updated'] = datetime.now(timezone.utc).isoformat()
             
             # Save with TTL
-            self.redis_client.setex(
+            await self.redis_client.setex(
                 metrics_key,
                 3600,  # 1 hour TTL for metrics
                 json.dumps(existing_metrics)
@@ -229,35 +283,38 @@ class CorrelationStateManager:
             self.logger.error(f"Failed to update global correlation metrics: {e}")
             return False
     
-    def cleanup_expired_states(self) -> int:
+    async def cleanup_expired_states(self) -> int:
         """Clean up expired correlation states"""
         try:
-            current_time = datetime.utcnow()
+            current_time = datetime.now(timezone.utc)
             
             # Check if cleanup is needed
             if (current_time - self.last_cleanup).total_seconds() < self.cleanup_interval:
                 return 0
             
-            cleaned_count = 0
-            pattern = f"{self.entity_prefix}*"
-            entity_keys = self.redis_client.keys(pattern)
+            current_time_us = datetime_to_epoch_us(current_time)
             
-            for key in entity_keys:
-                try:
-                    state_data = self.redis_client.get(key)
-                    if not state_data:
-                        continue
-                    
-                    data = json.loads(state_data)
-                    expiry_time = datetime.fromisoformat(data['expiry_time'])
+            async def cleanup_shard(client: aioredis.Redis) -> int:
+                expired_keys = []
+                async for key, state_data in self._iter_entity_states(client):
+                    try:
+                        data = decode_value(state_data)
+                        
+                        if current_time_us > to_epoch_us(data['expiry_time']):
+                            expired_keys.append(key)
                     
-                    if current_time > expiry_time:
-                        self.redis_client.delete(key)
-                        cleaned_count += 1
+                    except Exception as e:
+                        self.logger.warning(f"Failed to process cleanup for {key}: {e}")
+                        continue
                 
-                except Exception as e:
-                    self.logger.warning(f"Failed to process cleanup for {key}: {e}")
-                    continue
+                # Delete in chunks on the owning shard
+                removed = 0
+                for i in range(0, len(expired_keys), self.scan_count):
+                    removed += await client.delete(*expired_keys[i:i + self.scan_count])
+                return removed
+            
+            results = await self._fan_out_states(cleanup_shard)
+            cleaned_count = sum(r for r in results.values() if not isinstance(r, Exception))
             
             self.last_cleanup = current_time
             
@@ -270,7 +327,7 @@ class CorrelationStateManager:
             self.logger.error(f"Failed to cleanup expired states: {e}")
             return 0
     
-    def get_correlation_statistics(self) -> Dict[str, Any]:
+    async def get_correlation_statistics(self) -> Dict[str, Any]:
         """Get correlation state statistics"""
         try:
             stats = {
@@ -283,75 +340,150 @@ class CorrelationStateManager:
                 'newest_state_age': 0
             }
             
-            current_time = datetime.utcnow()
-            pattern = f"{self.entity_prefix}*"
-            entity_keys = self.redis_client.keys(pattern)
-            
-            stats['total_entities'] = len(entity_keys)
+            current_time = datetime.now(timezone.utc)
+            active_cutoff_us = datetime_to_epoch_us(current_time) - 3600 * 1_000_000
+            
+            async def shard_statistics(client: aioredis.Redis) -> Dict[str, Any]:
+                partial = {
+                    'total_entities': 0,
+                    'active_entities': 0,
+                    'total_anomalies': 0,
+                    'threat_counts': {},
+                    'oldest_time': current_time,
+                    'newest_time': _MIN_TIME
+                }
+                
+                async for key, state_data in self._iter_entity_states(client):
+                    partial['total_entities'] += 1
+                    try:
+                        data = decode_value(state_data)
+                        state = CorrelationState.from_dict(data)
+                        
+                        # Check if active (recent anomalies)
+                        if any(to_epoch_us(a['timestamp']) >= active_cutoff_us for a in state.anomaly_history):
+                            partial['active_entities'] += 1
+                        
+                        # Count anomalies and threat types
+                        partial['total_anomalies'] += len(state.anomaly_history)
+                        
+                        threat_counts = partial['threat_counts']
+                        for anomaly in state.anomaly_history:
+                            threat_type = anomaly['threat_type']
+                            threat_counts[threat_type] = threat_counts.get(threat_type, 0) + 1
+                        
+                        # Track state ages
+                        partial['oldest_time'] = min(partial['oldest_time'], state.last_updated)
+                        partial['newest_time'] = max(partial['newest_time'], state.last_updated)
+                    
+                    except Exception as e:
+                        self.logger.warning(f"Failed to process stats for {key}: {e}")
+                        continue
+                
+                return partial
             
+            # Merge per-shard partial aggregates
             oldest_time = current_time
-            newest_time = datetime.min
-            total_anomalies = 0
+            newest_time = _MIN_TIME
             threat_counts = {}
             
-            for key in entity_keys:
-                try:
-                    state_data = self.redis_client.get(key)
-                    if not state_data:
-                        continue
-                    
-                    data = json.loads(state_data)
-                    state = CorrelationState.from_dict(data)
-                    
-                    # Check if active (recent anomalies)
-                    recent_anomalies = [
-                        a for a in state.anomaly_history
-                        if (current_time - datetime.fromisoformat(a['timestamp'])).total_seconds() <= 3600
-                    ]
-                    
-                    if recent_anomalies:
-                        stats['active_entities'] += 1
-                    
-                    # Count anomalies and threat types
-                    total_anomalies += len(state.anomaly_history)
-                    
-                    for anomaly in state.anomaly_history:
-                        threat_type = anomaly['threat_type']
-                        threat_counts[threat_type] = threat_counts.get(threat_type, 0) + 1
-                    
-                    # Track state ages
-                    if state.last_updated < oldest_time:
-                        oldest_time = state.last_updated
-                    if state.last_updated > newest_time:
-                        newest_time = state.last_updated
-                
-                except Exception as e:
-                    self.logger.warning(f"Failed to process stats for {key}: {e}")
+            for partial in (await self._fan_out_states(shard_statistics)).values():
+                if isinstance(partial, Exception):
                     continue
+                for field in ('total_entities', 'active_entities', 'total_anomalies'):
+                    stats[field] += partial[field]
+                for threat_type, count in partial['threat_counts'].items():
+                    threat_counts[threat_type] = threat_counts.get(threat_type, 0) + count
+                oldest_time = min(oldest_time, partial['oldest_time'])
+                newest_time = max(newest_time, partial['newest_time'])
             
-            stats['total_anomalies'] = total_anomalies
             stats['threat_type_distribution'] = threat_counts
             
             if stats['total_entities'] > 0:
-                stats['avg_anomalies_per_entity'] = total_anomalies / stats['total_entities']
+                stats['avg_anomalies_per_entity'] = stats['total_anomalies'] / stats['total_entities']
             
             if oldest_time != current_time:
                 stats['oldest_state_age'] = (current_time - oldest_time).total_seconds()
             
-            if newest_time != datetime.min:
+            if newest_time != _MIN_TIME:
                 stats['newest_state_age'] = (current_time - newest_time).total_seconds()
             
+            if len(self.shards) > 1:
+                stats['shard_count'] = len(self.shards)
+            
             return stats
             
         except Exception as e:
             self.logger.error(f"Failed to get correlation statistics: {e}")
             return {}
     
+    @staticmethod
+    def _history_entry_output(anomaly: Dict) -> Dict:
+        """Render history entry for callers with an ISO timestamp"""
+        return dict(anomaly, timestamp=epoch_us_to_datetime(to_epoch_us(anomaly['timestamp'])).isoformat())
+    
+    async def health_check(self) -> bool:
+        """Check Redis connection health on every shard"""
+        results = await self.shards.fan_out(lambda name, client: client.ping())
+        failed = [name for name, result in results.items() if isinstance(result, Exception)]
+        if failed:
+            self.logger.error(f"Redis health check failed for shards: {', '.join(failed)}")
+            return False
+        return True
+    
+    async def close(self):
+        """Release pooled connections"""
+        await self.shards.close()
+
+
+class CorrelationStateManager:
+    """Synchronous adapter over AsyncCorrelationStateManager running on a background event loop"""
+    
+    def __init__(self, config: Dict[str, Any], loop_thread: Optional[EventLoopThread] = None):
+        self.config = config
+        self.logger = logging.getLogger(__name__)
+        self._loop_thread = loop_thread or EventLoopThread.shared()
+        self._manager = AsyncCorrelationStateManager(config)
+        
+        self.state_ttl = self._manager.state_ttl
+        self.max_history_size = self._manager.max_history_size
+        self.entity_prefix = self._manager.entity_prefix
+        self.global_prefix = self._manager.global_prefix
+    
+    @property
+    def async_manager(self) -> AsyncCorrelationStateManager:
+        """Underlying asyncio manager (for use from its event loop)"""
+        return self._manager
+    
+    def _run(self, coro):
+        return self._loop_thread.run(coro)
+    
+    def get_entity_correlation_state(self, entity_key: str) -> Optional[CorrelationState]:
+        return self._run(self._manager.get_entity_correlation_state(entity_key))
+    
+    def update_entity_correlation_state(self, entity_key: str, 
+                                      anomaly_data: Dict, 
+                                      correlation_context: Optional[Dict] = None) -> bool:
+        return self._run(self._manager.update_entity_correlation_state(entity_key, anomaly_data, correlation_context))
+    
+    def get_related_entities(self, entity_key: str, 
+                           time_window: int = 300,
+                           threat_types: Optional[Set[str]] = None) -> List[Dict]:
+        return self._run(self._manager.get_related_entities(entity_key, time_window, threat_types))
+    
+    def get_global_correlation_metrics(self) -> Dict[str, Any]:
+        return self._run(self._manager.get_global_correlation_metrics())
+    
+    def update_global_correlation_metrics(self, metrics: Dict[str, Any]) -> bool:
+        return self._run(self._manager.update_global_correlation_metrics(metrics))
+    
+    def cleanup_expired_states(self) -> int:
+        return self._run(self._manager.cleanup_expired_states())
+    
+    def get_correlation_statistics(self) -> Dict[str, Any]:
+        return self._run(self._manager.get_correlation_statistics())
+    
     def health_check(self) -> bool:
-        """Check Redis connection health"""
-        try:
-            self.redis_client.ping()
-            return True
-        except Exception as e:
-            self.logger.error(f"Redis health check failed: {e}")
-            return False
\ No newline at end of file
+        return self._run(self._manager.health_check())
+    
+    def close(self):
+        return self._run(self._manager.close())
\ No newline at end of file
@@ -0,0 +1,260 @@
+"""
+Static Pre-Filter
+Drops known-benign flows (FR-001 AWS endpoints, FR-002 health checks, FR-003 management traffic) ahead of Tier 1.
+"""
+
+import json
+import os
+import threading
+from typing import Any, Dict, List, Optional, Tuple
+import logging
+
+import numpy as np
+
+from ..validation.cidr_trie import CidrTrie
+from ...utils.network.ip_codec import IpCodec, split_families
+
+DEFAULT_RULE_FILE = os.path.join(os.path.dirname(__file__), 'default_rules.json')
+
+PROTOCOL_NAMES = {1: 'ICMP', 6: 'TCP', 17: 'UDP', 58: 'ICMPV6'}
+
+# Shared compute ranges: anyone can rent an address in them, attackers included
+BROAD_AWS_SERVICES = {'AMAZON', 'EC2'}
+
+
+def _protocol_name(protocol: Any) -> str:
+    if isinstance(protocol, int) or (isinstance(protocol, str) and protocol.isdigit()):
+        return PROTOCOL_NAMES.get(int(protocol), str(protocol))
+    return str(protocol or '').upper()
+
+
+def load_aws_ip_ranges(path: str, services: Optional[List[str]] = None) -> List[str]:
+    """Prefixes from an AWS ip-ranges.json document, optionally limited to some services"""
+    with open(path) as handle:
+        document = json.load(handle)
+    wanted = {s.upper() for s in services} if services else None
+    prefixes = []
+    for entry in document.get('prefixes', []) + document.get('ipv6_prefixes', []):
+        if wanted is None or entry.get('service', '').upper() in wanted:
+            prefixes.append(entry.get('ip_prefix') or entry.get('ipv6_prefix'))
+    return prefixes
+
+
+class FilterRule:
+    """One compiled rule; every condition it specifies must hold for a flow to match"""
+
+    def __init__(self, spec: Dict[str, Any], base_dir: str = '.'):
+        self.name = spec['name']
+
+        cidrs = {side: list(spec.get(key, [])) for side, key in (
+            ('source', 'source_cidrs'), ('destination', 'destination_cidrs'), ('either', 'cidrs')
+        )}
+        if spec.get('aws_ip_ranges'):
+            services = {str(service).upper() for service in spec.get('aws_services') or []}
+            if not services or services & BROAD_AWS_SERVICES:
+                raise ValueError(f"Rule {self.name}: aws_ip_ranges needs narrow aws_services, "
+                                 f"not all ranges or {sorted(BROAD_AWS_SERVICES)}")
+            path = os.path.join(base_dir, spec['aws_ip_ranges'])
+            if os.path.exists(path):
+                cidrs[spec.get('aws_ip_ranges_side', 'either')].extend(
+                    load_aws_ip_ranges(path, spec.get('aws_services'))
+                )
+            else:
+                logging.getLogger(__name__).info(f"Rule {self.name}: {path} not found, using inline CIDRs only")
+        self.tries = {side: CidrTrie(values) for side, values in cidrs.items() if values}
+
+        self.ports = np.asarray(sorted(spec.get('ports', [])), dtype=np.int64)
+        self.source_ports = np.asarray(sorted(spec.get('source_ports', [])), dtype=np.int64)
+        self.protocols = [_protocol_name(p) for p in spec.get('protocols', [])]
+        self.max_bytes = spec.get('max_bytes')
+        self.tuples = {(src, dst, int(port)) for src, dst, port in spec.get('tuples', [])}
+
+        # Conditions a rule lists under requires must be filled in (e.g. site-specific source CIDRs)
+        self.missing = [key for key in spec.get('requires', []) if not spec.get(key)]
+
+        # A rule with no conditions would drop everything
+        self.active = not self.missing and bool(self.tries or self.ports.size or self.source_ports.size or self.protocols
+                           or self.max_bytes is not None or self.tuples)
+
+    def match(self, columns: Dict[str, Any], candidates: 'np.ndarray') -> 'np.ndarray':
+        """Narrow the candidate mask to flows matching this rule, cheapest conditions first"""
+        mask = candidates.copy()
+        if self.ports.size:
+            mask &= np.isin(columns['destination_port'], self.ports)
+        if self.source_ports.size:
+            mask &= np.isin(columns['source_port'], self.source_ports)
+        if self.protocols:
+            mask &= np.isin(columns['protocol'], self.protocols)
+        if self.max_bytes is not None:
+            mask &= columns['bytes'] <= self.max_bytes
+
+        # CIDR walks only cover rows still in play
+        for side, trie in self.tries.items():
+            rows = np.flatnonzero(mask)
+            if not rows.size:
+                return mask
+            if side == 'either':
+                hits = self._match_rows(trie, columns['source_addresses'], rows)
+                hits |= self._match_rows(trie, columns['destination_addresses'], rows)
+            else:
+                hits = self._match_rows(trie, columns[f'{side}_addresses'], rows)
+            mask[rows] = hits
+
+        if self.tuples and mask.any():
+            source_ips, destination_ips, ports = columns['source_ip'], columns['destination_ip'], columns['destination_port']
+            for row in np.flatnonzero(mask).tolist():
+                if (source_ips[row], destination_ips[row], int(ports[row])) not in self.tuples:
+                    mask[row] = False
+        return mask
+
+    @staticmethod
+    def _match_rows(trie: CidrTrie, addresses: Tuple, rows: 'np.ndarray') -> 'np.ndarray':
+        v4_values, v4_mask, v6_values = addresses
+        v6_rows = []
+        if v6_values:
+            v6_rows = [(position, v6_values[row]) for position, row in enumerate(rows.tolist()) if row in v6_values]
+        return trie.match_parsed(v4_values[rows], v4_mask[rows], v6_rows)
+
+
+class StaticPreFilter:
+    """Rule-file driven batch filter with per-rule drop counters and a shadow mode"""
+
+    def __init__(self, config: Dict[str, Any]):
+        self.logger = logging.getLogger(__name__)
+        self.enabled = config.get('enabled', True)
+        self.shadow_mode = config.get('shadow_mode', False)
+        self.rule_file = config.get('rule_file', DEFAULT_RULE_FILE)
+        self.ip_codec = IpCodec.shared()
+
+        self._lock = threading.Lock()
+        self.rules: List[FilterRule] = []
+        self.stats = {'batches': 0, 'evaluated': 0, 'dropped': 0, 'would_drop': 0}
+        self.rule_counts: Dict[str, int] = {}
+
+        if self.enabled:
+            self.reload_rules(self.rule_file)
+
+    def reload_rules(self, rule_file: Optional[str] = None) -> bool:
+        """Compile a rule file and swap it in; the previous rules stay active on failure"""
+        rule_file = rule_file or self.rule_file
+        try:
+            with open(rule_file) as handle:
+                document = json.load(handle)
+            base_dir = os.path.dirname(os.path.abspath(rule_file))
+            rules = [FilterRule(spec, base_dir) for spec in document.get('rules', []) if spec.get('enabled', True)]
+
+            inactive = [rule.name + (f" (needs {', '.join(rule.missing)})" if rule.missing else '')
+                        for rule in rules if not rule.active]
+            if inactive:
+                self.logger.warning(f"Inactive pre-filter rules are ignored: {inactive}")
+
+            with self._lock:
+                self.rules = [rule for rule in rules if rule.active]
+                self.rule_file = rule_file
+                for rule in self.rules:
+                    self.rule_counts.setdefault(rule.name, 0)
+
+            self.logger.info(f"Loaded {len(self.rules)} pre-filter rules from {rule_file}")
+            return True
+
+        except Exception as e:
+            self.logger.error(f"Failed to load pre-filter rules from {rule_file}: {e}")
+            return False
+
+    def _extract_columns(self, flow_logs: List[Dict]) -> Dict[str, Any]:
+        """Columnar view of the fields rules can test, with addresses parsed once per batch"""
+        count = len(flow_logs)
+        source_ips = [log.get('source_ip', '') for log in flow_logs]
+        destination_ips = [log.get('destination_ip', '') for log in flow_logs]
+
+        # Unparseable values get a sentinel no port or byte ceiling can match
+        def int_column(key: str, default: int, invalid: int) -> 'np.ndarray':
+            try:
+                return np.fromiter((log.get(key, default) for log in flow_logs), dtype=np.int64, count=count)
+            except (TypeError, ValueError):
+                pass
+            values = np.empty(count, dtype=np.int64)
+            for i, log in enumerate(flow_logs):
+                try:
+                    values[i] = int(log.get(key, default) or default)
+                except (TypeError, ValueError):
+                    values[i] = invalid
+            return values
+
+        raw_protocols = [log.get('protocol', 'TCP') for log in flow_logs]
+        protocol_names = {raw: _protocol_name(raw) for raw in set(raw_protocols)}
+
+        return {
+            'source_ip': source_ips,
+            'destination_ip': destination_ips,
+            'source_addresses': self._parse_addresses(source_ips),
+            'destination_addresses': self._parse_addresses(destination_ips),
+            'destination_port': int_column('destination_port', 0, -1),
+            'source_port': int_column('source_port', 0, -1),
+            'bytes': int_column('bytes', 0, np.iinfo(np.int64).max),
+            'protocol': np.asarray([protocol_names[raw] for raw in raw_protocols], dtype=object)
+        }
+
+    def _parse_addresses(self, ips: List[str]) -> Tuple['np.ndarray', 'np.ndarray', Dict[int, int]]:
+        """IPv4 uint32 column and validity mask, plus IPv6 values by row, via the shared IP codec"""
+        return split_families(self.ip_codec.encode_many(ips))
+
+    def evaluate(self, flow_logs: List[Dict]) -> 'np.ndarray':
+        """Drop mask for a batch, attributing each dropped flow to the first matching rule"""
+        dropped = np.zeros(len(flow_logs), dtype=bool)
+        rules = self.rules
+        if not rules or not flow_logs:
+            return dropped
+
+        columns = self._extract_columns(flow_logs)
+        counts = {}
+        for rule in rules:
+            matched = rule.match(columns, ~dropped)
+            hits = int(matched.sum())
+            if hits:
+                counts[rule.name] = hits
+                dropped |= matched
+
+        with self._lock:
+            for name, hits in counts.items():
+                self.rule_counts[name] = self.rule_counts.get(name, 0) + hits
+        return dropped
+
+    def filter(self, flow_logs: List[Dict]) -> List[Dict]:
+        """Flows that should continue to Tier 1; in shadow mode every flow continues"""
+        if not self.enabled or not self.rules:
+            return flow_logs
+
+        try:
+            dropped = self.evaluate(flow_logs)
+        except Exception as e:
+            self.logger.error(f"Pre-filter evaluation failed, passing batch through: {e}")
+            return flow_logs
+
+        drop_count = int(dropped.sum())
+        with self._lock:
+            self.stats['batches'] += 1
+            self.stats['evaluated'] += len(flow_logs)
+            self.stats['would_drop' if self.shadow_mode else 'dropped'] += drop_count
+
+        if self.shadow_mode or not drop_count:
+            if drop_count:
+                self.logger.debug(f"Pre-filter (shadow) would drop {drop_count}/{len(flow_logs)} flows")
+            return flow_logs
+
+        return [flow_logs[i] for i in np.flatnonzero(~dropped).tolist()]
+
+    def get_statistics(self) -> Dict[str, Any]:
+        """Batch totals, per-rule drop counters and the current reduction ratio"""
+        with self._lock:
+            stats = dict(self.stats)
+            rule_counts = dict(self.rule_counts)
+        removed = stats['would_drop' if self.shadow_mode else 'dropped']
+        return dict(
+            stats,
+            enabled=self.enabled,
+            shadow_mode=self.shadow_mode,
+            rule_file=self.rule_file,
+            rules=rule_counts,
+            reduction_ratio=removed / stats['evaluated'] if stats['evaluated'] else 0.0
+        )
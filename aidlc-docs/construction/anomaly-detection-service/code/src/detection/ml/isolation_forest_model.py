@@ -11,6 +11,8 @@ from typing import List, Dict, Optional, Any
 from dataclasses import dataclass
 import logging
 
+from ...utils.timestamps.epoch import hour_of_day, to_epoch
+
 @dataclass
 class MLAnomaly:
     anomaly_id: str
@@ -93,7 +95,7 @@ class IsolationForestModel:
                     float(log.get('bytes', 0)) / max(float(log.get('packets', 1)), 1),  # Bytes per packet
                     float(log.get('destination_port', 0)),
                     self._encode_protocol(log.get('protocol', 'TCP')),
-                    self._encode_time_features(log.get('timestamp', datetime.utcnow())),
+                    self._encode_time_features(log.get('timestamp')),
                     self._calculate_flow_duration(log),
                     self._encode_action(log.get('action', 'ACCEPT'))
                 ]
@@ -116,12 +118,7 @@ class IsolationForestModel:
     
     def _encode_time_features(self, timestamp) -> float:
         """Encode timestamp as hour of day"""
-        if isinstance(timestamp, str):
-            timestamp = datetime.fromisoformat(timestamp.replace('Z', '+00:00'))
-        elif not isinstance(timestamp, datetime):
-            timestamp = datetime.utcnow()
-        
-        return float(timestamp.hour)
+        return float(hour_of_day(to_epoch(timestamp)))
     
     def _calculate_flow_duration(self, log: Dict) -> float:
         """Calculate flow duration (simplified)"""
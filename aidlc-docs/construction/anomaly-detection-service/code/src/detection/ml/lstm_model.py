@@ -4,6 +4,7 @@ Provides wrapper for SageMaker-hosted LSTM model for behavioral baseline analysi
 """
 
 import json
+from bisect import bisect_left
 import boto3
 import numpy as np
 from datetime import datetime, timedelta
@@ -11,6 +12,8 @@ from typing import List, Dict, Optional, Any
 from dataclasses import dataclass
 import logging
 
+from ...utils.timestamps.epoch import day_of_week, hour_of_day, now_epoch, to_epoch
+
 @dataclass
 class BaselineDeviation:
     anomaly_id: str
@@ -116,24 +119,30 @@ class LSTMModel:
         """Extract temporal features for LSTM"""
         features = []
         
-        # Sort logs by timestamp
-        sorted_logs = sorted(flow_logs, key=lambda x: x.get('timestamp', datetime.utcnow()))
+        # Parse each timestamp once, then sort logs by epoch
+        now = now_epoch()
+        timed_logs = []
+        for log in flow_logs:
+            try:
+                timed_logs.append((to_epoch(log.get('timestamp'), now), log))
+            except (ValueError, TypeError) as e:
+                self.logger.warning(f"Temporal feature extraction failed: {e}")
+        timed_logs.sort(key=lambda item: item[0])
+        
+        epochs = [epoch for epoch, _ in timed_logs]
+        rates = self._calculate_rate_features(epochs)
         
-        for log in sorted_logs:
+        for (epoch, log), rate in zip(timed_logs, rates):
             try:
-                timestamp = log.get('timestamp', datetime.utcnow())
-                if isinstance(timestamp, str):
-                    timestamp = datetime.fromisoformat(timestamp.replace('Z', '+00:00'))
-                
                 feature_vector = [
                     float(log.get('bytes', 0)),
                     float(log.get('packets', 0)),
                     float(log.get('destination_port', 0)),
                     self._encode_protocol(log.get('protocol', 'TCP')),
-                    float(timestamp.hour),  # Hour of day
-                    float(timestamp.weekday()),  # Day of week
+                    float(hour_of_day(epoch)),  # Hour of day
+                    float(day_of_week(epoch)),  # Day of week
                     self._encode_action(log.get('action', 'ACCEPT')),
-                    self._calculate_rate_features(log, sorted_logs)
+                    rate
                 ]
                 features.append(feature_vector)
             except (ValueError, TypeError) as e:
@@ -160,24 +169,12 @@ class LSTMModel:
         }
         return action_map.get(action.upper(), 0.5)
     
-    def _calculate_rate_features(self, current_log: Dict, all_logs: List[Dict]) -> float:
-        """Calculate rate-based features"""
-        # Simple rate calculation based on recent activity
-        current_time = current_log.get('timestamp', datetime.utcnow())
-        if isinstance(current_time, str):
-            current_time = datetime.fromisoformat(current_time.replace('Z', '+00:00'))
-        
-        # Count logs in last minute
-        recent_count = 0
-        for log in all_logs:
-            log_time = log.get('timestamp', datetime.utcnow())
-            if isinstance(log_time, str):
-                log_time = datetime.fromisoformat(log_time.replace('Z', '+00:00'))
-            
-            if (current_time - log_time).total_seconds() <= 60:
-                recent_count += 1
-        
-        return float(recent_count)
+    def _calculate_rate_features(self, epochs: List[int]) -> List[float]:
+        """Calculate rate-based features from sorted epoch timestamps"""
+        # Count logs no more than a minute older than each log (later logs included),
+        # i.e. everything from the first log at or after t - 60 to the end
+        total = len(epochs)
+        return [float(total - bisect_left(epochs, epoch - 60)) for epoch in epochs]
     
     def _calculate_reconstruction_error(self, original: List[List[float]], 
                                      reconstruction: List[List[float]]) -> float:
@@ -10,6 +10,9 @@ from typing import List, Dict, Set, Optional
 from dataclasses import dataclass
 from collections import defaultdict
 
+from .port_scanning_detector import FlowLog
+from ...utils.network.ip_codec import IpCodec
+
 @dataclass
 class C2BeaconingAnomaly:
     anomaly_id: str
@@ -35,6 +38,7 @@ class C2BeaconingDetector:
         self.min_connections = min_connections
         self.cv_threshold = cv_threshold
         self.confidence_threshold = confidence_threshold
+        self.ip_codec = IpCodec.shared()
     
     def detect(self, flow_logs: List[FlowLog]) -> List[C2BeaconingAnomaly]:
         """Detect C2 beaconing patterns in flow logs"""
@@ -43,7 +47,7 @@ class C2BeaconingDetector:
         
         # Group connections by source-destination pair
         for log in flow_logs:
-            conn_key = f"{log.source_ip}->{log.destination_ip}:{log.destination_port}"
+            conn_key = (log.source_ip, log.destination_ip, log.destination_port)
             connection_patterns[conn_key].append(log.timestamp)
         
         # Analyze each connection pattern
@@ -56,7 +60,7 @@ class C2BeaconingDetector:
                 # Calculate intervals between connections
                 intervals = []
                 for i in range(1, len(timestamps)):
-                    interval = (timestamps[i] - timestamps[i-1]).total_seconds()
+                    interval = float(timestamps[i] - timestamps[i-1])
                     intervals.append(interval)
                 
                 # Calculate coefficient of variation
@@ -76,14 +80,15 @@ class C2BeaconingDetector:
                             )
                             
                             if validation_score > self.confidence_threshold:
-                                source_ip, dest_info = conn_key.split('->')
-                                dest_ip, dest_port = dest_info.split(':')
+                                source_code, dest_code, dest_port = conn_key
+                                source_ip = self.ip_codec.decode(source_code)
+                                dest_ip = self.ip_codec.decode(dest_code)
                                 
                                 anomaly = C2BeaconingAnomaly(
-                                    anomaly_id=f"c2_{source_ip}_{dest_ip}_{int(timestamps[0].timestamp())}",
+                                    anomaly_id=f"c2_{source_ip}_{dest_ip}_{timestamps[0]}",
                                     source_ip=source_ip,
                                     destination_ip=dest_ip,
-                                    destination_port=int(dest_port),
+                                    destination_port=dest_port,
                                     connection_count=len(timestamps),
                                     mean_interval=mean_interval,
                                     coefficient_variation=coefficient_variation,
@@ -96,7 +101,7 @@ class C2BeaconingDetector:
     def _validate_beaconing_indicators(self, intervals: List[float], 
                                      mean_interval: float, 
                                      cv: float,
-                                     timestamps: List[datetime]) -> float:
+                                     timestamps: List[int]) -> float:
         """Multi-stage validation for C2 beaconing"""
         score = 0.0
         
@@ -117,7 +122,7 @@ class C2BeaconingDetector:
             score += 0.1
         
         # Indicator 3: Persistence (long-running pattern)
-        total_duration = (timestamps[-1] - timestamps[0]).total_seconds()
+        total_duration = float(timestamps[-1] - timestamps[0])
         if total_duration > 3600:  # More than 1 hour
             score += 0.2
         elif total_duration > 1800:  # More than 30 minutes
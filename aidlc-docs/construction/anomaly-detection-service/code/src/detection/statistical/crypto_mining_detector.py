@@ -10,6 +10,9 @@ from typing import List, Dict, Set, Optional
 from dataclasses import dataclass
 from collections import defaultdict
 
+from .port_scanning_detector import FlowLog
+from ...utils.network.ip_codec import IpCodec
+
 @dataclass
 class CryptoMiningAnomaly:
     anomaly_id: str
@@ -46,6 +49,7 @@ class CryptoMiningDetector:
             'stratum', 'pool', 'mining', 'mine', 'crypto',
             'btc', 'eth', 'xmr', 'monero', 'bitcoin', 'ethereum'
         }
+        self.ip_codec = IpCodec.shared()
     
     def detect(self, flow_logs: List[FlowLog]) -> List[CryptoMiningAnomaly]:
         """Detect crypto mining patterns in flow logs"""
@@ -77,7 +81,7 @@ class CryptoMiningDetector:
             
             # Check if destination matches mining patterns
             if self._is_potential_mining_destination(log.destination_ip, log.destination_port):
-                activity['mining_destinations'].add(f"{log.destination_ip}:{log.destination_port}")
+                activity['mining_destinations'].add((log.destination_ip, log.destination_port))
         
         # Evaluate each source for mining activity
         for source_ip, activity in source_activities.items():
@@ -91,10 +95,13 @@ class CryptoMiningDetector:
                 if validation_score > self.confidence_threshold:
                     mining_protocol = self._identify_mining_protocol(activity)
                     
+                    source = self.ip_codec.decode(source_ip)
                     anomaly = CryptoMiningAnomaly(
-                        anomaly_id=f"crypto_{source_ip}_{int(time.time())}",
-                        source_ip=source_ip,
-                        mining_pools=list(activity['mining_destinations']),
+                        anomaly_id=f"crypto_{source}_{int(time.time())}",
+                        source_ip=source,
+                        mining_pools=[
+                            f"{self.ip_codec.decode(ip)}:{port}" for ip, port in activity['mining_destinations']
+                        ],
                         connection_count=len(activity['connections']),
                         data_volume=activity['total_bytes'],
                         mining_protocol=mining_protocol,
@@ -104,7 +111,7 @@ class CryptoMiningDetector:
         
         return anomalies
     
-    def _is_potential_mining_destination(self, dest_ip: str, dest_port: int) -> bool:
+    def _is_potential_mining_destination(self, dest_ip: int, dest_port: int) -> bool:
         """Check if destination matches mining pool patterns"""
         # Check port patterns
         if dest_port in self.mining_ports:
@@ -112,7 +119,9 @@ class CryptoMiningDetector:
         
         # Check IP patterns (simplified - in real implementation, use threat intelligence)
         # This is a basic heuristic check
-        if any(pattern in dest_ip.lower() for pattern in self.mining_pool_patterns):
+        # Only non-address destinations (negative codes, e.g. hostnames) can contain the name patterns
+        if dest_ip < 0 and any(
+                pattern in self.ip_codec.decode(dest_ip).lower() for pattern in self.mining_pool_patterns):
             return True
         
         return False
@@ -154,14 +163,14 @@ class CryptoMiningDetector:
         # Group connections by destination
         dest_connections = defaultdict(list)
         for conn in connections:
-            dest_key = f"{conn['dest_ip']}:{conn['dest_port']}"
+            dest_key = (conn['dest_ip'], conn['dest_port'])
             dest_connections[dest_key].append(conn['timestamp'])
         
         max_duration = 0.0
         for dest, timestamps in dest_connections.items():
             if len(timestamps) > 1:
                 timestamps.sort()
-                duration = (timestamps[-1] - timestamps[0]).total_seconds()
+                duration = float(timestamps[-1] - timestamps[0])
                 max_duration = max(max_duration, duration)
         
         return max_duration
@@ -196,7 +205,7 @@ class CryptoMiningDetector:
             intervals = []
             timestamps.sort()
             for i in range(1, len(timestamps)):
-                interval = (timestamps[i] - timestamps[i-1]).total_seconds()
+                interval = float(timestamps[i] - timestamps[i-1])
                 intervals.append(interval)
             
             if intervals:
@@ -10,6 +10,9 @@ from typing import List, Dict, Set, Optional
 from dataclasses import dataclass
 from collections import defaultdict
 
+from .port_scanning_detector import FlowLog
+from ...utils.network.ip_codec import IpCodec
+
 @dataclass
 class DDoSAnomaly:
     anomaly_id: str
@@ -38,6 +41,7 @@ class DDoSDetector:
         self.high_threshold = high_threshold
         self.time_window = time_window
         self.confidence_threshold = confidence_threshold
+        self.ip_codec = IpCodec.shared()
     
     def detect(self, flow_logs: List[FlowLog]) -> List[DDoSAnomaly]:
         """Detect DDoS patterns in flow logs"""
@@ -45,7 +49,7 @@ class DDoSDetector:
         anomalies = []
         
         for log in flow_logs:
-            dest_key = f"{log.destination_ip}:{log.destination_port}"
+            dest_key = (log.destination_ip, log.destination_port)
             timestamp = log.timestamp
             
             if dest_key not in destination_traffic:
@@ -73,7 +77,7 @@ class DDoSDetector:
             })
             
             # Check for DDoS patterns
-            time_diff = (traffic['last_packet'] - traffic['first_packet']).total_seconds()
+            time_diff = float(traffic['last_packet'] - traffic['first_packet'])
             if time_diff > 0 and time_diff <= self.time_window:
                 
                 # Calculate packet rate
@@ -84,12 +88,13 @@ class DDoSDetector:
                     validation_score = self._validate_ddos_indicators(traffic, packet_rate)
                     
                     if validation_score > self.confidence_threshold:
-                        dest_ip, dest_port = dest_key.split(':')
+                        dest_code, dest_port = dest_key
+                        dest_ip = self.ip_codec.decode(dest_code)
                         
                         anomaly = DDoSAnomaly(
-                            anomaly_id=f"ddos_{dest_ip}_{dest_port}_{int(timestamp.timestamp())}",
+                            anomaly_id=f"ddos_{dest_ip}_{dest_port}_{timestamp}",
                             target_ip=dest_ip,
-                            target_port=int(dest_port),
+                            target_port=dest_port,
                             packet_rate=packet_rate,
                             source_count=len(traffic['source_ips']),
                             attack_type=self._classify_ddos_type(traffic),
@@ -169,7 +174,7 @@ class DDoSDetector:
         if len(timestamps) > 1:
             time_intervals = []
             for i in range(1, len(timestamps)):
-                interval = (timestamps[i] - timestamps[i-1]).total_seconds()
+                interval = float(timestamps[i] - timestamps[i-1])
                 time_intervals.append(interval)
             
             avg_interval = statistics.mean(time_intervals)
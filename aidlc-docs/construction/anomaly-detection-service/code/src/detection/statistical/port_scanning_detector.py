@@ -10,11 +10,13 @@ from typing import List, Dict, Set, Optional
 from dataclasses import dataclass
 from collections import defaultdict
 
+from ...utils.network.ip_codec import IpCodec
+
 @dataclass
 class FlowLog:
-    timestamp: datetime
-    source_ip: str
-    destination_ip: str
+    timestamp: int  # Epoch seconds (UTC)
+    source_ip: int  # IpCodec codes; decode only for output
+    destination_ip: int
     destination_port: int
     protocol: str
     action: str
@@ -44,6 +46,7 @@ class PortScanningDetector:
         self.port_threshold = port_threshold
         self.time_window = time_window
         self.confidence_threshold = confidence_threshold
+        self.ip_codec = IpCodec.shared()
         
     def detect(self, flow_logs: List[FlowLog]) -> List[PortScanAnomaly]:
         """Detect port scanning patterns in flow logs"""
@@ -76,19 +79,23 @@ class PortScanningDetector:
             })
             
             # Check if within time window and threshold exceeded
-            time_diff = (timestamp - candidate['first_seen']).total_seconds()
+            time_diff = float(timestamp - candidate['first_seen'])
             if time_diff <= self.time_window and len(candidate['unique_ports']) > self.port_threshold:
                 
                 # Multi-stage validation
                 validation_score = self._validate_port_scan_indicators(candidate)
                 if validation_score > self.confidence_threshold:
                     
+                    source = self.ip_codec.decode(source_ip)
                     anomaly = PortScanAnomaly(
-                        anomaly_id=f"ps_{source_ip}_{int(timestamp.timestamp())}",
-                        source_ip=source_ip,
+                        anomaly_id=f"ps_{source}_{timestamp}",
+                        source_ip=source,
                         unique_ports=len(candidate['unique_ports']),
                         time_window=time_diff,
-                        connections=candidate['connections'].copy(),
+                        connections=[
+                            dict(conn, dest_ip=self.ip_codec.decode(conn['dest_ip']))
+                            for conn in candidate['connections']
+                        ],
                         confidence_score=validation_score
                     )
                     anomalies.append(anomaly)
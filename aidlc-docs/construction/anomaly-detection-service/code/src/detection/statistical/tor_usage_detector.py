@@ -10,6 +10,9 @@ from typing import List, Dict, Set, Optional
 from dataclasses import dataclass
 from collections import defaultdict
 
+from .port_scanning_detector import FlowLog
+from ...utils.network.ip_codec import IpCodec, first_octet
+
 @dataclass
 class TorUsageAnomaly:
     anomaly_id: str
@@ -48,6 +51,7 @@ class TorUsageDetector:
             # This would be populated with known Tor exit nodes, relays, and bridges
             # For demo purposes, using pattern matching
         }
+        self.ip_codec = IpCodec.shared()
     
     def detect(self, flow_logs: List[FlowLog]) -> List[TorUsageAnomaly]:
         """Detect Tor usage patterns in flow logs"""
@@ -80,7 +84,7 @@ class TorUsageDetector:
             
             # Check if destination matches Tor patterns
             if self._is_potential_tor_node(log.destination_ip, log.destination_port):
-                activity['tor_destinations'].add(f"{log.destination_ip}:{log.destination_port}")
+                activity['tor_destinations'].add((log.destination_ip, log.destination_port))
         
         # Evaluate each source for Tor usage
         for source_ip, activity in source_activities.items():
@@ -93,10 +97,13 @@ class TorUsageDetector:
                 if validation_score > self.confidence_threshold:
                     connection_pattern = self._classify_tor_usage_pattern(activity)
                     
+                    source = self.ip_codec.decode(source_ip)
                     anomaly = TorUsageAnomaly(
-                        anomaly_id=f"tor_{source_ip}_{int(time.time())}",
-                        source_ip=source_ip,
-                        tor_nodes=list(activity['tor_destinations']),
+                        anomaly_id=f"tor_{source}_{int(time.time())}",
+                        source_ip=source,
+                        tor_nodes=[
+                            f"{self.ip_codec.decode(ip)}:{port}" for ip, port in activity['tor_destinations']
+                        ],
                         connection_count=len(activity['connections']),
                         tor_ports=activity['ports_used'].intersection(self.tor_ports),
                         connection_pattern=connection_pattern,
@@ -106,7 +113,7 @@ class TorUsageDetector:
         
         return anomalies
     
-    def _is_potential_tor_node(self, dest_ip: str, dest_port: int) -> bool:
+    def _is_potential_tor_node(self, dest_ip: int, dest_port: int) -> bool:
         """Check if destination matches Tor node patterns"""
         # Check port patterns
         if dest_port in self.tor_ports:
@@ -126,25 +133,16 @@ class TorUsageDetector:
         
         return False
     
-    def _looks_like_tor_bridge(self, dest_ip: str) -> bool:
+    def _looks_like_tor_bridge(self, dest_ip: int) -> bool:
         """Heuristic check for Tor bridge characteristics"""
         # In production, use threat intelligence feeds
         # For demo, using simple heuristics
         
         # Check if IP is in common cloud provider ranges (bridges often hosted there)
-        ip_parts = dest_ip.split('.')
-        if len(ip_parts) == 4:
-            try:
-                first_octet = int(ip_parts[0])
-                # Common cloud provider IP ranges (simplified)
-                if first_octet in {3, 13, 15, 18, 34, 35, 52, 54}:  # AWS, GCP ranges
-                    return True
-            except ValueError:
-                pass
-        
-        return False
+        # Common cloud provider IP ranges (simplified); first_octet is -1 for non-IPv4 codes
+        return first_octet(dest_ip) in {3, 13, 15, 18, 34, 35, 52, 54}  # AWS, GCP ranges
     
-    def _has_tor_characteristics(self, dest_ip: str) -> bool:
+    def _has_tor_characteristics(self, dest_ip: int) -> bool:
         """Check for Tor-like characteristics in IP"""
         # This would use threat intelligence in production
         # For demo, using basic heuristics
@@ -189,14 +187,14 @@ class TorUsageDetector:
         # Group connections by destination
         dest_connections = defaultdict(list)
         for conn in connections:
-            dest_key = f"{conn['dest_ip']}:{conn['dest_port']}"
+            dest_key = (conn['dest_ip'], conn['dest_port'])
             dest_connections[dest_key].append(conn['timestamp'])
         
         # Pattern 1: Rapid initial connections (circuit building)
         all_timestamps = sorted([conn['timestamp'] for conn in connections])
         if len(all_timestamps) >= 3:
             # Check if first 3 connections happen within 30 seconds
-            first_three_span = (all_timestamps[2] - all_timestamps[0]).total_seconds()
+            first_three_span = float(all_timestamps[2] - all_timestamps[0])
             if first_three_span <= 30:
                 score += 0.5
         
@@ -206,7 +204,7 @@ class TorUsageDetector:
                 timestamps.sort()
                 intervals = []
                 for i in range(1, len(timestamps)):
-                    interval = (timestamps[i] - timestamps[i-1]).total_seconds()
+                    interval = float(timestamps[i] - timestamps[i-1])
                     intervals.append(interval)
                 
                 # Check for regular intervals (Tor keep-alive)
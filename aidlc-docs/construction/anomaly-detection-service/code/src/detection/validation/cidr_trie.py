@@ -0,0 +1,171 @@
+"""
+CIDR Radix Trie
+Compiled longest-prefix-match lookup over IPv4 and IPv6 CIDR lists for whitelist validation.
+"""
+
+import ipaddress
+import socket
+from typing import Iterable, List, Optional, Tuple
+import logging
+
+try:
+    import numpy as np
+except ImportError:  # Batch lookups fall back to the scalar walk
+    np = None
+
+logger = logging.getLogger(__name__)
+
+# Node 0 is a sink whose children point back to itself, so array walks never branch
+_SINK = 0
+_ROOT = 1
+
+
+def parse_ip(ip: str) -> Optional[Tuple[int, int]]:
+    """Parse an address into (version, integer); None when invalid"""
+    try:
+        return 4, int.from_bytes(socket.inet_pton(socket.AF_INET, ip), 'big')
+    except (OSError, TypeError):
+        pass
+    try:
+        return 6, int.from_bytes(socket.inet_pton(socket.AF_INET6, ip.split('%', 1)[0]), 'big')
+    except (OSError, TypeError, AttributeError):
+        return None
+
+
+class _CompiledTrie:
+    """Binary trie for one address family stored as flat child/match arrays"""
+
+    def __init__(self, width: int):
+        self.width = width
+        self.children: List[List[int]] = [[_SINK, _SINK], [_SINK, _SINK]]
+        self.match: List[int] = [-1, -1]  # Index into CidrTrie.prefixes, -1 = none
+        self._np_children = None
+        self._np_match = None
+
+    def insert(self, value: int, prefix_len: int, prefix_index: int):
+        node = _ROOT
+        for depth in range(prefix_len):
+            bit = (value >> (self.width - 1 - depth)) & 1
+            child = self.children[node][bit]
+            if child == _SINK:
+                child = len(self.children)
+                self.children.append([_SINK, _SINK])
+                self.match.append(-1)
+                self.children[node][bit] = child
+            node = child
+        if self.match[node] == -1:
+            self.match[node] = prefix_index
+
+    def freeze(self):
+        if np is not None and self.width == 32:
+            self._np_children = np.asarray(self.children, dtype=np.int32)
+            self._np_match = np.asarray(self.match, dtype=np.int32)
+
+    def lookup(self, value: int) -> int:
+        """Index of the longest matching prefix, or -1"""
+        children = self.children
+        match = self.match
+        node = _ROOT
+        best = match[node]
+        shift = self.width - 1
+        while shift >= 0:
+            node = children[node][(value >> shift) & 1]
+            if node == _SINK:
+                break
+            if match[node] != -1:
+                best = match[node]
+            shift -= 1
+        return best
+
+    def lookup_array(self, values) -> 'np.ndarray':
+        """Vectorized walk for a uint32 array: one array step per bit"""
+        children = self._np_children
+        match = self._np_match
+        nodes = np.full(values.shape, _ROOT, dtype=np.int32)
+        best = np.full(values.shape, match[_ROOT], dtype=np.int32)
+        for shift in range(self.width - 1, -1, -1):
+            nodes = children[nodes, (values >> shift) & 1]
+            hit = match[nodes]
+            best = np.where(hit != -1, hit, best)
+            if not nodes.any():
+                break
+        return best
+
+
+class CidrTrie:
+    """Immutable longest-prefix-match set of CIDRs; rebuild and swap the reference to reload"""
+
+    def __init__(self, cidrs: Iterable[str] = ()):
+        self.prefixes: List[str] = []
+        self.invalid: List[str] = []
+        self._tries = {4: _CompiledTrie(32), 6: _CompiledTrie(128)}
+
+        for cidr in cidrs:
+            try:
+                network = ipaddress.ip_network(str(cidr).strip(), strict=False)
+            except ValueError:
+                self.invalid.append(cidr)
+                continue
+            self._tries[network.version].insert(
+                int(network.network_address), network.prefixlen, len(self.prefixes)
+            )
+            self.prefixes.append(str(cidr).strip())
+
+        for trie in self._tries.values():
+            trie.freeze()
+
+        if self.invalid:
+            logger.warning(f"Ignored {len(self.invalid)} invalid CIDR entries: {self.invalid[:5]}")
+
+    def __len__(self) -> int:
+        return len(self.prefixes)
+
+    def lookup(self, ip: str) -> Optional[str]:
+        """Longest matching CIDR for ip, or None"""
+        parsed = parse_ip(ip) if ip else None
+        if parsed is None or not self.prefixes:
+            return None
+        index = self._tries[parsed[0]].lookup(parsed[1])
+        return self.prefixes[index] if index != -1 else None
+
+    def __contains__(self, ip: str) -> bool:
+        return self.lookup(ip) is not None
+
+    def lookup_batch(self, ips: List[str]) -> List[Optional[str]]:
+        """Longest matching CIDR for each ip; IPv4 addresses are walked as one array when numpy is available"""
+        results: List[Optional[str]] = [None] * len(ips)
+        if not self.prefixes:
+            return results
+
+        v4_positions, v4_values = [], []
+        for i, ip in enumerate(ips):
+            parsed = parse_ip(ip) if ip else None
+            if parsed is None:
+                continue
+            version, value = parsed
+            if version == 4 and np is not None:
+                v4_positions.append(i)
+                v4_values.append(value)
+            else:
+                index = self._tries[version].lookup(value)
+                if index != -1:
+                    results[i] = self.prefixes[index]
+
+        if v4_positions:
+            indexes = self._tries[4].lookup_array(np.asarray(v4_values, dtype=np.uint32))
+            for position, index in zip(v4_positions, indexes.tolist()):
+                if index != -1:
+                    results[position] = self.prefixes[index]
+
+        return results
+
+    def match_parsed(self, v4_values: 'np.ndarray', v4_mask: 'np.ndarray',
+                     v6_rows: Iterable[Tuple[int, int]]) -> 'np.ndarray':
+        """Boolean match mask for pre-parsed addresses: a uint32 column for IPv4 rows plus (position, value) IPv6 pairs"""
+        if not self.prefixes:
+            return np.zeros(len(v4_values), dtype=bool)
+        matched = (self._tries[4].lookup_array(v4_values) != -1) & v4_mask
+        v6_trie = self._tries[6]
+        for row, value in v6_rows:
+            matched[row] = v6_trie.lookup(value) != -1
+        return matched
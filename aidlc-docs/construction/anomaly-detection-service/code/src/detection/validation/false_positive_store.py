@@ -0,0 +1,216 @@
+"""
+Historical False Positive Store
+SQLite-backed decayed verdict counters per (source_ip, threat_type) with an in-process cache.
+"""
+
+import math
+import os
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+import logging
+
+from ...infrastructure.cache.local_cache import LocalLRUCache
+
+# SQLite's default host-parameter limit is 999; two parameters per pair
+_LOOKUP_CHUNK = 400
+
+
+class FalsePositiveStore:
+    """Exponentially decayed analyst verdict counters used for Stage 4 validation"""
+
+    def __init__(self, config: Optional[Dict[str, Any]] = None):
+        config = config or {}
+        self.logger = logging.getLogger(__name__)
+
+        # Decay and smoothing: with no verdicts the rate equals prior_rate
+        self.half_life = config.get('half_life_seconds', 7 * 24 * 3600)
+        self.prior_rate = config.get('prior_rate', 0.02)
+        self.prior_weight = config.get('prior_weight', 10.0)
+
+        # db_path wins; otherwise a file in the configured data directory, else nothing touches disk
+        directory = config.get('directory')
+        self.db_path = config.get('db_path') or (
+            os.path.join(directory, 'false_positive_history.db') if directory else ':memory:'
+        )
+        if self.db_path != ':memory:':
+            os.makedirs(os.path.dirname(os.path.abspath(self.db_path)), exist_ok=True)
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(self.db_path, check_same_thread=False, isolation_level=None)
+        self._initialize_schema()
+
+        # Cache raw (fp, tp, updated_at) counters; decay is applied at read time
+        self.cache = LocalLRUCache(
+            max_entries=config.get('cache_max_entries', 100000),
+            ttl=config.get('cache_ttl', 60)
+        )
+
+        self.stats = {'lookups': 0, 'db_queries': 0, 'verdicts_recorded': 0}
+
+    def _initialize_schema(self):
+        with self._lock:
+            if self.db_path != ':memory:':
+                self._connection.execute("PRAGMA journal_mode=WAL")
+                self._connection.execute("PRAGMA synchronous=NORMAL")
+            self._connection.execute("""
+                CREATE TABLE IF NOT EXISTS fp_counters (
+                    source_ip TEXT NOT NULL,
+                    threat_type TEXT NOT NULL,
+                    fp_count REAL NOT NULL,
+                    tp_count REAL NOT NULL,
+                    updated_at REAL NOT NULL,
+                    PRIMARY KEY (source_ip, threat_type)
+                ) WITHOUT ROWID
+            """)
+
+    def _decay_factor(self, elapsed: float) -> float:
+        if elapsed <= 0 or not self.half_life:
+            return 1.0
+        return math.pow(0.5, elapsed / self.half_life)
+
+    def _rate(self, counters: Tuple[float, float, float], now: float) -> float:
+        fp_count, tp_count, updated_at = counters
+        factor = self._decay_factor(now - updated_at)
+        fp_count *= factor
+        tp_count *= factor
+        return (fp_count + self.prior_rate * self.prior_weight) / (fp_count + tp_count + self.prior_weight)
+
+    def get_rate(self, source_ip: str, threat_type: str) -> float:
+        """Decayed false positive rate for one (source_ip, threat_type)"""
+        return self.get_rates([(source_ip, threat_type)])[(source_ip, threat_type)]
+
+    def get_rates(self, pairs: Iterable[Tuple[str, str]]) -> Dict[Tuple[str, str], float]:
+        """Decayed false positive rates for many pairs with at most one query per chunk of cache misses"""
+        now = time.time()
+        unique_pairs = list(dict.fromkeys(pairs))
+        self.stats['lookups'] += len(unique_pairs)
+        counters: Dict[Tuple[str, str], Tuple[float, float, float]] = self.cache.get_many(unique_pairs)
+        missing = [pair for pair in unique_pairs if pair not in counters]
+
+        if missing:
+            fetched = self._fetch_counters(missing)
+            for pair in missing:
+                # Pairs without history are cached too, so repeat lookups skip SQLite
+                value = fetched.get(pair, (0.0, 0.0, now))
+                self.cache.set(pair, value)
+                counters[pair] = value
+
+        return {pair: self._rate(value, now) for pair, value in counters.items()}
+
+    def _fetch_counters(self, pairs: List[Tuple[str, str]]) -> Dict[Tuple[str, str], Tuple[float, float, float]]:
+        try:
+            with self._lock:
+                results = self._fetch_counters_locked(pairs)
+            self.stats['db_queries'] += math.ceil(len(pairs) / _LOOKUP_CHUNK)
+            return results
+        except Exception as e:
+            self.logger.error(f"Failed to fetch false positive counters: {e}")
+            return {}
+
+    def record_verdict(self, source_ip: str, threat_type: str, is_false_positive: bool,
+                       timestamp: Optional[float] = None) -> bool:
+        """Record one analyst verdict"""
+        return self.record_verdicts([(source_ip, threat_type, is_false_positive, timestamp)]) == 1
+
+    def record_verdicts(self, verdicts: Iterable[Tuple[str, str, bool, Optional[float]]]) -> int:
+        """Fold analyst verdicts into the decayed counters in a single transaction"""
+        now = time.time()
+        updates: Dict[Tuple[str, str], List[Tuple[bool, float]]] = {}
+        for source_ip, threat_type, is_false_positive, timestamp in verdicts:
+            updates.setdefault((source_ip, threat_type), []).append((is_false_positive, timestamp or now))
+
+        if not updates:
+            return 0
+
+        try:
+            with self._lock:
+                self._connection.execute("BEGIN")
+                try:
+                    existing = self._fetch_counters_locked(list(updates))
+                    rows = []
+                    for pair, pair_verdicts in updates.items():
+                        fp_count, tp_count, updated_at = existing.get(pair, (0.0, 0.0, 0.0))
+                        for is_false_positive, timestamp in sorted(pair_verdicts, key=lambda v: v[1]):
+                            # Decay forward to the verdict time; late verdicts are decayed back instead
+                            if timestamp >= updated_at:
+                                factor = self._decay_factor(timestamp - updated_at)
+                                fp_count, tp_count, updated_at = fp_count * factor, tp_count * factor, timestamp
+                                weight = 1.0
+                            else:
+                                weight = self._decay_factor(updated_at - timestamp)
+                            if is_false_positive:
+                                fp_count += weight
+                            else:
+                                tp_count += weight
+                        rows.append((pair[0], pair[1], fp_count, tp_count, updated_at))
+                        self.cache.set(pair, (fp_count, tp_count, updated_at))
+
+                    self._connection.executemany(
+                        "INSERT OR REPLACE INTO fp_counters (source_ip, threat_type, fp_count, tp_count, updated_at) "
+                        "VALUES (?, ?, ?, ?, ?)",
+                        rows
+                    )
+                    self._connection.execute("COMMIT")
+                except Exception:
+                    self._connection.execute("ROLLBACK")
+                    raise
+
+            recorded = sum(len(v) for v in updates.values())
+            self.stats['verdicts_recorded'] += recorded
+            return recorded
+
+        except Exception as e:
+            self.logger.error(f"Failed to record analyst verdicts: {e}")
+            for pair in updates:
+                self.cache.invalidate(pair)
+            return 0
+
+    def _fetch_counters_locked(self, pairs: List[Tuple[str, str]]) -> Dict[Tuple[str, str], Tuple[float, float, float]]:
+        results = {}
+        for start in range(0, len(pairs), _LOOKUP_CHUNK):
+            chunk = pairs[start:start + _LOOKUP_CHUNK]
+            placeholders = ','.join(['(?, ?)'] * len(chunk))
+            rows = self._connection.execute(
+                f"SELECT source_ip, threat_type, fp_count, tp_count, updated_at FROM fp_counters "
+                f"WHERE (source_ip, threat_type) IN (VALUES {placeholders})",
+                [value for pair in chunk for value in pair]
+            ).fetchall()
+            for source_ip, threat_type, fp_count, tp_count, updated_at in rows:
+                results[(source_ip, threat_type)] = (fp_count, tp_count, updated_at)
+        return results
+
+    def prune(self, min_weight: float = 0.01) -> int:
+        """Delete pairs whose decayed verdict weight has fallen below min_weight"""
+        now = time.time()
+        try:
+            with self._lock:
+                rows = self._connection.execute(
+                    "SELECT source_ip, threat_type, fp_count + tp_count, updated_at FROM fp_counters"
+                ).fetchall()
+                stale = [
+                    (source_ip, threat_type) for source_ip, threat_type, total, updated_at in rows
+                    if total * self._decay_factor(now - updated_at) < min_weight
+                ]
+                self._connection.executemany(
+                    "DELETE FROM fp_counters WHERE source_ip = ? AND threat_type = ?", stale
+                )
+            for pair in stale:
+                self.cache.invalidate(pair)
+            return len(stale)
+        except Exception as e:
+            self.logger.error(f"Failed to prune false positive counters: {e}")
+            return 0
+
+    def get_statistics(self) -> Dict[str, Any]:
+        """Store size, query counts and cache hit ratio"""
+        try:
+            with self._lock:
+                tracked_pairs = self._connection.execute("SELECT COUNT(*) FROM fp_counters").fetchone()[0]
+        except Exception:
+            tracked_pairs = None
+        return dict(self.stats, tracked_pairs=tracked_pairs, cache=self.cache.get_statistics())
+
+    def close(self):
+        with self._lock:
+            self._connection.close()
@@ -0,0 +1,86 @@
+"""
+Threat Validation Rules
+Default threat-specific minimums and the metric checks evaluated by both the per-group and batch validators.
+"""
+
+from typing import Any, Callable, Dict, NamedTuple, Optional, Tuple
+
+DEFAULT_THREAT_VALIDATION_RULES = {
+    'PORT_SCANNING': {
+        'min_ports': 10,
+        'max_false_positive_rate': 0.03,
+        'require_multiple_destinations': True
+    },
+    'DDOS': {
+        'min_packet_rate': 500,
+        'min_source_diversity': 5,
+        'max_false_positive_rate': 0.02
+    },
+    'C2_BEACONING': {
+        'min_regularity': 0.8,
+        'min_duration': 300,  # 5 minutes
+        'max_false_positive_rate': 0.04
+    },
+    'CRYPTO_MINING': {
+        'min_connection_duration': 60,
+        'min_data_volume': 1024,
+        'max_false_positive_rate': 0.05
+    },
+    'TOR_USAGE': {
+        'min_tor_indicators': 2,
+        'max_false_positive_rate': 0.03
+    }
+}
+
+# Stage 2: port scans inside business hours below this confidence look like legitimate network scanning
+BUSINESS_HOURS_MIN_PORT_SCAN_CONFIDENCE = 0.9
+
+# Stage 4: repetition above this score suggests a false positive
+MAX_PATTERN_REPETITION = 0.8
+DEFAULT_PATTERN_REPETITION = 0.3
+
+
+def _regularity(coefficient_variation: float) -> float:
+    """Convert a coefficient of variation (percent) to a regularity score"""
+    return 1.0 - (coefficient_variation / 100.0)
+
+
+class MetricCheck(NamedTuple):
+    """One stage 3 minimum: the anomaly attribute, its conversion to the compared value and the rule it must reach"""
+    attribute: str
+    default: Any
+    rule_key: str
+    message: str
+    convert: Optional[Callable[[Any], float]] = None
+
+    def measure(self, anomaly: Any) -> Any:
+        value = getattr(anomaly, self.attribute, self.default)
+        return self.convert(value) if self.convert else value
+
+    def failure(self, value: Any, minimum: Any) -> str:
+        return self.message.format(value=value, minimum=minimum)
+
+
+THREAT_METRIC_CHECKS: Dict[str, Tuple[MetricCheck, ...]] = {
+    'PORT_SCANNING': (
+        MetricCheck('unique_ports', 0, 'min_ports', "Port scanning: insufficient ports ({value} < {minimum})"),
+    ),
+    'DDOS': (
+        MetricCheck('packet_rate', 0, 'min_packet_rate', "DDoS: insufficient packet rate ({value} < {minimum})"),
+        MetricCheck('source_count', 0, 'min_source_diversity',
+                    "DDoS: insufficient source diversity ({value} < {minimum})")
+    ),
+    'C2_BEACONING': (
+        MetricCheck('coefficient_variation', 100, 'min_regularity',
+                    "C2 beaconing: insufficient regularity ({value:.2f} < {minimum})", _regularity),
+    ),
+    'CRYPTO_MINING': (
+        MetricCheck('data_volume', 0, 'min_data_volume', "Crypto mining: insufficient data volume ({value} < {minimum})"),
+    ),
+    'TOR_USAGE': (
+        MetricCheck('tor_nodes', [], 'min_tor_indicators', "Tor usage: insufficient indicators ({value} < {minimum})",
+                    len),
+    )
+}
+
+MAX_CHECKS_PER_THREAT = max(len(checks) for checks in THREAT_METRIC_CHECKS.values())
@@ -3,6 +3,7 @@ Multi-Stage Validation Engine
 Validates anomalies through multiple stages to achieve <5% false positive rate.
 """
 
+import ipaddress
 import json
 from datetime import datetime, timedelta
 from typing import List, Dict, Set, Optional, Any, Tuple
@@ -10,6 +11,27 @@ from dataclasses import dataclass
 from collections import defaultdict
 import logging
 
+from .cidr_trie import CidrTrie
+from .false_positive_store import FalsePositiveStore
+from .batch_validator import BatchValidator
+from .threat_rules import (
+    BUSINESS_HOURS_MIN_PORT_SCAN_CONFIDENCE, DEFAULT_PATTERN_REPETITION, DEFAULT_THREAT_VALIDATION_RULES,
+    MAX_PATTERN_REPETITION, THREAT_METRIC_CHECKS
+)
+
+# Base severity by threat type, and severity scale used for final assessment
+THREAT_SEVERITY_MAP = {
+    'DDOS': 'HIGH',
+    'C2_BEACONING': 'HIGH',
+    'PORT_SCANNING': 'MEDIUM',
+    'CRYPTO_MINING': 'MEDIUM',
+    'TOR_USAGE': 'LOW',
+    'ML_BEHAVIORAL_ANOMALY': 'MEDIUM',
+    'BEHAVIORAL_DEVIATION': 'LOW'
+}
+SEVERITY_LEVELS = ['LOW', 'MEDIUM', 'HIGH', 'CRITICAL']
+SEVERITY_SCORES = {'LOW': 2, 'MEDIUM': 5, 'HIGH': 8, 'CRITICAL': 10}
+
 @dataclass
 class ValidationResult:
     is_valid: bool
@@ -39,10 +61,14 @@ class MultiStageValidationEngine:
         self.min_confidence_threshold = config.get('min_confidence', 0.8)
         self.false_positive_threshold = config.get('false_positive_threshold', 0.05)
         
-        # Whitelist configurations
-        self.whitelisted_ips = set(config.get('whitelisted_ips', []))
-        self.whitelisted_subnets = set(config.get('whitelisted_subnets', []))
-        self.trusted_domains = set(config.get('trusted_domains', []))
+        # Whitelist configurations (subnets compiled into a longest-prefix-match trie)
+        self.reload_whitelists(config)
+        
+        # Decayed per-(source_ip, threat_type) false positive history from analyst verdicts
+        self.fp_store = FalsePositiveStore(config.get('false_positive_store', {}))
+        
+        # Vectorized stage evaluation for large batches
+        self.batch_validator = BatchValidator(self)
         
         # Business hours and context
         self.business_hours = config.get('business_hours', {'start': 8, 'end': 18})
@@ -50,38 +76,37 @@ class MultiStageValidationEngine:
         
         # Threat-specific validation rules
         self.threat_validation_rules = {
-            'PORT_SCANNING': {
-                'min_ports': 10,
-                'max_false_positive_rate': 0.03,
-                'require_multiple_destinations': True
-            },
-            'DDOS': {
-                'min_packet_rate': 500,
-                'min_source_diversity': 5,
-                'max_false_positive_rate': 0.02
-            },
-            'C2_BEACONING': {
-                'min_regularity': 0.8,
-                'min_duration': 300,  # 5 minutes
-                'max_false_positive_rate': 0.04
-            },
-            'CRYPTO_MINING': {
-                'min_connection_duration': 60,
-                'min_data_volume': 1024,
-                'max_false_positive_rate': 0.05
-            },
-            'TOR_USAGE': {
-                'min_tor_indicators': 2,
-                'max_false_positive_rate': 0.03
-            }
+            threat_type: dict(rules) for threat_type, rules in DEFAULT_THREAT_VALIDATION_RULES.items()
         }
     
+    def reload_whitelists(self, config: Dict[str, Any]):
+        """Rebuild whitelists from config and swap them in atomically"""
+        subnet_trie = CidrTrie(config.get('whitelisted_subnets', []))
+        whitelisted_ips = set(config.get('whitelisted_ips', []))
+        trusted_domains = set(config.get('trusted_domains', []))
+        
+        # Single attribute assignments; readers see either the old or the new trie
+        self.whitelisted_ips = whitelisted_ips
+        self.whitelisted_subnets = set(subnet_trie.prefixes)
+        self.trusted_domains = trusted_domains
+        self.subnet_trie = subnet_trie
+        
+        self.logger.info(f"Loaded whitelists: {len(whitelisted_ips)} IPs, {len(subnet_trie)} subnets")
+    
+    def lookup_whitelisted_subnets(self, ips: List[str]) -> Dict[str, Optional[str]]:
+        """Batch longest-prefix whitelist lookup, mapping each IP to its matching subnet or None"""
+        unique_ips = list(dict.fromkeys(ip for ip in ips if ip))
+        return dict(zip(unique_ips, self.subnet_trie.lookup_batch(unique_ips)))
+    
     def validate_correlation_groups(self, correlation_groups: List[Any]) -> List[ValidatedAnomaly]:
         """Apply multi-stage validation to correlation groups"""
         validated_anomalies = []
         
+        # Resolve whitelist matches and historical FP rates for all groups in one batch each
+        lookups = self._batch_lookups(correlation_groups)
+        
         for group in correlation_groups:
-            validation_result = self._apply_multistage_validation(group)
+            validation_result = self._apply_multistage_validation(group, lookups)
             
             if validation_result.is_valid:
                 group_confidence = self._calculate_group_confidence(group)
@@ -99,14 +124,43 @@ class MultiStageValidationEngine:
         
         return validated_anomalies
     
-    def _apply_multistage_validation(self, group: Any) -> ValidationResult:
+    def validate_correlation_groups_batch(self, correlation_groups: List[Any]) -> List[ValidatedAnomaly]:
+        """Same results as validate_correlation_groups, with stages evaluated as vectorized masks"""
+        if not self.batch_validator.available():
+            return self.validate_correlation_groups(correlation_groups)
+        return self.batch_validator.validate(correlation_groups)
+    
+    def _batch_lookups(self, correlation_groups: List[Any], source_ips: Optional[List[str]] = None,
+                       threat_types: Optional[List[str]] = None) -> Dict[str, Dict]:
+        """Batched per-group lookups shared by the validation stages"""
+        if source_ips is None:
+            source_ips = [getattr(group.primary_anomaly, 'source_ip', None) for group in correlation_groups]
+        if threat_types is None:
+            threat_types = [getattr(group.primary_anomaly, 'threat_type', 'UNKNOWN') for group in correlation_groups]
+        fp_pairs = [
+            (source_ip, threat_type)
+            for source_ip, threat_type in zip(source_ips, threat_types) if source_ip
+        ]
+        
+        return {
+            'subnet_matches': self.lookup_whitelisted_subnets(source_ips),
+            'fp_rates': self.fp_store.get_rates(fp_pairs)
+        }
+    
+    def record_analyst_verdict(self, source_ip: str, threat_type: str, is_false_positive: bool) -> bool:
+        """Feed an analyst verdict into the historical false positive store"""
+        return self.fp_store.record_verdict(source_ip, threat_type, is_false_positive)
+    
+    def _apply_multistage_validation(self, group: Any,
+                                     lookups: Optional[Dict[str, Dict]] = None) -> ValidationResult:
         """Apply multi-stage validation process"""
         validation_stages = {}
         failure_reasons = []
         validation_metadata = {}
+        lookups = lookups or {}
         
         # Stage 1: Whitelist validation
-        stage1_result = self._stage1_whitelist_validation(group)
+        stage1_result = self._stage1_whitelist_validation(group, lookups.get('subnet_matches'))
         validation_stages['whitelist'] = stage1_result['passed']
         if not stage1_result['passed']:
             failure_reasons.extend(stage1_result['reasons'])
@@ -127,7 +181,7 @@ class MultiStageValidationEngine:
         validation_metadata['threat_specific'] = stage3_result['metadata']
         
         # Stage 4: Historical pattern validation
-        stage4_result = self._stage4_historical_validation(group)
+        stage4_result = self._stage4_historical_validation(group, lookups.get('fp_rates'))
         validation_stages['historical'] = stage4_result['passed']
         if not stage4_result['passed']:
             failure_reasons.extend(stage4_result['reasons'])
@@ -145,7 +199,8 @@ class MultiStageValidationEngine:
             validation_metadata=validation_metadata
         )
     
-    def _stage1_whitelist_validation(self, group: Any) -> Dict[str, Any]:
+    def _stage1_whitelist_validation(self, group: Any,
+                                     subnet_matches: Optional[Dict[str, Optional[str]]] = None) -> Dict[str, Any]:
         """Stage 1: Whitelist and trusted entity validation"""
         result = {'passed': True, 'reasons': [], 'metadata': {}}
         
@@ -158,11 +213,14 @@ class MultiStageValidationEngine:
                 result['passed'] = False
                 result['reasons'].append(f"Source IP {source_ip} is whitelisted")
             
-            # Check subnet whitelist
-            for subnet in self.whitelisted_subnets:
-                if self._ip_in_subnet(source_ip, subnet):
-                    result['passed'] = False
-                    result['reasons'].append(f"Source IP {source_ip} in whitelisted subnet {subnet}")
+            # Check subnet whitelist (longest-prefix match, independent of list size)
+            if subnet_matches is not None and source_ip in subnet_matches:
+                subnet = subnet_matches[source_ip]
+            else:
+                subnet = self.subnet_trie.lookup(source_ip)
+            if subnet:
+                result['passed'] = False
+                result['reasons'].append(f"Source IP {source_ip} in whitelisted subnet {subnet}")
         
         # Check destination whitelist
         dest_ip = getattr(primary_anomaly, 'destination_ip', getattr(primary_anomaly, 'target_ip', None))
@@ -204,7 +262,7 @@ class MultiStageValidationEngine:
         if threat_type == 'PORT_SCANNING' and is_business_hours and not is_weekend:
             # Port scanning during business hours might be legitimate network scanning
             confidence = getattr(primary_anomaly, 'confidence_score', 1.0)
-            if confidence < 0.9:  # Lower confidence during business hours
+            if confidence < BUSINESS_HOURS_MIN_PORT_SCAN_CONFIDENCE:
                 result['passed'] = False
                 result['reasons'].append("Port scanning during business hours with low confidence")
         
@@ -231,51 +289,18 @@ class MultiStageValidationEngine:
         rules = self.threat_validation_rules[threat_type]
         result['metadata']['validation_rule'] = threat_type
         
-        # Apply threat-specific validation
-        if threat_type == 'PORT_SCANNING':
-            unique_ports = getattr(primary_anomaly, 'unique_ports', 0)
-            if unique_ports < rules['min_ports']:
+        # Apply threat-specific minimums
+        for check in THREAT_METRIC_CHECKS.get(threat_type, ()):
+            value = check.measure(primary_anomaly)
+            minimum = rules[check.rule_key]
+            if value < minimum:
                 result['passed'] = False
-                result['reasons'].append(f"Port scanning: insufficient ports ({unique_ports} < {rules['min_ports']})")
-        
-        elif threat_type == 'DDOS':
-            packet_rate = getattr(primary_anomaly, 'packet_rate', 0)
-            source_count = getattr(primary_anomaly, 'source_count', 0)
-            
-            if packet_rate < rules['min_packet_rate']:
-                result['passed'] = False
-                result['reasons'].append(f"DDoS: insufficient packet rate ({packet_rate} < {rules['min_packet_rate']})")
-            
-            if source_count < rules['min_source_diversity']:
-                result['passed'] = False
-                result['reasons'].append(f"DDoS: insufficient source diversity ({source_count} < {rules['min_source_diversity']})")
-        
-        elif threat_type == 'C2_BEACONING':
-            cv = getattr(primary_anomaly, 'coefficient_variation', 100)
-            connection_count = getattr(primary_anomaly, 'connection_count', 0)
-            
-            regularity = 1.0 - (cv / 100.0)  # Convert CV to regularity score
-            if regularity < rules['min_regularity']:
-                result['passed'] = False
-                result['reasons'].append(f"C2 beaconing: insufficient regularity ({regularity:.2f} < {rules['min_regularity']})")
-        
-        elif threat_type == 'CRYPTO_MINING':
-            connection_count = getattr(primary_anomaly, 'connection_count', 0)
-            data_volume = getattr(primary_anomaly, 'data_volume', 0)
-            
-            if data_volume < rules['min_data_volume']:
-                result['passed'] = False
-                result['reasons'].append(f"Crypto mining: insufficient data volume ({data_volume} < {rules['min_data_volume']})")
-        
-        elif threat_type == 'TOR_USAGE':
-            tor_nodes = getattr(primary_anomaly, 'tor_nodes', [])
-            if len(tor_nodes) < rules['min_tor_indicators']:
-                result['passed'] = False
-                result['reasons'].append(f"Tor usage: insufficient indicators ({len(tor_nodes)} < {rules['min_tor_indicators']})")
+                result['reasons'].append(check.failure(value, minimum))
         
         return result
     
-    def _stage4_historical_validation(self, group: Any) -> Dict[str, Any]:
+    def _stage4_historical_validation(self, group: Any,
+                                      fp_rates: Optional[Dict[Tuple[str, str], float]] = None) -> Dict[str, Any]:
         """Stage 4: Historical pattern and false positive validation"""
         result = {'passed': True, 'reasons': [], 'metadata': {}}
         
@@ -285,7 +310,10 @@ class MultiStageValidationEngine:
         
         # Check historical false positive rate for this source
         if source_ip:
-            historical_fp_rate = self._get_historical_false_positive_rate(source_ip, threat_type)
+            if fp_rates is not None and (source_ip, threat_type) in fp_rates:
+                historical_fp_rate = fp_rates[(source_ip, threat_type)]
+            else:
+                historical_fp_rate = self._get_historical_false_positive_rate(source_ip, threat_type)
             
             if threat_type in self.threat_validation_rules:
                 max_fp_rate = self.threat_validation_rules[threat_type]['max_false_positive_rate']
@@ -298,7 +326,7 @@ class MultiStageValidationEngine:
         
         # Check for repeated patterns that might indicate false positives
         pattern_score = self._analyze_pattern_repetition(group)
-        if pattern_score > 0.8:  # High repetition might indicate false positive
+        if pattern_score > MAX_PATTERN_REPETITION:  # High repetition might indicate false positive
             result['passed'] = False
             result['reasons'].append(f"High pattern repetition score ({pattern_score:.2f})")
         
@@ -362,17 +390,7 @@ class MultiStageValidationEngine:
         threat_type = getattr(primary_anomaly, 'threat_type', 'UNKNOWN')
         
         # Base severity from threat type
-        threat_severity_map = {
-            'DDOS': 'HIGH',
-            'C2_BEACONING': 'HIGH',
-            'PORT_SCANNING': 'MEDIUM',
-            'CRYPTO_MINING': 'MEDIUM',
-            'TOR_USAGE': 'LOW',
-            'ML_BEHAVIORAL_ANOMALY': 'MEDIUM',
-            'BEHAVIORAL_DEVIATION': 'LOW'
-        }
-        
-        base_severity = threat_severity_map.get(threat_type, 'LOW')
+        base_severity = THREAT_SEVERITY_MAP.get(threat_type, 'LOW')
         
         # Adjust based on confidence and correlation
         if confidence > 0.9:
@@ -388,7 +406,7 @@ class MultiStageValidationEngine:
             severity_modifier += 1
         
         # Final severity calculation
-        severity_levels = ['LOW', 'MEDIUM', 'HIGH', 'CRITICAL']
+        severity_levels = SEVERITY_LEVELS
         base_index = severity_levels.index(base_severity)
         final_index = max(0, min(len(severity_levels) - 1, base_index + severity_modifier))
         final_severity = severity_levels[final_index]
@@ -404,8 +422,7 @@ class MultiStageValidationEngine:
     
     def _calculate_priority(self, severity: str, confidence: float) -> int:
         """Calculate numeric priority (1-10, higher = more urgent)"""
-        severity_scores = {'LOW': 2, 'MEDIUM': 5, 'HIGH': 8, 'CRITICAL': 10}
-        base_score = severity_scores.get(severity, 1)
+        base_score = SEVERITY_SCORES.get(severity, 1)
         
         # Adjust by confidence
         confidence_modifier = int((confidence - 0.5) * 4)  # -2 to +2
@@ -413,30 +430,24 @@ class MultiStageValidationEngine:
         return max(1, min(10, base_score + confidence_modifier))
     
     def _ip_in_subnet(self, ip: str, subnet: str) -> bool:
-        """Check if IP is in subnet (simplified)"""
+        """Check if IP is in subnet (any prefix length, IPv4 or IPv6)"""
         try:
-            if '/' not in subnet:
-                return ip == subnet
-            
-            network, prefix = subnet.split('/')
-            prefix = int(prefix)
-            
-            # Simple /24 subnet check for demo
-            if prefix == 24:
-                return ip.rsplit('.', 1)[0] == network.rsplit('.', 1)[0]
-            
-            return False
-        except Exception:
+            return ipaddress.ip_address(ip) in ipaddress.ip_network(subnet, strict=False)
+        except ValueError:
             return False
     
     def _get_historical_false_positive_rate(self, source_ip: str, threat_type: str) -> float:
-        """Get historical false positive rate (simplified implementation)"""
-        # In production, this would query historical data
-        # For demo, return simulated rates
-        return 0.02  # 2% default false positive rate
+        """Get decayed historical false positive rate (prior rate when no verdicts exist)"""
+        return self.fp_store.get_rate(source_ip, threat_type)
     
     def _analyze_pattern_repetition(self, group: Any) -> float:
         """Analyze pattern repetition to detect potential false positives"""
         # Simplified pattern analysis
         # In production, this would analyze detailed patterns
-        return 0.3  # Default low repetition score
\ No newline at end of file
+        return DEFAULT_PATTERN_REPETITION  # Default low repetition score
+    
+    def _analyze_pattern_repetition_batch(self, groups: List[Any]) -> List[float]:
+        """Pattern repetition scores for a batch; overrides of the per-group analysis are honoured"""
+        if type(self)._analyze_pattern_repetition is not MultiStageValidationEngine._analyze_pattern_repetition:
+            return [self._analyze_pattern_repetition(group) for group in groups]
+        return [DEFAULT_PATTERN_REPETITION] * len(groups)
\ No newline at end of file
@@ -3,15 +3,23 @@ ElastiCache Correlation State Manager
 Manages distributed correlation state using Amazon ElastiCache Redis.
 """
 
-import redis
+import asyncio
+import redis.asyncio as aioredis
 import json
 import time
 from datetime import datetime, timedelta
-from typing import Dict, List, Optional, Any, Set
+from typing import Dict, List, Optional, Any, Set, AsyncIterator, Tuple
 from dataclasses import dataclass, asdict
 import logging
 import boto3
 
+from ..cache.state_codec import get_codec, decode_value
+from ..cache.local_cache import LocalLRUCache
+from ..cache.sharding import RedisShardSet, shard_configs_from
+from ...utils.concurrency.event_loop_thread import EventLoopThread
+
+L1_INVALIDATION_MODES = ('keyspace', 'version', 'none')
+
 @dataclass
 class CacheClusterInfo:
     cluster_id: str
@@ -21,7 +29,9 @@ class CacheClusterInfo:
     node_count: int
     cache_node_type: str
 
-class ElastiCacheManager:
+class AsyncElastiCacheManager:
+    """asyncio-native ElastiCache state manager on redis.asyncio"""
+    
     def __init__(self, config: Dict[str, Any]):
         self.config = config
         self.logger = logging.getLogger(__name__)
@@ -38,14 +48,18 @@ class ElastiCacheManager:
             'host': config.get('redis_host'),
             'port': config.get('redis_port', 6379),
             'db': config.get('redis_db', 0),
-            'decode_responses': True,
+            # Values are codec-tagged bytes, so responses are not decoded
+            'decode_responses': False,
             'socket_timeout': config.get('socket_timeout', 5),
             'socket_connect_timeout': config.get('connect_timeout', 5),
             'retry_on_timeout': True,
             'health_check_interval': 30
         }
         
-        # Connection pool
+        # Connection pools: one per shard. redis_client is the primary shard,
+        # which also holds unsharded keys (configuration, version stamps).
+        self.shards: Optional[RedisShardSet] = None
+        self.shard_vnodes = config.get('shard_vnodes', 160)
         self.connection_pool = None
         self.redis_client = None
         
@@ -53,6 +67,9 @@ class ElastiCacheManager:
         self.default_ttl = config.get('default_ttl', 1800)  # 30 minutes
         self.max_connections = config.get('max_connections', 50)
         
+        # Value codec for correlation and entity state (legacy JSON is always readable)
+        self.codec = get_codec(config.get('value_codec', 'msgpack'))
+        
         # Key prefixes for organization
         self.key_prefixes = {
             'correlation': 'corr:',
@@ -61,41 +78,391 @@ class ElastiCacheManager:
             'config': 'config:'
         }
         
-        # Initialize connection
-        self._initialize_connection()
+        # In-process L1 cache in front of Redis for entity/correlation reads.
+        # Invalidation modes: 'keyspace' (keyspace notifications), 'version'
+        # (polled global version stamp), 'none' (TTL only). RESP3 client
+        # tracking is not offered: redis.asyncio has no client-side caching.
+        l1_config = config.get('l1_cache', {})
+        self.l1_invalidation = l1_config.get('invalidation', 'keyspace')
+        if self.l1_invalidation not in L1_INVALIDATION_MODES:
+            raise ValueError(
+                f"Unsupported l1_cache invalidation '{self.l1_invalidation}'; "
+                f"redis.asyncio supports {', '.join(L1_INVALIDATION_MODES)}"
+            )
+        self.l1_cache = None
+        if l1_config.get('enabled', True):
+            self.l1_cache = LocalLRUCache(
+                max_entries=l1_config.get('max_entries', 10000),
+                ttl=l1_config.get('ttl', 5)
+            )
+        self.l1_version_check_interval = l1_config.get('version_check_interval', 1.0)
+        self.l1_version_key = f"{self.key_prefixes['config']}l1_version"
+        self._l1_version = None
+        self._l1_version_checked_at = 0.0
+        self._keyspace_pubsubs = []
+        self._keyspace_tasks = []
+        
+        # Per-prefix key counters maintained on write (avoids KEYS for statistics)
+        self.key_counts_key = f"{self.key_prefixes['metrics']}key_counts"
+        self.scan_count = config.get('scan_count', 1000)
+        
+        # Bookkeeping keys: never swept, never counted (the key sweeper adds its state key)
+        self.internal_keys: Set[str] = {self.key_counts_key, self.l1_version_key}
+        self._set_counted_script = None
+        self._delete_counted_script = None
+        
+        # L2 (Redis) lookup accounting
+        self.l2_hits = 0
+        self.l2_misses = 0
+        
+    @classmethod
+    async def create(cls, config: Dict[str, Any]) -> 'AsyncElastiCacheManager':
+        """Construct and connect a manager"""
+        manager = cls(config)
+        await manager.initialize()
+        return manager
+    
+    async def initialize(self):
+        """Open the connection pool and start L1 invalidation"""
+        await self._initialize_connection()
+        await self._start_l1_invalidation()
     
-    def _initialize_connection(self):
+    async def _initialize_connection(self):
         """Initialize Redis connection with connection pooling"""
         try:
-            if not self.redis_config['host']:
-                # Auto-discover endpoint if not provided
-                self.redis_config['host'] = self._discover_cluster_endpoint()
-            
-            # Create connection pool
-            self.connection_pool = redis.ConnectionPool(
-                host=self.redis_config['host'],
-                port=self.redis_config['port'],
-                db=self.redis_config['db'],
-                decode_responses=self.redis_config['decode_responses'],
-                socket_timeout=self.redis_config['socket_timeout'],
-                socket_connect_timeout=self.redis_config['connect_timeout'],
-                retry_on_timeout=self.redis_config['retry_on_timeout'],
-                health_check_interval=self.redis_config['health_check_interval'],
-                max_connections=self.max_connections
+            if not self.redis_config['host'] and not self.config.get('shards'):
+                # Auto-discover endpoint if not provided (blocking boto3 call off the loop)
+                self.redis_config['host'] = await asyncio.to_thread(self._discover_cluster_endpoint)
+            
+            # Create one connection pool per shard (a single shard when unsharded)
+            self.shards = RedisShardSet(
+                shard_configs_from(self.config, {
+                    'host': self.redis_config['host'],
+                    'port': self.redis_config['port'],
+                    'db': self.redis_config['db']
+                }),
+                vnodes=self.shard_vnodes,
+                connection_kwargs=dict(
+                    decode_responses=self.redis_config['decode_responses'],
+                    socket_timeout=self.redis_config['socket_timeout'],
+                    socket_connect_timeout=self.redis_config['socket_connect_timeout'],
+                    retry_on_timeout=self.redis_config['retry_on_timeout'],
+                    health_check_interval=self.redis_config['health_check_interval'],
+                    max_connections=self.max_connections
+                )
             )
             
-            # Create Redis client
-            self.redis_client = redis.Redis(connection_pool=self.connection_pool)
+            # Primary client
+            self.redis_client = self.shards.primary_client
+            self.connection_pool = self.shards.pools[self.shards.primary]
+            self._register_scripts()
             
-            # Test connection
-            self.redis_client.ping()
+            # Test connections
+            for client in self.shards.clients.values():
+                await client.ping()
             
-            self.logger.info(f"ElastiCache connection initialized: {self.redis_config['host']}:{self.redis_config['port']}")
+            self.logger.info(f"ElastiCache connection initialized: {', '.join(self.shards.names)}")
             
         except Exception as e:
             self.logger.error(f"Failed to initialize ElastiCache connection: {e}")
             raise e
     
+    def _register_scripts(self):
+        """Register Lua scripts that keep per-prefix key counters in step with writes"""
+        # KEYS[1]=key, KEYS[2]=counter hash; ARGV[1]=value, ARGV[2]=ttl (0 = none), ARGV[3]=prefix name
+        self._set_counted_script = self.redis_client.register_script("""
+            local existed = redis.call('EXISTS', KEYS[1])
+            if tonumber(ARGV[2]) > 0 then
+                redis.call('SET', KEYS[1], ARGV[1], 'EX', ARGV[2])
+            else
+                redis.call('SET', KEYS[1], ARGV[1])
+            end
+            if existed == 0 then
+                redis.call('HINCRBY', KEYS[2], ARGV[3], 1)
+            end
+            return 1
+        """)
+        # KEYS[1..n-1]=keys, KEYS[n]=counter hash; ARGV[1]=prefix name
+        self._delete_counted_script = self.redis_client.register_script("""
+            local counter = table.remove(KEYS)
+            local removed = redis.call('DEL', unpack(KEYS))
+            if removed > 0 then
+                redis.call('HINCRBY', counter, ARGV[1], -removed)
+            end
+            return removed
+        """)
+    
+    @property
+    def shard_names(self) -> List[str]:
+        return self.shards.names if self.shards else []
+    
+    def _client_for(self, prefix_name: str, key: str) -> aioredis.Redis:
+        """Shard client for a key; configuration stays on the primary shard"""
+        if prefix_name == 'config':
+            return self.redis_client
+        return self.shards.client_for(key)
+    
+    def _shard_client(self, shard: Optional[str]) -> aioredis.Redis:
+        return self.redis_client if shard is None else self.shards.clients[shard]
+    
+    async def _set_counted(self, prefix_name: str, full_key: str, payload: Any, ttl: Optional[int],
+                           client: Optional[aioredis.Redis] = None) -> bool:
+        """SET (with optional TTL) and bump the prefix counter when the key is new"""
+        result = await self._set_counted_script(
+            keys=[full_key, self.key_counts_key],
+            args=[payload, ttl or 0, prefix_name],
+            client=client or self.redis_client
+        )
+        return bool(result)
+    
+    async def _delete_counted(self, prefix_name: str, full_keys: List[Any],
+                              client: Optional[aioredis.Redis] = None) -> int:
+        """DEL keys and decrement the prefix counter by the number removed"""
+        if not full_keys:
+            return 0
+        return int(await self._delete_counted_script(
+            keys=list(full_keys) + [self.key_counts_key],
+            args=[prefix_name],
+            client=client or self.redis_client
+        ))
+    
+    async def scan_keys(self, match: str, count: Optional[int] = None) -> AsyncIterator[bytes]:
+        """Incrementally iterate keys matching pattern with SCAN across all shards"""
+        for client in self.shards.clients.values():
+            async for key in client.scan_iter(match=match, count=count or self.scan_count):
+                yield key
+    
+    async def scan_page(self, match: str, cursor: int = 0, count: Optional[int] = None,
+                        shard: Optional[str] = None) -> Tuple[int, List[bytes]]:
+        """Fetch a single SCAN page from one shard (primary by default) as (next_cursor, keys)"""
+        return await self._shard_client(shard).scan(cursor=cursor, match=match, count=count or self.scan_count)
+    
+    async def scan_batches(self, match: str, cursor: int = 0, count: Optional[int] = None,
+                           shard: Optional[str] = None) -> AsyncIterator[Tuple[int, List[bytes]]]:
+        """Iterate SCAN pages of one shard as (next_cursor, keys), resumable from a saved cursor"""
+        while True:
+            cursor, keys = await self.scan_page(match, cursor, count, shard)
+            yield cursor, keys
+            if cursor == 0:
+                break
+    
+    async def sweep_batch(self, prefix_name: str, keys: List[bytes], max_age_seconds: int,
+                          shard: Optional[str] = None) -> int:
+        """Delete TTL-less keys idle longer than max_age_seconds using pipelined TTL/IDLETIME"""
+        keys = [key for key in keys if self._decode_key(key) not in self.internal_keys]
+        if not keys:
+            return 0
+        
+        client = self._shard_client(shard)
+        pipe = client.pipeline(transaction=False)
+        for key in keys:
+            pipe.ttl(key)
+        ttls = await pipe.execute()
+        
+        # Keys without TTL (-1) are the only candidates; expired keys (-2) are already gone
+        persistent_keys = [key for key, ttl in zip(keys, ttls) if ttl == -1]
+        if not persistent_keys:
+            return 0
+        
+        pipe = client.pipeline(transaction=False)
+        for key in persistent_keys:
+            pipe.object('IDLETIME', key)
+        idle_times = await pipe.execute(raise_on_error=False)
+        
+        stale_keys = [
+            key for key, idle in zip(persistent_keys, idle_times)
+            if isinstance(idle, int) and idle > max_age_seconds
+        ]
+        
+        removed = await self._delete_counted(prefix_name, stale_keys, client)
+        if self.l1_cache is not None:
+            for key in stale_keys:
+                self.l1_cache.invalidate(self._decode_key(key))
+        return removed
+    
+    async def get_shard_key_counts(self, shard: Optional[str] = None) -> Dict[str, int]:
+        """One shard's raw per-prefix counters"""
+        raw_counts = await self._shard_client(shard).hgetall(self.key_counts_key)
+        return {self._decode_key(name): int(value) for name, value in raw_counts.items()}
+    
+    async def reconcile_key_counts(self, counts: Dict[str, int], baseline: Dict[str, int],
+                                   shard: Optional[str] = None):
+        """Correct a shard's counters by (scanned - counter value when the scan began) per prefix.
+        
+        HINCRBY keeps increments made by concurrent writers, which an HSET of the scanned
+        counts would overwrite.
+        """
+        try:
+            pipe = self._shard_client(shard).pipeline(transaction=False)
+            for name, count in counts.items():
+                # A prefix without a baseline (scan resumed from older state) is left alone
+                if name not in baseline:
+                    continue
+                delta = int(count) - int(baseline[name])
+                if delta:
+                    pipe.hincrby(self.key_counts_key, name, delta)
+            await pipe.execute()
+        except Exception as e:
+            self.logger.error(f"Failed to reconcile key counts: {e}")
+    
+    async def get_key_counts(self) -> Dict[str, int]:
+        """Get per-prefix key counts from write-maintained counters, summed over shards"""
+        per_shard = await self.shards.fan_out(lambda name, client: client.hgetall(self.key_counts_key))
+        
+        totals = {prefix_name: 0 for prefix_name in self.key_prefixes}
+        for raw_counts in per_shard.values():
+            if isinstance(raw_counts, Exception):
+                continue
+            for name, value in raw_counts.items():
+                name = self._decode_key(name)
+                if name in totals:
+                    totals[name] += max(int(value), 0)
+        return totals
+    
+    async def _start_l1_invalidation(self):
+        """Subscribe to keyspace notifications so L1 entries are dropped on remote writes"""
+        if self.l1_cache is None or self.l1_invalidation != 'keyspace':
+            return
+        
+        try:
+            try:
+                # K: keyspace channel, g: DEL/EXPIRE/RENAME, $: string writes, x/e: expired/evicted
+                for client in self.shards.clients.values():
+                    await client.config_set('notify-keyspace-events', 'Kg$xe')
+            except Exception as e:
+                # ElastiCache disallows CONFIG; the parameter group must enable notifications
+                self.logger.warning(f"Could not enable keyspace notifications ({e}); relying on parameter group")
+            
+            # Entity/correlation keys live on every shard, so subscribe to each
+            for name, client in self.shards.clients.items():
+                db = self.shards.shard_configs[name].get('db', 0)
+                patterns = {
+                    f"__keyspace@{db}__:{self.key_prefixes[prefix_name]}*": self._on_keyspace_event
+                    for prefix_name in ('correlation', 'entity')
+                }
+                pubsub = client.pubsub(ignore_subscribe_messages=True)
+                await pubsub.psubscribe(**patterns)
+                self._keyspace_pubsubs.append(pubsub)
+                self._keyspace_tasks.append(asyncio.create_task(pubsub.run()))
+            
+            self.logger.info("L1 cache keyspace invalidation started")
+            
+        except Exception as e:
+            # Staleness stays bounded by the L1 TTL
+            self.logger.error(f"Failed to start L1 keyspace invalidation: {e}")
+    
+    def _on_keyspace_event(self, message: Dict[str, Any]):
+        """Invalidate L1 entry for a keyspace notification"""
+        channel = self._decode_key(message.get('channel', b''))
+        _, _, key = channel.partition('__:')
+        if key:
+            self.l1_cache.invalidate(key)
+    
+    async def _check_l1_version(self):
+        """Clear L1 when the shared version stamp changes (version invalidation mode)"""
+        now = time.monotonic()
+        if now - self._l1_version_checked_at < self.l1_version_check_interval:
+            return
+        
+        self._l1_version_checked_at = now
+        try:
+            version = await self.redis_client.get(self.l1_version_key)
+            if self._l1_version is not None and version != self._l1_version:
+                self.l1_cache.clear()
+            self._l1_version = version
+        except Exception as e:
+            self.logger.warning(f"Failed to check L1 version stamp: {e}")
+    
+    async def invalidate_l1(self, key: Optional[str] = None) -> bool:
+        """Invalidate local L1 and bump the shared version stamp so peers drop theirs"""
+        if self.l1_cache is not None:
+            if key is None:
+                self.l1_cache.clear()
+            else:
+                self.l1_cache.invalidate(key)
+        
+        try:
+            await self.redis_client.incr(self.l1_version_key)
+            return True
+        except Exception as e:
+            self.logger.error(f"Failed to bump L1 version stamp: {e}")
+            return False
+    
+    async def _cached_get(self, full_key: str, client: aioredis.Redis) -> Optional[bytes]:
+        """Read raw payload through L1, falling back to the owning Redis shard"""
+        if self.l1_cache is not None:
+            if self.l1_invalidation == 'version':
+                await self._check_l1_version()
+            payload = self.l1_cache.get(full_key)
+            if payload is not None:
+                return payload
+        
+        payload = await client.get(full_key)
+        if payload is None:
+            self.l2_misses += 1
+            return None
+        
+        self.l2_hits += 1
+        if self.l1_cache is not None:
+            self.l1_cache.set(full_key, payload)
+        return payload
+    
+    async def _cached_get_many(self, full_keys: List[str], routing_keys: List[str]) -> List[Optional[bytes]]:
+        """Read many raw payloads through L1 with one MGET per shard for the misses"""
+        payloads: List[Optional[bytes]] = [None] * len(full_keys)
+        missing = []
+        
+        if self.l1_cache is not None and self.l1_invalidation == 'version':
+            await self._check_l1_version()
+        
+        for i, full_key in enumerate(full_keys):
+            payload = self.l1_cache.get(full_key) if self.l1_cache is not None else None
+            if payload is None:
+                missing.append(i)
+            else:
+                payloads[i] = payload
+        
+        if missing:
+            groups = self.shards.group_by_node([routing_keys[i] for i in missing])
+            indexes = [[missing[j] for j in group] for group in groups.values()]
+            results = await asyncio.gather(*(
+                self.shards.clients[name].mget([full_keys[i] for i in group])
+                for name, group in zip(groups, indexes)
+            ))
+            fetched_pairs = [
+                pair for group, fetched in zip(indexes, results) for pair in zip(group, fetched)
+            ]
+            for i, payload in fetched_pairs:
+                if payload is None:
+                    self.l2_misses += 1
+                    continue
+                self.l2_hits += 1
+                payloads[i] = payload
+                if self.l1_cache is not None:
+                    self.l1_cache.set(full_keys[i], payload)
+        
+        return payloads
+    
+    def _l1_store(self, full_key: str, payload: bytes, ttl: int):
+        """Write-through of a freshly stored payload into L1"""
+        if self.l1_cache is not None:
+            self.l1_cache.set(full_key, payload, ttl=min(self.l1_cache.ttl, ttl))
+    
+    def _layer_statistics(self) -> Dict[str, Any]:
+        """Per-layer hit ratios for L1 (in-process) and L2 (Redis)"""
+        l2_lookups = self.l2_hits + self.l2_misses
+        l1_stats = self.l1_cache.get_statistics() if self.l1_cache is not None else {'enabled': False}
+        l1_stats['invalidation'] = self.l1_invalidation
+        
+        return {
+            'l1': l1_stats,
+            'l2': {
+                'hits': self.l2_hits,
+                'misses': self.l2_misses,
+                'hit_rate': self.l2_hits / l2_lookups if l2_lookups else 0.0
+            }
+        }
+    
     def _discover_cluster_endpoint(self) -> str:
         """Auto-discover ElastiCache cluster endpoint"""
         try:
@@ -126,16 +493,19 @@ class ElastiCacheManager:
             self.logger.error(f"Failed to discover cluster endpoint: {e}")
             raise e
     
-    def set_correlation_state(self, key: str, data: Dict[str, Any], ttl: Optional[int] = None) -> bool:
+    async def set_correlation_state(self, key: str, data: Dict[str, Any], ttl: Optional[int] = None) -> bool:
         """Set correlation state with optional TTL"""
         try:
             full_key = f"{self.key_prefixes['correlation']}{key}"
-            serialized_data = json.dumps(data, default=str)
+            serialized_data = self.codec.encode(data)
             
             if ttl is None:
                 ttl = self.default_ttl
             
-            result = self.redis_client.setex(full_key, ttl, serialized_data)
+            result = await self._set_counted('correlation', full_key, serialized_data, ttl,
+                                             self._client_for('correlation', key))
+            if result:
+                self._l1_store(full_key, serialized_data, ttl)
             
             self.logger.debug(f"Set correlation state: {key} (TTL: {ttl}s)")
             return bool(result)
@@ -144,14 +514,14 @@ class ElastiCacheManager:
             self.logger.error(f"Failed to set correlation state for {key}: {e}")
             return False
     
-    def get_correlation_state(self, key: str) -> Optional[Dict[str, Any]]:
+    async def get_correlation_state(self, key: str) -> Optional[Dict[str, Any]]:
         """Get correlation state by key"""
         try:
             full_key = f"{self.key_prefixes['correlation']}{key}"
-            data = self.redis_client.get(full_key)
+            data = await self._cached_get(full_key, self._client_for('correlation', key))
             
             if data:
-                return json.loads(data)
+                return decode_value(data)
             
             return None
             
@@ -159,11 +529,13 @@ class ElastiCacheManager:
             self.logger.error(f"Failed to get correlation state for {key}: {e}")
             return None
     
-    def delete_correlation_state(self, key: str) -> bool:
+    async def delete_correlation_state(self, key: str) -> bool:
         """Delete correlation state"""
         try:
             full_key = f"{self.key_prefixes['correlation']}{key}"
-            result = self.redis_client.delete(full_key)
+            result = await self._delete_counted('correlation', [full_key], self._client_for('correlation', key))
+            if self.l1_cache is not None:
+                self.l1_cache.invalidate(full_key)
             
             self.logger.debug(f"Deleted correlation state: {key}")
             return bool(result)
@@ -172,44 +544,46 @@ class ElastiCacheManager:
             self.logger.error(f"Failed to delete correlation state for {key}: {e}")
             return False
     
-    def get_correlation_keys(self, pattern: str = "*") -> List[str]:
+    async def get_correlation_keys(self, pattern: str = "*") -> List[str]:
         """Get correlation keys matching pattern"""
         try:
             full_pattern = f"{self.key_prefixes['correlation']}{pattern}"
-            keys = self.redis_client.keys(full_pattern)
             
             # Remove prefix from keys
             prefix_len = len(self.key_prefixes['correlation'])
-            return [key[prefix_len:] for key in keys]
+            return [self._decode_key(key)[prefix_len:] async for key in self.scan_keys(full_pattern)]
             
         except Exception as e:
             self.logger.error(f"Failed to get correlation keys: {e}")
             return []
     
-    def set_entity_state(self, entity_id: str, state: Dict[str, Any], ttl: Optional[int] = None) -> bool:
+    async def set_entity_state(self, entity_id: str, state: Dict[str, Any], ttl: Optional[int] = None) -> bool:
         """Set entity-specific state"""
         try:
             full_key = f"{self.key_prefixes['entity']}{entity_id}"
-            serialized_state = json.dumps(state, default=str)
+            serialized_state = self.codec.encode(state)
             
             if ttl is None:
                 ttl = self.default_ttl
             
-            result = self.redis_client.setex(full_key, ttl, serialized_state)
+            result = await self._set_counted('entity', full_key, serialized_state, ttl,
+                                             self._client_for('entity', entity_id))
+            if result:
+                self._l1_store(full_key, serialized_state, ttl)
             return bool(result)
             
         except Exception as e:
             self.logger.error(f"Failed to set entity state for {entity_id}: {e}")
             return False
     
-    def get_entity_state(self, entity_id: str) -> Optional[Dict[str, Any]]:
+    async def get_entity_state(self, entity_id: str) -> Optional[Dict[str, Any]]:
         """Get entity-specific state"""
         try:
             full_key = f"{self.key_prefixes['entity']}{entity_id}"
-            data = self.redis_client.get(full_key)
+            data = await self._cached_get(full_key, self._client_for('entity', entity_id))
             
             if data:
-                return json.loads(data)
+                return decode_value(data)
             
             return None
             
@@ -217,30 +591,52 @@ class ElastiCacheManager:
             self.logger.error(f"Failed to get entity state for {entity_id}: {e}")
             return None
     
-    def increment_counter(self, key: str, increment: int = 1, ttl: Optional[int] = None) -> int:
+    async def get_entity_states(self, entity_ids: List[str]) -> Dict[str, Optional[Dict[str, Any]]]:
+        """Get state for many entities in one round trip"""
+        try:
+            full_keys = [f"{self.key_prefixes['entity']}{entity_id}" for entity_id in entity_ids]
+            payloads = await self._cached_get_many(full_keys, list(entity_ids))
+            
+            return {
+                entity_id: decode_value(payload) if payload else None
+                for entity_id, payload in zip(entity_ids, payloads)
+            }
+            
+        except Exception as e:
+            self.logger.error(f"Failed to get entity states for {len(entity_ids)} entities: {e}")
+            return {entity_id: None for entity_id in entity_ids}
+    
+    async def increment_counter(self, key: str, increment: int = 1, ttl: Optional[int] = None) -> int:
         """Increment counter with optional TTL"""
         try:
             full_key = f"{self.key_prefixes['metrics']}{key}"
             
+            client = self._client_for('metrics', key)
+            
             # Use pipeline for atomic operations
-            pipe = self.redis_client.pipeline()
+            pipe = client.pipeline()
             pipe.incr(full_key, increment)
             
             if ttl:
                 pipe.expire(full_key, ttl)
             
-            results = pipe.execute()
+            results = await pipe.execute()
+            
+            # First increment created the key
+            if results[0] == increment:
+                await client.hincrby(self.key_counts_key, 'metrics', 1)
+            
             return results[0]
             
         except Exception as e:
             self.logger.error(f"Failed to increment counter {key}: {e}")
             return 0
     
-    def get_counter(self, key: str) -> int:
+    async def get_counter(self, key: str) -> int:
         """Get counter value"""
         try:
             full_key = f"{self.key_prefixes['metrics']}{key}"
-            value = self.redis_client.get(full_key)
+            value = await self._client_for('metrics', key).get(full_key)
             
             return int(value) if value else 0
             
@@ -248,31 +644,28 @@ class ElastiCacheManager:
             self.logger.error(f"Failed to get counter {key}: {e}")
             return 0
     
-    def set_configuration(self, config_key: str, config_value: Any, ttl: Optional[int] = None) -> bool:
+    async def set_configuration(self, config_key: str, config_value: Any, ttl: Optional[int] = None) -> bool:
         """Set configuration value"""
         try:
             full_key = f"{self.key_prefixes['config']}{config_key}"
             serialized_value = json.dumps(config_value, default=str)
             
-            if ttl:
-                result = self.redis_client.setex(full_key, ttl, serialized_value)
-            else:
-                result = self.redis_client.set(full_key, serialized_value)
-            
-            return bool(result)
+            if full_key in self.internal_keys:
+                return bool(await self.redis_client.set(full_key, serialized_value, ex=ttl))
+            return await self._set_counted('config', full_key, serialized_value, ttl)
             
         except Exception as e:
             self.logger.error(f"Failed to set configuration {config_key}: {e}")
             return False
     
-    def get_configuration(self, config_key: str, default_value: Any = None) -> Any:
+    async def get_configuration(self, config_key: str, default_value: Any = None) -> Any:
         """Get configuration value"""
         try:
             full_key = f"{self.key_prefixes['config']}{config_key}"
-            data = self.redis_client.get(full_key)
+            data = await self.redis_client.get(full_key)
             
             if data:
-                return json.loads(data)
+                return decode_value(data)
             
             return default_value
             
@@ -280,32 +673,21 @@ class ElastiCacheManager:
             self.logger.error(f"Failed to get configuration {config_key}: {e}")
             return default_value
     
-    def cleanup_expired_keys(self, pattern: str = "*", max_age_seconds: int = 3600) -> int:
-        """Clean up expired keys older than max_age_seconds"""
+    async def cleanup_expired_keys(self, pattern: str = "*", max_age_seconds: int = 3600) -> int:
+        """Clean up expired keys older than max_age_seconds (SCAN-based, pipelined)"""
         try:
             cleaned_count = 0
-            current_time = time.time()
-            
-            for prefix in self.key_prefixes.values():
-                full_pattern = f"{prefix}{pattern}"
-                keys = self.redis_client.keys(full_pattern)
-                
-                for key in keys:
-                    try:
-                        # Check key TTL
-                        ttl = self.redis_client.ttl(key)
-                        
-                        # If key has no TTL (-1) or is expired (-2), check last modified time
-                        if ttl == -1:
-                            # Key exists but has no TTL, check if it's old
-                            key_info = self.redis_client.object('IDLETIME', key)
-                            if key_info and key_info > max_age_seconds:
-                                self.redis_client.delete(key)
-                                cleaned_count += 1
-                        
-                    except Exception as e:
-                        self.logger.warning(f"Failed to check key {key}: {e}")
-                        continue
+            
+            for shard in self.shard_names:
+                for prefix_name, prefix in self.key_prefixes.items():
+                    full_pattern = f"{prefix}{pattern}"
+                    
+                    async for _, keys in self.scan_batches(full_pattern, shard=shard):
+                        try:
+                            cleaned_count += await self.sweep_batch(prefix_name, keys, max_age_seconds, shard)
+                        except Exception as e:
+                            self.logger.warning(f"Failed to sweep batch for {prefix_name} on {shard}: {e}")
+                            continue
             
             if cleaned_count > 0:
                 self.logger.info(f"Cleaned up {cleaned_count} expired keys")
@@ -316,21 +698,41 @@ class ElastiCacheManager:
             self.logger.error(f"Failed to cleanup expired keys: {e}")
             return 0
     
-    def get_cache_statistics(self) -> Dict[str, Any]:
+    async def get_cache_statistics(self) -> Dict[str, Any]:
         """Get cache usage statistics"""
         try:
-            info = self.redis_client.info()
+            infos = await self.shards.fan_out(lambda name, client: client.info())
+            
+            shard_stats = {}
+            for name, info in infos.items():
+                if isinstance(info, Exception):
+                    shard_stats[name] = {'error': str(info)}
+                    continue
+                shard_stats[name] = {
+                    'connected_clients': info.get('connected_clients', 0),
+                    'used_memory': info.get('used_memory', 0),
+                    'used_memory_human': info.get('used_memory_human', '0B'),
+                    'keyspace_hits': info.get('keyspace_hits', 0),
+                    'keyspace_misses': info.get('keyspace_misses', 0),
+                    'total_commands_processed': info.get('total_commands_processed', 0),
+                    'instantaneous_ops_per_sec': info.get('instantaneous_ops_per_sec', 0),
+                    'uptime_in_seconds': info.get('uptime_in_seconds', 0)
+                }
             
+            # Totals across shards; uptime reports the youngest shard
+            reachable = [s for s in shard_stats.values() if 'error' not in s]
             stats = {
-                'connected_clients': info.get('connected_clients', 0),
-                'used_memory': info.get('used_memory', 0),
-                'used_memory_human': info.get('used_memory_human', '0B'),
-                'keyspace_hits': info.get('keyspace_hits', 0),
-                'keyspace_misses': info.get('keyspace_misses', 0),
-                'total_commands_processed': info.get('total_commands_processed', 0),
-                'instantaneous_ops_per_sec': info.get('instantaneous_ops_per_sec', 0),
-                'uptime_in_seconds': info.get('uptime_in_seconds', 0)
+                field: sum(s[field] for s in reachable)
+                for field in ('connected_clients', 'used_memory', 'keyspace_hits', 'keyspace_misses',
+                              'total_commands_processed', 'instantaneous_ops_per_sec')
             }
+            stats['used_memory_human'] = (
+                reachable[0]['used_memory_human'] if len(shard_stats) == 1 and reachable
+                else f"{stats['used_memory'] / (1024 * 1024):.2f}M"
+            )
+            stats['uptime_in_seconds'] = min((s['uptime_in_seconds'] for s in reachable), default=0)
+            if len(shard_stats) > 1:
+                stats['shards'] = shard_stats
             
             # Calculate hit rate
             hits = stats['keyspace_hits']
@@ -342,11 +744,11 @@ class ElastiCacheManager:
             else:
                 stats['hit_rate'] = 0.0
             
-            # Get key counts by prefix
-            stats['key_counts'] = {}
-            for prefix_name, prefix in self.key_prefixes.items():
-                keys = self.redis_client.keys(f"{prefix}*")
-                stats['key_counts'][prefix_name] = len(keys)
+            # Key counts by prefix (write-maintained counters, reconciled by the sweeper)
+            stats['key_counts'] = await self.get_key_counts()
+            
+            # Hit ratios per cache layer
+            stats['layers'] = self._layer_statistics()
             
             return stats
             
@@ -354,7 +756,12 @@ class ElastiCacheManager:
             self.logger.error(f"Failed to get cache statistics: {e}")
             return {}
     
-    def health_check(self) -> Dict[str, Any]:
+    @staticmethod
+    def _decode_key(key: Any) -> str:
+        """Decode raw Redis key/value bytes to str"""
+        return key.decode('utf-8') if isinstance(key, bytes) else key
+    
+    async def health_check(self) -> Dict[str, Any]:
         """Perform health check on ElastiCache connection"""
         health_status = {
             'healthy': False,
@@ -364,17 +771,30 @@ class ElastiCacheManager:
         }
         
         try:
-            # Test Redis connection
+            # Test Redis connection on every shard
+            async def ping(name, client):
+                shard_start = time.time()
+                await client.ping()
+                return (time.time() - shard_start) * 1000
+            
             start_time = time.time()
-            self.redis_client.ping()
+            results = await self.shards.fan_out(ping)
             response_time = (time.time() - start_time) * 1000  # Convert to milliseconds
             
-            health_status['healthy'] = True
+            failed = {name: str(r) for name, r in results.items() if isinstance(r, Exception)}
+            health_status['healthy'] = not failed
             health_status['response_time'] = response_time
+            if len(results) > 1:
+                health_status['shards'] = {
+                    name: {'healthy': name not in failed, 'response_time': None if name in failed else r}
+                    for name, r in results.items()
+                }
+            if failed:
+                health_status['error'] = f"Unreachable shards: {', '.join(sorted(failed))}"
             
             # Get cluster information
             try:
-                cluster_info = self._get_cluster_info()
+                cluster_info = await asyncio.to_thread(self._get_cluster_info)
                 health_status['cluster_info'] = cluster_info
             except Exception as e:
                 self.logger.warning(f"Failed to get cluster info: {e}")
@@ -413,13 +833,107 @@ class ElastiCacheManager:
             self.logger.error(f"Failed to get cluster info: {e}")
             return {}
     
-    def close_connection(self):
+    async def close_connection(self):
         """Close Redis connection"""
         try:
-            if self.connection_pool:
-                self.connection_pool.disconnect()
+            for task in self._keyspace_tasks:
+                task.cancel()
+            for pubsub in self._keyspace_pubsubs:
+                await pubsub.aclose()
+            
+            if self.shards:
+                await self.shards.close()
             
             self.logger.info("ElastiCache connection closed")
             
         except Exception as e:
-            self.logger.error(f"Failed to close ElastiCache connection: {e}")
\ No newline at end of file
+            self.logger.error(f"Failed to close ElastiCache connection: {e}")
+
+
+class ElastiCacheManager:
+    """Synchronous adapter over AsyncElastiCacheManager running on a background event loop"""
+    
+    def __init__(self, config: Dict[str, Any], loop_thread: Optional[EventLoopThread] = None):
+        self.config = config
+        self.logger = logging.getLogger(__name__)
+        self._loop_thread = loop_thread or EventLoopThread.shared()
+        self._manager = self._run(AsyncElastiCacheManager.create(config))
+        
+        self.key_prefixes = self._manager.key_prefixes
+        self.default_ttl = self._manager.default_ttl
+        self.shard_names = self._manager.shard_names
+        self.internal_keys = self._manager.internal_keys
+    
+    @property
+    def async_manager(self) -> AsyncElastiCacheManager:
+        """Underlying asyncio manager (for use from its event loop)"""
+        return self._manager
+    
+    def _run(self, coro):
+        return self._loop_thread.run(coro)
+    
+    def set_correlation_state(self, key: str, data: Dict[str, Any], ttl: Optional[int] = None) -> bool:
+        return self._run(self._manager.set_correlation_state(key, data, ttl))
+    
+    def get_correlation_state(self, key: str) -> Optional[Dict[str, Any]]:
+        return self._run(self._manager.get_correlation_state(key))
+    
+    def delete_correlation_state(self, key: str) -> bool:
+        return self._run(self._manager.delete_correlation_state(key))
+    
+    def get_correlation_keys(self, pattern: str = "*") -> List[str]:
+        return self._run(self._manager.get_correlation_keys(pattern))
+    
+    def set_entity_state(self, entity_id: str, state: Dict[str, Any], ttl: Optional[int] = None) -> bool:
+        return self._run(self._manager.set_entity_state(entity_id, state, ttl))
+    
+    def get_entity_state(self, entity_id: str) -> Optional[Dict[str, Any]]:
+        return self._run(self._manager.get_entity_state(entity_id))
+    
+    def get_entity_states(self, entity_ids: List[str]) -> Dict[str, Optional[Dict[str, Any]]]:
+        return self._run(self._manager.get_entity_states(entity_ids))
+    
+    def increment_counter(self, key: str, increment: int = 1, ttl: Optional[int] = None) -> int:
+        return self._run(self._manager.increment_counter(key, increment, ttl))
+    
+    def get_counter(self, key: str) -> int:
+        return self._run(self._manager.get_counter(key))
+    
+    def set_configuration(self, config_key: str, config_value: Any, ttl: Optional[int] = None) -> bool:
+        return self._run(self._manager.set_configuration(config_key, config_value, ttl))
+    
+    def get_configuration(self, config_key: str, default_value: Any = None) -> Any:
+        return self._run(self._manager.get_configuration(config_key, default_value))
+    
+    def scan_page(self, match: str, cursor: int = 0, count: Optional[int] = None,
+                  shard: Optional[str] = None) -> Tuple[int, List[bytes]]:
+        return self._run(self._manager.scan_page(match, cursor, count, shard))
+    
+    def sweep_batch(self, prefix_name: str, keys: List[bytes], max_age_seconds: int,
+                    shard: Optional[str] = None) -> int:
+        return self._run(self._manager.sweep_batch(prefix_name, keys, max_age_seconds, shard))
+    
+    def get_shard_key_counts(self, shard: Optional[str] = None) -> Dict[str, int]:
+        return self._run(self._manager.get_shard_key_counts(shard))
+    
+    def reconcile_key_counts(self, counts: Dict[str, int], baseline: Dict[str, int],
+                             shard: Optional[str] = None):
+        return self._run(self._manager.reconcile_key_counts(counts, baseline, shard))
+    
+    def get_key_counts(self) -> Dict[str, int]:
+        return self._run(self._manager.get_key_counts())
+    
+    def invalidate_l1(self, key: Optional[str] = None) -> bool:
+        return self._run(self._manager.invalidate_l1(key))
+    
+    def cleanup_expired_keys(self, pattern: str = "*", max_age_seconds: int = 3600) -> int:
+        return self._run(self._manager.cleanup_expired_keys(pattern, max_age_seconds))
+    
+    def get_cache_statistics(self) -> Dict[str, Any]:
+        return self._run(self._manager.get_cache_statistics())
+    
+    def health_check(self) -> Dict[str, Any]:
+        return self._run(self._manager.health_check())
+    
+    def close_connection(self):
+        return self._run(self._manager.close_connection())
\ No newline at end of file
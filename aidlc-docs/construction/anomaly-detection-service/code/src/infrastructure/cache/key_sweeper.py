@@ -0,0 +1,162 @@
+"""
+Background Key Sweeper
+Resumable, rate-limited SCAN sweeper for ElastiCache key cleanup and key-count reconciliation.
+"""
+
+import threading
+import time
+from typing import Any, Dict, Optional
+import logging
+
+
+class BackgroundKeySweeper:
+    """Sweeps cache prefixes incrementally, persisting SCAN progress in Redis"""
+
+    def __init__(self, cache_manager: Any, config: Optional[Dict[str, Any]] = None):
+        config = config or {}
+        self.cache_manager = cache_manager
+        self.logger = logging.getLogger(__name__)
+
+        # Sweep parameters
+        self.max_age_seconds = config.get('max_age_seconds', 3600)
+        self.max_keys_per_second = config.get('max_keys_per_second', 5000)
+        self.scan_count = config.get('scan_count', 500)
+        self.pass_interval = config.get('pass_interval', 300)  # Pause between full passes
+        self.state_key = config.get('state_key', 'sweeper:state')  # Under the config prefix
+        cache_manager.internal_keys.add(f"{cache_manager.key_prefixes['config']}{self.state_key}")
+
+        self.prefix_names = list(cache_manager.key_prefixes.keys())
+        self.shard_names = list(getattr(cache_manager, 'shard_names', None) or [None])
+        self._stop_event = threading.Event()
+        self._thread = None
+
+        self.metrics = {
+            'passes_completed': 0,
+            'keys_scanned': 0,
+            'keys_deleted': 0,
+            'last_pass_duration': 0.0,
+            'last_error': None
+        }
+
+    def start(self):
+        """Start sweeping in a daemon thread"""
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._run, name="cache-key-sweeper", daemon=True)
+        self._thread.start()
+        self.logger.info("Background key sweeper started")
+
+    def stop(self, timeout: float = 10.0):
+        """Stop sweeping; progress is already persisted after every SCAN page"""
+        self._stop_event.set()
+        if self._thread:
+            self._thread.join(timeout)
+        self.logger.info("Background key sweeper stopped")
+
+    def _run(self):
+        while not self._stop_event.is_set():
+            try:
+                completed = self.sweep_once()
+                if completed:
+                    self._stop_event.wait(self.pass_interval)
+            except Exception as e:
+                self.metrics['last_error'] = str(e)
+                self.logger.error(f"Key sweep failed: {e}")
+                self._stop_event.wait(min(self.pass_interval, 30))
+
+    def sweep_once(self) -> bool:
+        """Run (or resume) one full pass over all shards and prefixes. Returns True when the pass completed."""
+        state = self._load_state()
+        pass_started = time.time()
+
+        while state['shard_index'] < len(self.shard_names):
+            shard = self.shard_names[state['shard_index']]
+
+            while state['prefix_index'] < len(self.prefix_names):
+                prefix_name = self.prefix_names[state['prefix_index']]
+                match = f"{self.cache_manager.key_prefixes[prefix_name]}*"
+                cursor = state['cursor']
+                if cursor == 0 and prefix_name not in state['baseline']:
+                    # Counter value as this prefix's scan begins; reconciliation applies the difference
+                    state['baseline'][prefix_name] = self.cache_manager.get_shard_key_counts(shard).get(prefix_name, 0)
+                    state['counts'][prefix_name] = 0
+                    self._save_state(state)
+
+                while True:
+                    if self._stop_event.is_set():
+                        return False
+
+                    page_started = time.monotonic()
+                    cursor, keys = self.cache_manager.scan_page(match, cursor, self.scan_count, shard)
+                    keys = [key for key in keys if self._decode(key) not in self.cache_manager.internal_keys]
+                    deleted = self.cache_manager.sweep_batch(prefix_name, keys, self.max_age_seconds, shard)
+
+                    # Keys seen, deleted or not: the delete script already decremented the counter
+                    state['cursor'] = cursor
+                    state['counts'][prefix_name] = state['counts'].get(prefix_name, 0) + len(keys)
+                    self.metrics['keys_scanned'] += len(keys)
+                    self.metrics['keys_deleted'] += deleted
+                    self._save_state(state)
+
+                    self._throttle(len(keys), time.monotonic() - page_started)
+                    if cursor == 0:
+                        break
+
+                state['prefix_index'] += 1
+                state['cursor'] = 0
+                self._save_state(state)
+
+            # Shard finished: correct its drifted write counters by what SCAN observed
+            self.cache_manager.reconcile_key_counts(state['counts'], state['baseline'], shard)
+            self.logger.info(f"Key sweep of shard {shard} completed: {state['counts']}")
+            state.update(shard_index=state['shard_index'] + 1, prefix_index=0, cursor=0, counts={}, baseline={})
+            self._save_state(state)
+
+        self._save_state(self._initial_state())
+
+        self.metrics['passes_completed'] += 1
+        self.metrics['last_pass_duration'] = time.time() - pass_started
+        return True
+
+    def _throttle(self, key_count: int, elapsed: float):
+        """Sleep so the sweep stays under max_keys_per_second"""
+        if not self.max_keys_per_second or key_count == 0:
+            return
+        budget = key_count / self.max_keys_per_second
+        if budget > elapsed:
+            self._stop_event.wait(budget - elapsed)
+
+    @staticmethod
+    def _initial_state() -> Dict[str, Any]:
+        return {'shard_index': 0, 'prefix_index': 0, 'cursor': 0, 'counts': {}, 'baseline': {}}
+
+    @staticmethod
+    def _decode(key: Any) -> str:
+        return key.decode('utf-8', 'replace') if isinstance(key, bytes) else str(key)
+
+    def _load_state(self) -> Dict[str, Any]:
+        """Load persisted cursor progress so a sweep survives restarts"""
+        try:
+            state = self.cache_manager.get_configuration(self.state_key)
+            if state and state.get('shard_index', 0) < len(self.shard_names):
+                state.setdefault('shard_index', 0)
+                state.setdefault('baseline', {})
+                return state
+        except Exception as e:
+            self.logger.warning(f"Failed to load sweeper state, starting fresh: {e}")
+        return self._initial_state()
+
+    def _save_state(self, state: Dict[str, Any]):
+        try:
+            self.cache_manager.set_configuration(self.state_key, state)
+        except Exception as e:
+            self.logger.warning(f"Failed to persist sweeper state: {e}")
+
+    def get_status(self) -> Dict[str, Any]:
+        """Get sweeper metrics and persisted progress"""
+        return {
+            'running': bool(self._thread and self._thread.is_alive()),
+            'metrics': dict(self.metrics),
+            'progress': self._load_state()
+        }
@@ -0,0 +1,175 @@
+"""
+Shard Rebalancer
+Moves sharded correlation/entity keys to their consistent-hash owners after the shard list changes.
+
+Usage:
+    python -m src.infrastructure.cache.rebalance --shards localhost:6380 localhost:6381 localhost:6382 \
+        --previous-shards localhost:6380 localhost:6381 [--dry-run]
+
+Shard names are the 'host:port' strings, matching managers configured with
+`shards: ['host:port', ...]`. Keys are copied with DUMP/RESTORE (TTL kept)
+and deleted from the source only after the target accepted them.
+"""
+
+import argparse
+import asyncio
+import json
+from typing import Any, Dict, List, Optional
+import logging
+
+import redis.asyncio as aioredis
+
+from .sharding import RedisShardSet, parse_shard_url, strip_prefix
+
+logger = logging.getLogger(__name__)
+
+# Sharded namespaces: ElastiCacheManager prefixes (config stays on the primary)
+# plus CorrelationStateManager entity states
+DEFAULT_PREFIXES = {
+    'correlation': 'corr:',
+    'entity': 'entity:',
+    'metrics': 'metrics:',
+    'correlation_entity': 'correlation:entity:'
+}
+
+
+class ShardRebalancer:
+    """Scans every node and migrates keys whose ring owner changed"""
+
+    def __init__(self, shard_set: RedisShardSet, extra_sources: Optional[List[Dict[str, Any]]] = None,
+                 config: Optional[Dict[str, Any]] = None):
+        config = config or {}
+        self.shard_set = shard_set
+        self.prefixes = config.get('prefixes', DEFAULT_PREFIXES)
+        self.key_counts_key = config.get('key_counts_key', 'metrics:key_counts')
+        self.scan_count = config.get('scan_count', 500)
+        self.dry_run = config.get('dry_run', False)
+
+        # Nodes being drained (in the previous shard list but not the new one)
+        self.sources: Dict[str, aioredis.Redis] = dict(shard_set.clients)
+        self._extra_pools = []
+        for shard in extra_sources or []:
+            if shard['name'] in self.sources:
+                continue
+            pool = aioredis.ConnectionPool(host=shard['host'], port=shard['port'], db=shard['db'])
+            self._extra_pools.append(pool)
+            self.sources[shard['name']] = aioredis.Redis(connection_pool=pool)
+
+        self.stats = {'scanned': 0, 'moved': 0, 'failed': 0, 'by_route': {}}
+
+    def _prefix_name(self, key: str) -> Optional[str]:
+        best = None
+        for name, prefix in self.prefixes.items():
+            if key.startswith(prefix) and (best is None or len(prefix) > len(self.prefixes[best])):
+                best = name
+        return best
+
+    async def rebalance(self) -> Dict[str, Any]:
+        """Run one full migration pass over every source node"""
+        for source_name, source in self.sources.items():
+            for prefix in self.prefixes.values():
+                cursor = 0
+                while True:
+                    cursor, keys = await source.scan(cursor=cursor, match=f"{prefix}*", count=self.scan_count)
+                    await self._migrate_page(source_name, source, keys)
+                    if cursor == 0:
+                        break
+
+        logger.info(f"Rebalance {'plan' if self.dry_run else 'pass'} completed: {self.stats}")
+        return self.stats
+
+    async def _migrate_page(self, source_name: str, source: aioredis.Redis, keys: List[bytes]):
+        """Move misplaced keys of one SCAN page, grouped by target shard"""
+        moves: Dict[str, List[str]] = {}
+        for raw_key in keys:
+            key = raw_key.decode('utf-8')
+            self.stats['scanned'] += 1
+            if key == self.key_counts_key:
+                continue  # Per-shard counters never move
+            target = self.shard_set.node_for(strip_prefix(key, self.prefixes.values()))
+            if target != source_name:
+                moves.setdefault(target, []).append(key)
+
+        for target, target_keys in moves.items():
+            route = f"{source_name}->{target}"
+            self.stats['by_route'][route] = self.stats['by_route'].get(route, 0) + len(target_keys)
+            if self.dry_run:
+                self.stats['moved'] += len(target_keys)
+                continue
+            await self._move_keys(source, self.shard_set.clients[target], target_keys)
+
+    async def _move_keys(self, source: aioredis.Redis, target: aioredis.Redis, keys: List[str]):
+        # Snapshot values with remaining TTL
+        pipe = source.pipeline(transaction=False)
+        for key in keys:
+            pipe.dump(key)
+            pipe.pttl(key)
+        snapshot = await pipe.execute()
+
+        pipe = target.pipeline(transaction=False)
+        restorable = []
+        for i, key in enumerate(keys):
+            payload, pttl = snapshot[2 * i], snapshot[2 * i + 1]
+            if payload is None or pttl == -2:
+                continue  # Expired or deleted since SCAN
+            pipe.restore(key, max(pttl, 0), payload, replace=True)
+            restorable.append(key)
+        restored = await pipe.execute(raise_on_error=False)
+
+        moved = [key for key, result in zip(restorable, restored) if not isinstance(result, Exception)]
+        self.stats['failed'] += len(restorable) - len(moved)
+        if not moved:
+            return
+
+        await source.delete(*moved)
+        self.stats['moved'] += len(moved)
+
+        # Keep write-maintained key counters in step on both sides
+        counts: Dict[str, int] = {}
+        for key in moved:
+            name = self._prefix_name(key)
+            if name in ('correlation', 'entity', 'metrics'):
+                counts[name] = counts.get(name, 0) + 1
+        if counts:
+            source_pipe = source.pipeline(transaction=False)
+            target_pipe = target.pipeline(transaction=False)
+            for name, count in counts.items():
+                source_pipe.hincrby(self.key_counts_key, name, -count)
+                target_pipe.hincrby(self.key_counts_key, name, count)
+            await source_pipe.execute()
+            await target_pipe.execute()
+
+    async def close(self):
+        await self.shard_set.close()
+        for pool in self._extra_pools:
+            await pool.disconnect()
+
+
+async def _run(args: argparse.Namespace) -> Dict[str, Any]:
+    shard_set = RedisShardSet([parse_shard_url(url) for url in args.shards], vnodes=args.vnodes)
+    rebalancer = ShardRebalancer(
+        shard_set,
+        extra_sources=[parse_shard_url(url) for url in args.previous_shards],
+        config={'scan_count': args.scan_count, 'dry_run': args.dry_run}
+    )
+    try:
+        return await rebalancer.rebalance()
+    finally:
+        await rebalancer.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--shards', nargs='+', required=True, help="New shard list (host:port[/db])")
+    parser.add_argument('--previous-shards', nargs='*', default=[], help="Old shard list; removed nodes are drained")
+    parser.add_argument('--vnodes', type=int, default=160)
+    parser.add_argument('--scan-count', type=int, default=500)
+    parser.add_argument('--dry-run', action='store_true', help="Report planned moves without writing")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    print(json.dumps(asyncio.run(_run(args)), indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,166 @@
+"""
+Redis Shard Routing
+Client-side consistent-hash sharding of correlation state across multiple Redis nodes.
+"""
+
+import asyncio
+import bisect
+import hashlib
+from typing import Any, Awaitable, Callable, Dict, Iterable, List, Optional
+import logging
+
+import redis.asyncio as aioredis
+
+logger = logging.getLogger(__name__)
+
+
+def hash_tag(key: str) -> str:
+    """Routing portion of a key, honouring Redis Cluster {hash tag} semantics"""
+    start = key.find('{')
+    if start != -1:
+        end = key.find('}', start + 1)
+        if end > start + 1:
+            return key[start + 1:end]
+    return key
+
+
+def strip_prefix(full_key: str, prefixes: Iterable[str]) -> str:
+    """Key with its longest matching namespace prefix removed (the entity part routes)"""
+    best = ''
+    for prefix in prefixes:
+        if full_key.startswith(prefix) and len(prefix) > len(best):
+            best = prefix
+    return full_key[len(best):]
+
+
+def parse_shard_url(url: str, name: Optional[str] = None) -> Dict[str, Any]:
+    """Parse 'host:port[/db]' into a shard config"""
+    address, _, db = url.partition('/')
+    host, _, port = address.rpartition(':')
+    return {
+        'name': name or address,
+        'host': host or 'localhost',
+        'port': int(port or 6379),
+        'db': int(db or 0)
+    }
+
+
+class ConsistentHashRing:
+    """Consistent hash ring with virtual nodes"""
+
+    def __init__(self, nodes: Optional[List[str]] = None, vnodes: int = 160):
+        self.vnodes = vnodes
+        self._points: List[int] = []
+        self._owners: List[str] = []
+        self._nodes: List[str] = []
+        for node in nodes or []:
+            self.add_node(node)
+
+    @staticmethod
+    def _hash(value: str) -> int:
+        return int.from_bytes(hashlib.md5(value.encode('utf-8')).digest()[:8], 'big')
+
+    @property
+    def nodes(self) -> List[str]:
+        return list(self._nodes)
+
+    def add_node(self, node: str):
+        """Place node's virtual points on the ring"""
+        if node in self._nodes:
+            return
+        self._nodes.append(node)
+        for i in range(self.vnodes):
+            point = self._hash(f"{node}#{i}")
+            index = bisect.bisect(self._points, point)
+            self._points.insert(index, point)
+            self._owners.insert(index, node)
+
+    def remove_node(self, node: str):
+        """Remove node; its keys move to the next node clockwise"""
+        if node not in self._nodes:
+            return
+        self._nodes.remove(node)
+        kept = [(p, o) for p, o in zip(self._points, self._owners) if o != node]
+        self._points = [p for p, _ in kept]
+        self._owners = [o for _, o in kept]
+
+    def get_node(self, key: str) -> str:
+        """Owner node for a routing key"""
+        if not self._points:
+            raise ValueError("Hash ring has no nodes")
+        index = bisect.bisect(self._points, self._hash(hash_tag(key)))
+        return self._owners[index % len(self._points)]
+
+
+class RedisShardSet:
+    """Named redis.asyncio clients behind a consistent hash ring"""
+
+    def __init__(self, shard_configs: List[Dict[str, Any]], vnodes: int = 160,
+                 connection_kwargs: Optional[Dict[str, Any]] = None):
+        if not shard_configs:
+            raise ValueError("At least one shard is required")
+
+        connection_kwargs = connection_kwargs or {}
+        self.shard_configs = {}
+        self.pools: Dict[str, aioredis.ConnectionPool] = {}
+        self.clients: Dict[str, aioredis.Redis] = {}
+
+        for shard in shard_configs:
+            name = shard.get('name') or f"{shard['host']}:{shard.get('port', 6379)}"
+            self.shard_configs[name] = shard
+            self.pools[name] = aioredis.ConnectionPool(
+                host=shard['host'],
+                port=shard.get('port', 6379),
+                db=shard.get('db', 0),
+                **connection_kwargs
+            )
+            self.clients[name] = aioredis.Redis(connection_pool=self.pools[name])
+
+        self.names = list(self.clients)
+        self.primary = self.names[0]  # Holds unsharded keys (config, version stamps)
+        self.ring = ConsistentHashRing(self.names, vnodes=vnodes)
+
+    def __len__(self) -> int:
+        return len(self.names)
+
+    def node_for(self, routing_key: str) -> str:
+        return self.ring.get_node(routing_key)
+
+    def client_for(self, routing_key: str) -> aioredis.Redis:
+        """Client owning routing_key"""
+        return self.clients[self.ring.get_node(routing_key)]
+
+    @property
+    def primary_client(self) -> aioredis.Redis:
+        return self.clients[self.primary]
+
+    def group_by_node(self, routing_keys: List[str]) -> Dict[str, List[int]]:
+        """Indexes of routing_keys grouped by owning shard"""
+        groups: Dict[str, List[int]] = {}
+        for i, key in enumerate(routing_keys):
+            groups.setdefault(self.ring.get_node(key), []).append(i)
+        return groups
+
+    async def fan_out(self, fn: Callable[[str, aioredis.Redis], Awaitable[Any]]) -> Dict[str, Any]:
+        """Run fn(name, client) on every shard concurrently; failed shards map to their exception"""
+        results = await asyncio.gather(
+            *(fn(name, client) for name, client in self.clients.items()),
+            return_exceptions=True
+        )
+        for name, result in zip(self.names, results):
+            if isinstance(result, Exception):
+                logger.warning(f"Shard {name} failed during fan-out: {result}")
+        return dict(zip(self.names, results))
+
+    async def close(self):
+        for pool in self.pools.values():
+            await pool.disconnect()
+
+
+def shard_configs_from(config: Dict[str, Any], default: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """Shard list from config['shards'] (dicts or 'host:port/db' strings), else the single default node"""
+    shards = config.get('shards')
+    if not shards:
+        return [dict(default, name=default.get('name', 'primary'))]
+    return [parse_shard_url(s) if isinstance(s, str) else s for s in shards]
+
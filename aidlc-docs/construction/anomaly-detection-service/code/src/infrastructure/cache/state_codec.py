@@ -0,0 +1,206 @@
+"""
+State Codec Layer
+Pluggable, version-tagged serialization for correlation state and cache values.
+"""
+
+import json
+import struct
+from abc import ABC, abstractmethod
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, Optional
+import logging
+
+try:
+    import msgpack
+except ImportError:  # msgpack is optional; compact JSON is used without it
+    msgpack = None
+
+logger = logging.getLogger(__name__)
+
+# Encoded payloads start with a NUL marker byte followed by codec id and
+# format version. Legacy JSON values can never start with NUL, so anything
+# without the marker is read as plain JSON.
+CODEC_MARKER = b'\x00'
+HEADER_SIZE = 3
+
+# msgpack extension type used for datetimes (int64 epoch microseconds)
+DATETIME_EXT_TYPE = 1
+
+_EPOCH = datetime(1970, 1, 1)
+_EPOCH_UTC = datetime(1970, 1, 1, tzinfo=timezone.utc)
+
+
+def datetime_to_epoch_us(value: datetime) -> int:
+    """Convert datetime to integer epoch microseconds (naive values are UTC)"""
+    if value.tzinfo is not None:
+        value = value.astimezone(timezone.utc).replace(tzinfo=None)
+    delta = value - _EPOCH
+    return (delta.days * 86400 + delta.seconds) * 1_000_000 + delta.microseconds
+
+
+def epoch_us_to_datetime(value: int) -> datetime:
+    """Convert integer epoch microseconds to an aware UTC datetime (exact, no float rounding)"""
+    return _EPOCH_UTC + timedelta(microseconds=int(value))
+
+
+def to_epoch_us(value: Any) -> int:
+    """Normalize a stored timestamp (epoch us, datetime or legacy ISO string) to epoch us"""
+    if isinstance(value, int):
+        return value
+    if isinstance(value, datetime):
+        return datetime_to_epoch_us(value)
+    if isinstance(value, float):
+        return int(value)
+    return datetime_to_epoch_us(datetime.fromisoformat(value.replace('Z', '+00:00')))
+
+
+class StateCodec(ABC):
+    """Base class for cache value codecs"""
+
+    name = 'base'
+    codec_id = 0
+    version = 1
+
+    def header(self) -> bytes:
+        return CODEC_MARKER + bytes((self.codec_id, self.version))
+
+    def encode(self, data: Any) -> bytes:
+        """Encode value to tagged bytes"""
+        return self.header() + self._encode_body(data)
+
+    @abstractmethod
+    def decode_body(self, body: bytes, version: int) -> Any:
+        """Decode a payload body written in the given format version"""
+
+    @abstractmethod
+    def _encode_body(self, data: Any) -> bytes:
+        """Encode a value without the header"""
+
+
+class LegacyJsonCodec(StateCodec):
+    """Untagged JSON with ISO timestamp strings (original storage format)"""
+
+    name = 'json'
+    codec_id = 0
+
+    def encode(self, data: Any) -> bytes:
+        return self._encode_body(data)
+
+    def _encode_body(self, data: Any) -> bytes:
+        return json.dumps(data, default=str).encode('utf-8')
+
+    def decode_body(self, body: bytes, version: int) -> Any:
+        return json.loads(body)
+
+
+class CompactJsonCodec(StateCodec):
+    """Tagged compact JSON with datetimes as epoch microsecond integers"""
+
+    name = 'compact_json'
+    codec_id = 2
+
+    def _encode_body(self, data: Any) -> bytes:
+        return json.dumps(data, default=self._default, separators=(',', ':')).encode('utf-8')
+
+    def decode_body(self, body: bytes, version: int) -> Any:
+        return json.loads(body)
+
+    @staticmethod
+    def _default(value: Any) -> Any:
+        if isinstance(value, datetime):
+            return datetime_to_epoch_us(value)
+        if isinstance(value, (set, frozenset)):
+            return list(value)
+        return str(value)
+
+
+class MsgpackCodec(StateCodec):
+    """Tagged msgpack with datetimes as int64 epoch microsecond extension values"""
+
+    name = 'msgpack'
+    codec_id = 1
+
+    def __init__(self):
+        if msgpack is None:
+            raise ImportError("msgpack is required for MsgpackCodec")
+
+    def _encode_body(self, data: Any) -> bytes:
+        return msgpack.packb(data, default=self._default, use_bin_type=True)
+
+    def decode_body(self, body: bytes, version: int) -> Any:
+        return msgpack.unpackb(body, ext_hook=self._ext_hook, raw=False, strict_map_key=False)
+
+    @staticmethod
+    def _default(value: Any) -> Any:
+        if isinstance(value, datetime):
+            return msgpack.ExtType(DATETIME_EXT_TYPE, struct.pack('>q', datetime_to_epoch_us(value)))
+        if isinstance(value, (set, frozenset)):
+            return list(value)
+        return str(value)
+
+    @staticmethod
+    def _ext_hook(code: int, data: bytes) -> Any:
+        if code == DATETIME_EXT_TYPE:
+            return struct.unpack('>q', data)[0]
+        return msgpack.ExtType(code, data)
+
+
+_CODEC_CLASSES = {
+    LegacyJsonCodec.name: LegacyJsonCodec,
+    CompactJsonCodec.name: CompactJsonCodec,
+    MsgpackCodec.name: MsgpackCodec,
+}
+
+_DECODERS: Dict[int, StateCodec] = {}
+
+
+def get_codec(name: Optional[str] = None) -> StateCodec:
+    """Get codec by name, falling back to compact JSON when msgpack is unavailable"""
+    name = name or 'msgpack'
+    if name == MsgpackCodec.name and msgpack is None:
+        logger.warning("msgpack not installed, using compact_json state codec")
+        name = CompactJsonCodec.name
+
+    codec_class = _CODEC_CLASSES.get(name)
+    if codec_class is None:
+        raise ValueError(f"Unknown state codec: {name}")
+    return codec_class()
+
+
+def _decoder_for(codec_id: int) -> StateCodec:
+    decoder = _DECODERS.get(codec_id)
+    if decoder is None:
+        for codec_class in _CODEC_CLASSES.values():
+            if codec_class.codec_id == codec_id:
+                decoder = codec_class()
+                break
+        else:
+            raise ValueError(f"Unknown state codec id: {codec_id}")
+        _DECODERS[codec_id] = decoder
+    return decoder
+
+
+def decode_value(payload: Any) -> Any:
+    """Decode a cache payload written by any codec, including legacy JSON.
+
+    Tagged codecs return datetimes as epoch microsecond ints. Legacy JSON holds them as ISO
+    strings and is returned as stored: only callers that know their timestamp fields (such as
+    CorrelationState.from_dict) normalize them with to_epoch_us.
+    """
+    if payload is None:
+        return None
+    if isinstance(payload, str):
+        return json.loads(payload)
+
+    payload = bytes(payload)
+    if not payload.startswith(CODEC_MARKER):
+        return json.loads(payload)
+
+    if len(payload) < HEADER_SIZE:
+        raise ValueError("Truncated state codec header")
+
+    codec_id, version = payload[1], payload[2]
+    decoder = _decoder_for(codec_id)
+    if not 1 <= version <= decoder.version:
+        raise ValueError(f"Unsupported {decoder.name} format version {version} (supported up to {decoder.version})")
+    return decoder.decode_body(payload[HEADER_SIZE:], version)
@@ -3,16 +3,66 @@ EventBridge Event Publisher
 Publishes validated anomalies to AI Agent Service via EventBridge
 """
 
-import json
+import asyncio
+import functools
 import logging
+import random
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
-from typing import Dict, List, Optional, Any
-from dataclasses import dataclass, asdict
+from typing import Dict, List, Optional, Any, Tuple
+from dataclasses import dataclass
 import boto3
+from botocore.config import Config
 from botocore.exceptions import ClientError, BotoCoreError
 
+from .event_spool import EventSpool, SpoolFull
+from ...utils.serialization.fast_json import dumps, dumps_text, dumps_with, loads
+
 logger = logging.getLogger(__name__)
 
+# PutEvents request limits
+MAX_ENTRIES_PER_REQUEST = 10
+MAX_REQUEST_BYTES = 256 * 1024
+
+# Error codes that fail the same way on every retry
+PERMANENT_ERROR_CODES = frozenset({
+    'AccessDeniedException', 'InvalidArgument', 'MalformedDetail', 'NotAuthorizedForSourceException',
+    'ResourceNotFoundException', 'ValidationException'
+})
+
+
+def entry_size(entry: Dict[str, Any]) -> int:
+    """Size of one entry as EventBridge counts it against the request limit"""
+    size = 14 if entry.get('Time') else 0
+    for key in ('Source', 'DetailType', 'Detail'):
+        if entry.get(key):
+            size += len(entry[key].encode('utf-8'))
+    for resource in entry.get('Resources') or ():
+        size += len(resource.encode('utf-8'))
+    return size
+
+
+def pack_entries(entries: List[Dict[str, Any]], max_entries: int = MAX_ENTRIES_PER_REQUEST,
+                 max_bytes: int = MAX_REQUEST_BYTES) -> Tuple[List[List[int]], List[int]]:
+    """Entry indexes packed in order into requests within both limits, plus entries too large to send at all"""
+    chunks: List[List[int]] = []
+    oversized: List[int] = []
+    chunk: List[int] = []
+    chunk_bytes = 0
+    for index, entry in enumerate(entries):
+        size = entry_size(entry)
+        if size > max_bytes:
+            oversized.append(index)
+            continue
+        if chunk and (len(chunk) >= max_entries or chunk_bytes + size > max_bytes):
+            chunks.append(chunk)
+            chunk, chunk_bytes = [], 0
+        chunk.append(index)
+        chunk_bytes += size
+    if chunk:
+        chunks.append(chunk)
+    return chunks, oversized
+
 @dataclass
 class AnomalyEvent:
     """Anomaly event data structure"""
@@ -31,84 +81,134 @@ class AnomalyEvent:
 class EventPublisher:
     """EventBridge event publisher for anomaly notifications"""
     
-    def __init__(self, event_bus_name: str, source_name: str = "anomaly-detection-service"):
+    def __init__(self, event_bus_name: str, source_name: str = "anomaly-detection-service",
+                 max_concurrency: int = 4, max_retries: int = 3, retry_base_delay: float = 0.1,
+                 retry_max_delay: float = 5.0, client: Any = None):
         self.event_bus_name = event_bus_name
         self.source_name = source_name
-        self.client = boto3.client('events')
+        self.max_concurrency = max_concurrency
+        self.max_retries = max_retries
+        self.retry_base_delay = retry_base_delay
+        self.retry_max_delay = retry_max_delay
+        # client is injectable so a local bus can stand in for EventBridge
+        self.client = client or boto3.client('events', config=Config(max_pool_connections=max(10, max_concurrency)))
         self._health_status = True
         
+        # boto3 calls block, so they run on a small pool; the semaphore bounds requests in flight
+        self._executor = ThreadPoolExecutor(max_workers=max_concurrency, thread_name_prefix='eventbridge')
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+        
     async def publish_anomaly(self, anomaly: AnomalyEvent) -> bool:
         """Publish single anomaly event"""
         try:
             event_entry = self._create_event_entry(anomaly)
-            response = self.client.put_events(Entries=[event_entry])
+            if entry_size(event_entry) > MAX_REQUEST_BYTES:
+                logger.error(f"Anomaly {anomaly.anomaly_id} event exceeds {MAX_REQUEST_BYTES} bytes")
+                return False
             
-            if response['FailedEntryCount'] > 0:
-                logger.error(f"Failed to publish anomaly {anomaly.anomaly_id}: {response['Entries'][0].get('ErrorMessage')}")
+            failed, _ = await self._send_entries([event_entry])
+            if failed:
+                logger.error(f"Failed to publish anomaly {anomaly.anomaly_id}")
                 return False
                 
             logger.info(f"Published anomaly event {anomaly.anomaly_id}")
             return True
             
-        except (ClientError, BotoCoreError) as e:
-            logger.error(f"AWS error publishing anomaly {anomaly.anomaly_id}: {e}")
-            self._health_status = False
-            return False
         except Exception as e:
             logger.error(f"Unexpected error publishing anomaly {anomaly.anomaly_id}: {e}")
             return False
     
-    async def publish_batch(self, anomalies: List[AnomalyEvent]) -> Dict[str, int]:
-        """Publish batch of anomaly events (max 10 per batch)"""
-        results = {"success": 0, "failed": 0}
-        
-        # Process in batches of 10 (EventBridge limit)
-        for i in range(0, len(anomalies), 10):
-            batch = anomalies[i:i+10]
-            batch_results = await self._publish_batch_chunk(batch)
-            results["success"] += batch_results["success"]
-            results["failed"] += batch_results["failed"]
-            
-        return results
-    
-    async def _publish_batch_chunk(self, batch: List[AnomalyEvent]) -> Dict[str, int]:
-        """Publish single batch chunk"""
+    async def publish_batch(self, anomalies: List[AnomalyEvent]) -> Dict[str, Any]:
+        """Publish anomaly events in requests packed by count and size, sent concurrently"""
         try:
-            entries = [self._create_event_entry(anomaly) for anomaly in batch]
-            response = self.client.put_events(Entries=entries)
-            
-            success_count = len(batch) - response['FailedEntryCount']
-            failed_count = response['FailedEntryCount']
+            entries = [self._create_event_entry(anomaly) for anomaly in anomalies]
+            chunks, oversized = pack_entries(entries)
+            for index in oversized:
+                logger.error(f"Anomaly {anomalies[index].anomaly_id} event exceeds {MAX_REQUEST_BYTES} bytes")
             
-            if failed_count > 0:
-                for i, entry in enumerate(response['Entries']):
-                    if 'ErrorCode' in entry:
-                        logger.error(f"Failed to publish batch item {i}: {entry.get('ErrorMessage')}")
+            chunk_results = await asyncio.gather(
+                *(self._send_entries([entries[index] for index in chunk]) for chunk in chunks)
+            )
+            failed = sorted(oversized + [
+                chunk[position] for chunk, (positions, _) in zip(chunks, chunk_results) for position in positions
+            ])
+            rejected = sorted(oversized + [
+                chunk[position] for chunk, (_, positions) in zip(chunks, chunk_results) for position in positions
+            ])
             
-            logger.info(f"Batch published: {success_count} success, {failed_count} failed")
-            return {"success": success_count, "failed": failed_count}
-            
-        except (ClientError, BotoCoreError) as e:
-            logger.error(f"AWS error publishing batch: {e}")
-            self._health_status = False
-            return {"success": 0, "failed": len(batch)}
         except Exception as e:
             logger.error(f"Unexpected error publishing batch: {e}")
-            return {"success": 0, "failed": len(batch)}
+            failed, rejected = list(range(len(anomalies))), []
+        
+        success_count = len(anomalies) - len(failed)
+        logger.info(f"Batch published: {success_count} success, {len(failed)} failed")
+        return {
+            "success": success_count,
+            "failed": len(failed),
+            "failed_events": [anomalies[index] for index in failed],
+            # Subset of failed_events that no retry can deliver (too large or rejected by EventBridge)
+            "rejected_events": [anomalies[index] for index in rejected]
+        }
+    
+    async def _send_entries(self, entries: List[Dict[str, Any]]) -> Tuple[List[int], List[int]]:
+        """Send one request's entries, retrying only failed ones with jittered backoff; returns (failed, rejected) positions"""
+        pending = list(range(len(entries)))
+        permanent: List[int] = []
+        for attempt in range(self.max_retries + 1):
+            if attempt:
+                await asyncio.sleep(self._backoff(attempt))
+            try:
+                response = await self._put_events([entries[position] for position in pending])
+            except (ClientError, BotoCoreError) as e:
+                logger.warning(f"AWS error publishing {len(pending)} events (attempt {attempt + 1}): {e}")
+                self._health_status = False
+                error_code = e.response.get('Error', {}).get('Code') if isinstance(e, ClientError) else None
+                if error_code in PERMANENT_ERROR_CODES:
+                    permanent.extend(pending)
+                    pending = []
+                    break
+                continue
+            
+            retry = []
+            for position, result in zip(pending, response['Entries']):
+                error_code = result.get('ErrorCode')
+                if error_code is None:
+                    continue
+                if error_code in PERMANENT_ERROR_CODES:
+                    logger.error(f"Event rejected ({error_code}): {result.get('ErrorMessage')}")
+                    permanent.append(position)
+                else:
+                    retry.append(position)
+            pending = retry
+            if not pending:
+                break
+        
+        if pending:
+            logger.error(f"Gave up on {len(pending)} events after {self.max_retries} retries")
+        return sorted(permanent + pending), sorted(permanent)
+    
+    async def _put_events(self, entries: List[Dict[str, Any]]) -> Dict[str, Any]:
+        async with self._semaphore:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(self._executor, functools.partial(self.client.put_events, Entries=entries))
+    
+    def _backoff(self, attempt: int) -> float:
+        """Full jitter: uniform up to the capped exponential delay"""
+        return random.uniform(0, min(self.retry_max_delay, self.retry_base_delay * 2 ** (attempt - 1)))
     
     def _create_event_entry(self, anomaly: AnomalyEvent) -> Dict[str, Any]:
         """Create EventBridge event entry"""
-        detail = asdict(anomaly)
-        
-        # Add metadata
-        detail['event_version'] = '1.0'
-        detail['published_at'] = datetime.utcnow().isoformat()
-        detail['publisher'] = self.source_name
+        # The dataclass is encoded directly and the metadata appended, without an asdict() copy
+        detail = dumps_with(anomaly, {
+            'event_version': '1.0',
+            'published_at': datetime.utcnow().isoformat(),
+            'publisher': self.source_name
+        })
         
         return {
             'Source': self.source_name,
             'DetailType': f'Anomaly Detected - {anomaly.threat_type}',
-            'Detail': json.dumps(detail),
+            'Detail': detail.decode('utf-8'),
             'EventBusName': self.event_bus_name,
             'Resources': [
                 f'arn:aws:vpc-flow-logs:*:*:anomaly/{anomaly.anomaly_id}'
@@ -121,7 +221,7 @@ class EventPublisher:
             event_entry = {
                 'Source': self.source_name,
                 'DetailType': f'System Event - {event_type}',
-                'Detail': json.dumps({
+                'Detail': dumps_text({
                     'event_type': event_type,
                     'timestamp': datetime.utcnow().isoformat(),
                     'service': self.source_name,
@@ -130,7 +230,7 @@ class EventPublisher:
                 'EventBusName': self.event_bus_name
             }
             
-            response = self.client.put_events(Entries=[event_entry])
+            response = await self._put_events([event_entry])
             
             if response['FailedEntryCount'] > 0:
                 logger.error(f"Failed to publish system event {event_type}")
@@ -165,17 +265,27 @@ class EventPublisher:
                 'event_bus': self.event_bus_name,
                 'last_check': datetime.utcnow().isoformat()
             }
+    
+    def close(self):
+        """Stop the request thread pool"""
+        self._executor.shutdown(wait=True)
 
 class EventPublisherManager:
-    """Manages multiple event publishers with failover"""
+    """Manages multiple event publishers with failover; events both buses fail on go to the spool when one is set"""
     
-    def __init__(self, primary_bus: str, fallback_bus: Optional[str] = None):
-        self.primary_publisher = EventPublisher(primary_bus)
-        self.fallback_publisher = EventPublisher(fallback_bus) if fallback_bus else None
+    def __init__(self, primary_bus: str, fallback_bus: Optional[str] = None, spool: Optional[EventSpool] = None,
+                 **publisher_options):
+        self.primary_publisher = EventPublisher(primary_bus, **publisher_options)
+        self.fallback_publisher = EventPublisher(fallback_bus, **publisher_options) if fallback_bus else None
+        self.spool = spool
+        self._drainer: Optional[asyncio.Task] = None
         self._metrics = {
             'events_published': 0,
             'events_failed': 0,
-            'failover_count': 0
+            'failover_count': 0,
+            'events_spooled': 0,
+            'events_replayed': 0,
+            'events_dropped': 0
         }
     
     async def publish_anomaly(self, anomaly: AnomalyEvent) -> bool:
@@ -196,24 +306,134 @@ class EventPublisherManager:
                 return True
         
         self._metrics['events_failed'] += 1
+        await self._spool_events([anomaly])
         return False
     
-    async def publish_batch(self, anomalies: List[AnomalyEvent]) -> Dict[str, int]:
+    async def publish_batch(self, anomalies: List[AnomalyEvent]) -> Dict[str, Any]:
         """Publish batch with automatic failover"""
-        # Try primary publisher
-        results = await self.primary_publisher.publish_batch(anomalies)
-        
-        # If some failed and fallback available, retry failed ones
-        if results['failed'] > 0 and self.fallback_publisher:
-            logger.warning(f"Primary publisher had {results['failed']} failures, retrying with fallback")
-            # Note: In real implementation, would need to track which specific events failed
-            # For simplicity, this is a basic retry mechanism
-            
+        results = await self._publish_with_failover(anomalies)
         self._metrics['events_published'] += results['success']
         self._metrics['events_failed'] += results['failed']
         
+        # Rejected events would fail again on replay, so only retryable failures are spooled
+        rejected = {id(anomaly) for anomaly in results['rejected_events']}
+        results['spooled'] = await self._spool_events(
+            [anomaly for anomaly in results['failed_events'] if id(anomaly) not in rejected]
+        )
+        return results
+    
+    async def _publish_with_failover(self, anomalies: List[AnomalyEvent]) -> Dict[str, Any]:
+        # Try primary publisher
+        results = await self.primary_publisher.publish_batch(anomalies)
+        
+        # Events the primary gave up on are retried on the fallback
+        rejected = {id(anomaly) for anomaly in results['rejected_events']}
+        retryable = [anomaly for anomaly in results['failed_events'] if id(anomaly) not in rejected]
+        if retryable and self.fallback_publisher:
+            logger.warning(f"Primary publisher had {len(retryable)} failures, retrying with fallback")
+            fallback_results = await self.fallback_publisher.publish_batch(retryable)
+            self._metrics['failover_count'] += fallback_results['success']
+            results = {
+                "success": results['success'] + fallback_results['success'],
+                "failed": len(results['rejected_events']) + fallback_results['failed'],
+                "failed_events": results['rejected_events'] + fallback_results['failed_events'],
+                "rejected_events": results['rejected_events'] + fallback_results['rejected_events']
+            }
         return results
     
+    # Spool
+    
+    async def _spool_events(self, anomalies: List[AnomalyEvent]) -> int:
+        """Write undeliverable events to the spool for replay; returns how many were kept"""
+        if self.spool is None or not anomalies:
+            return 0
+        try:
+            stored = await asyncio.get_running_loop().run_in_executor(
+                None, self.spool.append, [dumps(anomaly) for anomaly in anomalies]
+            )
+        except (SpoolFull, OSError) as e:
+            logger.error(f"Dropping {len(anomalies)} undeliverable events: {e}")
+            self._metrics['events_dropped'] += len(anomalies)
+            return 0
+        self._metrics['events_spooled'] += stored
+        logger.warning(f"Spooled {stored} undeliverable events")
+        return stored
+    
+    async def drain_spool(self, max_events: int = 100) -> bool:
+        """Replay spooled events in order until the spool is empty (True) or a bus fails again (False).
+        
+        Delivery is at-least-once: events after the first retryable failure are not committed and are
+        sent again on the next drain even if a bus accepted them. events_replayed and events_dropped
+        count committed events only, so each spooled event is counted once.
+        """
+        loop = asyncio.get_running_loop()
+        while True:
+            records = await loop.run_in_executor(None, self.spool.read, max_events)
+            if not records:
+                return True
+            
+            events: List[Optional[AnomalyEvent]] = []
+            for payload, _ in records:
+                try:
+                    events.append(AnomalyEvent(**loads(payload)))
+                except (ValueError, TypeError) as e:
+                    logger.error(f"Discarding unreadable spooled event: {e}")
+                    events.append(None)
+            
+            readable = [event for event in events if event is not None]
+            results = await self._publish_with_failover(readable)
+            rejected = {id(event) for event in results['rejected_events']}
+            retryable = {id(event) for event in results['failed_events']} - rejected
+            
+            # Commit up to the first event that still needs a bus; later ones are resent with it
+            position, committed, dropped = None, 0, 0
+            for event, (_, end) in zip(events, records):
+                if event is not None and id(event) in retryable:
+                    break
+                position, committed = end, committed + 1
+                if event is None or id(event) in rejected:
+                    dropped += 1
+            # Counted before the await: the commit completes in its thread even if this task is cancelled meanwhile
+            self._metrics['events_replayed'] += committed - dropped
+            self._metrics['events_dropped'] += dropped
+            if position is not None:
+                await loop.run_in_executor(None, self.spool.commit, position, committed)
+            if retryable:
+                return False
+    
+    def start_spool_drainer(self, interval: float = 5.0, max_interval: float = 60.0):
+        """Background task that syncs the spool and replays it, backing off while the buses stay down"""
+        if self.spool is None or self._drainer is not None:
+            return
+        self._drainer = asyncio.get_running_loop().create_task(self._drain_loop(interval, max_interval))
+    
+    async def stop_spool_drainer(self):
+        if self._drainer is not None:
+            self._drainer.cancel()
+            try:
+                await self._drainer
+            except asyncio.CancelledError:
+                pass
+            self._drainer = None
+        if self.spool is not None:
+            self.spool.sync()
+    
+    async def _drain_loop(self, interval: float, max_interval: float):
+        delay = interval
+        loop = asyncio.get_running_loop()
+        while True:
+            await asyncio.sleep(delay)
+            try:
+                await loop.run_in_executor(None, self.spool.sync)
+                if self.spool.depth() == 0 or await self.drain_spool():
+                    delay = interval
+                else:
+                    delay = min(max_interval, delay * 2)
+                    logger.warning(f"Spool replay stalled with {self.spool.depth()} events; retrying in {delay:.0f}s")
+            except Exception as e:
+                logger.error(f"Spool drainer error: {e}")
+                delay = min(max_interval, delay * 2)
+    
     def get_metrics(self) -> Dict[str, Any]:
         """Get publisher metrics"""
         primary_health = self.primary_publisher.get_health_status()
@@ -222,5 +442,6 @@ class EventPublisherManager:
         return {
             'metrics': self._metrics,
             'primary_publisher': primary_health,
-            'fallback_publisher': fallback_health
+            'fallback_publisher': fallback_health,
+            'spool': self.spool.get_statistics() if self.spool is not None else None
         }
\ No newline at end of file
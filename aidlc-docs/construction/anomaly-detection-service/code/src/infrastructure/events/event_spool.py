@@ -0,0 +1,299 @@
+"""
+Event Spool
+Durable append-only spool for anomaly events that could not be delivered, kept as CRC-framed records in rolling segment files.
+"""
+
+import glob
+import json
+import os
+import struct
+import threading
+import time
+import zlib
+from typing import Any, Dict, List, NamedTuple, Optional, Tuple
+import logging
+
+# Frame header: payload length, crc32 of spooled_at + payload, spooled_at (epoch seconds)
+_FRAME = struct.Struct('<IId')
+_TIMESTAMP = struct.Struct('<d')
+
+SEGMENT_PATTERN = 'spool-{:012d}.log'
+CURSOR_FILE = 'spool.cursor'
+
+
+class SpoolPosition(NamedTuple):
+    """Read position: segment sequence, byte offset and records consumed within that segment"""
+    segment: int
+    offset: int
+    index: int
+
+
+class SpoolFull(Exception):
+    """Raised by append() under the reject_new eviction policy when the spool is at max_bytes"""
+
+
+class _Segment:
+    __slots__ = ('sequence', 'path', 'size', 'records')
+
+    def __init__(self, sequence: int, path: str, size: int = 0, records: int = 0):
+        self.sequence = sequence
+        self.path = path
+        self.size = size
+        self.records = records
+
+
+class EventSpool:
+    """Appends go to the newest segment and are fsynced in batches; a persisted cursor tracks what has been replayed"""
+
+    def __init__(self, config: Dict[str, Any]):
+        self.logger = logging.getLogger(__name__)
+        self.directory = config['directory']
+        self.max_bytes = config.get('max_bytes', 512 * 1024 * 1024)
+        self.segment_bytes = min(config.get('segment_bytes', 8 * 1024 * 1024), max(self.max_bytes // 4, 1))
+        # An fsync covers every append since the last one: whichever limit is hit first triggers it
+        self.fsync_batch = config.get('fsync_batch', 256)
+        self.fsync_interval = config.get('fsync_interval', 0.2)
+        # drop_oldest deletes the oldest segments to make room; reject_new refuses appends instead
+        self.eviction = config.get('eviction', 'drop_oldest')
+        if self.eviction not in ('drop_oldest', 'reject_new'):
+            raise ValueError(f"Unknown spool eviction policy: {self.eviction}")
+
+        self._lock = threading.RLock()
+        self._segments: List[_Segment] = []
+        self._handle = None
+        self._unsynced = 0
+        self._last_sync = time.monotonic()
+        self._cursor = SpoolPosition(0, 0, 0)
+        self.stats = {'appended': 0, 'replayed': 0, 'evicted': 0, 'rejected': 0, 'fsyncs': 0, 'corrupt': 0}
+
+        os.makedirs(self.directory, exist_ok=True)
+        self._recover()
+
+    # Recovery
+
+    def _recover(self):
+        """Scan segments, cut a torn tail off the newest one and load the cursor"""
+        paths = sorted(glob.glob(os.path.join(self.directory, 'spool-*.log')))
+        for path in paths:
+            sequence = int(os.path.basename(path)[len('spool-'):-len('.log')])
+            size, records = self._scan(path)
+            if size < os.path.getsize(path):
+                self.logger.warning(f"Truncating {os.path.getsize(path) - size} bytes of torn or corrupt data in {path}")
+                self.stats['corrupt'] += 1
+                with open(path, 'r+b') as f:
+                    f.truncate(size)
+            self._segments.append(_Segment(sequence, path, size, records))
+        if not self._segments:
+            self._segments.append(self._new_segment(1))
+
+        cursor = self._load_cursor()
+        first = self._segments[0]
+        segment = self._find(cursor.segment) if cursor else None
+        if segment is None or cursor.offset > segment.size:
+            # Cursor's segment was evicted or consumed while we were down
+            cursor = SpoolPosition(first.sequence, 0, 0)
+        self._cursor = cursor
+        for segment in [segment for segment in self._segments[:-1] if segment.sequence < cursor.segment]:
+            self._remove(segment)
+        self._handle = open(self._segments[-1].path, 'ab')
+
+    @staticmethod
+    def _scan(path: str) -> Tuple[int, int]:
+        """(bytes of valid frames, record count); stops at the first torn or corrupt frame"""
+        size = records = 0
+        with open(path, 'rb') as f:
+            while True:
+                header = f.read(_FRAME.size)
+                if len(header) < _FRAME.size:
+                    break
+                length, crc, spooled_at = _FRAME.unpack(header)
+                payload = f.read(length)
+                if len(payload) < length or zlib.crc32(payload, zlib.crc32(_TIMESTAMP.pack(spooled_at))) != crc:
+                    break
+                size += _FRAME.size + length
+                records += 1
+        return size, records
+
+    def _load_cursor(self) -> Optional[SpoolPosition]:
+        path = os.path.join(self.directory, CURSOR_FILE)
+        if not os.path.exists(path):
+            return None
+        try:
+            with open(path) as f:
+                data = json.load(f)
+            return SpoolPosition(data['segment'], data['offset'], data['index'])
+        except (OSError, ValueError, KeyError) as e:
+            self.logger.error(f"Failed to load spool cursor from {path}: {e}")
+            return None
+
+    def _save_cursor(self):
+        path = os.path.join(self.directory, CURSOR_FILE)
+        temp_path = f"{path}.tmp"
+        with open(temp_path, 'w') as f:
+            json.dump(self._cursor._asdict(), f)
+        os.replace(temp_path, path)
+
+    # Segments
+
+    def _new_segment(self, sequence: int) -> _Segment:
+        path = os.path.join(self.directory, SEGMENT_PATTERN.format(sequence))
+        open(path, 'ab').close()
+        return _Segment(sequence, path)
+
+    def _find(self, sequence: int) -> Optional[_Segment]:
+        for segment in self._segments:
+            if segment.sequence == sequence:
+                return segment
+        return None
+
+    def _roll(self):
+        self._sync()
+        self._handle.close()
+        self._segments.append(self._new_segment(self._segments[-1].sequence + 1))
+        self._handle = open(self._segments[-1].path, 'ab')
+
+    def _remove(self, segment: _Segment):
+        self._segments.remove(segment)
+        try:
+            os.remove(segment.path)
+        except OSError as e:
+            self.logger.error(f"Failed to remove spool segment {segment.path}: {e}")
+
+    # Writes
+
+    def append(self, payloads: List[bytes], spooled_at: Optional[float] = None) -> int:
+        """Append encoded events; returns how many were stored (SpoolFull under reject_new when there is no room)"""
+        spooled_at = time.time() if spooled_at is None else spooled_at
+        stamp = _TIMESTAMP.pack(spooled_at)
+        frames = [_FRAME.pack(len(payload), zlib.crc32(payload, zlib.crc32(stamp)), spooled_at) + payload
+                  for payload in payloads]
+        incoming = sum(len(frame) for frame in frames)
+        with self._lock:
+            if self.eviction == 'reject_new' and self.disk_bytes() + incoming > self.max_bytes:
+                self.stats['rejected'] += len(frames)
+                raise SpoolFull(f"Event spool is full ({self.disk_bytes()} of {self.max_bytes} bytes)")
+
+            for frame in frames:
+                if self._segments[-1].size and self._segments[-1].size + len(frame) > self.segment_bytes:
+                    self._roll()
+                self._handle.write(frame)
+                self._segments[-1].size += len(frame)
+                self._segments[-1].records += 1
+            self._unsynced += len(frames)
+            self.stats['appended'] += len(frames)
+
+            if self._unsynced >= self.fsync_batch or time.monotonic() - self._last_sync >= self.fsync_interval:
+                self._sync()
+            if self.eviction == 'drop_oldest':
+                self._evict()
+        return len(frames)
+
+    def sync(self):
+        """Flush and fsync anything appended since the last sync"""
+        with self._lock:
+            self._sync()
+
+    def _sync(self):
+        if not self._unsynced:
+            return
+        self._handle.flush()
+        os.fsync(self._handle.fileno())
+        self._unsynced = 0
+        self._last_sync = time.monotonic()
+        self.stats['fsyncs'] += 1
+
+    def _evict(self):
+        """Delete the oldest segments (never the one being written) until the spool fits in max_bytes"""
+        while self.disk_bytes() > self.max_bytes and len(self._segments) > 1:
+            oldest = self._segments[0]
+            lost = oldest.records - (self._cursor.index if self._cursor.segment == oldest.sequence else 0)
+            self._remove(oldest)
+            self.stats['evicted'] += lost
+            self.logger.warning(f"Spool over {self.max_bytes} bytes: evicted {lost} undelivered events")
+            if self._cursor.segment <= oldest.sequence:
+                self._cursor = SpoolPosition(self._segments[0].sequence, 0, 0)
+                self._save_cursor()
+
+    # Reads
+
+    def read(self, max_records: int = 100) -> List[Tuple[bytes, SpoolPosition]]:
+        """Next undelivered records in append order, each with the position just after it; does not advance"""
+        records: List[Tuple[bytes, SpoolPosition]] = []
+        with self._lock:
+            self._handle.flush()
+            position = self._cursor
+            for segment in self._segments:
+                if segment.sequence < position.segment:
+                    continue
+                offset, index = (position.offset, position.index) if segment.sequence == position.segment else (0, 0)
+                if offset >= segment.size:
+                    continue
+                with open(segment.path, 'rb') as f:
+                    f.seek(offset)
+                    while offset < segment.size and len(records) < max_records:
+                        length, _, _ = _FRAME.unpack(f.read(_FRAME.size))
+                        payload = f.read(length)
+                        offset += _FRAME.size + length
+                        index += 1
+                        records.append((payload, SpoolPosition(segment.sequence, offset, index)))
+                if len(records) >= max_records:
+                    break
+        return records
+
+    def commit(self, position: SpoolPosition, count: int):
+        """Mark everything up to position (count records) as delivered; consumed segments are deleted"""
+        with self._lock:
+            self._cursor = position
+            self.stats['replayed'] += count
+            # Whole segments behind the cursor are done; a finished segment that is no longer written to goes too
+            for segment in list(self._segments[:-1]):
+                if segment.sequence < position.segment or (
+                        segment.sequence == position.segment and position.offset >= segment.size):
+                    self._remove(segment)
+            if self._find(self._cursor.segment) is None:
+                self._cursor = SpoolPosition(self._segments[0].sequence, 0, 0)
+            self._save_cursor()
+
+    # Metrics
+
+    def disk_bytes(self) -> int:
+        return sum(segment.size for segment in self._segments)
+
+    def depth(self) -> int:
+        """Undelivered records"""
+        with self._lock:
+            pending = sum(segment.records for segment in self._segments if segment.sequence >= self._cursor.segment)
+            return pending - self._cursor.index
+
+    def oldest_age(self, now: Optional[float] = None) -> Optional[float]:
+        """Seconds since the oldest undelivered record was spooled"""
+        with self._lock:
+            self._handle.flush()
+            for segment in self._segments:
+                if segment.sequence < self._cursor.segment:
+                    continue
+                offset = self._cursor.offset if segment.sequence == self._cursor.segment else 0
+                if offset >= segment.size:
+                    continue
+                with open(segment.path, 'rb') as f:
+                    f.seek(offset)
+                    _, _, spooled_at = _FRAME.unpack(f.read(_FRAME.size))
+                return max(0.0, (time.time() if now is None else now) - spooled_at)
+        return None
+
+    def get_statistics(self) -> Dict[str, Any]:
+        with self._lock:
+            return dict(
+                self.stats,
+                depth=self.depth(),
+                oldest_age_seconds=self.oldest_age(),
+                disk_bytes=self.disk_bytes(),
+                max_bytes=self.max_bytes,
+                segments=len(self._segments),
+                eviction=self.eviction
+            )
+
+    def close(self):
+        with self._lock:
+            self._sync()
+            self._handle.close()
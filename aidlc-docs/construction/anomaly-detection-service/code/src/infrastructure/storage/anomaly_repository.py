@@ -0,0 +1,298 @@
+"""
+Anomaly Repository
+Embedded SQLite anomaly store partitioned by day, with IP and threat type indexes and keyset cursor pagination.
+"""
+
+import base64
+import glob
+import os
+import sqlite3
+import threading
+from collections import OrderedDict
+from datetime import datetime, timezone
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+import logging
+
+from ..cache.state_codec import to_epoch_us
+from ...utils.serialization.fast_json import dumps_text, loads
+
+DAY_US = 86400 * 1000000
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS anomalies (
+    anomaly_id TEXT PRIMARY KEY,
+    detected_at INTEGER NOT NULL,
+    source_ip TEXT,
+    destination_ip TEXT,
+    threat_type TEXT NOT NULL,
+    confidence_score REAL NOT NULL,
+    document TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS anomalies_time ON anomalies (detected_at, anomaly_id);
+CREATE INDEX IF NOT EXISTS anomalies_source ON anomalies (source_ip, detected_at);
+CREATE INDEX IF NOT EXISTS anomalies_destination ON anomalies (destination_ip, detected_at);
+CREATE INDEX IF NOT EXISTS anomalies_threat ON anomalies (threat_type, detected_at);
+"""
+
+
+def encode_cursor(detected_at: int, anomaly_id: str) -> str:
+    """Opaque cursor for the last row of a page"""
+    return base64.urlsafe_b64encode(f"{detected_at}:{anomaly_id}".encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor: str) -> Tuple[int, str]:
+    """(detected_at, anomaly_id) from a cursor; ValueError when malformed"""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)).decode()
+        detected_at, anomaly_id = raw.split(':', 1)
+        return int(detected_at), anomaly_id
+    except (ValueError, UnicodeDecodeError) as e:
+        raise ValueError(f"Invalid cursor: {cursor}") from e
+
+
+class AnomalyRepository:
+    """One SQLite file per UTC day; queries visit only the days in range, newest first"""
+
+    def __init__(self, config: Dict[str, Any]):
+        self.logger = logging.getLogger(__name__)
+        # ':memory:' keeps every partition in memory (tests, local runs)
+        self.directory = config.get('directory', ':memory:')
+        self.retention_days = config.get('retention_days', 90)
+        self.max_open_partitions = config.get('max_open_partitions', 32)
+        self.max_limit = config.get('max_limit', 1000)
+
+        self._lock = threading.RLock()
+        self._connections: 'OrderedDict[int, sqlite3.Connection]' = OrderedDict()
+        self._memory_days: set = set()
+        self.stats = {'duplicates': 0}
+        if self.directory != ':memory:':
+            os.makedirs(self.directory, exist_ok=True)
+
+    # Partitions
+
+    def _path(self, day: int) -> str:
+        stamp = datetime.fromtimestamp(day * 86400, tz=timezone.utc).strftime('%Y%m%d')
+        return os.path.join(self.directory, f"anomalies-{stamp}.db")
+
+    def _days(self) -> List[int]:
+        """Existing partitions, newest first"""
+        if self.directory == ':memory:':
+            return sorted(self._memory_days, reverse=True)
+        days = []
+        for path in glob.glob(os.path.join(self.directory, 'anomalies-*.db')):
+            stamp = os.path.basename(path)[len('anomalies-'):-len('.db')]
+            try:
+                days.append(int(datetime.strptime(stamp, '%Y%m%d').replace(tzinfo=timezone.utc).timestamp()) // 86400)
+            except ValueError:
+                continue
+        return sorted(days, reverse=True)
+
+    def _connection(self, day: int, create: bool = False) -> Optional[sqlite3.Connection]:
+        """Open partition for a day; caller holds the lock"""
+        connection = self._connections.get(day)
+        if connection is not None:
+            self._connections.move_to_end(day)
+            return connection
+        if self.directory == ':memory:':
+            if not create:
+                return None
+            connection = sqlite3.connect(':memory:', check_same_thread=False)
+            self._memory_days.add(day)
+        else:
+            path = self._path(day)
+            if not create and not os.path.exists(path):
+                return None
+            connection = sqlite3.connect(path, check_same_thread=False)
+            connection.execute('PRAGMA journal_mode=WAL')
+            connection.execute('PRAGMA synchronous=NORMAL')
+        connection.executescript(_SCHEMA)
+        self._connections[day] = connection
+
+        # In-memory partitions cannot be reopened, so only file-backed ones are evicted
+        if self.directory != ':memory:':
+            while len(self._connections) > self.max_open_partitions:
+                _, evicted = self._connections.popitem(last=False)
+                evicted.close()
+        return connection
+
+    # Writes
+
+    def save(self, anomaly: Dict[str, Any], detected_at: Any = None) -> str:
+        """Store one anomaly result dict; returns its id"""
+        self.save_many([anomaly], detected_at)
+        return anomaly['anomaly_id']
+
+    def save_many(self, anomalies: Iterable[Dict[str, Any]], detected_at: Any = None) -> int:
+        """Store anomaly result dicts, one transaction per day partition; returns how many were new"""
+        default_us = to_epoch_us(detected_at) if detected_at is not None else to_epoch_us(datetime.utcnow())
+        by_day: Dict[int, List[tuple]] = {}
+        for anomaly in anomalies:
+            timestamp = anomaly.get('detected_at')
+            timestamp_us = to_epoch_us(timestamp) if timestamp is not None else default_us
+            entities = anomaly.get('entities') or []
+            row = (
+                anomaly['anomaly_id'],
+                timestamp_us,
+                anomaly.get('source_ip') or (entities[0] if entities else None),
+                anomaly.get('destination_ip') or (entities[1] if len(entities) > 1 else None),
+                anomaly.get('threat_type', 'UNKNOWN'),
+                float(anomaly.get('confidence_score', 0.0)),
+                dumps_text(dict(anomaly, detected_at=timestamp_us))
+            )
+            by_day.setdefault(timestamp_us // DAY_US, []).append(row)
+
+        # An id that is already stored is rejected, never overwritten
+        stored = 0
+        with self._lock:
+            for day, rows in by_day.items():
+                connection = self._connection(day, create=True)
+                with connection:
+                    before = connection.total_changes
+                    connection.executemany(
+                        'INSERT OR IGNORE INTO anomalies VALUES (?, ?, ?, ?, ?, ?, ?)', rows
+                    )
+                    stored += connection.total_changes - before
+            rejected = sum(len(rows) for rows in by_day.values()) - stored
+            self.stats['duplicates'] += rejected
+        if rejected:
+            self.logger.warning(f"Rejected {rejected} anomalies whose ids are already stored")
+        return stored
+
+    # Reads
+
+    def get(self, anomaly_id: str) -> Optional[Dict[str, Any]]:
+        """Anomaly by id, searching partitions newest first"""
+        with self._lock:
+            for day in self._days():
+                connection = self._connection(day)
+                if connection is None:
+                    continue
+                row = connection.execute(
+                    'SELECT document FROM anomalies WHERE anomaly_id = ?', (anomaly_id,)
+                ).fetchone()
+                if row is not None:
+                    return loads(row[0])
+        return None
+
+    def query(self, start_time: Any = None, end_time: Any = None, source_ip: Optional[str] = None,
+              destination_ip: Optional[str] = None, threat_types: Optional[List[str]] = None,
+              min_confidence: float = 0.0, limit: int = 100, cursor: Optional[str] = None,
+              count_total: bool = False) -> Dict[str, Any]:
+        """Newest-first page of matching anomalies with a cursor for the next page"""
+        limit = max(1, min(limit, self.max_limit))
+        start_us = to_epoch_us(start_time) if start_time is not None else None
+        end_us = to_epoch_us(end_time) if end_time is not None else None
+
+        # Filters shared by every partition; the cursor bound is added per query
+        clauses, params = [], []
+        if start_us is not None:
+            clauses.append('detected_at >= ?')
+            params.append(start_us)
+        if end_us is not None:
+            clauses.append('detected_at <= ?')
+            params.append(end_us)
+        if source_ip:
+            clauses.append('source_ip = ?')
+            params.append(source_ip)
+        if destination_ip:
+            clauses.append('destination_ip = ?')
+            params.append(destination_ip)
+        if threat_types:
+            clauses.append(f"threat_type IN ({', '.join('?' * len(threat_types))})")
+            params.extend(threat_types)
+        if min_confidence:
+            clauses.append('confidence_score >= ?')
+            params.append(min_confidence)
+
+        page_clauses, page_params = list(clauses), list(params)
+        after = decode_cursor(cursor) if cursor else None
+        if after is not None:
+            page_clauses.append('(detected_at < ? OR (detected_at = ? AND anomaly_id < ?))')
+            page_params.extend([after[0], after[0], after[1]])
+
+        anomalies, last_key, has_more = [], None, False
+        total = 0
+        with self._lock:
+            for day in self._partitions_in_range(start_us, end_us, after[0] if after else None):
+                connection = self._connection(day)
+                if connection is None:
+                    continue
+                if not has_more:
+                    # One row past the page tells whether anything older remains
+                    where = f"WHERE {' AND '.join(page_clauses)}" if page_clauses else ''
+                    rows = connection.execute(
+                        f"SELECT detected_at, anomaly_id, document FROM anomalies {where} "
+                        f"ORDER BY detected_at DESC, anomaly_id DESC LIMIT ?",
+                        page_params + [limit + 1 - len(anomalies)]
+                    ).fetchall()
+                    for detected_at, anomaly_id, document in rows:
+                        if len(anomalies) == limit:
+                            has_more = True
+                            break
+                        anomalies.append(loads(document))
+                        last_key = (detected_at, anomaly_id)
+                if count_total:
+                    where = f"WHERE {' AND '.join(clauses)}" if clauses else ''
+                    total += connection.execute(f"SELECT COUNT(*) FROM anomalies {where}", params).fetchone()[0]
+                elif has_more:
+                    break
+
+        return {
+            'anomalies': anomalies,
+            'has_more': has_more,
+            'next_cursor': encode_cursor(*last_key) if has_more and last_key else None,
+            'total_count': total if count_total else None
+        }
+
+    def _partitions_in_range(self, start_us: Optional[int], end_us: Optional[int],
+                             cursor_us: Optional[int]) -> List[int]:
+        upper = min(value for value in (end_us, cursor_us) if value is not None) \
+            if end_us is not None or cursor_us is not None else None
+        first_day = start_us // DAY_US if start_us is not None else None
+        last_day = upper // DAY_US if upper is not None else None
+        return [
+            day for day in self._days()
+            if (first_day is None or day >= first_day) and (last_day is None or day <= last_day)
+        ]
+
+    # Maintenance
+
+    def purge_expired(self, now: Any = None) -> int:
+        """Drop whole partitions older than retention_days; returns partitions removed"""
+        today = (to_epoch_us(now) if now is not None else to_epoch_us(datetime.utcnow())) // DAY_US
+        removed = 0
+        with self._lock:
+            for day in self._days():
+                if day > today - self.retention_days:
+                    continue
+                connection = self._connections.pop(day, None)
+                if connection is not None:
+                    connection.close()
+                if self.directory == ':memory:':
+                    self._memory_days.discard(day)
+                else:
+                    for suffix in ('', '-wal', '-shm'):
+                        if os.path.exists(self._path(day) + suffix):
+                            os.remove(self._path(day) + suffix)
+                removed += 1
+        if removed:
+            self.logger.info(f"Purged {removed} anomaly partitions older than {self.retention_days} days")
+        return removed
+
+    def get_statistics(self) -> Dict[str, Any]:
+        with self._lock:
+            days = self._days()
+            return {
+                'directory': self.directory,
+                'duplicates': self.stats['duplicates'],
+                'partitions': len(days),
+                'open_partitions': len(self._connections),
+                'oldest_day': datetime.fromtimestamp(days[-1] * 86400, tz=timezone.utc).date().isoformat() if days else None,
+                'newest_day': datetime.fromtimestamp(days[0] * 86400, tz=timezone.utc).date().isoformat() if days else None
+            }
+
+    def close(self):
+        with self._lock:
+            for connection in self._connections.values():
+                connection.close()
+            self._connections.clear()
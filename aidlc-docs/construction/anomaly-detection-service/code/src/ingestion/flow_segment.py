@@ -0,0 +1,568 @@
+"""
+Flow Segments
+Append-only fixed-width binary flow segments with a block time index, memory-mapped for replay and backfill.
+"""
+
+import argparse
+import glob
+import json
+import os
+import struct
+import sys
+import time
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+import logging
+
+import numpy as np
+
+from .vpc_flow_log_reader import FlowRecordBatch, VpcFlowLogReader
+from ..detection.filtering.static_prefilter import PROTOCOL_NAMES
+from ..utils.network.ip_codec import IPV4_LIMIT, IPV6_BASE, IpCodec
+from ..utils.timestamps.epoch import to_epoch
+
+# Header: magic, version, record size, flags, record count, min/max timestamp, index interval.
+# record_count is the commit point: bytes past it are a torn append and are ignored.
+MAGIC = b'FLOWSEG1'
+VERSION = 1
+HEADER_SIZE = 64
+_HEADER = struct.Struct('<8sHHIQqqI')
+FLAG_SORTED = 1
+
+# 64-byte little-endian records. Addresses are 128-bit big halves (IPv4 uses lo only);
+# the family byte holds the source family in the low nibble and destination in the high one
+# (4, 6, or 0 for '-').
+RECORD_DTYPE = np.dtype([
+    ('timestamp', '<i8'),
+    ('src_hi', '<u8'),
+    ('src_lo', '<u8'),
+    ('dst_hi', '<u8'),
+    ('dst_lo', '<u8'),
+    ('packets', '<u8'),
+    ('bytes', '<u8'),
+    ('src_port', '<u2'),
+    ('dst_port', '<u2'),
+    ('protocol', 'u1'),
+    ('action', 'u1'),
+    ('family', 'u1'),
+    ('reserved', 'V1')
+])
+
+ACTION_NAMES = ('ACCEPT', 'REJECT', '-')
+_ACTION_CODES = {name: code for code, name in enumerate(ACTION_NAMES)}
+_PROTOCOL_NUMBERS = {name: number for number, name in PROTOCOL_NAMES.items()}
+
+_LOW_64 = (1 << 64) - 1
+
+
+def _encode_addresses(codes: List[int]) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """(family, hi, lo) columns for IpCodec codes"""
+    count = len(codes)
+    family = np.zeros(count, dtype=np.uint8)
+    hi = np.zeros(count, dtype=np.uint64)
+    lo = np.zeros(count, dtype=np.uint64)
+    for row, code in enumerate(codes):
+        if 0 <= code < IPV4_LIMIT:
+            family[row] = 4
+            lo[row] = code
+        elif code >= IPV6_BASE:
+            value = code - IPV6_BASE
+            family[row] = 6
+            hi[row] = value >> 64
+            lo[row] = value & _LOW_64
+    return family, hi, lo
+
+
+def _decode_addresses(family: np.ndarray, hi: np.ndarray, lo: np.ndarray, codec: IpCodec) -> List[str]:
+    """Address strings for (family, hi, lo) columns, interned through the codec"""
+    decode = codec.decode
+    if (family == 4).all():
+        return [decode(code) for code in lo.tolist()]
+    addresses = []
+    for fam, high, low in zip(family.tolist(), hi.tolist(), lo.tolist()):
+        if fam == 4:
+            addresses.append(decode(low))
+        elif fam == 6:
+            addresses.append(decode(IPV6_BASE + ((high << 64) | low)))
+        else:
+            addresses.append('-')
+    return addresses
+
+
+def encode_flow_logs(flow_logs: List[Dict[str, Any]], codec: Optional[IpCodec] = None) -> np.ndarray:
+    """Segment records for flow log dicts (JSON shape or VpcFlowLogReader.to_flow_logs output)"""
+    codec = codec or IpCodec.shared()
+    records = np.zeros(len(flow_logs), dtype=RECORD_DTYPE)
+    src_family, records['src_hi'], records['src_lo'] = _encode_addresses(
+        codec.encode_many(log.get('source_ip') for log in flow_logs))
+    dst_family, records['dst_hi'], records['dst_lo'] = _encode_addresses(
+        codec.encode_many(log.get('destination_ip') for log in flow_logs))
+    records['family'] = src_family | (dst_family << 4)
+
+    timestamps, ports, protocols, actions, counts = [], [], [], [], []
+    for log in flow_logs:
+        timestamps.append(to_epoch(log.get('timestamp'), 0))
+        ports.append((int(log.get('source_port') or 0), int(log.get('destination_port') or 0)))
+        protocol = log.get('protocol', 0)
+        if isinstance(protocol, str):
+            protocol = int(protocol) if protocol.isdigit() else _PROTOCOL_NUMBERS.get(protocol.upper(), 0)
+        protocols.append(protocol)
+        actions.append(_ACTION_CODES.get(log.get('action', 'ACCEPT'), 2))
+        counts.append((int(log.get('packets') or 0), int(log.get('bytes') or 0)))
+
+    records['timestamp'] = timestamps
+    if flow_logs:
+        records['src_port'], records['dst_port'] = np.asarray(ports, dtype=np.uint16).T
+        records['packets'], records['bytes'] = np.asarray(counts, dtype=np.uint64).T
+    records['protocol'] = protocols
+    records['action'] = actions
+    return records
+
+
+def encode_batch(batch: FlowRecordBatch, codec: Optional[IpCodec] = None) -> np.ndarray:
+    """Segment records straight from a VpcFlowLogReader batch; integer columns are copied without boxing"""
+    codec = codec or IpCodec.shared()
+    count = len(batch)
+    records = np.zeros(count, dtype=RECORD_DTYPE)
+
+    def column(name: str) -> np.ndarray:
+        values = batch.columns.get(name)
+        return np.maximum(values, 0) if values is not None else np.zeros(count, dtype=np.int64)
+
+    records['timestamp'] = column('start')
+    records['src_port'] = column('srcport')
+    records['dst_port'] = column('dstport')
+    records['protocol'] = column('protocol')
+    records['packets'] = column('packets')
+    records['bytes'] = column('bytes')
+
+    src_family = dst_family = np.zeros(count, dtype=np.uint8)
+    if 'srcaddr' in batch.fields:
+        src_family, records['src_hi'], records['src_lo'] = _encode_addresses(codec.encode_many(batch.text('srcaddr')))
+    if 'dstaddr' in batch.fields:
+        dst_family, records['dst_hi'], records['dst_lo'] = _encode_addresses(codec.encode_many(batch.text('dstaddr')))
+    records['family'] = src_family | (dst_family << 4)
+    if 'action' in batch.fields:
+        records['action'] = [_ACTION_CODES.get(action, 2) for action in batch.text('action')]
+    return records
+
+
+def to_flow_logs(records: np.ndarray, codec: Optional[IpCodec] = None) -> List[Dict[str, Any]]:
+    """Flow log dicts in the shape TieredAnomalyProcessor.process_flow_logs consumes"""
+    codec = codec or IpCodec.shared()
+    family = records['family']
+    source_ips = _decode_addresses(family & 0x0F, records['src_hi'], records['src_lo'], codec)
+    destination_ips = _decode_addresses(family >> 4, records['dst_hi'], records['dst_lo'], codec)
+
+    protocol_names = {}
+    flow_logs = []
+    for timestamp, source_ip, destination_ip, source_port, destination_port, protocol, action, packets, size in zip(
+            records['timestamp'].tolist(), source_ips, destination_ips, records['src_port'].tolist(),
+            records['dst_port'].tolist(), records['protocol'].tolist(), records['action'].tolist(),
+            records['packets'].tolist(), records['bytes'].tolist()):
+        if protocol not in protocol_names:
+            protocol_names[protocol] = PROTOCOL_NAMES.get(protocol, str(protocol))
+        flow_logs.append({
+            'timestamp': timestamp,
+            'source_ip': source_ip,
+            'destination_ip': destination_ip,
+            'source_port': source_port,
+            'destination_port': destination_port,
+            'protocol': protocol_names[protocol],
+            'action': ACTION_NAMES[action] if action < len(ACTION_NAMES) else '-',
+            'packets': packets,
+            'bytes': size
+        })
+    return flow_logs
+
+
+def _read_header(handle) -> Dict[str, Any]:
+    raw = handle.read(HEADER_SIZE)
+    if len(raw) < HEADER_SIZE:
+        raise ValueError("Truncated flow segment header")
+    magic, version, record_size, flags, count, min_ts, max_ts, interval = _HEADER.unpack_from(raw)
+    if magic != MAGIC:
+        raise ValueError("Not a flow segment")
+    if version != VERSION or record_size != RECORD_DTYPE.itemsize:
+        raise ValueError(f"Unsupported flow segment version {version} (record size {record_size})")
+    return {
+        'flags': flags, 'record_count': count, 'min_timestamp': min_ts,
+        'max_timestamp': max_ts, 'index_interval': interval
+    }
+
+
+def _block_index(timestamps: np.ndarray, interval: int) -> np.ndarray:
+    """(min, max) timestamp per block of interval rows"""
+    if not len(timestamps):
+        return np.zeros((0, 2), dtype=np.int64)
+    starts = np.arange(0, len(timestamps), interval)
+    return np.stack([np.minimum.reduceat(timestamps, starts), np.maximum.reduceat(timestamps, starts)], axis=1)
+
+
+class FlowSegmentWriter:
+    """Appends records to one segment; reopening an existing segment drops any torn tail and continues it"""
+
+    def __init__(self, path: str, index_interval: int = 4096, fsync: bool = False):
+        self.logger = logging.getLogger(__name__)
+        self.path = path
+        self.fsync = fsync
+        self.index_path = f"{path}.idx"
+
+        if os.path.exists(path) and os.path.getsize(path) >= HEADER_SIZE:
+            with open(path, 'rb') as handle:
+                header = _read_header(handle)
+            self.index_interval = header['index_interval']
+            self.count = header['record_count']
+            self.flags = header['flags']
+            self.min_timestamp = header['min_timestamp']
+            self.max_timestamp = header['max_timestamp']
+            self._handle = open(path, 'r+b')
+            self._handle.truncate(HEADER_SIZE + self.count * RECORD_DTYPE.itemsize)
+            segment = FlowSegment(path)
+            self._index = segment.index.copy()
+            segment.close()
+        else:
+            self.index_interval = index_interval
+            self.count = 0
+            self.flags = FLAG_SORTED
+            self.min_timestamp = self.max_timestamp = 0
+            self._handle = open(path, 'w+b')
+            self._index = np.zeros((0, 2), dtype=np.int64)
+            self._write_header()
+
+    def append(self, records: np.ndarray) -> int:
+        """Append records (RECORD_DTYPE); returns the segment's record count"""
+        if not len(records):
+            return self.count
+        records = np.ascontiguousarray(records, dtype=RECORD_DTYPE)
+        timestamps = records['timestamp']
+
+        # Sorted segments allow exact binary-searched range views
+        if self.flags & FLAG_SORTED:
+            if (self.count and timestamps[0] < self.max_timestamp) or (np.diff(timestamps) < 0).any():
+                self.flags &= ~FLAG_SORTED
+        low, high = int(timestamps.min()), int(timestamps.max())
+        self.min_timestamp = low if not self.count else min(self.min_timestamp, low)
+        self.max_timestamp = high if not self.count else max(self.max_timestamp, high)
+
+        self._extend_index(timestamps)
+        self._handle.seek(HEADER_SIZE + self.count * RECORD_DTYPE.itemsize)
+        self._handle.write(records.tobytes())
+        self.count += len(records)
+        self._handle.flush()
+        if self.fsync:
+            os.fsync(self._handle.fileno())
+        self._write_header()
+        return self.count
+
+    def append_flow_logs(self, flow_logs: List[Dict[str, Any]]) -> int:
+        return self.append(encode_flow_logs(flow_logs))
+
+    def _extend_index(self, timestamps: np.ndarray):
+        """Merge new rows into the (partial) last block, then add whole new blocks"""
+        interval = self.index_interval
+        head = (-self.count) % interval
+        if head and len(self._index):
+            first = timestamps[:head]
+            self._index[-1, 0] = min(self._index[-1, 0], first.min())
+            self._index[-1, 1] = max(self._index[-1, 1], first.max())
+            timestamps = timestamps[head:]
+        if len(timestamps):
+            self._index = np.concatenate([self._index, _block_index(timestamps, interval)])
+
+    def _write_header(self):
+        self._handle.seek(0)
+        self._handle.write(_HEADER.pack(
+            MAGIC, VERSION, RECORD_DTYPE.itemsize, self.flags, self.count,
+            self.min_timestamp, self.max_timestamp, self.index_interval
+        ).ljust(HEADER_SIZE, b'\0'))
+        self._handle.flush()
+        if self.fsync:
+            os.fsync(self._handle.fileno())
+
+        # The index is derived data; readers rebuild it when it does not cover record_count
+        temp_path = f"{self.index_path}.tmp"
+        self._index.astype('<i8').tofile(temp_path)
+        os.replace(temp_path, self.index_path)
+
+    def close(self):
+        if not self._handle.closed:
+            self._write_header()
+            self._handle.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class FlowSegment:
+    """Read-only memory-mapped segment; range queries return views into the mapping"""
+
+    def __init__(self, path: str):
+        self.path = path
+        with open(path, 'rb') as handle:
+            header = _read_header(handle)
+        self.count = header['record_count']
+        self.flags = header['flags']
+        self.min_timestamp = header['min_timestamp']
+        self.max_timestamp = header['max_timestamp']
+        self.index_interval = header['index_interval']
+        self.sorted = bool(self.flags & FLAG_SORTED)
+
+        if self.count:
+            self.records = np.memmap(path, dtype=RECORD_DTYPE, mode='r', offset=HEADER_SIZE, shape=(self.count,))
+        else:
+            self.records = np.zeros(0, dtype=RECORD_DTYPE)
+        self.index = self._load_index()
+
+    def _load_index(self) -> np.ndarray:
+        blocks = -(-self.count // self.index_interval)
+        index_path = f"{self.path}.idx"
+        if os.path.exists(index_path):
+            index = np.fromfile(index_path, dtype='<i8')
+            if len(index) == blocks * 2:
+                return index.reshape(blocks, 2)
+        return _block_index(self.records['timestamp'], self.index_interval)
+
+    def __len__(self) -> int:
+        return self.count
+
+    def overlaps(self, start: Optional[int], end: Optional[int]) -> bool:
+        return bool(self.count) and (start is None or self.max_timestamp >= start) and \
+            (end is None or self.min_timestamp < end)
+
+    def iter_range(self, start: Optional[int] = None, end: Optional[int] = None,
+                   batch_rows: int = 65536) -> Iterator[np.ndarray]:
+        """Records with start <= timestamp < end in chunks of at most batch_rows.
+
+        Sorted segments yield zero-copy views. Unsorted ones skip blocks the index rules
+        out and view whole blocks when every row is in range, copying only mixed blocks.
+        """
+        if not self.overlaps(start, end):
+            return
+        low = start if start is not None else np.iinfo(np.int64).min
+        high = end if end is not None else np.iinfo(np.int64).max
+
+        if self.sorted:
+            timestamps = self.records['timestamp']
+            first = int(np.searchsorted(timestamps, low, side='left'))
+            last = int(np.searchsorted(timestamps, high, side='left'))
+            for offset in range(first, last, batch_rows):
+                yield self.records[offset:min(offset + batch_rows, last)]
+            return
+
+        interval = self.index_interval
+        inside = (self.index[:, 0] >= low) & (self.index[:, 1] < high)
+        touching = (self.index[:, 1] >= low) & (self.index[:, 0] < high)
+        block = 0
+        while block < len(self.index):
+            if not touching[block]:
+                block += 1
+                continue
+            if inside[block]:
+                # Run of fully covered blocks: plain views
+                run_end = block
+                while run_end < len(self.index) and inside[run_end]:
+                    run_end += 1
+                rows_end = min(run_end * interval, self.count)
+                for offset in range(block * interval, rows_end, batch_rows):
+                    yield self.records[offset:min(offset + batch_rows, rows_end)]
+                block = run_end
+                continue
+            chunk = self.records[block * interval:(block + 1) * interval]
+            timestamps = chunk['timestamp']
+            selected = chunk[(timestamps >= low) & (timestamps < high)]
+            if len(selected):
+                yield selected
+            block += 1
+
+    def close(self):
+        """Release the mapping; views still held by callers keep it alive until they are dropped"""
+        mapping = getattr(self.records, '_mmap', None)
+        self.records = None
+        # Unmapping under a live view would crash on its next access, so only close when nothing else refers to it
+        if mapping is not None and sys.getrefcount(mapping) <= 2:
+            mapping.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def get_info(self) -> Dict[str, Any]:
+        return {
+            'path': self.path,
+            'records': self.count,
+            'sorted': self.sorted,
+            'min_timestamp': self.min_timestamp,
+            'max_timestamp': self.max_timestamp,
+            'index_blocks': len(self.index),
+            'bytes': HEADER_SIZE + self.count * RECORD_DTYPE.itemsize
+        }
+
+
+def segment_paths(patterns: Iterable[str]) -> List[str]:
+    """Segment files named by paths, globs or directories, in name order"""
+    paths = []
+    for pattern in patterns:
+        if os.path.isdir(pattern):
+            paths.extend(glob.glob(os.path.join(pattern, '*.seg')))
+        else:
+            paths.extend(path for path in glob.glob(pattern) if not path.endswith('.idx'))
+    return sorted(set(paths))
+
+
+def iter_segments(paths: Iterable[str], start: Optional[int] = None, end: Optional[int] = None,
+                  batch_rows: int = 65536) -> Iterator[np.ndarray]:
+    """Record views from every segment overlapping [start, end)"""
+    for path in segment_paths(paths):
+        with FlowSegment(path) as segment:
+            if segment.overlaps(start, end):
+                yield from segment.iter_range(start, end, batch_rows)
+
+
+class SegmentRoller:
+    """Writes records across numbered segments in a directory, starting a new one every max_records"""
+
+    def __init__(self, directory: str, max_records: int = 4 * 1024 * 1024, prefix: str = 'flows'):
+        os.makedirs(directory, exist_ok=True)
+        self.directory = directory
+        self.max_records = max_records
+        self.prefix = prefix
+        existing = sorted(glob.glob(os.path.join(directory, f"{prefix}-*.seg")))
+        self.sequence = len(existing)
+        self.writer: Optional[FlowSegmentWriter] = None
+        if existing:
+            self.sequence -= 1
+            self.writer = FlowSegmentWriter(existing[-1])
+        self.records_written = 0
+
+    def append(self, records: np.ndarray):
+        offset = 0
+        while offset < len(records):
+            if self.writer is None or self.writer.count >= self.max_records:
+                if self.writer is not None:
+                    self.writer.close()
+                self.sequence += 1
+                self.writer = FlowSegmentWriter(os.path.join(self.directory, f"{self.prefix}-{self.sequence:06d}.seg"))
+            room = self.max_records - self.writer.count
+            self.writer.append(records[offset:offset + room])
+            offset += room
+        self.records_written += len(records)
+
+    def close(self):
+        if self.writer is not None:
+            self.writer.close()
+
+
+def _iter_json_lines(handle, batch_rows: int) -> Iterator[List[Dict[str, Any]]]:
+    batch = []
+    for line in handle:
+        line = line.strip()
+        if not line:
+            continue
+        payload = json.loads(line)
+        batch.extend(payload if isinstance(payload, list) else [payload])
+        if len(batch) >= batch_rows:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def convert(paths: List[str], directory: str, input_format: str = 'vpc', max_records: int = 4 * 1024 * 1024,
+            batch_rows: int = 65536, log_format: Optional[str] = None) -> Dict[str, Any]:
+    """Convert VPC Flow Log text or JSON-lines files into segments under directory"""
+    roller = SegmentRoller(directory, max_records)
+    started = time.perf_counter()
+    try:
+        if input_format == 'vpc':
+            reader = VpcFlowLogReader({'batch_size': batch_rows, 'log_format': log_format})
+            for batch in reader.read_paths(paths):
+                roller.append(encode_batch(batch))
+        else:
+            for path in paths:
+                with (sys.stdin if path == '-' else open(path)) as handle:
+                    for flow_logs in _iter_json_lines(handle, batch_rows):
+                        roller.append(encode_flow_logs(flow_logs))
+    finally:
+        roller.close()
+    elapsed = time.perf_counter() - started
+    return {
+        'records': roller.records_written,
+        'segments': roller.sequence,
+        'seconds': round(elapsed, 3),
+        'records_per_second': round(roller.records_written / elapsed) if elapsed else None
+    }
+
+
+def replay(paths: List[str], processor: Any, start: Optional[int] = None, end: Optional[int] = None,
+           batch_rows: int = 65536) -> Dict[str, Any]:
+    """Push every record in [start, end) through processor.process_flow_logs as fast as it will go"""
+    stats = {'records': 0, 'batches': 0, 'anomalies': 0, 'failed_batches': 0}
+    started = time.perf_counter()
+    for records in iter_segments(paths, start, end, batch_rows):
+        result = processor.process_flow_logs(to_flow_logs(records))
+        stats['records'] += len(records)
+        stats['batches'] += 1
+        stats['anomalies'] += len(result.anomalies)
+        if 'error' in result.processing_metadata or 'errors' in result.processing_metadata:
+            stats['failed_batches'] += 1
+    elapsed = time.perf_counter() - started
+    stats['seconds'] = round(elapsed, 3)
+    stats['records_per_second'] = round(stats['records'] / elapsed) if elapsed else None
+    return stats
+
+
+def _time_argument(value: Optional[str]) -> Optional[int]:
+    return None if value is None else to_epoch(int(value) if value.lstrip('-').isdigit() else value)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Convert flow logs to segments and replay them through detection")
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    convert_parser = commands.add_parser('convert', help="Convert VPC Flow Log text or JSON lines to segments")
+    convert_parser.add_argument('paths', nargs='+', help="Input files ('-' for stdin)")
+    convert_parser.add_argument('--output', required=True, help="Segment directory")
+    convert_parser.add_argument('--input-format', choices=['vpc', 'json'], default='vpc')
+    convert_parser.add_argument('--log-format', help="VPC field list when the input has no header line")
+    convert_parser.add_argument('--segment-records', type=int, default=4 * 1024 * 1024)
+
+    replay_parser = commands.add_parser('replay', help="Replay a time range through TieredAnomalyProcessor")
+    replay_parser.add_argument('paths', nargs='+', help="Segment files, globs or directories")
+    replay_parser.add_argument('--start', help="Inclusive start (epoch seconds or ISO 8601)")
+    replay_parser.add_argument('--end', help="Exclusive end (epoch seconds or ISO 8601)")
+    replay_parser.add_argument('--batch-rows', type=int, default=65536)
+    replay_parser.add_argument('--config', help="JSON file with TieredAnomalyProcessor configuration "
+                                                "(default: statistical tiers only)")
+
+    info_parser = commands.add_parser('info', help="Print segment headers")
+    info_parser.add_argument('paths', nargs='+')
+    args = parser.parse_args()
+
+    if args.command == 'convert':
+        output = convert(args.paths, args.output, args.input_format, args.segment_records, log_format=args.log_format)
+    elif args.command == 'replay':
+        from ..api.services.detection_service import DEFAULT_PROCESSOR_CONFIG, check_processor_config
+        from ..detection.tiered_processor import TieredAnomalyProcessor
+        # Unset runs the statistical tiers only, as the API does; ML tiers need SageMaker endpoint names
+        config = DEFAULT_PROCESSOR_CONFIG
+        if args.config:
+            with open(args.config) as f:
+                config = json.load(f)
+        check_processor_config(config)
+        output = replay(args.paths, TieredAnomalyProcessor(config),
+                        _time_argument(args.start), _time_argument(args.end), args.batch_rows)
+    else:
+        output = []
+        for path in segment_paths(args.paths):
+            with FlowSegment(path) as segment:
+                output.append(segment.get_info())
+    print(json.dumps(output, indent=2))
+
+
+if __name__ == "__main__":
+    main()
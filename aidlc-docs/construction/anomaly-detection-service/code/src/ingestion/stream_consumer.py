@@ -0,0 +1,553 @@
+"""
+Streaming Flow Log Consumer
+Long-running shard-parallel consumer that feeds stream records through TieredAnomalyProcessor with checkpointing.
+"""
+
+import argparse
+import gzip
+import io
+import json
+import os
+import signal
+import sys
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional
+import logging
+
+from .stream_sources import StreamRecord, StreamSource, create_source
+from .vpc_flow_log_reader import VpcFlowLogReader
+
+# Field aliases used by producers such as testing/load-test.py
+FIELD_ALIASES = {
+    'src_ip': 'source_ip',
+    'srcaddr': 'source_ip',
+    'dest_ip': 'destination_ip',
+    'dst_ip': 'destination_ip',
+    'dstaddr': 'destination_ip',
+    'src_port': 'source_port',
+    'srcport': 'source_port',
+    'dest_port': 'destination_port',
+    'dst_port': 'destination_port',
+    'dstport': 'destination_port'
+}
+
+_GZIP_MAGIC = b'\x1f\x8b'
+
+
+class CheckpointStore:
+    """Last processed sequence number per shard, persisted as a JSON file replaced atomically"""
+
+    def __init__(self, path: Optional[str] = None, flush_interval: float = 5.0):
+        self.logger = logging.getLogger(__name__)
+        self.path = path
+        self.flush_interval = flush_interval
+        self._lock = threading.Lock()
+        self._checkpoints: Dict[str, str] = {}
+        self._dirty = False
+        self._last_flush = time.time()
+
+        if path and os.path.exists(path):
+            try:
+                with open(path) as f:
+                    self._checkpoints = json.load(f)
+            except (OSError, ValueError) as e:
+                self.logger.error(f"Failed to load checkpoints from {path}: {e}")
+
+    def get(self, shard_id: str) -> Optional[str]:
+        with self._lock:
+            return self._checkpoints.get(shard_id)
+
+    def update(self, shard_id: str, sequence_number: str):
+        """Record progress; written to disk at most once per flush_interval"""
+        with self._lock:
+            self._checkpoints[shard_id] = sequence_number
+            self._dirty = True
+            due = time.time() - self._last_flush >= self.flush_interval
+        if due:
+            self.flush()
+
+    def flush(self):
+        with self._lock:
+            if not self._dirty or not self.path:
+                return
+            snapshot = dict(self._checkpoints)
+            self._dirty = False
+            self._last_flush = time.time()
+        temp_path = f"{self.path}.tmp"
+        try:
+            with open(temp_path, 'w') as f:
+                json.dump(snapshot, f)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(temp_path, self.path)
+        except OSError as e:
+            self.logger.error(f"Checkpoint flush failed: {e}")
+            with self._lock:
+                self._dirty = True
+
+    def snapshot(self) -> Dict[str, str]:
+        with self._lock:
+            return dict(self._checkpoints)
+
+
+class DeadLetterLog:
+    """Batches that exhausted their retries, appended as JSON lines so the checkpoint can move past them"""
+
+    def __init__(self, path: str):
+        self.logger = logging.getLogger(__name__)
+        self.path = path
+        self._lock = threading.Lock()
+
+    def write(self, shard_id: str, sequence_number: str, flow_logs: List[Dict], error: str) -> bool:
+        """Durably record a failed batch; False when it could not be written"""
+        line = json.dumps({
+            'shard_id': shard_id,
+            'sequence_number': sequence_number,
+            'error': error,
+            'failed_at': time.time(),
+            'flow_logs': flow_logs
+        }, default=str)
+        try:
+            with self._lock, open(self.path, 'a') as f:
+                f.write(line + '\n')
+                f.flush()
+                os.fsync(f.fileno())
+            return True
+        except OSError as e:
+            self.logger.error(f"Dead-letter write to {self.path} failed: {e}")
+            return False
+
+
+class _ShardProgress:
+    """Batches of one shard complete out of order; checkpoints only advance over a completed prefix"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._pending = deque()  # [sequence_number, done]
+        # Set when a batch could be neither processed nor dead-lettered: the shard stops there
+        self.failed = threading.Event()
+
+    def add(self, sequence_number: str) -> list:
+        entry = [sequence_number, False]
+        with self._lock:
+            self._pending.append(entry)
+        return entry
+
+    def fail(self):
+        """Stop the shard; the failed batch is never completed, so the checkpoint cannot pass it"""
+        self.failed.set()
+
+    def complete(self, entry: list) -> Optional[str]:
+        """Mark a batch done; returns the new checkpoint if the completed prefix grew"""
+        checkpoint = None
+        with self._lock:
+            entry[1] = True
+            while self._pending and self._pending[0][1]:
+                checkpoint = self._pending.popleft()[0]
+        return checkpoint
+
+
+class StreamConsumer:
+    """Reads every assigned shard in its own thread and processes batches on a bounded worker pool"""
+
+    def __init__(self, config: Dict[str, Any], processor_factory: Optional[Callable[[], Any]] = None,
+                 source: Optional[StreamSource] = None, result_handler: Optional[Callable[[Any, str], None]] = None):
+        self.config = config
+        self.logger = logging.getLogger(__name__)
+        self.source = source or create_source(config.get('source', {}))
+        self.result_handler = result_handler
+
+        # TieredAnomalyProcessor is not thread-safe: every processing worker gets its own.
+        # The first one is built up front and also drives the adaptive batch size.
+        self._processor_factory = processor_factory or (lambda: self._build_processor(config.get('processor', {})))
+        self.processor = self._processor_factory()
+        self._processors = [self.processor]
+        self._unclaimed_processors = [self.processor]
+        self._worker_state = threading.local()
+
+        # Batching: batch_size defaults to the processor's adaptive batch size when it has one
+        self.batch_size = config.get('batch_size')
+        self.max_batch_wait = config.get('max_batch_wait', 1.0)
+        self.fetch_limit = config.get('fetch_limit', 1000)
+        self.idle_sleep = config.get('idle_sleep', 0.2)
+
+        # Backpressure: shard readers block once max_in_flight batches are queued or running
+        self.max_in_flight = config.get('max_in_flight', 4)
+        self.max_retries = config.get('max_retries', 2)
+        self._in_flight = threading.BoundedSemaphore(self.max_in_flight)
+        self.executor = ThreadPoolExecutor(
+            max_workers=config.get('processing_workers', 2), thread_name_prefix="stream-process"
+        )
+
+        # Static shard assignment when several consumer instances share one stream
+        self.instance_index = config.get('instance_index', 0)
+        self.instance_count = config.get('instance_count', 1)
+        self.shard_refresh_interval = config.get('shard_refresh_interval', 60.0)
+
+        self.checkpoints = CheckpointStore(config.get('checkpoint_path'), config.get('checkpoint_interval', 5.0))
+        # Without a dead-letter log a batch that keeps failing stops its shard instead of being skipped
+        dead_letter_path = config.get('dead_letter_path')
+        self.dead_letters = DeadLetterLog(dead_letter_path) if dead_letter_path else None
+        # Shard threads decode concurrently, so each call builds its own reader from this config
+        self.reader_config = {'log_format': config.get('log_format'), 'skip_no_data': True}
+
+        self._lock = threading.Lock()
+        self._stopping = threading.Event()
+        self._stopped = threading.Event()
+        self._shard_threads: Dict[str, threading.Thread] = {}
+        self._closed_shards = set()
+        self._progress: Dict[str, _ShardProgress] = {}
+        self._queued_records = 0
+        self._run_thread: Optional[threading.Thread] = None
+
+        self.stats = {
+            'records_received': 0,
+            'flow_logs': 0,
+            'decode_errors': 0,
+            'batches_submitted': 0,
+            'batches_processed': 0,
+            'batches_failed': 0,
+            'batches_dead_lettered': 0,
+            'shards_failed': 0,
+            'anomalies': 0,
+            'backpressure_waits': 0,
+            'shards_closed': 0
+        }
+
+    @staticmethod
+    def _build_processor(processor_config: Dict[str, Any]):
+        from ..api.services.detection_service import DEFAULT_PROCESSOR_CONFIG, check_processor_config
+        from ..detection.tiered_processor import TieredAnomalyProcessor
+        # Unset runs the statistical tiers only, as the API does; ML tiers need SageMaker endpoint names
+        processor_config = processor_config or DEFAULT_PROCESSOR_CONFIG
+        check_processor_config(processor_config)
+        return TieredAnomalyProcessor(processor_config)
+
+    # Lifecycle
+
+    def start(self):
+        """Run the consumer in a background thread"""
+        self._run_thread = threading.Thread(target=self.run, name="stream-consumer", daemon=True)
+        self._run_thread.start()
+
+    def run(self):
+        """Consume until stop() is called or every shard is closed, then drain"""
+        self.logger.info(f"Stream consumer started on {self.source.name} source")
+        last_refresh = 0.0
+        try:
+            while not self._stopping.is_set():
+                if time.time() - last_refresh >= self.shard_refresh_interval:
+                    self._start_shard_workers()
+                    last_refresh = time.time()
+                with self._lock:
+                    active = [thread for thread in self._shard_threads.values() if thread.is_alive()]
+                if not active and self._shard_threads:
+                    break
+                self._stopping.wait(self.idle_sleep)
+        finally:
+            self._drain()
+
+    def stop(self, timeout: Optional[float] = 30.0) -> bool:
+        """Stop reading, finish in-flight batches and flush checkpoints; True when fully drained"""
+        self._stopping.set()
+        if self._run_thread is not None:
+            self._run_thread.join(timeout)
+        return self._stopped.wait(timeout)
+
+    def _drain(self):
+        self._stopping.set()
+        with self._lock:
+            threads = list(self._shard_threads.values())
+        for thread in threads:
+            thread.join()
+        self.executor.shutdown(wait=True)
+        self.checkpoints.flush()
+        self.source.close()
+        self._stopped.set()
+        self.logger.info(f"Stream consumer drained: {self.stats}")
+
+    def _start_shard_workers(self):
+        try:
+            shards = self.source.list_shards()
+        except Exception as e:
+            self.logger.error(f"Shard discovery failed: {e}")
+            return
+        with self._lock:
+            for index, shard_id in enumerate(sorted(shards)):
+                if index % self.instance_count != self.instance_index:
+                    continue
+                if shard_id in self._shard_threads or shard_id in self._closed_shards:
+                    continue
+                self._progress[shard_id] = _ShardProgress()
+                thread = threading.Thread(
+                    target=self._consume_shard, args=(shard_id,), name=f"shard-{shard_id}", daemon=True
+                )
+                self._shard_threads[shard_id] = thread
+                thread.start()
+
+    # Shard reading
+
+    def _consume_shard(self, shard_id: str):
+        try:
+            iterator = self.source.get_iterator(shard_id, self.checkpoints.get(shard_id))
+        except Exception as e:
+            self.logger.error(f"Could not open shard {shard_id}: {e}")
+            return
+
+        progress = self._progress[shard_id]
+        pending: List[Dict] = []
+        last_sequence = None
+        batch_started = 0.0
+        while iterator is not None and not self._stopping.is_set():
+            if progress.failed.is_set():
+                # Unread and unprocessed records are picked up again from the checkpoint on restart
+                self.logger.error(f"Shard {shard_id} stopped at checkpoint {self.checkpoints.get(shard_id)} "
+                                  f"after a batch could not be processed or dead-lettered")
+                with self._lock:
+                    self.stats['shards_failed'] += 1
+                return
+
+            try:
+                limit = max(1, min(self.fetch_limit, self._target_batch_size() - len(pending)))
+                records, iterator = self.source.get_records(iterator, limit)
+            except Exception as e:
+                self.logger.error(f"Read from shard {shard_id} failed: {e}")
+                self._stopping.wait(self.idle_sleep)
+                continue
+
+            if records:
+                if last_sequence is None:
+                    batch_started = time.time()
+                pending.extend(self.decode_records(records))
+                last_sequence = records[-1].sequence_number
+            elif iterator is not None:
+                self._stopping.wait(self.idle_sleep)
+
+            if last_sequence is not None and (
+                    len(pending) >= self._target_batch_size()
+                    or time.time() - batch_started >= self.max_batch_wait
+                    or iterator is None):
+                self._submit(shard_id, pending, last_sequence)
+                pending, last_sequence = [], None
+
+        # Graceful drain: whatever was read is still processed and checkpointed
+        if last_sequence is not None and not progress.failed.is_set():
+            self._submit(shard_id, pending, last_sequence)
+        if iterator is None:
+            with self._lock:
+                self._closed_shards.add(shard_id)
+                self.stats['shards_closed'] += 1
+            self.logger.info(f"Shard {shard_id} closed")
+
+    def _target_batch_size(self) -> int:
+        if self.batch_size:
+            return self.batch_size
+        controller = getattr(self.processor, 'batch_controller', None)
+        return controller.batch_size if controller is not None else 10000
+
+    def decode_records(self, records: List[StreamRecord]) -> List[Dict]:
+        """Flow log dicts from JSON records, CloudWatch Logs subscription payloads or raw flow log lines"""
+        flow_logs = []
+        text_lines = []
+        errors = 0
+        for record in records:
+            data = record.data
+            try:
+                if data[:2] == _GZIP_MAGIC:
+                    data = gzip.decompress(data)
+                stripped = data.lstrip()
+                if not stripped.startswith((b'{', b'[')):
+                    text_lines.append(stripped.rstrip(b'\r\n'))
+                    continue
+                payload = json.loads(data)
+            except (OSError, ValueError, EOFError) as e:
+                errors += 1
+                self.logger.debug(f"Undecodable record {record.sequence_number}: {e}")
+                continue
+
+            if isinstance(payload, dict) and 'logEvents' in payload:
+                # CloudWatch Logs subscription: each event message is one flow log line
+                if payload.get('messageType') == 'DATA_MESSAGE':
+                    text_lines.extend(event.get('message', '').encode() for event in payload['logEvents'])
+            elif isinstance(payload, dict):
+                flow_logs.append(self._normalise_fields(payload))
+            elif isinstance(payload, list):
+                flow_logs.extend(self._normalise_fields(item) for item in payload if isinstance(item, dict))
+            else:
+                errors += 1
+
+        if text_lines:
+            block = io.BufferedReader(io.BytesIO(b'\n'.join(text_lines) + b'\n'))
+            for batch in VpcFlowLogReader(self.reader_config).read(block):
+                flow_logs.extend(batch.to_flow_logs())
+
+        with self._lock:
+            self.stats['records_received'] += len(records)
+            self.stats['flow_logs'] += len(flow_logs)
+            self.stats['decode_errors'] += errors
+        return flow_logs
+
+    @staticmethod
+    def _normalise_fields(record: Dict) -> Dict:
+        if not any(key in FIELD_ALIASES for key in record):
+            return record
+        return {FIELD_ALIASES.get(key, key): value for key, value in record.items()}
+
+    # Processing
+
+    def _submit(self, shard_id: str, flow_logs: List[Dict], last_sequence: str):
+        """Hand a batch to the worker pool, blocking while max_in_flight batches are outstanding"""
+        if not self._in_flight.acquire(blocking=False):
+            with self._lock:
+                self.stats['backpressure_waits'] += 1
+            self._in_flight.acquire()
+
+        entry = self._progress[shard_id].add(last_sequence)
+        with self._lock:
+            self.stats['batches_submitted'] += 1
+            self._queued_records += len(flow_logs)
+        self.executor.submit(self._process_batch, shard_id, flow_logs, entry)
+
+    def _worker_processor(self):
+        """This worker thread's processor, claiming the prebuilt one or building another"""
+        processor = getattr(self._worker_state, 'processor', None)
+        if processor is None:
+            with self._lock:
+                processor = self._unclaimed_processors.pop() if self._unclaimed_processors else None
+            if processor is None:
+                processor = self._processor_factory()
+                with self._lock:
+                    self._processors.append(processor)
+            self._worker_state.processor = processor
+        return processor
+
+    @staticmethod
+    def _pipeline_error(result: Any) -> Optional[str]:
+        """Error recorded in a processing result's metadata, if any"""
+        metadata = getattr(result, 'processing_metadata', None) or {}
+        error = metadata.get('error') or metadata.get('errors')
+        return str(error) if error else None
+
+    def _process_batch(self, shard_id: str, flow_logs: List[Dict], entry: list):
+        progress = self._progress[shard_id]
+        completed = True
+        try:
+            result = None
+            if flow_logs:
+                processor = self._worker_processor()
+                error = None
+                for attempt in range(self.max_retries + 1):
+                    try:
+                        result = processor.process_flow_logs(flow_logs, backlog=self._queued_records)
+                        # The pipeline reports its own failures in the result instead of raising
+                        error = self._pipeline_error(result)
+                    except Exception as e:
+                        result, error = None, e
+                    if error is None:
+                        break
+                    result = None
+                    self.logger.error(f"Batch from {shard_id} failed (attempt {attempt + 1}): {error}")
+                else:
+                    with self._lock:
+                        self.stats['batches_failed'] += 1
+                    # The checkpoint only moves past a failed batch once it is safely dead-lettered
+                    if self.dead_letters is not None and self.dead_letters.write(shard_id, entry[0], flow_logs, str(error)):
+                        with self._lock:
+                            self.stats['batches_dead_lettered'] += 1
+                    else:
+                        completed = False
+                        progress.fail()
+                        return
+
+            if result is not None:
+                with self._lock:
+                    self.stats['batches_processed'] += 1
+                    self.stats['anomalies'] += len(getattr(result, 'anomalies', []))
+                if self.result_handler is not None:
+                    try:
+                        self.result_handler(result, shard_id)
+                    except Exception as e:
+                        self.logger.error(f"Result handler failed: {e}")
+        finally:
+            with self._lock:
+                self._queued_records -= len(flow_logs)
+            if completed:
+                checkpoint = progress.complete(entry)
+                if checkpoint is not None:
+                    self.checkpoints.update(shard_id, checkpoint)
+            self._in_flight.release()
+
+    def get_statistics(self) -> Dict[str, Any]:
+        """Consumer counters, shard state and checkpoints"""
+        with self._lock:
+            stats = dict(self.stats)
+            stats['active_shards'] = sum(1 for thread in self._shard_threads.values() if thread.is_alive())
+            stats['queued_records'] = self._queued_records
+            stats['processors'] = len(self._processors)
+        stats['batch_size'] = self._target_batch_size()
+        stats['checkpoints'] = self.checkpoints.snapshot()
+        millis_behind = getattr(self.source, 'millis_behind', None)
+        if millis_behind:
+            stats['millis_behind_latest'] = dict(millis_behind)
+        return stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run the tiered detection pipeline continuously on a stream")
+    parser.add_argument('--source', choices=['kinesis', 'file', 'socket'], default='kinesis')
+    parser.add_argument('--stream-name', default='vpc-flow-logs-stream')
+    parser.add_argument('--region', default='us-east-1')
+    parser.add_argument('--initial-position', choices=['LATEST', 'TRIM_HORIZON'], default='LATEST')
+    parser.add_argument('--paths', nargs='*', default=[], help="Files for the file source (one shard per file)")
+    parser.add_argument('--follow', action='store_true', help="Keep polling files at EOF")
+    parser.add_argument('--port', type=int, default=9999, help="Listen port for the socket source")
+    parser.add_argument('--checkpoint', help="Checkpoint file path")
+    parser.add_argument('--dead-letter', help="JSON lines file for batches that exhaust their retries "
+                                              "(without it such a batch stops its shard)")
+    parser.add_argument('--config', help="JSON file with TieredAnomalyProcessor configuration "
+                                         "(default: statistical tiers only)")
+    parser.add_argument('--batch-size', type=int)
+    parser.add_argument('--max-in-flight', type=int, default=4)
+    parser.add_argument('--workers', type=int, default=2)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s %(levelname)s %(name)s %(message)s')
+    processor_config = None
+    if args.config:
+        with open(args.config) as f:
+            processor_config = json.load(f)
+
+    consumer = StreamConsumer({
+        'source': {
+            'type': args.source,
+            'stream_name': args.stream_name,
+            'region': args.region,
+            'initial_position': args.initial_position,
+            'paths': args.paths,
+            'follow': args.follow,
+            'port': args.port
+        },
+        'processor': processor_config,
+        'checkpoint_path': args.checkpoint,
+        'dead_letter_path': args.dead_letter,
+        'batch_size': args.batch_size,
+        'max_in_flight': args.max_in_flight,
+        'processing_workers': args.workers
+    })
+
+    def request_stop(signum, frame):
+        consumer.logger.info(f"Signal {signum} received, draining")
+        consumer._stopping.set()
+
+    signal.signal(signal.SIGINT, request_stop)
+    signal.signal(signal.SIGTERM, request_stop)
+    consumer.run()
+    json.dump(consumer.get_statistics(), sys.stdout, indent=2)
+    print()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,250 @@
+"""
+Stream Sources
+Shard-oriented record sources for the streaming consumer: Kinesis, plus file, in-process queue and socket stand-ins.
+"""
+
+import glob
+import itertools
+import queue
+import socketserver
+import threading
+import time
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional, Tuple
+import logging
+
+try:
+    import boto3
+except ImportError:  # Only KinesisSource needs boto3
+    boto3 = None
+
+
+@dataclass
+class StreamRecord:
+    sequence_number: str
+    data: bytes
+    partition_key: str = ''
+
+
+class StreamSource:
+    """Source interface: shards are read through opaque iterators; a None next iterator means the shard is closed"""
+
+    name = 'base'
+
+    def list_shards(self) -> List[str]:
+        raise NotImplementedError
+
+    def get_iterator(self, shard_id: str, after_sequence: Optional[str]) -> Any:
+        """Iterator positioned after the checkpointed sequence number, or at the configured start"""
+        raise NotImplementedError
+
+    def get_records(self, iterator: Any, limit: int) -> Tuple[List[StreamRecord], Any]:
+        """Up to limit records and the iterator to use next"""
+        raise NotImplementedError
+
+    def close(self):
+        pass
+
+
+class KinesisSource(StreamSource):
+    """Kinesis Data Streams shards via GetRecords polling"""
+
+    name = 'kinesis'
+
+    def __init__(self, config: Dict[str, Any]):
+        if boto3 is None:
+            raise ImportError("boto3 is required for the Kinesis source")
+        self.logger = logging.getLogger(__name__)
+        self.stream_name = config.get('stream_name', 'vpc-flow-logs-stream')
+        self.initial_position = config.get('initial_position', 'LATEST')
+        self.throttle_backoff = config.get('throttle_backoff', 1.0)
+        self.client = boto3.client('kinesis', region_name=config.get('region', 'us-east-1'))
+        self.millis_behind: Dict[str, int] = {}
+
+    def list_shards(self) -> List[str]:
+        shards = []
+        kwargs = {'StreamName': self.stream_name}
+        while True:
+            response = self.client.list_shards(**kwargs)
+            shards.extend(shard['ShardId'] for shard in response.get('Shards', []))
+            if not response.get('NextToken'):
+                return shards
+            kwargs = {'NextToken': response['NextToken']}
+
+    def get_iterator(self, shard_id: str, after_sequence: Optional[str]) -> Any:
+        kwargs = {'StreamName': self.stream_name, 'ShardId': shard_id}
+        if after_sequence:
+            kwargs.update(ShardIteratorType='AFTER_SEQUENCE_NUMBER', StartingSequenceNumber=after_sequence)
+        else:
+            kwargs.update(ShardIteratorType=self.initial_position)
+        return (shard_id, self.client.get_shard_iterator(**kwargs)['ShardIterator'])
+
+    def get_records(self, iterator: Any, limit: int) -> Tuple[List[StreamRecord], Any]:
+        shard_id, shard_iterator = iterator
+        try:
+            response = self.client.get_records(ShardIterator=shard_iterator, Limit=min(limit, 10000))
+        except Exception as e:
+            # Throttling is expected under load; back off and retry the same iterator
+            if type(e).__name__ == 'ProvisionedThroughputExceededException' or 'Throttl' in str(e):
+                time.sleep(self.throttle_backoff)
+                return [], iterator
+            raise
+
+        self.millis_behind[shard_id] = response.get('MillisBehindLatest', 0)
+        records = [
+            StreamRecord(record['SequenceNumber'], record['Data'], record.get('PartitionKey', ''))
+            for record in response.get('Records', [])
+        ]
+        next_iterator = response.get('NextShardIterator')
+        return records, (shard_id, next_iterator) if next_iterator else None
+
+
+class FileSource(StreamSource):
+    """Newline-delimited files as shards (one shard per file); sequence numbers are line numbers"""
+
+    name = 'file'
+
+    def __init__(self, config: Dict[str, Any]):
+        self.paths = sorted(itertools.chain.from_iterable(glob.glob(pattern) for pattern in config.get('paths', [])))
+        # follow: keep polling at EOF like `tail -f` instead of closing the shard
+        self.follow = config.get('follow', False)
+        self._handles = []
+
+    def list_shards(self) -> List[str]:
+        return list(self.paths)
+
+    def get_iterator(self, shard_id: str, after_sequence: Optional[str]) -> Any:
+        handle = open(shard_id, 'rb')
+        self._handles.append(handle)
+        skip = int(after_sequence) if after_sequence else 0
+        for _ in range(skip):
+            if not handle.readline():
+                break
+        return {'handle': handle, 'line': skip}
+
+    def get_records(self, iterator: Any, limit: int) -> Tuple[List[StreamRecord], Any]:
+        handle = iterator['handle']
+        records = []
+        while len(records) < limit:
+            position = handle.tell()
+            line = handle.readline()
+            if not line.endswith(b'\n'):
+                # Partial trailing line: leave it for the writer to finish when following
+                if line and not self.follow:
+                    iterator['line'] += 1
+                    records.append(StreamRecord(str(iterator['line']), line))
+                elif line:
+                    handle.seek(position)
+                break
+            iterator['line'] += 1
+            if line.strip():
+                records.append(StreamRecord(str(iterator['line']), line))
+
+        if not records and not self.follow:
+            handle.close()
+            return [], None
+        return records, iterator
+
+    def close(self):
+        for handle in self._handles:
+            handle.close()
+
+
+class QueueSource(StreamSource):
+    """In-process queues as shards, for tests and local pipelines; put None to close a shard"""
+
+    name = 'queue'
+
+    def __init__(self, config: Optional[Dict[str, Any]] = None):
+        config = config or {}
+        self.poll_timeout = config.get('poll_timeout', 0.2)
+        self.max_queued = config.get('max_queued', 100000)
+        self._lock = threading.Lock()
+        self._queues: Dict[str, queue.Queue] = {}
+        self._sequences: Dict[str, itertools.count] = {}
+        for shard_id in config.get('shards', ['shard-0']):
+            self._shard(shard_id)
+
+    def _shard(self, shard_id: str) -> queue.Queue:
+        with self._lock:
+            if shard_id not in self._queues:
+                self._queues[shard_id] = queue.Queue(maxsize=self.max_queued)
+                self._sequences[shard_id] = itertools.count(1)
+            return self._queues[shard_id]
+
+    def put(self, shard_id: str, data: Optional[bytes], timeout: Optional[float] = None):
+        """Append a record to a shard, blocking when the shard queue is full"""
+        self._shard(shard_id).put(data, timeout=timeout)
+
+    def list_shards(self) -> List[str]:
+        with self._lock:
+            return list(self._queues)
+
+    def get_iterator(self, shard_id: str, after_sequence: Optional[str]) -> Any:
+        # Queued records are consumed once; there is nothing to replay
+        return shard_id
+
+    def get_records(self, iterator: Any, limit: int) -> Tuple[List[StreamRecord], Any]:
+        shard_queue = self._shard(iterator)
+        sequence = self._sequences[iterator]
+        records = []
+        try:
+            data = shard_queue.get(timeout=self.poll_timeout)
+            while True:
+                if data is None:
+                    return records, None
+                records.append(StreamRecord(str(next(sequence)), data))
+                if len(records) >= limit:
+                    break
+                data = shard_queue.get_nowait()
+        except queue.Empty:
+            pass
+        return records, iterator
+
+
+class SocketSource(QueueSource):
+    """TCP listener feeding newline-delimited records into a single queue shard"""
+
+    name = 'socket'
+
+    def __init__(self, config: Dict[str, Any]):
+        self.shard_id = config.get('shard_id', 'socket-0')
+        super().__init__(dict(config, shards=[self.shard_id]))
+        self.logger = logging.getLogger(__name__)
+        source = self
+
+        class _Handler(socketserver.StreamRequestHandler):
+            def handle(self):
+                for line in self.rfile:
+                    if line.strip():
+                        source.put(source.shard_id, line)
+
+        socketserver.ThreadingTCPServer.allow_reuse_address = True
+        self.server = socketserver.ThreadingTCPServer(
+            (config.get('host', '127.0.0.1'), config.get('port', 9999)), _Handler
+        )
+        self.server.daemon_threads = True
+        self.address = self.server.server_address
+        self._thread = threading.Thread(target=self.server.serve_forever, name="socket-source", daemon=True)
+        self._thread.start()
+        self.logger.info(f"Socket source listening on {self.address[0]}:{self.address[1]}")
+
+    def close(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+SOURCES = {
+    'kinesis': KinesisSource,
+    'file': FileSource,
+    'queue': QueueSource,
+    'socket': SocketSource
+}
+
+
+def create_source(config: Dict[str, Any]) -> StreamSource:
+    """Build the source named by config['type'] (default kinesis)"""
+    source_type = config.get('type', 'kinesis')
+    if source_type not in SOURCES:
+        raise ValueError(f"Unknown stream source type: {source_type}")
+    return SOURCES[source_type](config)
@@ -0,0 +1,407 @@
+"""
+VPC Flow Log Reader
+Streaming parser for VPC Flow Log v2-v5 text (plain or gzip, files or stdin) emitting columnar record batches.
+"""
+
+import argparse
+import gzip
+import json
+import sys
+from typing import Any, BinaryIO, Dict, Iterable, Iterator, List, Optional, Tuple
+import logging
+
+import numpy as np
+
+from ..detection.filtering.static_prefilter import PROTOCOL_NAMES
+
+# Default (version 2) format; S3 deliveries start with a header naming the actual fields
+DEFAULT_FIELDS = [
+    'version', 'account-id', 'interface-id', 'srcaddr', 'dstaddr', 'srcport', 'dstport',
+    'protocol', 'packets', 'bytes', 'start', 'end', 'action', 'log-status'
+]
+
+# Every field a flow log record can carry (v2-v8); a header line names only these
+KNOWN_FIELDS = set(DEFAULT_FIELDS) | {
+    'vpc-id', 'subnet-id', 'instance-id', 'tcp-flags', 'type', 'pkt-srcaddr', 'pkt-dstaddr', 'region', 'az-id',
+    'sublocation-type', 'sublocation-id', 'pkt-src-aws-service', 'pkt-dst-aws-service', 'flow-direction',
+    'traffic-path', 'ecs-cluster-arn', 'ecs-cluster-name', 'ecs-container-instance-arn',
+    'ecs-container-instance-id', 'ecs-container-id', 'ecs-second-container-id', 'ecs-service-name',
+    'ecs-task-definition-arn', 'ecs-task-arn', 'ecs-task-id', 'reject-reason'
+}
+
+# Everything else (addresses, ids, action, type, region, ...) is kept as text
+INTEGER_FIELDS = {
+    'version', 'srcport', 'dstport', 'protocol', 'packets', 'bytes', 'start', 'end', 'tcp-flags', 'traffic-path'
+}
+
+# Integer columns use -1 for '-' (not applicable / no data)
+MISSING = -1
+
+_GZIP_MAGIC = b'\x1f\x8b'
+
+_PARSE_CHUNK_ROWS = 16384
+
+# Leading pad so 16-byte windows ending at the first token never index before the buffer
+_PAD = b' ' * 16
+
+# SWAR constants for parsing up to 8 ASCII digits held in one big-endian uint64
+_U = np.uint64
+_ASCII_ZEROS = _U(0x3030303030303030)
+_HIGH_BITS = _U(0x8080808080808080)
+_ABOVE_NINE = _U(0x4646464646464646)
+_LANES_8 = _U(0x00FF00FF00FF00FF)
+_LANES_16 = _U(0x0000FFFF0000FFFF)
+_LANES_32 = _U(0x00000000FFFFFFFF)
+_KEEP_LOW_BYTES = np.array([0] + [(1 << (8 * n)) - 1 for n in range(1, 8)] + [0xFFFFFFFFFFFFFFFF], dtype=np.uint64)
+
+
+def parse_log_format(log_format: str) -> List[str]:
+    """Field names from a header line or a '${field} ${field}' log-format string"""
+    return [token.strip('${}') for token in log_format.split()]
+
+
+def _token_starts(ends: 'np.ndarray', line_starts: 'np.ndarray', index: int) -> 'np.ndarray':
+    return ends[:, index - 1] + 1 if index else line_starts
+
+
+def _digits8(words: 'np.ndarray', lengths: 'np.ndarray') -> Tuple['np.ndarray', 'np.ndarray']:
+    """Value of the last `lengths` (0-8) ASCII digits in each word, and a mask of non-digit tokens"""
+    keep = _KEEP_LOW_BYTES[lengths]
+    chars = (words & keep) | (_ASCII_ZEROS & ~keep)
+    invalid = ((((chars - _ASCII_ZEROS) & ~chars) | ((chars + _ABOVE_NINE) | chars)) & _HIGH_BITS) != 0
+    digits = chars - _ASCII_ZEROS
+    digits = ((digits >> _U(8)) & _LANES_8) * _U(10) + (digits & _LANES_8)
+    digits = ((digits >> _U(16)) & _LANES_16) * _U(100) + (digits & _LANES_16)
+    digits = (digits >> _U(32)) * _U(10000) + (digits & _LANES_32)
+    return digits.astype(np.int64), invalid
+
+
+class FlowRecordBatch:
+    """Columnar batch: integer fields as int64 arrays, text fields decoded from the shared buffer on demand"""
+
+    def __init__(self, fields: List[str], buffer: bytes, line_starts: 'np.ndarray', ends: 'np.ndarray',
+                 columns: Dict[str, 'np.ndarray']):
+        self.fields = fields
+        self.columns = columns
+        self._buffer = buffer
+        self._line_starts = line_starts
+        self._ends = ends  # (rows, fields) offsets of the separator after each token
+        self._text: Dict[str, List[str]] = {}
+
+    def __len__(self) -> int:
+        return len(self._ends)
+
+    def take(self, rows) -> 'FlowRecordBatch':
+        """Batch restricted to a row slice, index array or boolean mask (shares the buffer)"""
+        return FlowRecordBatch(
+            self.fields, self._buffer, self._line_starts[rows], self._ends[rows],
+            {name: values[rows] for name, values in self.columns.items()}
+        )
+
+    def token_bounds(self, field: str) -> Tuple['np.ndarray', 'np.ndarray']:
+        """Start and end byte offsets of a field's tokens in the batch buffer"""
+        index = self.fields.index(field)
+        return _token_starts(self._ends, self._line_starts, index), self._ends[:, index]
+
+    def text(self, field: str) -> List[str]:
+        """Decoded text values of a field ('-' stays '-')"""
+        if field not in self._text:
+            buffer = self._buffer
+            starts, ends = self.token_bounds(field)
+            self._text[field] = [buffer[s:e].decode('ascii', 'replace') for s, e in zip(starts.tolist(), ends.tolist())]
+        return self._text[field]
+
+    def to_flow_logs(self) -> List[Dict[str, Any]]:
+        """Row dicts in the shape TieredAnomalyProcessor.process_flow_logs consumes, timestamps as epoch seconds"""
+        count = len(self)
+        source_ips = self.text('srcaddr') if 'srcaddr' in self.fields else [''] * count
+        destination_ips = self.text('dstaddr') if 'dstaddr' in self.fields else [''] * count
+        actions = self.text('action') if 'action' in self.fields else ['ACCEPT'] * count
+
+        def column(name: str) -> List[int]:
+            values = self.columns.get(name)
+            return values.tolist() if values is not None else [MISSING] * count
+
+        protocol_names = {}
+        records = []
+        for source_ip, destination_ip, source_port, destination_port, protocol, action, packets, size, start in zip(
+                source_ips, destination_ips, column('srcport'), column('dstport'), column('protocol'),
+                actions, column('packets'), column('bytes'), column('start')):
+            if protocol not in protocol_names:
+                protocol_names[protocol] = PROTOCOL_NAMES.get(protocol, str(protocol))
+            records.append({
+                'timestamp': max(start, 0),
+                'source_ip': source_ip,
+                'destination_ip': destination_ip,
+                'source_port': max(source_port, 0),
+                'destination_port': max(destination_port, 0),
+                'protocol': protocol_names[protocol],
+                'action': action,
+                'packets': max(packets, 0),
+                'bytes': max(size, 0)
+            })
+        return records
+
+
+class VpcFlowLogReader:
+    """Reads flow log streams in large blocks and parses whole blocks with numpy"""
+
+    def __init__(self, config: Optional[Dict[str, Any]] = None):
+        config = config or {}
+        self.logger = logging.getLogger(__name__)
+        self.batch_size = config.get('batch_size', 65536)
+        self.read_size = config.get('read_size', 8 * 1024 * 1024)
+        self.skip_no_data = config.get('skip_no_data', True)
+        self._line_bytes = 64.0  # Running estimate used to size reads to whole batches
+
+        log_format = config.get('log_format')
+        # A configured format is authoritative: no line is ever taken for a header
+        self.detect_header = not log_format
+        self.default_fields = parse_log_format(log_format) if log_format else list(DEFAULT_FIELDS)
+
+        self.stats = {
+            'streams': 0, 'bytes_read': 0, 'lines': 0, 'records': 0, 'batches': 0,
+            'header_lines': 0, 'bad_lines': 0, 'no_data': 0, 'slow_path_blocks': 0
+        }
+
+    def read_paths(self, paths: Iterable[str]) -> Iterator[FlowRecordBatch]:
+        """Batches from each path in turn; '-' reads stdin"""
+        for path in paths:
+            if path == '-':
+                yield from self.read(sys.stdin.buffer)
+            else:
+                with open(path, 'rb') as handle:
+                    yield from self.read(handle)
+
+    def read(self, stream: BinaryIO) -> Iterator[FlowRecordBatch]:
+        """Batches from one stream; gzip (including multi-member) is detected from the magic bytes"""
+        stream = self._maybe_decompress(stream)
+        self.stats['streams'] += 1
+
+        fields = None
+        pending: List[bytes] = []
+        pending_bytes = 0
+        eof = False
+        while not eof:
+            chunk = stream.read(self.read_size)
+            eof = not chunk
+            if chunk:
+                self.stats['bytes_read'] += len(chunk)
+                pending.append(chunk)
+                pending_bytes += len(chunk)
+            # Parse once roughly a full batch is buffered; any surplus rows are carried forward
+            if not eof and pending_bytes < self.batch_size * self._line_bytes:
+                continue
+
+            if fields is None:
+                head = b''.join(pending)
+                if not head.strip():
+                    if eof:
+                        break
+                    continue
+                fields, head = self._read_header(head)
+                pending = [head]
+
+            # One copy into a padded buffer; the partial last line stays in it but is not parsed
+            buffer = b''.join([_PAD] + pending)
+            length = len(buffer)
+            tail = b''
+            if not eof:
+                length = max(buffer.rfind(b'\n') + 1, len(_PAD))
+                tail = buffer[length:]
+            elif length > len(_PAD) and not buffer.endswith(b'\n'):
+                buffer += b'\n'
+                length += 1
+
+            carry = b''
+            if length > len(_PAD):
+                batches, carry = self._parse_block(buffer, length, fields, eof)
+                yield from batches
+
+            pending = [part for part in (carry, tail) if part]
+            pending_bytes = len(carry) + len(tail)
+
+    def _maybe_decompress(self, stream: BinaryIO) -> BinaryIO:
+        peek = getattr(stream, 'peek', None)
+        if peek is not None:
+            magic = peek(2)[:2]
+        else:
+            magic = stream.read(2)
+            stream = _PrefixedStream(magic, stream)
+        if magic == _GZIP_MAGIC:
+            return gzip.GzipFile(fileobj=stream, mode='rb')
+        return stream
+
+    def _read_header(self, block: bytes) -> Tuple[List[str], bytes]:
+        """Fields named by a leading header line, else the configured format"""
+        block = block.lstrip()
+        if not self.detect_header:
+            return list(self.default_fields), block
+        first_line, _, rest = block.partition(b'\n')
+        # Only a line made entirely of known field names is a header; anything else is a record
+        tokens = first_line.decode('ascii', 'replace').split()
+        if tokens and all(token in KNOWN_FIELDS for token in tokens):
+            self.stats['header_lines'] += 1
+            return tokens, rest
+        return list(self.default_fields), block
+
+    def _parse_block(self, buffer: bytes, length: int, fields: List[str],
+                     eof: bool) -> Tuple[List[FlowRecordBatch], bytes]:
+        """Parse the complete lines in buffer[pad:length]; rows past the last full batch are handed back
+        unless at end of stream"""
+        width = len(fields)
+        ends = self._separator_matrix(buffer, length, width)
+        if ends is None:
+            # Irregular whitespace or bad lines: normalise in Python, then take the vectorized path
+            self.stats['slow_path_blocks'] += 1
+            buffer = _PAD + self._normalise_lines(buffer[len(_PAD):length], width)
+            length = len(buffer)
+            ends = self._separator_matrix(buffer, length, width)
+            if ends is None:
+                ends = np.empty((0, width), dtype=np.int64)
+
+        rows = len(ends)
+        if rows:
+            self._line_bytes = max(self._line_bytes, 1.1 * (length - len(_PAD)) / rows)
+        carry = b''
+        if not eof and rows % self.batch_size:
+            full = rows - rows % self.batch_size
+            carry = buffer[int(ends[full - 1, -1]) + 1 if full else len(_PAD):length]
+            ends = ends[:full]
+        self.stats['lines'] += len(ends)
+
+        line_starts = np.empty(len(ends), dtype=np.int64)
+        line_starts[:1] = len(_PAD)
+        line_starts[1:] = ends[:-1, -1] + 1
+        columns = self._integer_columns(buffer, fields, line_starts, ends)
+        batch = FlowRecordBatch(fields, buffer, line_starts, ends, columns)
+        batch = self._drop_invalid(batch)
+
+        batches = [batch.take(slice(start, start + self.batch_size)) for start in range(0, len(batch), self.batch_size)]
+        self.stats['records'] += len(batch)
+        self.stats['batches'] += len(batches)
+        return batches, carry
+
+    @staticmethod
+    def _separator_matrix(buffer: bytes, length: int, width: int) -> Optional['np.ndarray']:
+        """(lines, width) separator offsets when every line in buffer[pad:length] has exactly `width`
+        single-space separated tokens; None sends the block down the slow path"""
+        data = np.frombuffer(buffer, dtype=np.uint8, count=length)
+        is_separator = data[len(_PAD):] <= 32
+        # Leading whitespace or runs of separators would shift tokens between columns
+        if not len(is_separator) or is_separator[0] or (is_separator[1:] & is_separator[:-1]).any():
+            return None
+        separators = np.flatnonzero(is_separator)
+        separators += len(_PAD)
+
+        separator_bytes = data[separators]
+        newlines = separator_bytes == 10
+        lines = int(np.count_nonzero(newlines))
+        if len(separators) != lines * width or not ((separator_bytes == 32) | newlines).all():
+            return None
+        # Each line's last token must be the one followed by its newline
+        if not newlines.reshape(lines, width)[:, -1].all():
+            return None
+        return separators.reshape(lines, width)
+
+    def _normalise_lines(self, block: bytes, width: int) -> bytes:
+        good = []
+        for line in block.split(b'\n'):
+            tokens = line.split()
+            if len(tokens) == width:
+                good.append(b' '.join(tokens))
+            elif tokens:
+                self.stats['bad_lines'] += 1
+                self.stats['lines'] += 1
+        return b'\n'.join(good) + b'\n' if good else b''
+
+    @staticmethod
+    def _integer_columns(buffer: bytes, fields: List[str], line_starts: 'np.ndarray',
+                         ends: 'np.ndarray') -> Dict[str, 'np.ndarray']:
+        """Parse integer fields with 8-digit SWAR words; '-' becomes MISSING and other non-digit tokens
+        mark the row invalid"""
+        data = np.frombuffer(buffer, dtype=np.uint8)
+        words = np.ndarray(shape=(max(len(buffer) - 7, 0),), dtype='>u8', buffer=buffer, strides=(1,))
+        indexes = [index for index, field in enumerate(fields) if field in INTEGER_FIELDS]
+        rows = len(ends)
+        columns = {fields[index]: np.empty(rows, dtype=np.int64) for index in indexes}
+        invalid = np.zeros(rows, dtype=bool)
+
+        # Row chunks keep every temporary cache resident
+        for start in range(0, rows, _PARSE_CHUNK_ROWS):
+            chunk_ends = ends[start:start + _PARSE_CHUNK_ROWS]
+            chunk_line_starts = line_starts[start:start + _PARSE_CHUNK_ROWS]
+            for index in indexes:
+                token_ends = chunk_ends[:, index]
+                token_starts = _token_starts(chunk_ends, chunk_line_starts, index)
+                lengths = token_ends - token_starts
+
+                values, bad = _digits8(words[token_ends - 8].astype(np.uint64), np.minimum(lengths, 8))
+                if lengths.max() > 8:
+                    high, high_bad = _digits8(words[token_ends - 16].astype(np.uint64), np.clip(lengths - 8, 0, 8))
+                    values += high * 100000000
+                    bad |= high_bad | (lengths > 16)
+
+                # Only non-digit tokens can be '-'
+                if bad.any():
+                    suspect = np.flatnonzero(bad)
+                    dash = suspect[(lengths[suspect] == 1) & (data[token_starts[suspect]] == 45)]
+                    values[dash] = MISSING
+                    bad[dash] = False
+                    invalid[start:start + len(bad)] |= bad
+                columns[fields[index]][start:start + len(values)] = values
+
+        columns['_invalid'] = invalid
+        return columns
+
+    def _drop_invalid(self, batch: FlowRecordBatch) -> FlowRecordBatch:
+        """Remove rows with unparseable integers and, optionally, NODATA/SKIPDATA records"""
+        invalid = batch.columns.pop('_invalid')
+        keep = ~invalid
+        self.stats['bad_lines'] += int(invalid.sum())
+
+        if self.skip_no_data and 'log-status' in batch.fields and len(batch):
+            starts, _ = batch.token_bounds('log-status')
+            status_ok = np.frombuffer(batch._buffer, dtype=np.uint8)[starts] == 79  # 'O'K
+            no_data = keep & ~status_ok
+            self.stats['no_data'] += int(no_data.sum())
+            keep &= status_ok
+
+        return batch if keep.all() else batch.take(keep)
+
+    def get_statistics(self) -> Dict[str, Any]:
+        """Counters accumulated across every stream read"""
+        return dict(self.stats)
+
+
+class _PrefixedStream:
+    """Re-attaches bytes consumed while sniffing a stream without peek()"""
+
+    def __init__(self, prefix: bytes, stream: BinaryIO):
+        self._prefix = prefix
+        self._stream = stream
+
+    def read(self, size: int = -1) -> bytes:
+        if not self._prefix:
+            return self._stream.read(size)
+        prefix, self._prefix = self._prefix, b''
+        if size is None or size < 0:
+            return prefix + self._stream.read()
+        return prefix + self._stream.read(max(size - len(prefix), 0))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Parse VPC Flow Logs and print record counts")
+    parser.add_argument('paths', nargs='*', default=['-'], help="Files to read ('-' for stdin, gzip detected)")
+    parser.add_argument('--batch-size', type=int, default=65536)
+    parser.add_argument('--log-format', help="Field list when the input has no header line")
+    args = parser.parse_args()
+
+    reader = VpcFlowLogReader({'batch_size': args.batch_size, 'log_format': args.log_format})
+    for _ in reader.read_paths(args.paths):
+        pass
+    print(json.dumps(reader.get_statistics(), indent=2))
+
+
+if __name__ == "__main__":
+    main()
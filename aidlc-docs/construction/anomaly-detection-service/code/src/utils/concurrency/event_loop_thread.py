@@ -0,0 +1,53 @@
+"""
+Background Event Loop Thread
+Runs an asyncio event loop in a daemon thread so synchronous adapters can drive async components.
+"""
+
+import asyncio
+import threading
+from typing import Any, Awaitable, Optional
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class EventLoopThread:
+    """Dedicated asyncio loop running in a daemon thread"""
+
+    _shared: Optional['EventLoopThread'] = None
+    _shared_lock = threading.Lock()
+
+    def __init__(self, name: str = "async-adapter-loop"):
+        self.loop = asyncio.new_event_loop()
+        self._started = threading.Event()
+        self._thread = threading.Thread(target=self._run, name=name, daemon=True)
+        self._thread.start()
+        self._started.wait()
+
+    @classmethod
+    def shared(cls) -> 'EventLoopThread':
+        """Process-wide loop shared by all sync adapters"""
+        with cls._shared_lock:
+            if cls._shared is None or not cls._shared.is_running():
+                cls._shared = cls()
+            return cls._shared
+
+    def _run(self):
+        asyncio.set_event_loop(self.loop)
+        self.loop.call_soon(self._started.set)
+        self.loop.run_forever()
+
+    def is_running(self) -> bool:
+        return self._thread.is_alive() and self.loop.is_running()
+
+    def run(self, coro: Awaitable, timeout: Optional[float] = None) -> Any:
+        """Run coroutine on the background loop and block for its result"""
+        if threading.current_thread() is self._thread:
+            raise RuntimeError("EventLoopThread.run() called from its own loop; await the coroutine instead")
+        return asyncio.run_coroutine_threadsafe(coro, self.loop).result(timeout)
+
+    def stop(self, timeout: float = 5.0):
+        """Stop the loop and join the thread"""
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self._thread.join(timeout)
+        logger.info("Background event loop stopped")
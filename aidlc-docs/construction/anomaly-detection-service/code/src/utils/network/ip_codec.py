@@ -0,0 +1,159 @@
+"""
+IP Address Codec
+Encodes IP strings to integers once at ingest, gives O(1) subnet masking, and interns string forms for output.
+"""
+
+import itertools
+import socket
+import threading
+from typing import Dict, Iterable, List, Optional
+
+try:
+    import numpy as np
+except ImportError:  # split_families is unavailable without numpy
+    np = None
+
+# Integer layout: IPv4 addresses are their uint32 value, IPv6 addresses are
+# their uint128 value offset by IPV6_BASE so the two families never collide,
+# and strings that are not addresses ('', '-', hostnames) get negative ids.
+IPV4_LIMIT = 1 << 32
+IPV6_BASE = 1 << 128
+INVALID = -1
+
+_V4_MASKS = [((1 << 32) - 1) ^ ((1 << (32 - length)) - 1) for length in range(33)]
+_V6_MASKS = [((1 << 128) - 1) ^ ((1 << (128 - length)) - 1) for length in range(129)]
+
+
+def is_ipv4(code: int) -> bool:
+    """True when code is an encoded IPv4 address"""
+    return 0 <= code < IPV4_LIMIT
+
+
+def is_ipv6(code: int) -> bool:
+    """True when code is an encoded IPv6 address"""
+    return code >= IPV6_BASE
+
+
+def network(code: int, prefix_len: int) -> int:
+    """Network part of an encoded address for a prefix length; non-addresses are returned unchanged"""
+    if 0 <= code < IPV4_LIMIT:
+        return code & _V4_MASKS[min(prefix_len, 32)]
+    if code >= IPV6_BASE:
+        return IPV6_BASE | ((code - IPV6_BASE) & _V6_MASKS[min(prefix_len, 128)])
+    return code
+
+
+def same_subnet(code1: int, code2: int, prefix_len: int = 24, v6_prefix_len: Optional[int] = None) -> bool:
+    """Whether two encoded addresses share a subnet; IPv6 pairs are compared only when v6_prefix_len is set"""
+    if 0 <= code1 < IPV4_LIMIT and 0 <= code2 < IPV4_LIMIT:
+        return ((code1 ^ code2) & _V4_MASKS[prefix_len]) == 0
+    if v6_prefix_len is not None and code1 >= IPV6_BASE and code2 >= IPV6_BASE:
+        return ((code1 ^ code2) & _V6_MASKS[v6_prefix_len]) == 0
+    return False
+
+
+def first_octet(code: int) -> int:
+    """Leading octet of an encoded IPv4 address, -1 otherwise"""
+    return code >> 24 if 0 <= code < IPV4_LIMIT else -1
+
+
+def _parse(ip: str) -> Optional[int]:
+    """Integer code for an address string, or None when it is not an address"""
+    try:
+        return int.from_bytes(socket.inet_pton(socket.AF_INET, ip), 'big')
+    except OSError:
+        pass
+    try:
+        return IPV6_BASE + int.from_bytes(socket.inet_pton(socket.AF_INET6, ip.split('%', 1)[0]), 'big')
+    except (OSError, ValueError):
+        return None
+
+
+class IpCodec:
+    """Memoized string <-> integer IP codec; decode returns the interned string seen at ingest"""
+
+    _shared: Optional['IpCodec'] = None
+    _shared_lock = threading.Lock()
+
+    def __init__(self, max_entries: int = 1 << 20):
+        self.max_entries = max_entries
+        self._codes: Dict[str, int] = {}
+        self._strings: Dict[int, str] = {}
+        # Non-address strings keep their ids for the codec's lifetime so they always decode
+        self._invalid_codes: Dict[str, int] = {'': INVALID}
+        self._invalid_strings: Dict[int, str] = {INVALID: ''}
+        self._invalid_ids = itertools.count(INVALID - 1, -1)
+
+    @classmethod
+    def shared(cls) -> 'IpCodec':
+        """Process-wide codec shared by the pipeline stages"""
+        with cls._shared_lock:
+            if cls._shared is None:
+                cls._shared = cls()
+            return cls._shared
+
+    def encode(self, ip: Optional[str]) -> int:
+        """Integer code for ip; the first sighting of each string parses it, later ones are a dict lookup"""
+        code = self._codes.get(ip)
+        if code is not None:
+            return code
+        if not isinstance(ip, str):
+            ip = '' if ip is None else str(ip)
+        code = _parse(ip.strip())
+        if code is None:
+            code = self._invalid_codes.get(ip)
+            if code is None:
+                if len(self._invalid_codes) >= self.max_entries:
+                    return INVALID
+                code = next(self._invalid_ids)
+                self._invalid_codes[ip] = code
+                self._invalid_strings[code] = ip
+            return code
+
+        if len(self._codes) >= self.max_entries:
+            self._codes.clear()
+            self._strings.clear()
+        self._codes[ip] = code
+        self._strings.setdefault(code, ip)
+        return code
+
+    def encode_many(self, ips: Iterable[Optional[str]]) -> List[int]:
+        """Integer codes for a sequence of IP strings"""
+        encode = self.encode
+        return [encode(ip) for ip in ips]
+
+    def decode(self, code: int) -> str:
+        """String form of an encoded address, interned so repeated output shares one object"""
+        ip = self._strings.get(code)
+        if ip is not None:
+            return ip
+        if code < 0:
+            return self._invalid_strings.get(code, '')
+        if code < IPV4_LIMIT:
+            ip = socket.inet_ntoa(code.to_bytes(4, 'big'))
+        else:
+            ip = socket.inet_ntop(socket.AF_INET6, (code - IPV6_BASE).to_bytes(16, 'big'))
+        self._strings[code] = ip
+        return ip
+
+    def get_statistics(self) -> Dict[str, int]:
+        """Codec table sizes"""
+        return {
+            'encoded': len(self._codes),
+            'interned': len(self._strings),
+            'invalid': len(self._invalid_codes)
+        }
+
+
+def split_families(codes: List[int]):
+    """uint32 IPv4 column with validity mask, plus uint128 IPv6 values by row, for vectorized trie walks"""
+    v4_values = [0] * len(codes)
+    v4_flags = [False] * len(codes)
+    v6_values = {}
+    for row, code in enumerate(codes):
+        if 0 <= code < IPV4_LIMIT:
+            v4_values[row] = code
+            v4_flags[row] = True
+        elif code >= IPV6_BASE:
+            v6_values[row] = code - IPV6_BASE
+    return np.asarray(v4_values, dtype=np.uint32), np.asarray(v4_flags, dtype=bool), v6_values
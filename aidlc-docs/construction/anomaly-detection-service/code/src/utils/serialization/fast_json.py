@@ -0,0 +1,82 @@
+"""
+Fast JSON
+orjson-backed encoding shared by API responses, the live feed, the anomaly store and event publishing.
+"""
+
+import dataclasses
+import json
+from datetime import date, datetime
+from decimal import Decimal
+from enum import Enum
+from typing import Any, Dict, Optional
+
+try:
+    import orjson
+except ImportError:  # stdlib json with the same output rules when orjson is missing
+    orjson = None
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+HAS_ORJSON = orjson is not None
+
+if HAS_ORJSON:
+    _OPTIONS = orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS
+
+
+def _default(value: Any) -> Any:
+    """Types orjson leaves to us: sets (e.g. TorUsageAnomaly.tor_ports), Decimal, numpy scalars, anything else as str"""
+    if isinstance(value, (set, frozenset)):
+        return list(value)
+    if isinstance(value, Decimal):
+        return float(value)
+    if np is not None and isinstance(value, np.generic):
+        return value.item()
+    return str(value)
+
+
+def _stdlib_default(value: Any) -> Any:
+    """Fallback encoder for the types orjson handles natively"""
+    if dataclasses.is_dataclass(value) and not isinstance(value, type):
+        # Shallow: nested values go back through the encoder instead of asdict's deep copy
+        return {field.name: getattr(value, field.name) for field in dataclasses.fields(value)}
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    if isinstance(value, Enum):
+        return value.value
+    if np is not None and isinstance(value, np.ndarray):
+        return value.tolist()
+    return _default(value)
+
+
+def dumps(value: Any) -> bytes:
+    """Compact UTF-8 JSON; dataclasses, datetimes (ISO 8601), sets and numpy values are encoded directly"""
+    if HAS_ORJSON:
+        return orjson.dumps(value, default=_default, option=_OPTIONS)
+    return json.dumps(value, default=_stdlib_default, separators=(',', ':'), ensure_ascii=False).encode('utf-8')
+
+
+def dumps_text(value: Any) -> str:
+    """dumps() as str, for APIs that take text (WebSocket frames, EventBridge Detail, SQLite columns)"""
+    return dumps(value).decode('utf-8')
+
+
+def dumps_with(value: Any, extra: Optional[Dict[str, Any]] = None) -> bytes:
+    """Encode an object-shaped value (dict or dataclass) with extra top-level keys, without copying it into a dict"""
+    body = dumps(value)
+    if not extra:
+        return body
+    tail = dumps(extra)
+    if body == b'{}':
+        return tail
+    # Splice the encoded objects; extra keys must not repeat keys of value
+    return body[:-1] + b',' + tail[1:]
+
+
+def loads(data: Any) -> Any:
+    """Parse JSON from bytes or str"""
+    if HAS_ORJSON:
+        return orjson.loads(data)
+    return json.loads(data)
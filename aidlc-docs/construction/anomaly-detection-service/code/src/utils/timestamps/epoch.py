@@ -0,0 +1,180 @@
+"""
+Epoch Timestamps
+Integer epoch-second time model for flow records: ISO strings are parsed once, datetimes are built only for output.
+"""
+
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, Iterable, List, Optional
+
+try:
+    import numpy as np
+except ImportError:  # to_epoch_array returns a list without numpy
+    np = None
+
+SECONDS_PER_HOUR = 3600
+SECONDS_PER_DAY = 86400
+
+_EPOCH = datetime(1970, 1, 1)
+_EPOCH_WEEKDAY = 3  # 1970-01-01 was a Thursday
+
+# UTC offsets accepted by the fast path; anything else goes through fromisoformat
+_UTC_SUFFIXES = frozenset(('', 'Z', '+00:00', '+0000', '-00:00'))
+
+# 'YYYY-MM-DDTHH' -> epoch seconds at the start of that hour. Flow batches
+# cover a few hours at most, so the cache stays tiny and almost always hits.
+_PREFIX_CACHE: Dict[str, int] = {}
+_PREFIX_CACHE_LIMIT = 4096
+
+# Byte offsets of the digits in 'YYYY-MM-DDTHH:MM:SS' and days per month (index 0 unused)
+_DIGIT_COLUMNS = [0, 1, 2, 3, 5, 6, 8, 9, 11, 12, 14, 15, 17, 18]
+_MONTH_DAYS = (0, 31, 28, 31, 30, 31, 30, 31, 31, 30, 31, 30, 31)
+
+
+def now_epoch() -> int:
+    """Current time as integer epoch seconds"""
+    return int(time.time())
+
+
+def datetime_to_epoch(value: datetime) -> int:
+    """Convert datetime to integer epoch seconds (naive values are UTC)"""
+    if value.tzinfo is not None:
+        value = value.astimezone(timezone.utc).replace(tzinfo=None)
+    delta = value - _EPOCH
+    return delta.days * SECONDS_PER_DAY + delta.seconds
+
+
+def epoch_to_datetime(value: int) -> datetime:
+    """Convert integer epoch seconds to naive UTC datetime"""
+    return _EPOCH + timedelta(seconds=int(value))
+
+
+def _hour_prefix_epoch(prefix: str) -> int:
+    """Epoch seconds for a 'YYYY-MM-DDTHH' prefix, memoized"""
+    base = _PREFIX_CACHE.get(prefix)
+    if base is None:
+        hour = prefix[11:13]
+        if prefix[10] not in 'T ' or not hour.isdigit():
+            raise ValueError(f"Invalid ISO timestamp prefix: {prefix!r}")
+        base = datetime_to_epoch(datetime.fromisoformat(prefix[:10])) + int(hour) * SECONDS_PER_HOUR
+        if len(_PREFIX_CACHE) >= _PREFIX_CACHE_LIMIT:
+            _PREFIX_CACHE.clear()
+        _PREFIX_CACHE[prefix] = base
+    return base
+
+
+def parse_iso_epoch(value: str) -> int:
+    """Parse an ISO-8601 timestamp to epoch seconds, reusing the parsed date/hour prefix"""
+    if len(value) >= 19 and value[13] == ':' and value[16] == ':':
+        minutes, seconds, tail = value[14:16], value[17:19], value[19:]
+        if tail[:1] == '.':
+            end = 1
+            while end < len(tail) and tail[end].isdigit():
+                end += 1
+            tail = tail[end:]
+        if tail in _UTC_SUFFIXES and minutes.isdigit() and seconds.isdigit():
+            return _hour_prefix_epoch(value[:13]) + int(minutes) * 60 + int(seconds)
+
+    # Non-UTC offsets, date-only values and other ISO variants
+    return datetime_to_epoch(datetime.fromisoformat(value.replace('Z', '+00:00')))
+
+
+def to_epoch(value: Any, default: Optional[int] = None) -> int:
+    """Normalize an epoch number, datetime or ISO string to epoch seconds; default (or now) when missing"""
+    if isinstance(value, int):
+        return value
+    if isinstance(value, str):
+        return parse_iso_epoch(value)
+    if isinstance(value, datetime):
+        return datetime_to_epoch(value)
+    if isinstance(value, float):
+        return int(value)
+    if np is not None and isinstance(value, np.integer):
+        return int(value)
+    return now_epoch() if default is None else default
+
+
+def _days_from_civil(year, month, day):
+    """Days since 1970-01-01 for proleptic Gregorian dates (vectorized)"""
+    year = year - (month <= 2)
+    era = year // 400
+    year_of_era = year - era * 400
+    day_of_year = (153 * (month + np.where(month > 2, -3, 9)) + 2) // 5 + day - 1
+    day_of_era = year_of_era * 365 + year_of_era // 4 - year_of_era // 100 + day_of_year
+    return era * 146097 + day_of_era - 719468
+
+
+def _parse_iso_column(strings: List[str]):
+    """Vectorized parse of 'YYYY-MM-DD[T ]HH:MM:SS[Z|+00:00]' strings; returns (epochs, parsed row mask)"""
+    try:
+        column = np.array(strings, dtype=bytes)
+    except UnicodeEncodeError:
+        return np.zeros(len(strings), dtype=np.int64), np.zeros(len(strings), dtype=bool)
+    width = max(column.dtype.itemsize, 26)
+    chars = np.zeros((len(strings), width), dtype=np.uint8)
+    chars[:, :column.dtype.itemsize] = column.view(np.uint8).reshape(len(strings), column.dtype.itemsize)
+
+    tail = chars[:, 19:26]
+    parsed = (
+        (chars[:, 4] == ord('-')) & (chars[:, 7] == ord('-'))
+        & ((chars[:, 10] == ord('T')) | (chars[:, 10] == ord(' ')))
+        & (chars[:, 13] == ord(':')) & (chars[:, 16] == ord(':'))
+        & (chars[:, 26:] == 0).all(axis=1)
+        & ((tail[:, 0] == 0)
+           | ((tail[:, 0] == ord('Z')) & (tail[:, 1] == 0))
+           | (tail == np.frombuffer(b'+00:00\0', dtype=np.uint8)).all(axis=1))
+    )
+    digits = chars[:, _DIGIT_COLUMNS].astype(np.int64) - ord('0')
+    parsed &= ((digits >= 0) & (digits <= 9)).all(axis=1)
+    digits = np.where(parsed[:, None], digits, 0)
+
+    def number(first: int, count: int):
+        value = digits[:, first]
+        for offset in range(1, count):
+            value = value * 10 + digits[:, first + offset]
+        return value
+
+    year, month, day = number(0, 4), number(4, 2), number(6, 2)
+    hour, minute, second = number(8, 2), number(10, 2), number(12, 2)
+    leap = (year % 4 == 0) & ((year % 100 != 0) | (year % 400 == 0))
+    month_days = np.asarray(_MONTH_DAYS, dtype=np.int64)[np.clip(month, 0, 12)] + ((month == 2) & leap)
+    parsed &= ((month >= 1) & (month <= 12) & (day >= 1) & (day <= month_days)
+               & (year >= 1) & (hour <= 23) & (minute <= 59) & (second <= 59))
+
+    epochs = (_days_from_civil(year, month, day) * SECONDS_PER_DAY
+              + hour * SECONDS_PER_HOUR + minute * 60 + second)
+    return np.where(parsed, epochs, 0), parsed
+
+
+def to_epoch_array(values: Iterable[Any], default: Optional[int] = None):
+    """Epoch seconds for a column of timestamps as an int64 array; ISO strings are parsed as one block"""
+    if default is None:
+        default = now_epoch()
+    values = list(values)
+    if np is None:
+        return [to_epoch(value, default) for value in values]
+
+    positions = [i for i, value in enumerate(values) if isinstance(value, str)]
+    if not positions:
+        return np.fromiter((to_epoch(value, default) for value in values), dtype=np.int64, count=len(values))
+
+    epochs = np.fromiter(
+        (default if isinstance(value, str) else to_epoch(value, default) for value in values),
+        dtype=np.int64, count=len(values)
+    )
+    parsed_epochs, parsed = _parse_iso_column([values[i] for i in positions])
+    positions = np.asarray(positions, dtype=np.int64)
+    epochs[positions[parsed]] = parsed_epochs[parsed]
+    for position in positions[~parsed].tolist():
+        epochs[position] = parse_iso_epoch(values[position])
+    return epochs
+
+
+def hour_of_day(epoch: int) -> int:
+    """UTC hour of day for epoch seconds"""
+    return (epoch // SECONDS_PER_HOUR) % 24
+
+
+def day_of_week(epoch: int) -> int:
+    """UTC weekday for epoch seconds (Monday is 0, as datetime.weekday)"""
+    return (epoch // SECONDS_PER_DAY + _EPOCH_WEEKDAY) % 7
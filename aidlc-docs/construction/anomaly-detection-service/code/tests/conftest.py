@@ -0,0 +1,9 @@
+"""
+Test Configuration
+Puts the service root on sys.path so tests import the src package the way the benchmarks do.
+"""
+
+import os
+import sys
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
@@ -0,0 +1,134 @@
+#!/usr/bin/env python3
+"""
+Anomaly Repository Benchmark
+Loads synthetic anomalies spread over --days into the day-partitioned SQLite store and times each
+GET /api/v1/anomalies filter, a full cursor walk, and id lookups; pages are checked against a brute-force scan.
+
+Usage:
+    python tests/performance/bench_anomaly_repository.py [--anomalies 1000000] [--days 30] [--directory DIR]
+"""
+
+import argparse
+import os
+import random
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+
+from src.infrastructure.cache.state_codec import to_epoch_us
+from src.infrastructure.storage.anomaly_repository import AnomalyRepository
+
+THREAT_TYPES = ['PORT_SCANNING', 'DDOS', 'C2_BEACONING', 'CRYPTO_MINING', 'TOR_USAGE', 'ML_BEHAVIORAL_ANOMALY']
+END = datetime(2024, 3, 1)
+
+
+def build_anomalies(count: int, days: int):
+    random.seed(11)
+    span = days * 86400
+    anomalies = []
+    for i in range(count):
+        anomalies.append({
+            'anomaly_id': f"anom_{i:08d}",
+            'anomaly_detected': True,
+            'threat_type': random.choice(THREAT_TYPES),
+            'severity': random.choice(['low', 'medium', 'high', 'critical']),
+            'confidence_score': round(random.random(), 3),
+            'detection_method': 'tiered_processing',
+            'validation_results': {'validated': True},
+            'source_ip': f"10.{random.randint(0, 15)}.{random.randint(0, 255)}.{random.randint(1, 254)}",
+            'destination_ip': f"172.16.{random.randint(0, 3)}.{random.randint(1, 254)}",
+            'processing_time_ms': random.randint(5, 500),
+            'detected_at': END - timedelta(seconds=random.randint(0, span))
+        })
+    return anomalies
+
+
+def timed(function, repeat: int = 5):
+    samples = []
+    result = None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = function()
+        samples.append(time.perf_counter() - started)
+    return statistics.median(samples), result
+
+
+def brute_force(anomalies, limit, **filters):
+    rows = [
+        a for a in anomalies
+        if (filters.get('source_ip') is None or a['source_ip'] == filters['source_ip'])
+        and (filters.get('destination_ip') is None or a['destination_ip'] == filters['destination_ip'])
+        and (filters.get('threat_types') is None or a['threat_type'] in filters['threat_types'])
+        and a['confidence_score'] >= filters.get('min_confidence', 0.0)
+        and (filters.get('start_time') is None or a['detected_at'] >= filters['start_time'])
+        and (filters.get('end_time') is None or a['detected_at'] <= filters['end_time'])
+    ]
+    rows.sort(key=lambda a: (to_epoch_us(a['detected_at']), a['anomaly_id']), reverse=True)
+    return [a['anomaly_id'] for a in rows[:limit]]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--anomalies', type=int, default=1000000)
+    parser.add_argument('--days', type=int, default=30)
+    parser.add_argument('--directory', help="Store location (default: a temporary directory)")
+    args = parser.parse_args()
+
+    directory = args.directory or tempfile.mkdtemp(prefix='anomaly-store-')
+    repository = AnomalyRepository({'directory': directory, 'retention_days': args.days + 1})
+    try:
+        anomalies = build_anomalies(args.anomalies, args.days)
+        started = time.perf_counter()
+        for offset in range(0, len(anomalies), 10000):
+            repository.save_many(anomalies[offset:offset + 10000])
+        load = time.perf_counter() - started
+        print(f"=== Anomaly repository: {args.anomalies:,} anomalies over {args.days} days ===")
+        print(f"load {load:,.1f} s ({args.anomalies / load:,.0f} anomalies/s), "
+              f"{repository.get_statistics()['partitions']} partitions")
+
+        sample = anomalies[len(anomalies) // 2]
+        cases = [
+            ('latest page', {}),
+            ('last 24h', {'start_time': END - timedelta(days=1)}),
+            ('source_ip', {'source_ip': sample['source_ip']}),
+            ('destination_ip', {'destination_ip': sample['destination_ip']}),
+            ('threat_types', {'threat_types': ['DDOS', 'TOR_USAGE']}),
+            ('min_confidence 0.99', {'min_confidence': 0.99}),
+            ('source_ip + 7 days', {'source_ip': sample['source_ip'], 'start_time': END - timedelta(days=7)}),
+        ]
+        for name, filters in cases:
+            elapsed, page = timed(lambda: repository.query(limit=100, **filters))
+            matches = [a['anomaly_id'] for a in page['anomalies']] == brute_force(anomalies, 100, **filters)
+            print(f"{name:<22} {elapsed * 1000:>8.2f} ms  rows {len(page['anomalies']):>4}  "
+                  f"has_more {str(page['has_more']):<5}  matches {matches}")
+
+        # Walk every page of one threat type with cursors
+        started = time.perf_counter()
+        cursor, pages, rows = None, 0, 0
+        while True:
+            page = repository.query(threat_types=['C2_BEACONING'], limit=1000, cursor=cursor)
+            pages += 1
+            rows += len(page['anomalies'])
+            if not page['has_more']:
+                break
+            cursor = page['next_cursor']
+        walk = time.perf_counter() - started
+        expected = sum(1 for a in anomalies if a['threat_type'] == 'C2_BEACONING')
+        print(f"{'cursor walk':<22} {walk * 1000:>8.0f} ms  pages {pages}  rows {rows:,}  complete {rows == expected}")
+
+        ids = [random.choice(anomalies)['anomaly_id'] for _ in range(200)]
+        elapsed, _ = timed(lambda: [repository.get(anomaly_id) for anomaly_id in ids], repeat=1)
+        print(f"{'get by id':<22} {elapsed / len(ids) * 1000:>8.3f} ms per lookup")
+    finally:
+        repository.close()
+        if not args.directory:
+            shutil.rmtree(directory)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,127 @@
+#!/usr/bin/env python3
+"""
+Batch Detection Endpoint Load Test
+Drives POST /api/v1/detect/batch with concurrent clients and reports throughput, request latency and
+event loop lag, with detection running inline on threads versus on the worker process pool.
+
+Usage:
+    python tests/performance/bench_batch_endpoint.py [--requests 64] [--batch 5000] [--concurrency 1 8 32]
+
+Runs the app in-process through httpx's ASGI transport, so no server or network is involved.
+"""
+
+import argparse
+import asyncio
+import os
+import random
+import statistics
+import sys
+import time
+from datetime import datetime, timedelta
+
+import httpx
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+
+from src.api.endpoints import anomaly_api
+from src.api.services.detection_service import DetectionService
+
+
+def build_batch(size: int, seed: int) -> dict:
+    """Mostly ordinary traffic plus one scanner sweeping ports so every tier runs"""
+    rng = random.Random(seed)
+    base = datetime(2024, 1, 1) + timedelta(minutes=seed)
+    flow_logs = []
+    for i in range(size):
+        scanner = i % 10 == 0
+        start = base + timedelta(seconds=i * 60 / size)
+        flow_logs.append({
+            'source_ip': '198.51.100.7' if scanner else f"10.0.{rng.randint(0, 255)}.{rng.randint(1, 254)}",
+            'destination_ip': f"172.16.0.{rng.randint(1, 20)}",
+            'source_port': rng.randint(1024, 65535),
+            'destination_port': i if scanner else rng.choice([80, 443]),
+            'protocol': 'TCP',
+            'packets': rng.randint(1, 20),
+            'bytes': rng.randint(40, 20000),
+            'start_time': start.isoformat(),
+            'end_time': (start + timedelta(seconds=1)).isoformat(),
+            'action': 'REJECT' if scanner else 'ACCEPT'
+        })
+    return {'flow_logs': flow_logs, 'detection_types': ['all']}
+
+
+async def measure_loop_lag(stop: asyncio.Event, samples: list, interval: float = 0.01):
+    """How late a 10 ms timer fires: the time any other request would wait for the loop"""
+    loop = asyncio.get_running_loop()
+    while not stop.is_set():
+        expected = loop.time() + interval
+        await asyncio.sleep(interval)
+        samples.append(max(0.0, loop.time() - expected))
+
+
+async def run_scenario(payloads: list, concurrency: int) -> dict:
+    transport = httpx.ASGITransport(app=anomaly_api.app)
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies, lag, statuses = [], [], {}
+    stop = asyncio.Event()
+
+    async with httpx.AsyncClient(transport=transport, base_url='http://bench', timeout=600) as client:
+        async def one(payload):
+            async with semaphore:
+                started = time.perf_counter()
+                response = await client.post('/api/v1/detect/batch', json=payload)
+                latencies.append(time.perf_counter() - started)
+                statuses[response.status_code] = statuses.get(response.status_code, 0) + 1
+
+        monitor = asyncio.create_task(measure_loop_lag(stop, lag))
+        started = time.perf_counter()
+        await asyncio.gather(*(one(payload) for payload in payloads))
+        elapsed = time.perf_counter() - started
+        stop.set()
+        await monitor
+
+    ordered = sorted(latencies)
+    return {
+        'elapsed': elapsed,
+        'requests_per_second': len(payloads) / elapsed,
+        'flows_per_second': sum(len(p['flow_logs']) for p in payloads) / elapsed,
+        'p50': statistics.median(ordered),
+        'p95': ordered[int(0.95 * (len(ordered) - 1))],
+        'max_lag': max(lag) if lag else 0.0,
+        'statuses': statuses
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--requests', type=int, default=64)
+    parser.add_argument('--batch', type=int, default=5000)
+    parser.add_argument('--concurrency', type=int, nargs='+', default=[1, 8, 32])
+    parser.add_argument('--workers', type=int, default=os.cpu_count())
+    args = parser.parse_args()
+
+    payloads = [build_batch(args.batch, seed) for seed in range(args.requests)]
+    print(f"=== POST /api/v1/detect/batch: {args.requests} requests x {args.batch:,} flows ===")
+    for use_processes in (False, True):
+        mode = f"process pool x{args.workers}" if use_processes else "inline thread"
+        service = DetectionService({
+            'max_batch_items': args.batch,
+            'workers': args.workers if use_processes else 1,
+            'use_process_pool': use_processes
+        })
+        service.start()
+        anomaly_api.detection_service = service
+        anomaly_api.app.dependency_overrides[anomaly_api.get_anomaly_detector] = lambda: service
+        try:
+            for concurrency in args.concurrency:
+                stats = asyncio.run(run_scenario(payloads, concurrency))
+                print(f"{mode:<18} c={concurrency:<3} {stats['requests_per_second']:>7.2f} req/s  "
+                      f"{stats['flows_per_second']:>10,.0f} flows/s  p50 {stats['p50'] * 1000:>8,.0f} ms  "
+                      f"p95 {stats['p95'] * 1000:>8,.0f} ms  max loop lag {stats['max_lag'] * 1000:>7,.1f} ms  "
+                      f"{stats['statuses']}")
+        finally:
+            service.shutdown()
+
+
+if __name__ == "__main__":
+    main()
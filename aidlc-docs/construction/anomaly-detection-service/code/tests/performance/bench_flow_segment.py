@@ -0,0 +1,109 @@
+#!/usr/bin/env python3
+"""
+Flow Segment Benchmark
+Compares producing detector input from JSON lines, VPC Flow Log text and memory-mapped segments,
+and times a narrow time-range query against a full scan.
+
+Usage:
+    python tests/performance/bench_flow_segment.py [--records 1000000] [--batch-rows 65536]
+"""
+
+import argparse
+import io
+import json
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+
+from src.ingestion.flow_segment import convert, iter_segments, to_flow_logs
+from src.ingestion.vpc_flow_log_reader import VpcFlowLogReader
+
+
+def build_inputs(records: int, directory: str):
+    random.seed(5)
+    text_path = os.path.join(directory, 'flows.log')
+    json_path = os.path.join(directory, 'flows.jsonl')
+    with open(text_path, 'w') as text, open(json_path, 'w') as lines:
+        for i in range(records):
+            source = f"10.{random.randint(0, 255)}.{random.randint(0, 255)}.{random.randint(1, 254)}"
+            destination = f"172.16.{random.randint(0, 15)}.{random.randint(1, 254)}"
+            source_port, destination_port = random.randint(1024, 65535), random.choice([22, 53, 80, 443])
+            packets, size = random.randint(1, 500), random.randint(40, 10 ** 6)
+            start = 1700000000 + i // 20
+            action = random.choice(['ACCEPT', 'REJECT'])
+            text.write(f"2 123456789012 eni-0a1b2c3d {source} {destination} {source_port} {destination_port} "
+                       f"6 {packets} {size} {start} {start + 60} {action} OK\n")
+            lines.write(json.dumps({
+                'timestamp': start, 'source_ip': source, 'destination_ip': destination,
+                'source_port': source_port, 'destination_port': destination_port, 'protocol': 'TCP',
+                'action': action, 'packets': packets, 'bytes': size
+            }) + '\n')
+    return text_path, json_path
+
+
+def time_json(path: str, batch_rows: int) -> float:
+    start = time.perf_counter()
+    batch = []
+    with open(path) as handle:
+        for line in handle:
+            batch.append(json.loads(line))
+            if len(batch) >= batch_rows:
+                batch = []
+    return time.perf_counter() - start
+
+
+def time_text(path: str, batch_rows: int) -> float:
+    start = time.perf_counter()
+    with open(path, 'rb') as handle:
+        for batch in VpcFlowLogReader({'batch_size': batch_rows}).read(io.BufferedReader(handle)):
+            batch.to_flow_logs()
+    return time.perf_counter() - start
+
+
+def time_segments(directory: str, batch_rows: int, start_ts=None, end_ts=None, decode=True):
+    rows = 0
+    start = time.perf_counter()
+    for records in iter_segments([directory], start_ts, end_ts, batch_rows):
+        rows += len(records)
+        if decode:
+            to_flow_logs(records)
+    return time.perf_counter() - start, rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--records', type=int, default=1000000)
+    parser.add_argument('--batch-rows', type=int, default=65536)
+    args = parser.parse_args()
+
+    directory = tempfile.mkdtemp(prefix='flow-segments-')
+    try:
+        text_path, json_path = build_inputs(args.records, directory)
+        segment_dir = os.path.join(directory, 'segments')
+        conversion = convert([text_path], segment_dir, 'vpc', max_records=1 << 20, batch_rows=args.batch_rows)
+
+        print(f"=== Detector input from {args.records:,} flows ===")
+        print(f"convert (text -> segments)  {conversion['seconds'] * 1000:>9,.1f} ms  "
+              f"{conversion['records_per_second']:>12,} rec/s  {conversion['segments']} segments")
+        for name, elapsed in (
+                ('json lines -> dicts', time_json(json_path, args.batch_rows)),
+                ('vpc text -> dicts', time_text(text_path, args.batch_rows)),
+                ('segments -> dicts', time_segments(segment_dir, args.batch_rows)[0]),
+                ('segments -> views', time_segments(segment_dir, args.batch_rows, decode=False)[0])):
+            print(f"{name:<27} {elapsed * 1000:>9,.1f} ms  {args.records / elapsed:>12,.0f} rec/s")
+
+        # One hour out of the whole span: sorted segments binary-search straight to it
+        first = 1700000000 + (args.records // 20) // 2
+        elapsed, rows = time_segments(segment_dir, args.batch_rows, first, first + 3600, decode=False)
+        print(f"{'1h range query (views)':<27} {elapsed * 1000:>9,.3f} ms  {rows:>12,} rows")
+    finally:
+        shutil.rmtree(directory)
+
+
+if __name__ == "__main__":
+    main()
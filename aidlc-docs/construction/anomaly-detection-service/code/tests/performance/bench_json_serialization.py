@@ -0,0 +1,132 @@
+#!/usr/bin/env python3
+"""
+JSON Serialization Benchmark
+Compares stdlib json against the fast_json layer for an anomaly query page, EventBridge event details
+built from anomaly dataclasses, and stored anomaly documents read back from the repository.
+
+Usage:
+    python tests/performance/bench_json_serialization.py [--anomalies 1000] [--events 10000] [--repeat 5]
+"""
+
+import argparse
+import json
+import os
+import random
+import statistics
+import sys
+import time
+from dataclasses import asdict
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+
+from src.detection.statistical.tor_usage_detector import TorUsageAnomaly
+from src.utils.serialization import fast_json
+from src.utils.serialization.fast_json import dumps, dumps_with, loads
+
+THREAT_TYPES = ['PORT_SCANNING', 'DDOS', 'C2_BEACONING', 'CRYPTO_MINING', 'TOR_USAGE']
+
+
+def build_anomalies(count: int):
+    """Anomaly result dicts as the query and batch endpoints return them"""
+    anomalies = []
+    for i in range(count):
+        anomalies.append({
+            'anomaly_id': f"anom_{i:08d}",
+            'anomaly_detected': True,
+            'threat_type': random.choice(THREAT_TYPES),
+            'severity': random.choice(['low', 'medium', 'high', 'critical']),
+            'confidence_score': round(random.random(), 4),
+            'detection_method': 'tiered_processing',
+            'validation_results': {
+                'validated': True,
+                'stages': {'whitelist': True, 'historical': True, 'cross_tier': True},
+                'failure_reasons': []
+            },
+            'correlation_context': {'group_id': f"corr_{i}", 'related_anomalies': 3, 'group_confidence': 0.91},
+            'source_ip': f"10.0.{i // 256 % 256}.{i % 256}",
+            'destination_ip': f"172.16.0.{random.randint(1, 254)}",
+            'entities': [f"10.0.{i // 256 % 256}.{i % 256}", '172.16.0.9', '198.51.100.7'],
+            'processing_time_ms': random.randint(5, 500)
+        })
+    return anomalies
+
+
+def build_tor_anomalies(count: int):
+    """Dataclasses with the awkward types: sets, lists and datetimes"""
+    now = datetime(2024, 3, 1)
+    return [
+        TorUsageAnomaly(
+            anomaly_id=f"tor_{i}",
+            source_ip=f"10.1.{i // 256 % 256}.{i % 256}",
+            tor_nodes=[f"185.220.101.{j}" for j in range(8)],
+            connection_count=random.randint(3, 200),
+            tor_ports={9001, 9030, 9050, 9150, 443},
+            connection_pattern='persistent',
+            confidence_score=round(random.random(), 4),
+            detection_timestamp=now - timedelta(seconds=i)
+        )
+        for i in range(count)
+    ]
+
+
+def timed(function, repeat: int):
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        function()
+        samples.append(time.perf_counter() - started)
+    return statistics.median(samples)
+
+
+def report(name: str, baseline: float, fast: float, items: int):
+    print(f"{name:<32} stdlib {items / baseline:>12,.0f}/s  fast_json {items / fast:>12,.0f}/s  "
+          f"speedup {baseline / fast:>5.1f}x")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--anomalies', type=int, default=1000, help="Anomalies per query page")
+    parser.add_argument('--events', type=int, default=10000)
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    random.seed(5)
+    backend = 'orjson' if fast_json.HAS_ORJSON else 'stdlib fallback'
+    print(f"=== JSON serialization benchmark ({backend}) ===")
+
+    # Query page: one response body per iteration
+    page = {'anomalies': build_anomalies(args.anomalies), 'total_count': args.anomalies, 'query_time_ms': 3,
+            'has_more': True, 'next_cursor': 'MTcwOTI1MTIwMDAwMDAwMDphbm9tXzAwMDAwMDAx'}
+    pages = 20
+    baseline = timed(lambda: [json.dumps(page, default=str).encode() for _ in range(pages)], args.repeat)
+    fast = timed(lambda: [dumps(page) for _ in range(pages)], args.repeat)
+    report(f"query page ({args.anomalies} anomalies)", baseline, fast, pages)
+
+    # Event details: asdict() + metadata + json.dumps versus direct dataclass encoding
+    events = build_tor_anomalies(args.events)
+    metadata = {'event_version': '1.0', 'published_at': datetime.utcnow().isoformat(),
+                'publisher': 'anomaly-detection-service'}
+    baseline = timed(lambda: [json.dumps(dict(asdict(event), **metadata), default=str) for event in events],
+                     args.repeat)
+    fast = timed(lambda: [dumps_with(event, metadata).decode() for event in events], args.repeat)
+    report("event detail (TorUsageAnomaly)", baseline, fast, len(events))
+
+    # Stored documents: repository rows are parsed back on every query
+    documents = [json.dumps(anomaly) for anomaly in page['anomalies']]
+    baseline = timed(lambda: [json.loads(document) for document in documents], args.repeat)
+    fast = timed(lambda: [loads(document) for document in documents], args.repeat)
+    report("stored document parse", baseline, fast, len(documents))
+
+    # Output must stay equivalent to what the stdlib path produced
+    sample = events[0]
+    expected = dict(asdict(sample), tor_ports=sorted(sample.tor_ports),
+                    detection_timestamp=sample.detection_timestamp.isoformat(), **metadata)
+    decoded = loads(dumps_with(sample, metadata))
+    decoded['tor_ports'] = sorted(decoded['tor_ports'])
+    print(f"event detail equivalent to stdlib: {decoded == expected}")
+    print(f"query page equivalent to stdlib: {loads(dumps(page)) == json.loads(json.dumps(page))}")
+
+
+if __name__ == "__main__":
+    main()
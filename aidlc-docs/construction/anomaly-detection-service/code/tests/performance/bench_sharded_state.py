@@ -0,0 +1,125 @@
+#!/usr/bin/env python3
+"""
+Sharded Correlation State Benchmark
+Compares entity-state write/read throughput and related-entity fan-out for 1 vs N local Redis shards,
+then adds a shard and times the rebalance.
+
+Usage:
+    python tests/performance/bench_sharded_state.py [--entities 20000] [--shards 3] [--concurrency 64]
+
+Requires redis-server on PATH; instances are started on --base-port onwards.
+"""
+
+import argparse
+import asyncio
+import os
+import sys
+import time
+
+import redis.asyncio as aioredis
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+sys.path.insert(0, os.path.dirname(__file__))
+
+from local_redis_shards import LocalRedisShards
+from src.detection.correlation.correlation_state_manager import AsyncCorrelationStateManager
+from src.infrastructure.cache.rebalance import ShardRebalancer
+from src.infrastructure.cache.sharding import RedisShardSet, parse_shard_url
+
+
+def anomaly(i: int) -> dict:
+    return {
+        'anomaly_id': f"bench_{i}",
+        'threat_type': 'PORT_SCANNING',
+        'confidence_score': 0.9,
+        'source_ip': f"10.{i // 65536 % 256}.{i // 256 % 256}.{i % 256}",
+        'destination_ip': '172.16.0.1',
+        'destination_port': 443
+    }
+
+
+async def bench_shards(urls, entities: int, concurrency: int) -> dict:
+    manager = AsyncCorrelationStateManager({'shards': urls, 'max_connections': concurrency * 2})
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def bounded(coro):
+        async with semaphore:
+            return await coro
+
+    keys = [anomaly(i)['source_ip'] for i in range(entities)]
+
+    start = time.perf_counter()
+    await asyncio.gather(*(bounded(manager.update_entity_correlation_state(k, anomaly(i))) for i, k in enumerate(keys)))
+    write_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    await asyncio.gather(*(bounded(manager.get_entity_correlation_state(k)) for k in keys))
+    read_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    related = await manager.get_related_entities(keys[0])
+    fan_out_time = time.perf_counter() - start
+
+    distribution = {}
+    for key in keys:
+        node = manager.shards.node_for(key)
+        distribution[node] = distribution.get(node, 0) + 1
+
+    await manager.close()
+    return {
+        'writes_per_sec': entities / write_time,
+        'reads_per_sec': entities / read_time,
+        'related_query_ms': fan_out_time * 1000,
+        'related_found': len(related),
+        'distribution': distribution
+    }
+
+
+async def bench_rebalance(urls, previous_urls) -> dict:
+    rebalancer = ShardRebalancer(
+        RedisShardSet([parse_shard_url(u) for u in urls]),
+        extra_sources=[parse_shard_url(u) for u in previous_urls]
+    )
+    start = time.perf_counter()
+    stats = await rebalancer.rebalance()
+    stats['seconds'] = time.perf_counter() - start
+    await rebalancer.close()
+    return stats
+
+
+async def flush(urls):
+    for url in urls:
+        shard = parse_shard_url(url)
+        client = aioredis.Redis(host=shard['host'], port=shard['port'], db=shard['db'])
+        await client.flushdb()
+        await client.aclose()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--entities', type=int, default=20000)
+    parser.add_argument('--shards', type=int, default=3)
+    parser.add_argument('--concurrency', type=int, default=64)
+    parser.add_argument('--base-port', type=int, default=6380)
+    args = parser.parse_args()
+
+    with LocalRedisShards(args.shards + 1, args.base_port) as all_urls:
+        print(f"=== Sharded state benchmark: {args.entities} entities ===")
+        for count in (1, args.shards):
+            urls = all_urls[:count]
+            result = asyncio.run(bench_shards(urls, args.entities, args.concurrency))
+            print(f"{count} shard(s): write {result['writes_per_sec']:>9,.0f}/s  "
+                  f"read {result['reads_per_sec']:>9,.0f}/s  "
+                  f"related query {result['related_query_ms']:>8,.1f} ms  "
+                  f"distribution {result['distribution']}")
+            if count != args.shards:
+                asyncio.run(flush(urls))
+
+        # Add one shard and move the affected keys
+        stats = asyncio.run(bench_rebalance(all_urls, all_urls[:args.shards]))
+        print(f"rebalance to {args.shards + 1} shards: moved {stats['moved']} of {stats['scanned']} keys "
+              f"in {stats['seconds']:.2f}s (failed {stats['failed']})")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,134 @@
+#!/usr/bin/env python3
+"""
+State Codec Benchmark
+Measures encode/decode throughput and payload size for correlation state codecs.
+
+Usage:
+    python tests/performance/bench_state_codec.py [--states 2000] [--history 100] [--redis-url redis://localhost:6379/15]
+
+When --redis-url is given, each codec's payloads are written to Redis and
+MEMORY USAGE is sampled to report the per-key server-side footprint.
+"""
+
+import argparse
+import os
+import random
+import sys
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+
+from src.detection.correlation.correlation_state_manager import CorrelationState
+from src.infrastructure.cache.state_codec import (
+    LegacyJsonCodec, CompactJsonCodec, decode_value, datetime_to_epoch_us, msgpack
+)
+
+THREAT_TYPES = ['PORT_SCANNING', 'DDOS', 'C2_BEACONING', 'CRYPTO_MINING', 'TOR_USAGE']
+
+
+def build_states(count: int, history_size: int):
+    """Build synthetic correlation states with full anomaly histories"""
+    now = datetime.utcnow()
+    states = []
+    for i in range(count):
+        source_ip = f"10.{i // 65536 % 256}.{i // 256 % 256}.{i % 256}"
+        history = []
+        for j in range(history_size):
+            history.append({
+                'anomaly_id': f"ps_{source_ip}_{j}",
+                'threat_type': random.choice(THREAT_TYPES),
+                'confidence_score': round(random.random(), 4),
+                'timestamp': datetime_to_epoch_us(now - timedelta(seconds=j * 3)),
+                'source_ip': source_ip,
+                'destination_ip': f"172.16.{j % 256}.{random.randint(1, 254)}",
+                'destination_port': random.choice([22, 80, 443, 3389, 8080])
+            })
+        states.append(CorrelationState(
+            entity_key=source_ip,
+            anomaly_history=history,
+            correlation_context={'group_id': f"corr_{i}", 'score': random.random()},
+            last_updated=now,
+            expiry_time=now + timedelta(minutes=30)
+        ))
+    return states
+
+
+def legacy_payload(state: CorrelationState) -> dict:
+    """Render state in the original ISO-string JSON layout"""
+    data = state.to_dict()
+    data['anomaly_history'] = [
+        dict(entry, timestamp=datetime.utcfromtimestamp(entry['timestamp'] / 1_000_000).isoformat())
+        for entry in state.anomaly_history
+    ]
+    return data
+
+
+def bench_codec(name, codec, states, redis_client=None):
+    records = [legacy_payload(s) for s in states] if name == 'json' else [s.to_record() for s in states]
+
+    start = time.perf_counter()
+    payloads = [codec.encode(record) for record in records]
+    encode_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for payload in payloads:
+        CorrelationState.from_dict(decode_value(payload))
+    decode_time = time.perf_counter() - start
+
+    total_bytes = sum(len(p) for p in payloads)
+    result = {
+        'codec': name,
+        'encode_per_sec': len(payloads) / encode_time,
+        'decode_per_sec': len(payloads) / decode_time,
+        'avg_payload_bytes': total_bytes / len(payloads)
+    }
+
+    if redis_client is not None:
+        sample = payloads[:200]
+        pipe = redis_client.pipeline()
+        for i, payload in enumerate(sample):
+            pipe.set(f"bench:{name}:{i}", payload)
+        pipe.execute()
+        usages = [redis_client.memory_usage(f"bench:{name}:{i}") or 0 for i in range(len(sample))]
+        redis_client.delete(*[f"bench:{name}:{i}" for i in range(len(sample))])
+        result['avg_redis_memory_bytes'] = sum(usages) / len(usages)
+
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--states', type=int, default=2000)
+    parser.add_argument('--history', type=int, default=100)
+    parser.add_argument('--redis-url', default=None)
+    args = parser.parse_args()
+
+    random.seed(7)
+    states = build_states(args.states, args.history)
+
+    redis_client = None
+    if args.redis_url:
+        import redis
+        redis_client = redis.Redis.from_url(args.redis_url)
+
+    codecs = [('json', LegacyJsonCodec()), ('compact_json', CompactJsonCodec())]
+    if msgpack is not None:
+        from src.infrastructure.cache.state_codec import MsgpackCodec
+        codecs.append(('msgpack', MsgpackCodec()))
+    else:
+        print("msgpack not installed - skipping msgpack codec")
+
+    print(f"=== State codec benchmark: {args.states} states x {args.history} history entries ===")
+    for name, codec in codecs:
+        result = bench_codec(name, codec, states, redis_client)
+        line = (f"{result['codec']:>13}: encode {result['encode_per_sec']:>10,.0f}/s  "
+                f"decode {result['decode_per_sec']:>10,.0f}/s  "
+                f"payload {result['avg_payload_bytes']:>9,.0f} B")
+        if 'avg_redis_memory_bytes' in result:
+            line += f"  redis {result['avg_redis_memory_bytes']:>9,.0f} B"
+        print(line)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,57 @@
+#!/usr/bin/env python3
+"""
+Timestamp Parsing Benchmark
+Compares per-record datetime.fromisoformat against the memoized-prefix and vectorized epoch parsers.
+
+Usage:
+    python tests/performance/bench_timestamp_parsing.py [--records 200000]
+"""
+
+import argparse
+import os
+import random
+import sys
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+
+from src.utils.timestamps.epoch import datetime_to_epoch, parse_iso_epoch, to_epoch_array
+
+
+def build_timestamps(count: int):
+    start = datetime(2024, 1, 15, 8, 0, 0)
+    offsets = sorted(random.randint(0, 6 * 3600) for _ in range(count))
+    return [(start + timedelta(seconds=offset)).isoformat() + 'Z' for offset in offsets]
+
+
+def timed(label: str, func, values, baseline=None):
+    start = time.perf_counter()
+    result = func(values)
+    elapsed = time.perf_counter() - start
+    result = list(result)
+    speedup = f"  {baseline / elapsed:5.1f}x" if baseline else ''
+    print(f"{label:<26} {elapsed * 1000:>9,.1f} ms  {len(values) / elapsed:>12,.0f} rec/s{speedup}")
+    return result, elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--records', type=int, default=200000)
+    args = parser.parse_args()
+
+    random.seed(11)
+    values = build_timestamps(args.records)
+
+    print(f"=== {args.records:,} ISO timestamps ===")
+    expected, baseline = timed(
+        'fromisoformat per record',
+        lambda xs: [datetime_to_epoch(datetime.fromisoformat(x.replace('Z', '+00:00'))) for x in xs], values
+    )
+    memoized, _ = timed('memoized prefix', lambda xs: [parse_iso_epoch(x) for x in xs], values, baseline)
+    vectorized, _ = timed('vectorized column', lambda xs: to_epoch_array(xs).tolist(), values, baseline)
+    print(f"identical: {memoized == expected and vectorized == expected}")
+
+
+if __name__ == "__main__":
+    main()
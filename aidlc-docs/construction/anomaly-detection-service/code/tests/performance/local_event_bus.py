@@ -0,0 +1,55 @@
+#!/usr/bin/env python3
+"""
+Local Event Bus
+In-process stand-in for an EventBridge client: records PutEvents entries and can simulate outages and partial failures.
+
+Benchmarks pass LocalEventBus instances as the `client` of EventPublisher.
+"""
+
+import random
+import threading
+import time
+from typing import Any, Dict, List
+
+from botocore.exceptions import ClientError
+
+MAX_ENTRIES_PER_REQUEST = 10
+
+
+class LocalEventBus:
+    """put_events / describe_event_bus with switchable outage, per-entry failure rate and latency"""
+
+    def __init__(self, name: str = 'local-bus', failure_rate: float = 0.0, latency: float = 0.0, seed: int = 0):
+        self.name = name
+        self.failure_rate = failure_rate
+        self.latency = latency
+        self.down = False
+        self.delivered: List[Dict[str, Any]] = []
+        self.requests = 0
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def put_events(self, Entries: List[Dict[str, Any]]) -> Dict[str, Any]:
+        if len(Entries) > MAX_ENTRIES_PER_REQUEST:
+            raise ClientError({'Error': {'Code': 'ValidationException', 'Message': 'Too many entries'}}, 'PutEvents')
+        if self.latency:
+            time.sleep(self.latency)
+        with self._lock:
+            self.requests += 1
+            if self.down:
+                raise ClientError({'Error': {'Code': 'ServiceUnavailable', 'Message': f"{self.name} is down"}},
+                                  'PutEvents')
+            results = []
+            for entry in Entries:
+                if self._random.random() < self.failure_rate:
+                    results.append({'ErrorCode': 'InternalFailure', 'ErrorMessage': 'Simulated failure'})
+                else:
+                    self.delivered.append(entry)
+                    results.append({'EventId': f"{self.name}-{len(self.delivered)}"})
+        return {'FailedEntryCount': sum('ErrorCode' in result for result in results), 'Entries': results}
+
+    def describe_event_bus(self, Name: str) -> Dict[str, Any]:
+        if self.down:
+            raise ClientError({'Error': {'Code': 'ServiceUnavailable', 'Message': f"{self.name} is down"}},
+                              'DescribeEventBus')
+        return {'Name': Name, 'Arn': f"arn:aws:events:local:000000000000:event-bus/{Name}"}
@@ -0,0 +1,93 @@
+#!/usr/bin/env python3
+"""
+Local Redis Shards
+Starts throwaway redis-server processes to stand in for sharded ElastiCache nodes.
+
+Usage:
+    python tests/performance/local_redis_shards.py [--count 3] [--base-port 6380]
+
+Prints the `shards` config list and keeps the servers up until interrupted.
+Benchmarks import LocalRedisShards and use it as a context manager.
+"""
+
+import argparse
+import json
+import shutil
+import socket
+import subprocess
+import tempfile
+import time
+from typing import List
+
+
+class LocalRedisShards:
+    """Context manager running `count` redis-server instances on consecutive ports"""
+
+    def __init__(self, count: int = 3, base_port: int = 6380, redis_server: str = 'redis-server'):
+        self.count = count
+        self.base_port = base_port
+        self.redis_server = shutil.which(redis_server) or redis_server
+        self.processes = []
+        self._workdir = None
+
+    @property
+    def urls(self) -> List[str]:
+        return [f"localhost:{self.base_port + i}" for i in range(self.count)]
+
+    def start(self) -> List[str]:
+        self._workdir = tempfile.TemporaryDirectory(prefix='redis-shards-')
+        for i in range(self.count):
+            port = self.base_port + i
+            self.processes.append(subprocess.Popen(
+                [self.redis_server, '--port', str(port), '--save', '', '--appendonly', 'no',
+                 '--dir', self._workdir.name, '--notify-keyspace-events', 'Kg$xe'],
+                stdout=subprocess.DEVNULL, stderr=subprocess.STDOUT
+            ))
+        for i in range(self.count):
+            self._wait_for_port(self.base_port + i)
+        return self.urls
+
+    @staticmethod
+    def _wait_for_port(port: int, timeout: float = 10.0):
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            try:
+                with socket.create_connection(('localhost', port), timeout=0.2):
+                    return
+            except OSError:
+                time.sleep(0.05)
+        raise RuntimeError(f"redis-server on port {port} did not start")
+
+    def stop(self):
+        for process in self.processes:
+            process.terminate()
+        for process in self.processes:
+            process.wait(timeout=10)
+        self.processes = []
+        if self._workdir:
+            self._workdir.cleanup()
+
+    def __enter__(self) -> List[str]:
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--count', type=int, default=3)
+    parser.add_argument('--base-port', type=int, default=6380)
+    args = parser.parse_args()
+
+    with LocalRedisShards(args.count, args.base_port) as urls:
+        print(json.dumps({'shards': urls}))
+        try:
+            while True:
+                time.sleep(3600)
+        except KeyboardInterrupt:
+            pass
+
+
+if __name__ == "__main__":
+    main()
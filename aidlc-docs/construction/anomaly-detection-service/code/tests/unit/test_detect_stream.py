@@ -0,0 +1,47 @@
+"""
+Streaming Detection Endpoint Tests
+The NDJSON upload is read by the response body itself, so it must complete under any ASGI spec version.
+"""
+
+import gzip
+import json
+import os
+
+import pytest
+
+os.environ.setdefault('DETECT_USE_PROCESSES', 'false')
+os.environ.setdefault('DETECT_WORKERS', '1')
+
+from fastapi.testclient import TestClient
+
+from src.api.endpoints.anomaly_api import app
+
+FLOWS = 200
+
+
+def ndjson_body() -> bytes:
+    return gzip.compress(b''.join(
+        json.dumps({'timestamp': 1709251200 + i, 'source_ip': f"10.0.0.{i % 250 + 1}", 'destination_ip': '172.16.0.9',
+                    'destination_port': 443, 'protocol': 'TCP', 'action': 'ACCEPT', 'packets': 3,
+                    'bytes': 180}).encode() + b'\n'
+        for i in range(FLOWS)
+    ))
+
+
+@pytest.fixture(scope='module')
+def client():
+    # The TestClient reports ASGI spec 2.3, where StreamingResponse would listen for disconnects on receive()
+    with TestClient(app) as test_client:
+        yield test_client
+
+
+def test_gzip_stream_completes_with_summary(client):
+    response = client.post('/api/v1/detect/stream', content=ndjson_body(),
+                           headers={'Content-Type': 'application/x-ndjson', 'Content-Encoding': 'gzip'})
+
+    assert response.status_code == 200
+    lines = [json.loads(line) for line in response.text.splitlines()]
+    summary = lines[-1]
+    assert summary['type'] == 'summary'
+    assert summary['flow_logs'] == FLOWS
+    assert summary['parse_errors'] == 0
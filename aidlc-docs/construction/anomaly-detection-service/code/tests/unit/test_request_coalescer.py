@@ -0,0 +1,46 @@
+"""
+Request Coalescer Tests
+A failed coalesced pass is an error for every caller in it, never an empty "no anomaly" result.
+"""
+
+import asyncio
+
+import pytest
+
+from src.api.services.request_coalescer import DetectionFailed, RequestCoalescer
+
+FAILED_SUMMARY = {
+    'anomalies': [],
+    'member_flows': [],
+    'tier_timings_ms': {},
+    'tier_counts': {},
+    'processing_time_ms': 1,
+    'error': 'tier 1 unavailable'
+}
+
+
+class FailingService:
+    """Answers like DetectionService when TieredAnomalyProcessor caught a tier failure"""
+
+    async def detect(self, flow_logs, detection_types=None, priority='normal'):
+        return dict(FAILED_SUMMARY)
+
+    async def detect_members(self, flow_logs, detection_types=None, priority='normal'):
+        return dict(FAILED_SUMMARY)
+
+
+def flow(index: int):
+    return {'source_ip': f"10.0.0.{index}", 'destination_ip': '172.16.0.9', 'destination_port': 443}
+
+
+@pytest.mark.parametrize('enabled', [True, False])
+def test_failed_pass_raises_for_every_caller(enabled):
+    coalescer = RequestCoalescer(FailingService(), {'enabled': enabled})
+
+    async def run():
+        return await asyncio.gather(*[coalescer.detect(flow(i)) for i in range(1, 4)], return_exceptions=True)
+
+    results = asyncio.run(run())
+    assert all(isinstance(result, DetectionFailed) for result in results)
+    assert 'tier 1 unavailable' in str(results[0])
+    assert coalescer.stats['errors'] == (1 if enabled else 3)
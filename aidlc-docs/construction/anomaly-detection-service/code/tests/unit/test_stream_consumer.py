@@ -0,0 +1,70 @@
+"""
+Stream Consumer Tests
+Failed pipeline passes are retried, then dead-lettered or stop the shard; the checkpoint never skips them.
+"""
+
+import json
+
+import pytest
+
+from src.api.services.detection_service import DEFAULT_PROCESSOR_CONFIG
+from src.detection.tiered_processor import TieredAnomalyProcessor
+from src.ingestion.stream_consumer import StreamConsumer
+from src.ingestion.stream_sources import FileSource
+
+RECORDS = 30
+
+
+def failing_processor():
+    """A real processor whose tier 1 raises; process_flow_logs reports the error in its result"""
+    processor = TieredAnomalyProcessor(DEFAULT_PROCESSOR_CONFIG)
+
+    def tier1_fails(flow_logs):
+        raise RuntimeError("tier 1 unavailable")
+
+    processor._tier1_fast_screening = tier1_fails
+    return processor
+
+
+@pytest.fixture
+def flow_file(tmp_path):
+    path = tmp_path / 'flows.jsonl'
+    path.write_text(''.join(
+        json.dumps({'timestamp': 1709251200 + i, 'source_ip': f"10.0.0.{i + 1}", 'destination_ip': '172.16.0.9',
+                    'destination_port': 443, 'protocol': 'TCP', 'action': 'ACCEPT', 'packets': 3, 'bytes': 180}) + '\n'
+        for i in range(RECORDS)
+    ))
+    return path
+
+
+def run_consumer(flow_file, tmp_path, **config):
+    consumer = StreamConsumer(
+        dict({'checkpoint_path': str(tmp_path / 'checkpoints.json'), 'batch_size': 10, 'max_retries': 1,
+              'idle_sleep': 0.01, 'max_batch_wait': 0.01}, **config),
+        processor_factory=failing_processor,
+        source=FileSource({'paths': [str(flow_file)]})
+    )
+    consumer.run()
+    return consumer.get_statistics()
+
+
+def test_failed_batches_are_dead_lettered(flow_file, tmp_path):
+    dead_letter = tmp_path / 'dead-letter.jsonl'
+    stats = run_consumer(flow_file, tmp_path, dead_letter_path=str(dead_letter))
+
+    assert stats['batches_processed'] == 0
+    assert stats['batches_failed'] == stats['batches_submitted'] == stats['batches_dead_lettered']
+    entries = [json.loads(line) for line in dead_letter.read_text().splitlines()]
+    assert sum(len(entry['flow_logs']) for entry in entries) == RECORDS
+    assert all('tier 1 unavailable' in entry['error'] for entry in entries)
+    # Every batch is safely recorded, so the checkpoint may move past them
+    assert stats['checkpoints'][str(flow_file)] == str(RECORDS)
+
+
+def test_failed_batch_without_dead_letter_stops_the_shard(flow_file, tmp_path):
+    stats = run_consumer(flow_file, tmp_path)
+
+    assert stats['batches_processed'] == 0
+    assert stats['batches_failed'] >= 1
+    assert stats['batches_dead_lettered'] == 0
+    assert stats['checkpoints'].get(str(flow_file)) is None